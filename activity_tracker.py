@@ -1,6 +1,10 @@
 """
 Advanced Activity Tracking and Opportunity Management System
-Comprehensive logging, user notifications, and opportunity tracking to ensure nothing falls through the cracks
+Comprehensive logging, user notifications, and opportunity tracking to ensure nothing falls through the cracks:
+- Append-only storage: each event is one INSERT, changes are targeted UPDATEs
+- Time-based retention: old activities move to activity_logs_archive, old read notifications are dropped
+- Windowed, indexed queries instead of loading history into memory
+- Background ingestion queue: batched writes and opportunity checks off the request path
 """
 
 from __future__ import annotations
@@ -9,17 +13,23 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Any, Set
+from typing import List, Dict, Optional, Any, Sequence, Set
 from enum import Enum
+import atexit
+import queue
+import threading
+import time
 import uuid
 import json
-import sqlite3
+from db_connection import get_connection, transaction
+from schema_migrations import ensure_schema
 
 class ActivityType(Enum):
     """Types of tracked activities"""
     DEAL_CREATED = "Deal Created"
     DEAL_UPDATED = "Deal Updated"
     DEAL_STAGE_CHANGED = "Deal Stage Changed"
+    LEAD_CREATED = "Lead Created"
     LEAD_CONTACTED = "Lead Contacted"
     BUYER_MATCHED = "Buyer Matched"
     EMAIL_SENT = "Email Sent"
@@ -37,6 +47,7 @@ class ActivityType(Enum):
     OFFER_SUBMITTED = "Offer Submitted"
     CONTRACT_SIGNED = "Contract Signed"
     CLOSING_SCHEDULED = "Closing Scheduled"
+    GENERAL_ACTIVITY = "General Activity"
 
 class Priority(Enum):
     """Priority levels for activities and notifications"""
@@ -125,105 +136,50 @@ class ReminderRule:
     is_active: bool = True
     created_at: datetime = field(default_factory=datetime.now)
 
+# Retention: older activities move to activity_logs_archive, older read notifications are deleted
+ACTIVITY_RETENTION_DAYS = 90
+NOTIFICATION_RETENTION_DAYS = 30
+PRUNE_INTERVAL = timedelta(hours=24)
+
+# Background ingestion: a batch is written every FLUSH_INTERVAL_MS or BATCH_SIZE events
+INGEST_QUEUE_SIZE = 10000
+INGEST_BATCH_SIZE = 200
+INGEST_FLUSH_INTERVAL_MS = 250
+
+# Windowed reads return at most this many rows, newest first
+ACTIVITY_WINDOW_LIMIT = 1000
+NOTIFICATION_WINDOW_LIMIT = 500
+
+ACTIVITY_COLUMNS = (
+    'id', 'user_id', 'activity_type', 'title', 'description', 'entity_type', 'entity_id', 'metadata',
+    'priority', 'created_at', 'requires_action', 'action_deadline', 'is_completed', 'completed_at', 'tags'
+)
+OPPORTUNITY_COLUMNS = (
+    'id', 'opportunity_type', 'title', 'description', 'entity_id', 'potential_value', 'confidence_score',
+    'priority', 'created_at', 'expires_at', 'is_acted_upon', 'action_taken', 'action_date', 'outcome'
+)
+NOTIFICATION_COLUMNS = (
+    'id', 'user_id', 'title', 'message', 'notification_type', 'priority', 'channels', 'related_entity_type',
+    'related_entity_id', 'scheduled_for', 'sent_at', 'read_at', 'is_sent', 'is_read', 'action_url', 'metadata'
+)
+
 class ActivityTracker:
     """Comprehensive activity tracking system"""
     
-    def __init__(self, db_path: str = "crm_data.db"):
+    def __init__(self, db_path: str = "crm_data.db", background: bool = True):
         self.db_path = db_path
-        self.activity_logs: List[ActivityLog] = []
-        self.opportunity_alerts: List[OpportunityAlert] = []
-        self.notifications: List[UserNotification] = []
         self.reminder_rules: List[ReminderRule] = []
+        self._last_pruned: Optional[datetime] = None
         self.init_database()
         self.setup_default_reminder_rules()
-        self.load_data()
+        self.prune_history()
+        # Without a background queue every log_activity call writes inline
+        self.ingestion: Optional[ActivityIngestionQueue] = get_activity_ingestion_queue(self) if background else None
     
     def init_database(self):
-        """Initialize activity tracking database tables"""
+        """Initialize activity tracking database tables (schema owned by schema_migrations)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Activity logs table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS activity_logs (
-                        id TEXT PRIMARY KEY,
-                        user_id TEXT,
-                        activity_type TEXT,
-                        title TEXT,
-                        description TEXT,
-                        entity_type TEXT,
-                        entity_id TEXT,
-                        metadata TEXT,
-                        priority TEXT,
-                        created_at TEXT,
-                        requires_action BOOLEAN,
-                        action_deadline TEXT,
-                        is_completed BOOLEAN,
-                        completed_at TEXT,
-                        tags TEXT
-                    )
-                ''')
-                
-                # Opportunity alerts table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS opportunity_alerts (
-                        id TEXT PRIMARY KEY,
-                        opportunity_type TEXT,
-                        title TEXT,
-                        description TEXT,
-                        entity_id TEXT,
-                        potential_value REAL,
-                        confidence_score REAL,
-                        priority TEXT,
-                        created_at TEXT,
-                        expires_at TEXT,
-                        is_acted_upon BOOLEAN,
-                        action_taken TEXT,
-                        action_date TEXT,
-                        outcome TEXT
-                    )
-                ''')
-                
-                # User notifications table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS user_notifications (
-                        id TEXT PRIMARY KEY,
-                        user_id TEXT,
-                        title TEXT,
-                        message TEXT,
-                        notification_type TEXT,
-                        priority TEXT,
-                        channels TEXT,
-                        related_entity_type TEXT,
-                        related_entity_id TEXT,
-                        scheduled_for TEXT,
-                        sent_at TEXT,
-                        read_at TEXT,
-                        is_sent BOOLEAN,
-                        is_read BOOLEAN,
-                        action_url TEXT,
-                        metadata TEXT
-                    )
-                ''')
-                
-                # Reminder rules table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS reminder_rules (
-                        id TEXT PRIMARY KEY,
-                        name TEXT,
-                        entity_type TEXT,
-                        trigger_condition TEXT,
-                        trigger_value INTEGER,
-                        reminder_message TEXT,
-                        priority TEXT,
-                        channels TEXT,
-                        is_active BOOLEAN,
-                        created_at TEXT
-                    )
-                ''')
-                
-                conn.commit()
+            ensure_schema(self.db_path)
         except Exception as e:
             print(f"Database initialization error: {e}")
     
@@ -301,7 +257,12 @@ class ActivityTracker:
                     requires_action: bool = False,
                     action_deadline: Optional[datetime] = None,
                     tags: List[str] = None) -> ActivityLog:
-        """Log a new activity"""
+        """Log a new activity
+        
+        With background ingestion the activity is queued and returned
+        immediately; it is stored and checked for opportunities within
+        INGEST_FLUSH_INTERVAL_MS. Call flush_activities() to wait for it.
+        """
         
         activity = ActivityLog(
             user_id=user_id,
@@ -317,14 +278,50 @@ class ActivityTracker:
             tags=tags or []
         )
         
-        self.activity_logs.append(activity)
-        self.save_data()
-        
-        # Check if this activity triggers any opportunities or reminders
-        self.check_opportunity_triggers(activity)
+        if self.ingestion is None or not self.ingestion.submit(activity):
+            self.store_activities([activity])
         
         return activity
     
+    def store_activities(self, activities: List[ActivityLog]) -> int:
+        """Write a batch of activities and run their opportunity checks
+        
+        Returns the number of activities stored. The batch is one
+        transaction; if it fails the rows are retried one by one so a
+        single bad event does not lose the rest.
+        """
+        rows = [self._activity_row(activity) for activity in activities]
+        sql = (f"INSERT INTO activity_logs ({', '.join(ACTIVITY_COLUMNS)}) "
+               f"VALUES ({', '.join('?' * len(ACTIVITY_COLUMNS))})")
+        stored = []
+        try:
+            with transaction(self.db_path) as conn:
+                conn.executemany(sql, rows)
+            stored = list(activities)
+        except Exception as e:
+            print(f"Error saving activity batch, retrying individually: {e}")
+            for activity, row in zip(activities, rows):
+                try:
+                    with transaction(self.db_path) as conn:
+                        conn.execute(sql, row)
+                    stored.append(activity)
+                except Exception as e:
+                    print(f"Error saving activity data: {e}")
+        
+        self._prune_if_due()
+        
+        # Check if these activities trigger any opportunities or reminders
+        for activity in stored:
+            try:
+                self.check_opportunity_triggers(activity)
+            except Exception as e:
+                print(f"Error checking opportunity triggers: {e}")
+        return len(stored)
+    
+    def flush_activities(self, timeout: Optional[float] = None) -> bool:
+        """Wait until queued activities are stored; True if the queue drained"""
+        return self.ingestion.flush(timeout) if self.ingestion else True
+    
     def create_opportunity_alert(self,
                                opportunity_type: str,
                                title: str,
@@ -347,21 +344,22 @@ class ActivityTracker:
             expires_at=expires_at
         )
         
-        self.opportunity_alerts.append(opportunity)
-        
-        # Create notification for the opportunity
-        self.create_notification(
-            user_id="admin",  # In real app, determine appropriate user
-            title=f"New Opportunity: {title}",
-            message=description,
-            notification_type="opportunity",
-            priority=priority,
-            channels=[NotificationChannel.IN_APP, NotificationChannel.EMAIL],
-            related_entity_type="opportunity",
-            related_entity_id=opportunity.id
-        )
+        # The opportunity and its notification are stored together
+        with transaction(self.db_path):
+            self._insert('opportunity_alerts', OPPORTUNITY_COLUMNS, [self._opportunity_row(opportunity)])
+            
+            # Create notification for the opportunity
+            self.create_notification(
+                user_id="admin",  # In real app, determine appropriate user
+                title=f"New Opportunity: {title}",
+                message=description,
+                notification_type="opportunity",
+                priority=priority,
+                channels=[NotificationChannel.IN_APP, NotificationChannel.EMAIL],
+                related_entity_type="opportunity",
+                related_entity_id=opportunity.id
+            )
         
-        self.save_data()
         return opportunity
     
     def create_notification(self,
@@ -392,8 +390,7 @@ class ActivityTracker:
             metadata=metadata or {}
         )
         
-        self.notifications.append(notification)
-        self.save_data()
+        self._insert('user_notifications', NOTIFICATION_COLUMNS, [self._notification_row(notification)])
         return notification
     
     def check_opportunity_triggers(self, activity: ActivityLog):
@@ -553,258 +550,458 @@ class ActivityTracker:
         return None
     
     def get_activity_summary(self, days: int = 7) -> Dict[str, Any]:
-        """Get activity summary for the specified number of days"""
-        cutoff_date = datetime.now() - timedelta(days=days)
-        recent_activities = [a for a in self.activity_logs if a.created_at >= cutoff_date]
+        """Get activity summary for the specified number of days
         
-        # Activity type breakdown
+        Counts come from the daily activity and opportunity rollups, so the
+        window covers whole days back to the cutoff date.
+        """
+        cutoff_day = (datetime.now() - timedelta(days=days)).date().isoformat()
         activity_counts = {}
-        for activity in recent_activities:
-            activity_type = activity.activity_type.value
-            activity_counts[activity_type] = activity_counts.get(activity_type, 0) + 1
-        
-        # Priority breakdown
         priority_counts = {}
-        for activity in recent_activities:
-            priority = activity.priority.value
-            priority_counts[priority] = priority_counts.get(priority, 0) + 1
-        
-        # Actions required
-        actions_required = len([a for a in recent_activities if a.requires_action and not a.is_completed])
+        actions_required = 0
+        opportunities_identified = 0
+        total_opportunity_value = 0
         
-        # Opportunities
-        recent_opportunities = [o for o in self.opportunity_alerts if o.created_at >= cutoff_date]
-        total_opportunity_value = sum(o.potential_value for o in recent_opportunities)
+        try:
+            conn = get_connection(self.db_path)
+            try:
+                rows = conn.execute('''
+                    SELECT activity_type, priority, SUM(row_count), SUM(actions_open)
+                    FROM rollup_activity_daily WHERE day >= ?
+                    GROUP BY activity_type, priority
+                ''', (cutoff_day,)).fetchall()
+                opportunities = conn.execute('''
+                    SELECT SUM(row_count), SUM(potential_value_sum)
+                    FROM rollup_opportunities_daily WHERE day >= ?
+                ''', (cutoff_day,)).fetchone()
+            finally:
+                conn.close()
+            
+            for activity_type, priority, count, open_actions in rows:
+                if not count:
+                    continue
+                # Activity type and priority breakdowns
+                activity_counts[activity_type] = activity_counts.get(activity_type, 0) + count
+                priority_counts[priority] = priority_counts.get(priority, 0) + count
+                actions_required += int(open_actions or 0)
+            opportunities_identified = opportunities[0] or 0
+            total_opportunity_value = opportunities[1] or 0
+        except Exception as e:
+            print(f"❌ Error loading activity summary: {e}")
         
         return {
-            'total_activities': len(recent_activities),
+            'total_activities': sum(activity_counts.values()),
             'activity_breakdown': activity_counts,
             'priority_breakdown': priority_counts,
             'actions_required': actions_required,
-            'opportunities_identified': len(recent_opportunities),
+            'opportunities_identified': opportunities_identified,
             'total_opportunity_value': total_opportunity_value,
-            'unread_notifications': len([n for n in self.notifications if not n.is_read]),
-            'pending_notifications': len([n for n in self.notifications if not n.is_sent])
+            **self._notification_counts()
         }
     
-    def get_pending_actions(self) -> List[ActivityLog]:
-        """Get all activities requiring action"""
-        return [a for a in self.activity_logs if a.requires_action and not a.is_completed]
+    def get_pending_actions(self, limit: int = ACTIVITY_WINDOW_LIMIT) -> List[ActivityLog]:
+        """Get activities requiring action (newest first)"""
+        rows = self._query(f'''
+            SELECT {', '.join(ACTIVITY_COLUMNS)} FROM activity_logs
+            WHERE requires_action = 1 AND is_completed = 0
+            ORDER BY created_at DESC LIMIT ?
+        ''', (limit,))
+        return [self._activity_from_row(row) for row in rows]
     
-    def get_recent_activities(self, days_back: int = 7, activity_type: ActivityType = None, priority: Priority = None) -> List[ActivityLog]:
-        """Get recent activities with optional filtering"""
+    def get_recent_activities(self, days_back: int = 7, activity_type: ActivityType = None, priority: Priority = None,
+                              limit: int = ACTIVITY_WINDOW_LIMIT) -> List[ActivityLog]:
+        """Get recent activities with optional filtering (newest first)"""
         cutoff_date = datetime.now() - timedelta(days=days_back)
+        clauses, params = ["created_at >= ?"], [cutoff_date.isoformat()]
         
-        # Filter by date first
-        activities = [a for a in self.activity_logs if a.created_at >= cutoff_date]
-        
-        # Filter by activity type if specified
         if activity_type:
-            activities = [a for a in activities if a.activity_type == activity_type]
+            clauses.append("activity_type = ?")
+            params.append(activity_type.value)
         
-        # Filter by priority if specified
         if priority:
-            activities = [a for a in activities if a.priority == priority]
-        
-        # Sort by creation date (newest first)
-        activities.sort(key=lambda x: x.created_at, reverse=True)
-        
-        return activities
+            clauses.append("priority = ?")
+            params.append(priority.value)
+        
+        rows = self._query(f'''
+            SELECT {', '.join(ACTIVITY_COLUMNS)} FROM activity_logs
+            WHERE {' AND '.join(clauses)}
+            ORDER BY created_at DESC LIMIT ?
+        ''', params + [limit])
+        return [self._activity_from_row(row) for row in rows]
     
-    def get_active_opportunities(self) -> List[OpportunityAlert]:
+    def get_active_opportunities(self, limit: int = ACTIVITY_WINDOW_LIMIT) -> List[OpportunityAlert]:
         """Get all active opportunities"""
-        current_time = datetime.now()
-        return [o for o in self.opportunity_alerts 
-                if not o.is_acted_upon and (not o.expires_at or o.expires_at > current_time)]
+        rows = self._query(f'''
+            SELECT {', '.join(OPPORTUNITY_COLUMNS)} FROM opportunity_alerts
+            WHERE is_acted_upon = 0 AND (expires_at IS NULL OR expires_at > ?)
+            ORDER BY created_at DESC LIMIT ?
+        ''', (datetime.now().isoformat(), limit))
+        return [self._opportunity_from_row(row) for row in rows]
     
     def get_unread_notifications(self, user_id: str) -> List[UserNotification]:
         """Get unread notifications for a user"""
-        return [n for n in self.notifications if n.user_id == user_id and not n.is_read]
+        return self.get_user_notifications(user_id, unread_only=True)
     
     def mark_notification_read(self, notification_id: str):
         """Mark a notification as read"""
-        for notification in self.notifications:
-            if notification.id == notification_id:
-                notification.is_read = True
-                notification.read_at = datetime.now()
-                break
-        self.save_data()
+        self._execute("UPDATE user_notifications SET is_read = 1, read_at = ? WHERE id = ?",
+                      (datetime.now().isoformat(), notification_id))
     
     def mark_opportunity_acted_upon(self, opportunity_id: str, action_taken: str, outcome: str = ""):
         """Mark an opportunity as acted upon"""
-        for opportunity in self.opportunity_alerts:
-            if opportunity.id == opportunity_id:
-                opportunity.is_acted_upon = True
-                opportunity.action_taken = action_taken
-                opportunity.action_date = datetime.now()
-                opportunity.outcome = outcome
-                break
-        self.save_data()
+        self._execute('''
+            UPDATE opportunity_alerts SET is_acted_upon = 1, action_taken = ?, action_date = ?, outcome = ?
+            WHERE id = ?
+        ''', (action_taken, datetime.now().isoformat(), outcome, opportunity_id))
+    
+    def get_user_notifications(self, user_id, unread_only=False, limit: int = NOTIFICATION_WINDOW_LIMIT):
+        """Get notifications for a specific user (newest first)"""
+        unread = "AND is_read = 0" if unread_only else ""
+        rows = self._query(f'''
+            SELECT {', '.join(NOTIFICATION_COLUMNS)} FROM user_notifications
+            WHERE user_id = ? {unread}
+            ORDER BY scheduled_for DESC LIMIT ?
+        ''', (user_id, limit))
+        return [self._notification_from_row(row) for row in rows]
     
-    def load_data(self):
-        """Load activity data from database"""
+    def prune_history(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Apply retention: archive old activities and delete old read notifications"""
+        now = now or datetime.now()
+        activity_cutoff = (now - timedelta(days=ACTIVITY_RETENTION_DAYS)).isoformat()
+        notification_cutoff = (now - timedelta(days=NOTIFICATION_RETENTION_DAYS)).isoformat()
+        columns = ', '.join(ACTIVITY_COLUMNS)
+        pruned = {'activities_archived': 0, 'notifications_deleted': 0}
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Load activity logs
-                cursor.execute("SELECT * FROM activity_logs ORDER BY created_at DESC LIMIT 1000")
-                for row in cursor.fetchall():
-                    activity = ActivityLog(
-                        id=row[0],
-                        user_id=row[1],
-                        activity_type=ActivityType(row[2]),
-                        title=row[3],
-                        description=row[4],
-                        entity_type=row[5],
-                        entity_id=row[6],
-                        metadata=json.loads(row[7]) if row[7] else {},
-                        priority=Priority(row[8]),
-                        created_at=datetime.fromisoformat(row[9]),
-                        requires_action=bool(row[10]),
-                        action_deadline=datetime.fromisoformat(row[11]) if row[11] else None,
-                        is_completed=bool(row[12]),
-                        completed_at=datetime.fromisoformat(row[13]) if row[13] else None,
-                        tags=json.loads(row[14]) if row[14] else []
-                    )
-                    self.activity_logs.append(activity)
-                
-                # Load opportunity alerts
-                cursor.execute("SELECT * FROM opportunity_alerts ORDER BY created_at DESC")
-                for row in cursor.fetchall():
-                    opportunity = OpportunityAlert(
-                        id=row[0],
-                        opportunity_type=row[1],
-                        title=row[2],
-                        description=row[3],
-                        entity_id=row[4],
-                        potential_value=row[5],
-                        confidence_score=row[6],
-                        priority=Priority(row[7]),
-                        created_at=datetime.fromisoformat(row[8]),
-                        expires_at=datetime.fromisoformat(row[9]) if row[9] else None,
-                        is_acted_upon=bool(row[10]),
-                        action_taken=row[11],
-                        action_date=datetime.fromisoformat(row[12]) if row[12] else None,
-                        outcome=row[13]
-                    )
-                    self.opportunity_alerts.append(opportunity)
-                
-                # Load notifications
-                cursor.execute("SELECT * FROM user_notifications ORDER BY scheduled_for DESC LIMIT 500")
-                for row in cursor.fetchall():
-                    notification = UserNotification(
-                        id=row[0],
-                        user_id=row[1],
-                        title=row[2],
-                        message=row[3],
-                        notification_type=row[4],
-                        priority=Priority(row[5]),
-                        channels=[NotificationChannel(c) for c in json.loads(row[6])],
-                        related_entity_type=row[7],
-                        related_entity_id=row[8],
-                        scheduled_for=datetime.fromisoformat(row[9]),
-                        sent_at=datetime.fromisoformat(row[10]) if row[10] else None,
-                        read_at=datetime.fromisoformat(row[11]) if row[11] else None,
-                        is_sent=bool(row[12]),
-                        is_read=bool(row[13]),
-                        action_url=row[14],
-                        metadata=json.loads(row[15]) if row[15] else {}
-                    )
-                    self.notifications.append(notification)
-                    
+            with transaction(self.db_path) as conn:
+                # Copy before deleting: the activity rollup keeps counting archived rows
+                conn.execute(f'''
+                    INSERT OR REPLACE INTO activity_logs_archive ({columns})
+                    SELECT {columns} FROM activity_logs WHERE created_at < ?
+                ''', (activity_cutoff,))
+                pruned['activities_archived'] = conn.execute(
+                    "DELETE FROM activity_logs WHERE created_at < ?", (activity_cutoff,)).rowcount
+                pruned['notifications_deleted'] = conn.execute(
+                    "DELETE FROM user_notifications WHERE is_read = 1 AND scheduled_for < ?",
+                    (notification_cutoff,)).rowcount
+            self._last_pruned = now
         except Exception as e:
-            print(f"Error loading activity data: {e}")
+            print(f"Error pruning activity history: {e}")
+        return pruned
+    
+    def _prune_if_due(self):
+        if self._last_pruned is None or datetime.now() - self._last_pruned >= PRUNE_INTERVAL:
+            self.prune_history()
     
-    def get_user_notifications(self, user_id, unread_only=False):
-        """Get notifications for a specific user"""
+    def _notification_counts(self) -> Dict[str, int]:
+        rows = self._query("SELECT SUM(is_read = 0), SUM(is_sent = 0) FROM user_notifications")
+        unread, pending = rows[0] if rows else (0, 0)
+        return {'unread_notifications': unread or 0, 'pending_notifications': pending or 0}
+    
+    def _insert(self, table: str, columns: Sequence[str], rows: List[tuple]):
+        """Append rows; nothing already stored is rewritten"""
         try:
-            user_notifications = [n for n in self.notifications if n.user_id == user_id]
-            if unread_only:
-                user_notifications = [n for n in user_notifications if not n.is_read]
-            return user_notifications
+            with transaction(self.db_path) as conn:
+                conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) "
+                                 f"VALUES ({', '.join('?' * len(columns))})", rows)
         except Exception as e:
-            print(f"Error getting user notifications: {e}")
-            return []
+            print(f"Error saving activity data: {e}")
     
-    def save_data(self):
-        """Save activity data to database"""
+    def _execute(self, sql: str, params: Sequence[Any] = ()):
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Save activity logs (only recent ones to prevent database bloat)
-                cursor.execute("DELETE FROM activity_logs")
-                for activity in self.activity_logs[-1000:]:  # Keep last 1000 activities
-                    cursor.execute('''
-                        INSERT INTO activity_logs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        activity.id,
-                        activity.user_id,
-                        activity.activity_type.value,
-                        activity.title,
-                        activity.description,
-                        activity.entity_type,
-                        activity.entity_id,
-                        json.dumps(activity.metadata),
-                        activity.priority.value,
-                        activity.created_at.isoformat(),
-                        activity.requires_action,
-                        activity.action_deadline.isoformat() if activity.action_deadline else None,
-                        activity.is_completed,
-                        activity.completed_at.isoformat() if activity.completed_at else None,
-                        json.dumps(activity.tags)
-                    ))
-                
-                # Save opportunity alerts
-                cursor.execute("DELETE FROM opportunity_alerts")
-                for opportunity in self.opportunity_alerts:
-                    cursor.execute('''
-                        INSERT INTO opportunity_alerts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        opportunity.id,
-                        opportunity.opportunity_type,
-                        opportunity.title,
-                        opportunity.description,
-                        opportunity.entity_id,
-                        opportunity.potential_value,
-                        opportunity.confidence_score,
-                        opportunity.priority.value,
-                        opportunity.created_at.isoformat(),
-                        opportunity.expires_at.isoformat() if opportunity.expires_at else None,
-                        opportunity.is_acted_upon,
-                        opportunity.action_taken,
-                        opportunity.action_date.isoformat() if opportunity.action_date else None,
-                        opportunity.outcome
-                    ))
-                
-                # Save notifications
-                cursor.execute("DELETE FROM user_notifications")
-                for notification in self.notifications[-500:]:  # Keep last 500 notifications
-                    cursor.execute('''
-                        INSERT INTO user_notifications VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        notification.id,
-                        notification.user_id,
-                        notification.title,
-                        notification.message,
-                        notification.notification_type,
-                        notification.priority.value,
-                        json.dumps([c.value for c in notification.channels]),
-                        notification.related_entity_type,
-                        notification.related_entity_id,
-                        notification.scheduled_for.isoformat(),
-                        notification.sent_at.isoformat() if notification.sent_at else None,
-                        notification.read_at.isoformat() if notification.read_at else None,
-                        notification.is_sent,
-                        notification.is_read,
-                        notification.action_url,
-                        json.dumps(notification.metadata)
-                    ))
-                
-                conn.commit()
+            with transaction(self.db_path) as conn:
+                conn.execute(sql, params)
         except Exception as e:
             print(f"Error saving activity data: {e}")
+    
+    def _query(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        try:
+            conn = get_connection(self.db_path)
+            try:
+                return conn.execute(sql, params).fetchall()
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Error loading activity data: {e}")
+            return []
+    
+    @staticmethod
+    def _activity_row(activity: ActivityLog) -> tuple:
+        return (
+            activity.id,
+            activity.user_id,
+            activity.activity_type.value,
+            activity.title,
+            activity.description,
+            activity.entity_type,
+            activity.entity_id,
+            json.dumps(activity.metadata),
+            activity.priority.value,
+            activity.created_at.isoformat(),
+            activity.requires_action,
+            activity.action_deadline.isoformat() if activity.action_deadline else None,
+            activity.is_completed,
+            activity.completed_at.isoformat() if activity.completed_at else None,
+            json.dumps(activity.tags)
+        )
+    
+    @staticmethod
+    def _activity_from_row(row: tuple) -> ActivityLog:
+        return ActivityLog(
+            id=row[0],
+            user_id=row[1],
+            activity_type=ActivityType(row[2]),
+            title=row[3],
+            description=row[4],
+            entity_type=row[5],
+            entity_id=row[6],
+            metadata=json.loads(row[7]) if row[7] else {},
+            priority=Priority(row[8]),
+            created_at=datetime.fromisoformat(row[9]),
+            requires_action=bool(row[10]),
+            action_deadline=datetime.fromisoformat(row[11]) if row[11] else None,
+            is_completed=bool(row[12]),
+            completed_at=datetime.fromisoformat(row[13]) if row[13] else None,
+            tags=json.loads(row[14]) if row[14] else []
+        )
+    
+    @staticmethod
+    def _opportunity_row(opportunity: OpportunityAlert) -> tuple:
+        return (
+            opportunity.id,
+            opportunity.opportunity_type,
+            opportunity.title,
+            opportunity.description,
+            opportunity.entity_id,
+            opportunity.potential_value,
+            opportunity.confidence_score,
+            opportunity.priority.value,
+            opportunity.created_at.isoformat(),
+            opportunity.expires_at.isoformat() if opportunity.expires_at else None,
+            opportunity.is_acted_upon,
+            opportunity.action_taken,
+            opportunity.action_date.isoformat() if opportunity.action_date else None,
+            opportunity.outcome
+        )
+    
+    @staticmethod
+    def _opportunity_from_row(row: tuple) -> OpportunityAlert:
+        return OpportunityAlert(
+            id=row[0],
+            opportunity_type=row[1],
+            title=row[2],
+            description=row[3],
+            entity_id=row[4],
+            potential_value=row[5],
+            confidence_score=row[6],
+            priority=Priority(row[7]),
+            created_at=datetime.fromisoformat(row[8]),
+            expires_at=datetime.fromisoformat(row[9]) if row[9] else None,
+            is_acted_upon=bool(row[10]),
+            action_taken=row[11],
+            action_date=datetime.fromisoformat(row[12]) if row[12] else None,
+            outcome=row[13]
+        )
+    
+    @staticmethod
+    def _notification_row(notification: UserNotification) -> tuple:
+        return (
+            notification.id,
+            notification.user_id,
+            notification.title,
+            notification.message,
+            notification.notification_type,
+            notification.priority.value,
+            json.dumps([c.value for c in notification.channels]),
+            notification.related_entity_type,
+            notification.related_entity_id,
+            notification.scheduled_for.isoformat(),
+            notification.sent_at.isoformat() if notification.sent_at else None,
+            notification.read_at.isoformat() if notification.read_at else None,
+            notification.is_sent,
+            notification.is_read,
+            notification.action_url,
+            json.dumps(notification.metadata)
+        )
+    
+    @staticmethod
+    def _notification_from_row(row: tuple) -> UserNotification:
+        return UserNotification(
+            id=row[0],
+            user_id=row[1],
+            title=row[2],
+            message=row[3],
+            notification_type=row[4],
+            priority=Priority(row[5]),
+            channels=[NotificationChannel(c) for c in json.loads(row[6])],
+            related_entity_type=row[7],
+            related_entity_id=row[8],
+            scheduled_for=datetime.fromisoformat(row[9]),
+            sent_at=datetime.fromisoformat(row[10]) if row[10] else None,
+            read_at=datetime.fromisoformat(row[11]) if row[11] else None,
+            is_sent=bool(row[12]),
+            is_read=bool(row[13]),
+            action_url=row[14],
+            metadata=json.loads(row[15]) if row[15] else {}
+        )
+
+class ActivityIngestionQueue:
+    """Bounded queue drained by a background writer thread
+    
+    ``submit`` never blocks: when the queue is full it returns False and
+    the caller writes the event inline, which is counted as backpressure.
+    Pending events are flushed when the process exits.
+    """
+    
+    def __init__(self, tracker: ActivityTracker, max_size: int = INGEST_QUEUE_SIZE,
+                 batch_size: int = INGEST_BATCH_SIZE, flush_interval_ms: int = INGEST_FLUSH_INTERVAL_MS):
+        self.tracker = tracker
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_size)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition()
+        self._unfinished = 0
+        self._metrics = {
+            'submitted': 0, 'rejected_full': 0, 'stored': 0, 'failed': 0,
+            'batches': 0, 'max_depth': 0, 'last_batch_size': 0, 'last_batch_ms': 0.0
+        }
+    
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        """Start the writer thread (no-op if already running)"""
+        with self._lock:
+            if self.is_running:
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="activity-ingestion", daemon=True)
+            self._thread.start()
+    
+    def stop(self, timeout: float = 10.0):
+        """Stop accepting work, store everything queued and wait for the writer"""
+        with self._lock:
+            self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        # Anything still queued (writer never started or timed out) is written here
+        self._drain()
+    
+    def submit(self, activity: ActivityLog) -> bool:
+        """Queue an activity; False if the queue is full or stopped"""
+        with self._idle:
+            self._unfinished += 1
+        # Checked under the lock so nothing is queued after stop() has drained
+        with self._lock:
+            accepted = not self._stop_event.is_set() and self.is_running
+            if accepted:
+                try:
+                    self._queue.put_nowait(activity)
+                except queue.Full:
+                    accepted = False
+                    self._metrics['rejected_full'] += 1
+            if accepted:
+                self._metrics['submitted'] += 1
+                self._metrics['max_depth'] = max(self._metrics['max_depth'], self._queue.qsize())
+        if not accepted:
+            self._task_done(1)
+        return accepted
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every submitted activity is stored; True if drained"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._unfinished == 0, timeout)
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Counters plus current depth; rejected_full counts inline fallbacks"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics['depth'] = self._queue.qsize()
+        metrics['capacity'] = self._queue.maxsize
+        metrics['running'] = self.is_running
+        return metrics
+    
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+        self._drain()
+    
+    def _next_batch(self) -> List[ActivityLog]:
+        """Wait for one event, then coalesce until the batch is full or the interval ends"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _drain(self):
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+    
+    def _write(self, batch: List[ActivityLog]):
+        started = time.perf_counter()
+        try:
+            stored = self.tracker.store_activities(batch)
+        except Exception as e:
+            print(f"Error writing activity batch: {e}")
+            stored = 0
+        with self._lock:
+            self._metrics['stored'] += stored
+            self._metrics['failed'] += len(batch) - stored
+            self._metrics['batches'] += 1
+            self._metrics['last_batch_size'] = len(batch)
+            self._metrics['last_batch_ms'] = (time.perf_counter() - started) * 1000
+        self._task_done(len(batch))
+    
+    def _task_done(self, count: int):
+        with self._idle:
+            self._unfinished -= count
+            if self._unfinished <= 0:
+                self._idle.notify_all()
+
+_ingestion_queues: Dict[str, ActivityIngestionQueue] = {}
+_ingestion_queues_lock = threading.Lock()
+
+def get_activity_ingestion_queue(tracker: ActivityTracker) -> ActivityIngestionQueue:
+    """Process-wide ingestion queue for the tracker's database, started on first use"""
+    with _ingestion_queues_lock:
+        ingestion = _ingestion_queues.get(tracker.db_path)
+        if ingestion is None:
+            ingestion = ActivityIngestionQueue(tracker)
+            _ingestion_queues[tracker.db_path] = ingestion
+    ingestion.start()
+    return ingestion
+
+@atexit.register
+def _flush_ingestion_queues():
+    """Flush-on-shutdown guarantee: store every queued activity before exit"""
+    with _ingestion_queues_lock:
+        queues = list(_ingestion_queues.values())
+    for ingestion in queues:
+        ingestion.stop()
 
 # Global activity tracker
 @st.cache_resource
@@ -6,7 +6,8 @@ Comprehensive automation workflows for email marketing, CRM processes, document
 import streamlit as st
 import pandas as pd
 import numpy as np
-import sqlite3
+from db_connection import get_connection, transaction
+from schema_migrations import ensure_schema
 import json
 import smtplib
 import ssl
@@ -14,6 +15,7 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
+from email.utils import make_msgid
 from datetime import datetime, timedelta
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -31,6 +33,9 @@ import zipfile
 import os
 from pathlib import Path
 
+from message_outbox import (DeliveryResult, OutboundMessage, enqueue, get_outbox_worker, latest_job_id,
+                            register_job_kind, register_sender, show_job_progress)
+
 # Document generation imports
 try:
     from reportlab.lib.pagesizes import letter, A4
@@ -106,7 +111,9 @@ class AdvancedAutomationSystem:
     def setup_automation_tables(self):
         """Setup automation-related database tables"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            # Shared schema (message outbox) first, so enqueue never migrates mid-transaction
+            ensure_schema(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             # Automation rules table
@@ -217,10 +224,10 @@ class AdvancedAutomationSystem:
     def load_automation_data(self):
         """Load automation data from database"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             
             # Load automation rules
-            rules_df = pd.read_sql_query("SELECT * FROM automation_rules", conn)
+            rules_df = pd.read_sql_query("SELECT * FROM automation_rules", conn.raw)
             self.automation_rules = []
             for _, row in rules_df.iterrows():
                 rule = AutomationRule(
@@ -237,7 +244,7 @@ class AdvancedAutomationSystem:
                 self.automation_rules.append(rule)
             
             # Load email templates
-            templates_df = pd.read_sql_query("SELECT * FROM email_templates", conn)
+            templates_df = pd.read_sql_query("SELECT * FROM email_templates", conn.raw)
             self.email_templates = []
             for _, row in templates_df.iterrows():
                 template = EmailTemplate(
@@ -260,7 +267,7 @@ class AdvancedAutomationSystem:
     def create_automation_rule(self, rule: AutomationRule) -> bool:
         """Create a new automation rule"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -419,7 +426,7 @@ class AdvancedAutomationSystem:
             assigned_to = action.get('assigned_to')
             
             # Create task in database
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -461,7 +468,7 @@ class AdvancedAutomationSystem:
             values.append(deal_id)
             
             # Execute update
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             query = f"UPDATE deals SET {', '.join(set_clauses)} WHERE id = ?"
@@ -550,7 +557,7 @@ class AdvancedAutomationSystem:
     def create_email_template(self, template: EmailTemplate) -> bool:
         """Create a new email template"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -623,7 +630,7 @@ class AdvancedAutomationSystem:
     def _store_generated_document(self, template_id: str, file_path: str, deal_id: str = None):
         """Store generated document reference in database"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -650,7 +657,7 @@ class AdvancedAutomationSystem:
     def create_email_campaign(self, campaign_data: Dict) -> bool:
         """Create and manage email campaigns"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -679,14 +686,14 @@ class AdvancedAutomationSystem:
     def execute_scheduled_campaigns(self):
         """Execute scheduled email campaigns"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             
             # Get scheduled campaigns that are due
             scheduled_campaigns = pd.read_sql_query("""
                 SELECT * FROM email_campaigns 
                 WHERE status = 'scheduled' 
                 AND schedule_time <= ?
-            """, conn, params=[datetime.now().isoformat()])
+            """, conn.raw, params=[datetime.now().isoformat()])
             
             for _, campaign in scheduled_campaigns.iterrows():
                 self._execute_email_campaign(campaign)
@@ -696,18 +703,21 @@ class AdvancedAutomationSystem:
         except Exception as e:
             st.error(f"Error executing scheduled campaigns: {e}")
     
-    def _execute_email_campaign(self, campaign):
-        """Execute a single email campaign"""
+    def _execute_email_campaign(self, campaign) -> Optional[str]:
+        """Queue a single email campaign; returns the outbox job id
+        
+        Background workers send the emails over SMTP and mark the campaign
+        sent once every message is delivered or has failed.
+        """
         try:
             # Get email template
             template = next((t for t in self.email_templates if t.id == campaign['template_id']), None)
             if not template:
-                return False
+                return None
             
             recipients = json.loads(campaign['recipient_list'])
             
-            # Send emails
-            sent_count = 0
+            messages = []
             for recipient in recipients:
                 # Create context for each recipient (could include personalized data)
                 context = {'recipient_email': recipient}
@@ -715,32 +725,38 @@ class AdvancedAutomationSystem:
                 subject = self._replace_template_variables(template.subject, context)
                 body = self._replace_template_variables(template.body, context)
                 
-                if self.send_email([recipient], subject, body):
-                    sent_count += 1
-            
-            # Update campaign status
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                UPDATE email_campaigns 
-                SET status = 'sent', sent_count = ?
-                WHERE id = ?
-            """, (sent_count, campaign['id']))
-            
-            conn.commit()
-            conn.close()
+                messages.append(OutboundMessage(
+                    channel='email',
+                    provider='smtp',
+                    recipient=recipient,
+                    payload={'to_email': recipient, 'subject': subject, 'body': body}
+                ))
             
-            return True
+            # Update campaign status and queue its job together: enqueue's own
+            # transaction nests as a savepoint, so a failed enqueue rolls back
+            # the status too. sent_count grows as deliveries complete.
+            with transaction(self.db_path) as conn:
+                conn.execute("""
+                    UPDATE email_campaigns 
+                    SET status = ?, sent_count = 0
+                    WHERE id = ?
+                """, ('sending' if messages else 'sent', campaign['id']))
+                job_id = enqueue('automation_email_campaign', messages, reference_id=campaign['id'],
+                                 db_path=self.db_path, start_worker=False)
+            
+            # Wake the worker only once the job is committed and visible to it
+            if messages:
+                get_outbox_worker(self.db_path).wake()
+            return job_id
             
         except Exception as e:
             st.error(f"Error executing email campaign: {e}")
-            return False
+            return None
     
     def _update_rule_execution_stats(self, rule: AutomationRule):
         """Update automation rule execution statistics"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -759,7 +775,7 @@ class AdvancedAutomationSystem:
                                 status: str, details: str = None, error_message: str = None):
         """Log automation execution"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -777,25 +793,25 @@ class AdvancedAutomationSystem:
     def get_automation_analytics(self) -> Dict:
         """Get automation system analytics"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             
             # Get execution statistics
             stats = {}
             
             # Total rules
-            rules_df = pd.read_sql_query("SELECT COUNT(*) as count FROM automation_rules", conn)
+            rules_df = pd.read_sql_query("SELECT COUNT(*) as count FROM automation_rules", conn.raw)
             stats['total_rules'] = rules_df.iloc[0]['count']
             
             # Active rules
-            active_rules_df = pd.read_sql_query("SELECT COUNT(*) as count FROM automation_rules WHERE is_active = 1", conn)
+            active_rules_df = pd.read_sql_query("SELECT COUNT(*) as count FROM automation_rules WHERE is_active = 1", conn.raw)
             stats['active_rules'] = active_rules_df.iloc[0]['count']
             
             # Total executions
-            executions_df = pd.read_sql_query("SELECT COUNT(*) as count FROM automation_log", conn)
+            executions_df = pd.read_sql_query("SELECT COUNT(*) as count FROM automation_log", conn.raw)
             stats['total_executions'] = executions_df.iloc[0]['count']
             
             # Success rate
-            success_df = pd.read_sql_query("SELECT COUNT(*) as count FROM automation_log WHERE status = 'success'", conn)
+            success_df = pd.read_sql_query("SELECT COUNT(*) as count FROM automation_log WHERE status = 'success'", conn.raw)
             success_count = success_df.iloc[0]['count']
             stats['success_rate'] = (success_count / stats['total_executions'] * 100) if stats['total_executions'] > 0 else 0
             
@@ -805,7 +821,7 @@ class AdvancedAutomationSystem:
                 FROM automation_log 
                 ORDER BY execution_time DESC 
                 LIMIT 10
-            """, conn)
+            """, conn.raw)
             stats['recent_activity'] = recent_activity_df.to_dict('records')
             
             conn.close()
@@ -815,6 +831,62 @@ class AdvancedAutomationSystem:
             st.error(f"Error getting automation analytics: {e}")
             return {}
 
+def _smtp_setting(name: str, default: Any = None) -> Any:
+    try:
+        value = st.secrets.get(name)
+    except Exception:
+        value = None
+    return value or os.getenv(name) or default
+
+def send_smtp_message(payload: Dict[str, Any]) -> DeliveryResult:
+    """Outbox sender for automation emails
+    
+    Runs on a worker thread or process, so SMTP settings come from
+    Streamlit secrets or the environment rather than session state.
+    """
+    smtp_server = _smtp_setting("SMTP_SERVER", "smtp.gmail.com")
+    smtp_port = int(_smtp_setting("SMTP_PORT", 587))
+    username = _smtp_setting("EMAIL_USERNAME")
+    password = _smtp_setting("EMAIL_PASSWORD")
+    
+    if not all([username, password]):
+        return DeliveryResult(False, error_message="Email credentials not configured")
+    
+    body = payload['body']
+    message = MIMEMultipart()
+    message["From"] = username
+    message["To"] = payload['to_email']
+    message["Subject"] = payload['subject']
+    message["Message-ID"] = make_msgid()
+    message.attach(MIMEText(body, "html" if "<html>" in body.lower() else "plain"))
+    
+    try:
+        with smtplib.SMTP(smtp_server, smtp_port, timeout=30) as server:
+            server.starttls(context=ssl.create_default_context())
+            server.login(username, password)
+            server.sendmail(username, payload['to_email'], message.as_string())
+        return DeliveryResult(True, message_id=message["Message-ID"])
+    except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError) as e:
+        return DeliveryResult(False, error_message=f"Error sending email: {e}", retryable=True)
+    except smtplib.SMTPResponseException as e:
+        # 4xx replies are temporary; 5xx (bad credentials, rejected recipient) are not
+        return DeliveryResult(False, error_message=f"Error sending email: {e}", retryable=400 <= e.smtp_code < 500)
+    except smtplib.SMTPException as e:
+        return DeliveryResult(False, error_message=f"Error sending email: {e}")
+    except OSError as e:
+        return DeliveryResult(False, error_message=f"Error sending email: {e}", retryable=True)
+
+def _count_campaign_sends(conn, job: Dict[str, Any], outcomes: List[Dict[str, Any]]):
+    sent_count = sum(1 for outcome in outcomes if outcome['status'] == 'sent')
+    conn.execute("UPDATE email_campaigns SET sent_count = sent_count + ? WHERE id = ?",
+                 (sent_count, job['reference_id']))
+
+def _complete_email_campaign(conn, job: Dict[str, Any], counts: Dict[str, int]):
+    conn.execute("UPDATE email_campaigns SET status = 'sent' WHERE id = ?", (job['reference_id'],))
+
+register_sender('smtp', send_smtp_message)
+register_job_kind('automation_email_campaign', on_batch=_count_campaign_sends, on_complete=_complete_email_campaign)
+
 def show_advanced_automation_system():
     """Main function to display Advanced Automation System"""
     st.header("⚡ Advanced Automation System")
@@ -1141,7 +1213,7 @@ Generated by NxTrix CRM""",
             
             # Save to database
             try:
-                conn = sqlite3.connect(automation_system.db_path)
+                conn = get_connection(automation_system.db_path)
                 cursor = conn.cursor()
                 
                 cursor.execute("""
@@ -1172,8 +1244,8 @@ Generated by NxTrix CRM""",
     
     # Load existing templates
     try:
-        conn = sqlite3.connect(automation_system.db_path)
-        templates_df = pd.read_sql_query("SELECT * FROM document_templates WHERE is_active = 1", conn)
+        conn = get_connection(automation_system.db_path)
+        templates_df = pd.read_sql_query("SELECT * FROM document_templates WHERE is_active = 1", conn.raw)
         conn.close()
         
         if not templates_df.empty:
@@ -1323,16 +1395,21 @@ def show_email_campaigns(automation_system: AdvancedAutomationSystem):
                 st.success(f"Email campaign '{campaign_name}' created successfully!")
                 
                 if send_immediately:
-                    # Execute campaign immediately
-                    st.info("Sending emails...")
-                    # This would trigger immediate execution
+                    # Queue the campaign now; workers deliver it in the background
+                    job_id = automation_system._execute_email_campaign({
+                        'id': campaign_data['id'],
+                        'template_id': selected_template_id,
+                        'recipient_list': json.dumps(recipients)
+                    })
+                    if job_id:
+                        st.info("📤 Emails queued for sending")
             else:
                 st.error("Failed to create email campaign")
     
     # Display existing campaigns
     try:
-        conn = sqlite3.connect(automation_system.db_path)
-        campaigns_df = pd.read_sql_query("SELECT * FROM email_campaigns ORDER BY created_at DESC", conn)
+        conn = get_connection(automation_system.db_path)
+        campaigns_df = pd.read_sql_query("SELECT * FROM email_campaigns ORDER BY created_at DESC", conn.raw)
         conn.close()
         
         if not campaigns_df.empty:
@@ -1355,6 +1432,11 @@ def show_email_campaigns(automation_system: AdvancedAutomationSystem):
                         click_rate = (campaign['clicked_count'] / campaign['sent_count'] * 100) if campaign['sent_count'] > 0 else 0
                         st.metric("Open Rate", f"{open_rate:.1f}%")
                         st.metric("Click Rate", f"{click_rate:.1f}%")
+                    
+                    if campaign['status'] == 'sending':
+                        job_id = latest_job_id('automation_email_campaign', campaign['id'], automation_system.db_path)
+                        if job_id:
+                            show_job_progress(job_id, automation_system.db_path, label="Sending emails")
         else:
             st.info("No email campaigns found.")
             
@@ -1396,7 +1478,7 @@ def show_automation_analytics(automation_system: AdvancedAutomationSystem):
         
         # Performance charts
         try:
-            conn = sqlite3.connect(automation_system.db_path)
+            conn = get_connection(automation_system.db_path)
             
             # Execution trends
             trend_df = pd.read_sql_query("""
@@ -1405,7 +1487,7 @@ def show_automation_analytics(automation_system: AdvancedAutomationSystem):
                 WHERE execution_time >= date('now', '-30 days')
                 GROUP BY DATE(execution_time), status
                 ORDER BY date
-            """, conn)
+            """, conn.raw)
             
             if not trend_df.empty:
                 st.write("### Execution Trends (Last 30 Days)")
@@ -10,7 +10,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
-import sqlite3
+from db_connection import get_connection
 from dataclasses import dataclass
 from typing import List, Dict, Any, Optional, Tuple
 from enum import Enum
@@ -96,7 +96,7 @@ class AdvancedDealAnalytics:
         
     def initialize_analytics_tables(self):
         """Initialize analytics database tables"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         # Deal analytics table
@@ -1,6 +1,9 @@
 """
 Advanced Reporting & Analytics System for NXTRIX CRM
-Comprehensive business intelligence with automated insights
+Comprehensive business intelligence with automated insights:
+- Current and previous period metrics from one conditional-aggregation query per table
+- KPI tiles and time series read the daily rollups, not raw rows
+- Aggregates cached per timeframe and table data version
 """
 
 import streamlit as st
@@ -9,7 +12,11 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
-import sqlite3
+import threading
+import time
+from db_connection import get_connection
+from schema_migrations import ensure_schema
+from report_rollups import rollup_columns
 import numpy as np
 from typing import Dict, List, Any, Optional, Tuple
 import json
@@ -41,129 +48,148 @@ class ReportMetric:
     change_direction: str
     format_type: str = "number"  # number, currency, percentage
 
+# Reported aggregates per rollup: metric -> (rollup column, rollup column it is averaged over or None)
+DEAL_AGGREGATES = {
+    'total_deals': ('row_count', None),
+    'avg_ai_score': ('ai_score_sum', 'ai_score_count'),
+    'total_value': ('purchase_price_sum', None),
+    'avg_cap_rate': ('cap_rate_sum', 'cap_rate_count'),
+    'avg_coc_return': ('cash_on_cash_return_sum', 'cash_on_cash_return_count'),
+    'projected_income': ('projected_income_sum', None)
+}
+
+LEAD_AGGREGATES = {
+    'total_leads': ('row_count', None),
+    'hot_leads': ('hot_leads', None)
+}
+
+# source table -> (daily rollup, aggregates)
+REPORT_TABLES = {
+    'deals': ('deal_reporting_daily', DEAL_AGGREGATES),
+    'leads': ('leads_daily', LEAD_AGGREGATES)
+}
+
+# Cached aggregates are reused until the table changes or the window has drifted this far
+REPORT_CACHE_TTL_SECONDS = 300
+
+# Distribution charts (histograms, scatter) plot at most this many of the newest deals
+DISTRIBUTION_SAMPLE_SIZE = 5000
+
+class ReportingQueryEngine:
+    """Current and previous period aggregates in one grouped query per table
+    
+    Metrics are read from the table's daily rollup (see report_rollups), so
+    periods are whole days and the cost does not grow with history. Both
+    periods come from one pass using conditional aggregation over the
+    combined day range. Results are cached per (table, timeframe) together
+    with the table's data version, which triggers bump on every write (see
+    schema_migrations), so a cached result is reused until the table changes
+    or REPORT_CACHE_TTL_SECONDS pass.
+    """
+    
+    def __init__(self, db_path: str = "crm_data.db"):
+        self.db_path = db_path
+        self._cache: Dict[Tuple[str, TimeFrame], Tuple[int, float, Dict[str, Dict[str, float]]]] = {}
+        self._lock = threading.Lock()
+        self.queries_run = 0
+    
+    def period_aggregates(self, table: str, timeframe: TimeFrame, start_date: datetime,
+                          end_date: datetime) -> Dict[str, Dict[str, float]]:
+        """{'current': {metric: value}, 'previous': {metric: value}} for one table
+        
+        With N the number of days from ``start_date`` to ``end_date``, the
+        current period is the N whole days ending on ``end_date``'s day
+        (inclusive) and the previous period is the N days before it.
+        """
+        rollup, aggregates = REPORT_TABLES[table]
+        conn = get_connection(self.db_path)
+        try:
+            version = self._data_version(conn, table)
+            key = (table, timeframe)
+            with self._lock:
+                cached = self._cache.get(key)
+            if cached and cached[0] == version and time.monotonic() - cached[1] < REPORT_CACHE_TTL_SECONDS:
+                return cached[2]
+            
+            # Measures the source table lacks here are not in the rollup and read as 0
+            available = set(rollup_columns(conn, rollup))
+            needed = [column for pair in aggregates.values() for column in pair if column in available]
+            needed = list(dict.fromkeys(needed))
+            totals = {'current': {}, 'previous': {}}
+            if needed:
+                # Both periods are N whole days; the previous one ends where the current one starts
+                days = timedelta(days=max(1, (end_date.date() - start_date.date()).days))
+                end_day = end_date.date()
+                columns = []
+                for column in needed:
+                    columns.append(f"SUM(CASE WHEN day > :current_after THEN {column} END)")
+                    columns.append(f"SUM(CASE WHEN day <= :current_after THEN {column} END)")
+                row = conn.execute(f'''
+                    SELECT {', '.join(columns)} FROM rollup_{rollup}
+                    WHERE day > :previous_after AND day <= :end
+                ''', {
+                    'previous_after': (end_day - 2 * days).isoformat(),
+                    'current_after': (end_day - days).isoformat(),
+                    'end': end_day.isoformat()
+                }).fetchone()
+                self.queries_run += 1
+                for index, column in enumerate(needed):
+                    totals['current'][column] = row[2 * index] or 0
+                    totals['previous'][column] = row[2 * index + 1] or 0
+        finally:
+            conn.close()
+        
+        result = {'current': {}, 'previous': {}}
+        for period, sums in totals.items():
+            for name, (numerator, denominator) in aggregates.items():
+                value = sums.get(numerator, 0)
+                if denominator:
+                    count = sums.get(denominator, 0)
+                    value = value / count if count else 0
+                result[period][name] = value
+        with self._lock:
+            self._cache[key] = (version, time.monotonic(), result)
+        return result
+    
+    @staticmethod
+    def _data_version(conn, table: str) -> int:
+        row = conn.execute("SELECT version FROM report_data_versions WHERE table_name = ?", (table,)).fetchone()
+        return row[0] if row else 0
+    
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
 class AdvancedReporting:
     """Advanced reporting and analytics system"""
     
     def __init__(self, db_path: str = "crm_data.db"):
         self.db_path = db_path
         self.init_reporting_tables()
+        self.query_engine = ReportingQueryEngine(db_path)
     
     def init_reporting_tables(self):
-        """Initialize reporting-specific database tables"""
+        """Initialize reporting-specific database tables (schema owned by schema_migrations)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # KPI tracking table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS kpi_metrics (
-                    id TEXT PRIMARY KEY,
-                    metric_name TEXT NOT NULL,
-                    metric_value REAL NOT NULL,
-                    period_start TIMESTAMP NOT NULL,
-                    period_end TIMESTAMP NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Report generation log
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS report_log (
-                    id TEXT PRIMARY KEY,
-                    report_type TEXT NOT NULL,
-                    parameters TEXT,
-                    generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    user_id TEXT
-                )
-            ''')
-            
-            conn.commit()
-            conn.close()
-            
+            ensure_schema(self.db_path)
         except Exception as e:
             st.error(f"Error initializing reporting database: {e}")
     
     def get_deal_metrics(self, timeframe: TimeFrame) -> Dict[str, ReportMetric]:
         """Get deal-related metrics"""
         try:
-            start_date, end_date = self._get_date_range(timeframe)
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Total deals
-            cursor.execute('''
-                SELECT COUNT(*) FROM deals 
-                WHERE date_added BETWEEN ? AND ?
-            ''', (start_date.isoformat(), end_date.isoformat()))
-            total_deals = cursor.fetchone()[0]
-            
-            # Average AI score
-            cursor.execute('''
-                SELECT AVG(ai_score) FROM deals 
-                WHERE date_added BETWEEN ? AND ?
-            ''', (start_date.isoformat(), end_date.isoformat()))
-            avg_ai_score = cursor.fetchone()[0] or 0
-            
-            # Total deal value
-            cursor.execute('''
-                SELECT SUM(purchase_price) FROM deals 
-                WHERE date_added BETWEEN ? AND ?
-            ''', (start_date.isoformat(), end_date.isoformat()))
-            total_value = cursor.fetchone()[0] or 0
+            periods = self._period_aggregates('deals', timeframe)
+            current, previous = periods['current'], periods['previous']
             
-            # Average deal size
-            avg_deal_size = total_value / total_deals if total_deals > 0 else 0
-            
-            # Get previous period for comparison
-            prev_start = start_date - (end_date - start_date)
-            prev_end = start_date
-            
-            cursor.execute('''
-                SELECT COUNT(*) FROM deals 
-                WHERE date_added BETWEEN ? AND ?
-            ''', (prev_start.isoformat(), prev_end.isoformat()))
-            prev_total_deals = cursor.fetchone()[0]
-            
-            cursor.execute('''
-                SELECT SUM(purchase_price) FROM deals 
-                WHERE date_added BETWEEN ? AND ?
-            ''', (prev_start.isoformat(), prev_end.isoformat()))
-            prev_total_value = cursor.fetchone()[0] or 0
-            
-            conn.close()
-            
-            # Calculate changes
-            deal_change = ((total_deals - prev_total_deals) / prev_total_deals * 100) if prev_total_deals > 0 else 0
-            value_change = ((total_value - prev_total_value) / prev_total_value * 100) if prev_total_value > 0 else 0
+            for period in (current, previous):
+                period['avg_deal_size'] = (period['total_value'] / period['total_deals']
+                                           if period['total_deals'] > 0 else 0)
             
             return {
-                'total_deals': ReportMetric(
-                    name="Total Deals",
-                    value=total_deals,
-                    change=deal_change,
-                    change_direction="up" if deal_change > 0 else "down"
-                ),
-                'avg_ai_score': ReportMetric(
-                    name="Average AI Score",
-                    value=avg_ai_score,
-                    change=0,  # Would need historical tracking
-                    change_direction="neutral"
-                ),
-                'total_value': ReportMetric(
-                    name="Total Deal Value",
-                    value=total_value,
-                    change=value_change,
-                    change_direction="up" if value_change > 0 else "down",
-                    format_type="currency"
-                ),
-                'avg_deal_size': ReportMetric(
-                    name="Average Deal Size",
-                    value=avg_deal_size,
-                    change=0,
-                    change_direction="neutral",
-                    format_type="currency"
-                )
+                'total_deals': self._metric("Total Deals", 'total_deals', current, previous),
+                'avg_ai_score': self._metric("Average AI Score", 'avg_ai_score', current, previous),
+                'total_value': self._metric("Total Deal Value", 'total_value', current, previous, "currency"),
+                'avg_deal_size': self._metric("Average Deal Size", 'avg_deal_size', current, previous, "currency")
             }
             
         except Exception as e:
@@ -173,56 +199,19 @@ class AdvancedReporting:
     def get_lead_metrics(self, timeframe: TimeFrame) -> Dict[str, ReportMetric]:
         """Get lead-related metrics"""
         try:
-            start_date, end_date = self._get_date_range(timeframe)
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Check if leads table exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='leads'")
-            if not cursor.fetchone():
-                conn.close()
-                return {}
-            
-            # Total leads
-            cursor.execute('''
-                SELECT COUNT(*) FROM leads 
-                WHERE created_at BETWEEN ? AND ?
-            ''', (start_date.isoformat(), end_date.isoformat()))
-            total_leads = cursor.fetchone()[0]
-            
-            # Hot leads (score >= 80)
-            cursor.execute('''
-                SELECT COUNT(*) FROM leads 
-                WHERE created_at BETWEEN ? AND ? AND score >= 80
-            ''', (start_date.isoformat(), end_date.isoformat()))
-            hot_leads = cursor.fetchone()[0]
+            periods = self._period_aggregates('leads', timeframe)
+            current, previous = periods['current'], periods['previous']
             
             # Conversion rate (leads to deals - approximate)
-            conversion_rate = (hot_leads / total_leads * 100) if total_leads > 0 else 0
-            
-            conn.close()
+            for period in (current, previous):
+                period['conversion_rate'] = (period['hot_leads'] / period['total_leads'] * 100
+                                             if period['total_leads'] > 0 else 0)
             
             return {
-                'total_leads': ReportMetric(
-                    name="Total Leads",
-                    value=total_leads,
-                    change=0,
-                    change_direction="neutral"
-                ),
-                'hot_leads': ReportMetric(
-                    name="Hot Leads",
-                    value=hot_leads,
-                    change=0,
-                    change_direction="neutral"
-                ),
-                'conversion_rate': ReportMetric(
-                    name="Lead Quality Rate",
-                    value=conversion_rate,
-                    change=0,
-                    change_direction="neutral",
-                    format_type="percentage"
-                )
+                'total_leads': self._metric("Total Leads", 'total_leads', current, previous),
+                'hot_leads': self._metric("Hot Leads", 'hot_leads', current, previous),
+                'conversion_rate': self._metric("Lead Quality Rate", 'conversion_rate', current, previous,
+                                                "percentage")
             }
             
         except Exception as e:
@@ -230,90 +219,66 @@ class AdvancedReporting:
             return {}
     
     def get_financial_metrics(self, timeframe: TimeFrame) -> Dict[str, ReportMetric]:
-        """Get financial performance metrics"""
+        """Get financial performance metrics (shares the cached deals aggregates)"""
         try:
-            start_date, end_date = self._get_date_range(timeframe)
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Total investment potential
-            cursor.execute('''
-                SELECT SUM(purchase_price), AVG(cap_rate), AVG(cash_on_cash_return)
-                FROM deals WHERE date_added BETWEEN ? AND ?
-            ''', (start_date.isoformat(), end_date.isoformat()))
-            result = cursor.fetchone()
-            total_investment = result[0] or 0
-            avg_cap_rate = result[1] or 0
-            avg_coc_return = result[2] or 0
-            
-            # Projected annual income
-            cursor.execute('''
-                SELECT SUM(monthly_rent * 12) FROM deals 
-                WHERE date_added BETWEEN ? AND ?
-            ''', (start_date.isoformat(), end_date.isoformat()))
-            projected_income = cursor.fetchone()[0] or 0
-            
-            conn.close()
+            periods = self._period_aggregates('deals', timeframe)
+            current, previous = periods['current'], periods['previous']
             
             return {
-                'total_investment': ReportMetric(
-                    name="Total Investment Value",
-                    value=total_investment,
-                    change=0,
-                    change_direction="neutral",
-                    format_type="currency"
-                ),
-                'avg_cap_rate': ReportMetric(
-                    name="Average Cap Rate",
-                    value=avg_cap_rate,
-                    change=0,
-                    change_direction="neutral",
-                    format_type="percentage"
-                ),
-                'avg_coc_return': ReportMetric(
-                    name="Average CoC Return",
-                    value=avg_coc_return,
-                    change=0,
-                    change_direction="neutral",
-                    format_type="percentage"
-                ),
-                'projected_income': ReportMetric(
-                    name="Projected Annual Income",
-                    value=projected_income,
-                    change=0,
-                    change_direction="neutral",
-                    format_type="currency"
-                )
+                'total_investment': self._metric("Total Investment Value", 'total_value', current, previous,
+                                                 "currency"),
+                'avg_cap_rate': self._metric("Average Cap Rate", 'avg_cap_rate', current, previous, "percentage"),
+                'avg_coc_return': self._metric("Average CoC Return", 'avg_coc_return', current, previous,
+                                               "percentage"),
+                'projected_income': self._metric("Projected Annual Income", 'projected_income', current, previous,
+                                                 "currency")
             }
             
         except Exception as e:
             st.error(f"Error getting financial metrics: {e}")
             return {}
     
+    def _period_aggregates(self, table: str, timeframe: TimeFrame) -> Dict[str, Dict[str, float]]:
+        start_date, end_date = self._get_date_range(timeframe)
+        return self.query_engine.period_aggregates(table, timeframe, start_date, end_date)
+    
+    @staticmethod
+    def _metric(name: str, key: str, current: Dict[str, float], previous: Dict[str, float],
+                format_type: str = "number") -> ReportMetric:
+        """Build a metric with its percentage change against the previous period"""
+        value, prev_value = current[key], previous[key]
+        change = ((value - prev_value) / prev_value * 100) if prev_value > 0 else 0
+        if change > 0:
+            direction = "up"
+        elif change < 0:
+            direction = "down"
+        else:
+            direction = "neutral"
+        return ReportMetric(name=name, value=value, change=change, change_direction=direction,
+                            format_type=format_type)
+    
     def generate_deals_chart(self, timeframe: TimeFrame) -> go.Figure:
         """Generate deals analysis chart"""
         try:
             start_date, end_date = self._get_date_range(timeframe)
             
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
+            daily_deals = self._daily_series(conn, 'deal_reporting_daily', {'count': 'SUM(row_count)'},
+                                             start_date, end_date)
             df = pd.read_sql_query('''
                 SELECT date_added, ai_score, purchase_price, property_address as address
                 FROM deals 
                 WHERE date_added BETWEEN ? AND ?
-                ORDER BY date_added
-            ''', conn, params=[start_date.isoformat(), end_date.isoformat()])
+                ORDER BY date_added DESC LIMIT ?
+            ''', conn.raw, params=[start_date.isoformat(), end_date.isoformat(), DISTRIBUTION_SAMPLE_SIZE])
             conn.close()
             
-            if df.empty:
+            if df.empty and daily_deals.empty:
                 fig = go.Figure()
                 fig.add_annotation(text="No data available for selected timeframe", 
                                  xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
                 return fig
             
-            # Convert date column
-            df['date_added'] = pd.to_datetime(df['date_added'])
-            
             # Create subplots
             fig = make_subplots(
                 rows=2, cols=2,
@@ -323,10 +288,7 @@ class AdvancedReporting:
                        [{"secondary_y": False}, {"secondary_y": False}]]
             )
             
-            # Deals over time
-            daily_deals = df.groupby(df['date_added'].dt.date).size().reset_index()
-            daily_deals.columns = ['date', 'count']
-            
+            # Deals over time (daily rollup)
             fig.add_trace(
                 go.Scatter(x=daily_deals['date'], y=daily_deals['count'],
                           mode='lines+markers', name='Daily Deals'),
@@ -366,16 +328,19 @@ class AdvancedReporting:
         try:
             start_date, end_date = self._get_date_range(timeframe)
             
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
+            daily_returns = self._daily_series(conn, 'deal_reporting_daily', {
+                'cap_rate': 'SUM(cap_rate_sum) / NULLIF(SUM(cap_rate_count), 0)'
+            }, start_date, end_date)
             df = pd.read_sql_query('''
                 SELECT date_added, cap_rate, cash_on_cash_return, monthly_rent, purchase_price
                 FROM deals 
                 WHERE date_added BETWEEN ? AND ?
-                ORDER BY date_added
-            ''', conn, params=[start_date.isoformat(), end_date.isoformat()])
+                ORDER BY date_added DESC LIMIT ?
+            ''', conn.raw, params=[start_date.isoformat(), end_date.isoformat(), DISTRIBUTION_SAMPLE_SIZE])
             conn.close()
             
-            if df.empty:
+            if df.empty and daily_returns.empty:
                 fig = go.Figure()
                 fig.add_annotation(text="No financial data available", 
                                  xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
@@ -410,12 +375,9 @@ class AdvancedReporting:
                 row=2, col=1
             )
             
-            # Returns over time
-            df['date_added'] = pd.to_datetime(df['date_added'])
-            df_sorted = df.sort_values('date_added')
-            
+            # Daily average cap rate (daily rollup)
             fig.add_trace(
-                go.Scatter(x=df_sorted['date_added'], y=df_sorted['cap_rate'],
+                go.Scatter(x=daily_returns['date'], y=daily_returns['cap_rate'],
                           mode='lines+markers', name='Cap Rate Trend'),
                 row=2, col=2
             )
@@ -427,6 +389,18 @@ class AdvancedReporting:
             st.error(f"Error generating financial chart: {e}")
             return go.Figure()
     
+    def _daily_series(self, conn, rollup: str, columns: Dict[str, str], start_date: datetime,
+                      end_date: datetime) -> pd.DataFrame:
+        """Per-day series from a rollup (empty when this database has no such rollup)"""
+        if not rollup_columns(conn, rollup):
+            return pd.DataFrame(columns=['date', *columns])
+        selected = ', '.join(f"{expression} AS {alias}" for alias, expression in columns.items())
+        return pd.read_sql_query(f'''
+            SELECT day AS date, {selected} FROM rollup_{rollup}
+            WHERE day BETWEEN ? AND ?
+            GROUP BY day ORDER BY day
+        ''', conn.raw, params=[start_date.date().isoformat(), end_date.date().isoformat()])
+    
     def _get_date_range(self, timeframe: TimeFrame) -> Tuple[datetime, datetime]:
         """Get date range for timeframe"""
         end_date = datetime.now()
@@ -451,14 +425,14 @@ class AdvancedReporting:
         try:
             start_date, end_date = self._get_date_range(timeframe)
             
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             
             if report_type == ReportType.DEALS:
                 df = pd.read_sql_query('''
                     SELECT * FROM deals 
                     WHERE date_added BETWEEN ? AND ?
                     ORDER BY date_added DESC
-                ''', conn, params=[start_date.isoformat(), end_date.isoformat()])
+                ''', conn.raw, params=[start_date.isoformat(), end_date.isoformat()])
             
             elif report_type == ReportType.LEADS:
                 # Try to get leads data if table exists
@@ -467,7 +441,7 @@ class AdvancedReporting:
                         SELECT * FROM leads 
                         WHERE created_at BETWEEN ? AND ?
                         ORDER BY created_at DESC
-                    ''', conn, params=[start_date.isoformat(), end_date.isoformat()])
+                    ''', conn.raw, params=[start_date.isoformat(), end_date.isoformat()])
                 except:
                     df = pd.DataFrame()  # Return empty if table doesn't exist
             
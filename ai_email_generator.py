@@ -10,7 +10,7 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
 from enum import Enum
-import sqlite3
+from db_connection import get_connection
 
 class EmailType(Enum):
     DEAL_ANNOUNCEMENT = "deal_announcement"
@@ -62,7 +62,7 @@ class AIEmailGenerator:
     def init_database(self):
         """Initialize AI email templates database"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -315,7 +315,7 @@ Best regards,
     def _save_template(self, template: EmailTemplate):
         """Save generated template to database"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -343,7 +343,7 @@ Best regards,
     def get_recent_templates(self, limit: int = 10) -> List[EmailTemplate]:
         """Get recently generated templates"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
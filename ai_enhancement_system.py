@@ -6,7 +6,7 @@ Advanced AI-powered features for intelligent deal analysis and automation
 import streamlit as st
 import pandas as pd
 import numpy as np
-import sqlite3
+from db_connection import get_connection
 import json
 import openai
 from datetime import datetime, timedelta
@@ -85,7 +85,7 @@ class AIEnhancementSystem:
     
     def get_database_connection(self):
         """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        return get_connection(self.db_path)
     
     def analyze_deal_with_ai(self, deal_data: Dict) -> AIAnalysisResult:
         """Comprehensive AI analysis of a deal"""
@@ -246,7 +246,7 @@ class AIEnhancementSystem:
                 SELECT * FROM deals 
                 WHERE status != 'rejected'
                 ORDER BY created_at DESC
-            """, conn)
+            """, conn.raw)
             conn.close()
             
             if properties_df.empty:
@@ -379,14 +379,14 @@ class AIEnhancementSystem:
                 SELECT * FROM deals 
                 WHERE status = 'analyzing' OR status = 'approved'
                 ORDER BY deal_score DESC, roi DESC
-            """, conn)
+            """, conn.raw)
             
             # Get investor criteria if available
             investor_criteria_df = pd.read_sql_query("""
                 SELECT * FROM investor_criteria 
                 WHERE active = 1
                 ORDER BY created_date DESC
-            """, conn)
+            """, conn.raw)
             
             conn.close()
             
@@ -798,7 +798,7 @@ def show_smart_deal_analysis(ai_system: AIEnhancementSystem):
             SELECT id, property_address, purchase_price, deal_type, status 
             FROM deals 
             ORDER BY created_at DESC
-        """, conn)
+        """, conn.raw)
         conn.close()
         
         if not deals_df.empty:
@@ -815,7 +815,7 @@ def show_smart_deal_analysis(ai_system: AIEnhancementSystem):
                     conn = ai_system.get_database_connection()
                     deal_data = pd.read_sql_query(
                         "SELECT * FROM deals WHERE id = ?", 
-                        conn, 
+                        conn.raw, 
                         params=[selected_deal_id]
                     ).iloc[0].to_dict()
                     conn.close()
@@ -1093,7 +1093,7 @@ def show_ai_insights_dashboard(ai_system: AIEnhancementSystem):
         deals_df = pd.read_sql_query("""
             SELECT * FROM deals 
             ORDER BY created_at DESC
-        """, conn)
+        """, conn.raw)
         
         conn.close()
         
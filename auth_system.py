@@ -5,6 +5,7 @@ Comprehensive user management, session handling, and security features
 
 import streamlit as st
 import sqlite3
+from db_connection import get_connection
 import hashlib
 import secrets
 import uuid
@@ -28,7 +29,7 @@ class StreamlitAuth:
         
     def init_database(self):
         """Initialize user database"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         # Create users table
@@ -160,7 +161,7 @@ class StreamlitAuth:
             if not full_name.strip():
                 return {"success": False, "error": "Full name is required"}
             
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             # Check if user already exists
@@ -197,7 +198,7 @@ class StreamlitAuth:
     def authenticate_user(self, email: str, password: str) -> Dict[str, Any]:
         """Authenticate user login"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -238,7 +239,7 @@ class StreamlitAuth:
     def update_last_login(self, user_uuid: str):
         """Update user's last login timestamp"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE users SET last_login = ? WHERE user_uuid = ?",
@@ -252,7 +253,7 @@ class StreamlitAuth:
     def get_user_data(self, user_uuid: str) -> Dict[str, Any]:
         """Get complete user data"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -294,7 +295,7 @@ class StreamlitAuth:
         expires_at = (datetime.now() + timedelta(days=30)).isoformat()
         
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -467,7 +468,7 @@ class StreamlitAuth:
         if 'session_id' in st.session_state:
             # Invalidate session in database
             try:
-                conn = sqlite3.connect("nxtrix_users.db")
+                conn = get_connection("nxtrix_users.db")
                 cursor = conn.cursor()
                 cursor.execute(
                     "DELETE FROM user_sessions WHERE session_id = ?",
@@ -515,7 +516,7 @@ def logout():
     if 'session_id' in st.session_state:
         # Invalidate session in database
         try:
-            conn = sqlite3.connect("nxtrix_users.db")
+            conn = get_connection("nxtrix_users.db")
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE user_sessions SET is_active = 0 WHERE session_id = ?",
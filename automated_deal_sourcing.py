@@ -15,12 +15,26 @@ from typing import List, Dict, Any, Optional, Tuple
 from enum import Enum
 import uuid
 import json
-import sqlite3
+import threading
+from itertools import islice
+from db_connection import get_connection, transaction
+from schema_migrations import ensure_schema
+from keyset_pagination import DEFAULT_PAGE_SIZE, KeysetQuery, Page, current_page_cursor, show_page_navigation
 import requests
 import time
 import warnings
 warnings.filterwarnings('ignore')
 
+# Property lead listing: newest discoveries first, without photos and notes
+PROPERTY_LEAD_LIST_QUERY = KeysetQuery(
+    'property_leads',
+    ['lead_id', 'property_address', 'city', 'state', 'zip_code', 'property_type', 'bedrooms', 'bathrooms',
+     'square_feet', 'lot_size', 'year_built', 'asking_price', 'estimated_arv', 'estimated_rehab',
+     'property_condition', 'days_on_market', 'listing_agent', 'listing_agent_phone', 'deal_source',
+     'lead_source_contact', 'description', 'discovered_date', 'status'],
+    order_by=[('discovered_date', 'DESC'), ('lead_id', 'DESC')]
+)
+
 class PropertyType(Enum):
     """Property types for deal sourcing"""
     SINGLE_FAMILY = "Single Family Home"
@@ -123,108 +137,174 @@ class DealAlert:
     investor_response: str = ""
     response_date: Optional[datetime] = None
 
+class InvestorMatcher:
+    """Incremental matcher of property leads against active investor criteria
+    
+    Active criteria are read and parsed once into NumPy columns and stay
+    resident while the ``investor_criteria`` data version is unchanged; the
+    schema triggers bump it on any write, from any process. ``invalidate``
+    forces a reload in this process regardless.
+    Leads are scored in batches against every investor at once, in tiles of
+    at most ``max_block_cells`` lead x investor cells.
+    """
+    
+    match_threshold = 70  # 70% match threshold
+    
+    def __init__(self, db_path: str = "crm_data.db", max_block_cells: int = 1 << 20):
+        self.db_path = db_path
+        self.max_block_cells = max_block_cells
+        self._lock = threading.Lock()
+        self._criteria: Optional[Dict[str, Any]] = None
+        self._version: Optional[int] = None
+        self.loads = 0
+        ensure_schema(db_path)
+    
+    def invalidate(self):
+        """Drop the resident criteria; the next batch reloads them"""
+        with self._lock:
+            self._criteria = None
+    
+    def criteria(self) -> Dict[str, Any]:
+        """Parsed active investor criteria as columns (reloaded when the data version moves)"""
+        # Read before loading: a write in between only costs one extra reload
+        version = self._criteria_version()
+        with self._lock:
+            if self._criteria is None or self._version != version:
+                self._criteria = self._load_criteria()
+                self._version = version
+                self.loads += 1
+            return self._criteria
+    
+    def _criteria_version(self) -> int:
+        conn = get_connection(self.db_path)
+        try:
+            row = conn.execute(
+                "SELECT version FROM report_data_versions WHERE table_name = 'investor_criteria'"
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else 0
+    
+    def _load_criteria(self) -> Dict[str, Any]:
+        conn = get_connection(self.db_path)
+        try:
+            rows = conn.execute('''
+                SELECT investor_id, min_price, max_price, preferred_property_types, target_locations,
+                       min_roi, max_rehab_budget, preferred_conditions
+                FROM investor_criteria WHERE active = 1
+            ''').fetchall()
+        finally:
+            conn.close()
+        
+        def numbers(position):
+            return np.array([np.nan if row[position] is None else row[position] for row in rows], dtype=float)
+        
+        type_bits = {pt.value: 1 << bit for bit, pt in enumerate(PropertyType)}
+        condition_bits = {pc.value: 1 << bit for bit, pc in enumerate(PropertyCondition)}
+        vocabulary: Dict[str, int] = {}
+        type_masks, condition_masks, memberships = [], [], []
+        for row in rows:
+            type_masks.append(sum(type_bits.get(value, 0) for value in set(json.loads(row[3] or '[]'))))
+            condition_masks.append(sum(condition_bits.get(value, 0) for value in set(json.loads(row[7] or '[]'))))
+            memberships.append({vocabulary.setdefault(location.lower(), len(vocabulary))
+                                for location in json.loads(row[4] or '[]')})
+        
+        locations = np.zeros((len(rows), len(vocabulary)), dtype=np.float32)
+        for position, terms in enumerate(memberships):
+            locations[position, list(terms)] = 1.0
+        
+        return {
+            'investor_ids': [row[0] for row in rows],
+            'min_price': numbers(1),
+            'max_price': numbers(2),
+            'min_roi': numbers(5),
+            'max_rehab': numbers(6),
+            'type_mask': np.array(type_masks, dtype=np.int64),
+            'condition_mask': np.array(condition_masks, dtype=np.int64),
+            'type_bits': type_bits,
+            'condition_bits': condition_bits,
+            'vocabulary': list(vocabulary),
+            'locations': locations
+        }
+    
+    def score_leads(self, leads: List[PropertyLead], roi: np.ndarray,
+                    criteria: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """(leads x investors) match scores, same rules as ``_calculate_match_score``"""
+        criteria = criteria if criteria is not None else self.criteria()
+        price = np.array([lead.asking_price for lead in leads], dtype=float)[:, None]
+        rehab = np.array([lead.estimated_rehab for lead in leads], dtype=float)[:, None]
+        lead_types = np.array([criteria['type_bits'].get(lead.property_type.value, 0) for lead in leads],
+                              dtype=np.int64)[:, None]
+        lead_conditions = np.array([criteria['condition_bits'].get(lead.property_condition.value, 0)
+                                    for lead in leads], dtype=np.int64)[:, None]
+        
+        # Price range match (25 points), bonus below minimum, penalty over budget
+        score = np.where((criteria['min_price'] <= price) & (price <= criteria['max_price']), 25,
+                         np.where(price < criteria['min_price'], 30, -10))
+        score = score + np.where((criteria['type_mask'] & lead_types) != 0, 20, 0)
+        
+        vocabulary = criteria['vocabulary']
+        if vocabulary:
+            places = [(lead.zip_code.lower(), lead.city.lower()) for lead in leads]
+            hits = np.array([[term in zip_code or term in city for term in vocabulary]
+                             for zip_code, city in places], dtype=np.float32)
+            score = score + np.where(hits @ criteria['locations'].T > 0, 15, 0)
+        
+        score = score + np.where((criteria['condition_mask'] & lead_conditions) != 0, 15, 0)
+        score = score + np.where(rehab <= criteria['max_rehab'], 10, 0)
+        score = score + np.where(roi[:, None] >= criteria['min_roi'], 15, 0)
+        return np.clip(score, 0, 100)
+    
+    def match_leads(self, leads: List[PropertyLead], roi: np.ndarray) -> List[DealAlert]:
+        """Deal alerts for every lead x investor pair at or above the threshold"""
+        # One snapshot for the whole call so columns stay aligned with investor_ids
+        criteria = self.criteria()
+        investor_ids = criteria['investor_ids']
+        if not leads or not investor_ids:
+            return []
+        
+        alerts = []
+        block_rows = max(1, self.max_block_cells // len(investor_ids))
+        for start in range(0, len(leads), block_rows):
+            block = leads[start:start + block_rows]
+            scores = self.score_leads(block, roi[start:start + block_rows], criteria)
+            alert_date = datetime.now()
+            for row, column in zip(*np.nonzero(scores >= self.match_threshold)):
+                alerts.append(DealAlert(
+                    alert_id=str(uuid.uuid4()),
+                    investor_id=investor_ids[column],
+                    property_lead_id=block[row].lead_id,
+                    match_score=float(scores[row, column]),
+                    alert_date=alert_date
+                ))
+        return alerts
+
+_investor_matchers: Dict[str, InvestorMatcher] = {}
+_investor_matchers_lock = threading.Lock()
+
+def get_investor_matcher(db_path: str = "crm_data.db") -> InvestorMatcher:
+    """Process-wide matcher per database, so parsed criteria survive Streamlit reruns"""
+    with _investor_matchers_lock:
+        if db_path not in _investor_matchers:
+            _investor_matchers[db_path] = InvestorMatcher(db_path)
+        return _investor_matchers[db_path]
+
 class AutomatedDealSourcing:
     """Automated deal sourcing and matching engine"""
     
     def __init__(self, db_path: str = "crm_data.db"):
         self.db_path = db_path
         self.initialize_sourcing_tables()
+        self.matcher = get_investor_matcher(db_path)
     
     def initialize_sourcing_tables(self):
-        """Initialize deal sourcing database tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Investor criteria table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS investor_criteria (
-                investor_id TEXT PRIMARY KEY,
-                investor_name TEXT,
-                min_price REAL,
-                max_price REAL,
-                preferred_property_types TEXT,
-                target_locations TEXT,
-                min_roi REAL,
-                min_cash_flow REAL,
-                max_rehab_budget REAL,
-                preferred_conditions TEXT,
-                investment_strategy TEXT,
-                deal_sources TEXT,
-                alert_frequency TEXT,
-                active BOOLEAN,
-                created_date TEXT
-            )
-        ''')
-        
-        # Property leads table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS property_leads (
-                lead_id TEXT PRIMARY KEY,
-                property_address TEXT,
-                city TEXT,
-                state TEXT,
-                zip_code TEXT,
-                property_type TEXT,
-                bedrooms INTEGER,
-                bathrooms REAL,
-                square_feet INTEGER,
-                lot_size REAL,
-                year_built INTEGER,
-                asking_price REAL,
-                estimated_arv REAL,
-                estimated_rehab REAL,
-                property_condition TEXT,
-                days_on_market INTEGER,
-                listing_agent TEXT,
-                listing_agent_phone TEXT,
-                deal_source TEXT,
-                lead_source_contact TEXT,
-                description TEXT,
-                photos TEXT,
-                discovered_date TEXT,
-                last_updated TEXT,
-                status TEXT,
-                notes TEXT
-            )
-        ''')
-        
-        # Deal alerts table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS deal_alerts (
-                alert_id TEXT PRIMARY KEY,
-                investor_id TEXT,
-                property_lead_id TEXT,
-                match_score REAL,
-                alert_date TEXT,
-                alert_sent BOOLEAN,
-                investor_response TEXT,
-                response_date TEXT,
-                FOREIGN KEY (investor_id) REFERENCES investor_criteria (investor_id),
-                FOREIGN KEY (property_lead_id) REFERENCES property_leads (lead_id)
-            )
-        ''')
-        
-        # Deal sourcing activity table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sourcing_activity (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                activity_type TEXT,
-                description TEXT,
-                property_lead_id TEXT,
-                investor_id TEXT,
-                activity_date TEXT,
-                result TEXT,
-                notes TEXT
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """Initialize deal sourcing database tables (schema owned by schema_migrations)"""
+        ensure_schema(self.db_path)
     
     def add_investor_criteria(self, criteria: InvestorCriteria) -> bool:
         """Add investor criteria for deal matching"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -253,6 +333,7 @@ class AutomatedDealSourcing:
             
             conn.commit()
             conn.close()
+            self.matcher.invalidate()
             return True
         except Exception as e:
             st.error(f"Error adding investor criteria: {e}")
@@ -260,11 +341,36 @@ class AutomatedDealSourcing:
     
     def add_property_lead(self, lead: PropertyLead) -> bool:
         """Add property lead to the system"""
+        return self.add_property_leads([lead]) == 1
+    
+    def add_property_leads(self, leads, batch_size: int = 500) -> int:
+        """Add property leads in one streaming pass; returns how many were stored
+        
+        Each batch of leads is written together with its deal alerts in a
+        single transaction, matched against the resident investor criteria.
+        """
+        stored = 0
+        iterator = iter(leads)
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            while True:
+                batch = list(islice(iterator, batch_size))
+                if not batch:
+                    break
+                stored += self.store_property_lead_batch(batch)
+            return stored
             
-            cursor.execute('''
+        except Exception as e:
+            st.error(f"Error adding property lead: {e}")
+            return stored
+    
+    def store_property_lead_batch(self, batch: List[PropertyLead]) -> int:
+        """Write one batch of leads and their deal alerts in a single transaction
+        
+        Raises on failure (nothing from the batch is stored) so callers such
+        as the bulk importer can account for the failed rows themselves.
+        """
+        with transaction(self.db_path) as conn:
+            conn.executemany('''
                 INSERT OR REPLACE INTO property_leads 
                 (lead_id, property_address, city, state, zip_code, property_type,
                  bedrooms, bathrooms, square_feet, lot_size, year_built, asking_price,
@@ -272,93 +378,60 @@ class AutomatedDealSourcing:
                  listing_agent, listing_agent_phone, deal_source, lead_source_contact,
                  description, photos, discovered_date, last_updated, status, notes)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                lead.lead_id,
-                lead.property_address,
-                lead.city,
-                lead.state,
-                lead.zip_code,
-                lead.property_type.value,
-                lead.bedrooms,
-                lead.bathrooms,
-                lead.square_feet,
-                lead.lot_size,
-                lead.year_built,
-                lead.asking_price,
-                lead.estimated_arv,
-                lead.estimated_rehab,
-                lead.property_condition.value,
-                lead.days_on_market,
-                lead.listing_agent,
-                lead.listing_agent_phone,
-                lead.deal_source.value,
-                lead.lead_source_contact,
-                lead.description,
-                json.dumps(lead.photos),
-                lead.discovered_date.isoformat(),
-                lead.last_updated.isoformat(),
-                lead.status,
-                lead.notes
-            ))
-            
-            conn.commit()
-            conn.close()
+            ''', [self._lead_row(lead) for lead in batch])
             
             # Auto-match with investors
-            self._auto_match_investors(lead)
-            return True
-            
-        except Exception as e:
-            st.error(f"Error adding property lead: {e}")
-            return False
+            self._insert_deal_alerts(conn, self._match_investors(batch))
+        return len(batch)
+    
+    def _lead_row(self, lead: PropertyLead) -> tuple:
+        return (
+            lead.lead_id,
+            lead.property_address,
+            lead.city,
+            lead.state,
+            lead.zip_code,
+            lead.property_type.value,
+            lead.bedrooms,
+            lead.bathrooms,
+            lead.square_feet,
+            lead.lot_size,
+            lead.year_built,
+            lead.asking_price,
+            lead.estimated_arv,
+            lead.estimated_rehab,
+            lead.property_condition.value,
+            lead.days_on_market,
+            lead.listing_agent,
+            lead.listing_agent_phone,
+            lead.deal_source.value,
+            lead.lead_source_contact,
+            lead.description,
+            json.dumps(lead.photos),
+            lead.discovered_date.isoformat(),
+            lead.last_updated.isoformat(),
+            lead.status,
+            lead.notes
+        )
+    
+    def _match_investors(self, leads: List[PropertyLead]) -> List[DealAlert]:
+        """Deal alerts for a batch of leads against the resident investor criteria"""
+        roi = np.array([self._estimate_roi(lead) for lead in leads], dtype=float)
+        return self.matcher.match_leads(leads, roi)
     
     def _auto_match_investors(self, lead: PropertyLead):
         """Automatically match property lead with investor criteria"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Get all active investor criteria
-            cursor.execute("SELECT * FROM investor_criteria WHERE active = 1")
-            investors = cursor.fetchall()
-            
-            for investor_row in investors:
-                investor_data = {
-                    'investor_id': investor_row[0],
-                    'investor_name': investor_row[1],
-                    'min_price': investor_row[2],
-                    'max_price': investor_row[3],
-                    'preferred_property_types': json.loads(investor_row[4]),
-                    'target_locations': json.loads(investor_row[5]),
-                    'min_roi': investor_row[6],
-                    'min_cash_flow': investor_row[7],
-                    'max_rehab_budget': investor_row[8],
-                    'preferred_conditions': json.loads(investor_row[9]),
-                    'alert_frequency': investor_row[12]
-                }
-                
-                # Calculate match score
-                match_score = self._calculate_match_score(lead, investor_data)
-                
-                # If match score is above threshold, create alert
-                if match_score >= 70:  # 70% match threshold
-                    alert = DealAlert(
-                        alert_id=str(uuid.uuid4()),
-                        investor_id=investor_data['investor_id'],
-                        property_lead_id=lead.lead_id,
-                        match_score=match_score,
-                        alert_date=datetime.now()
-                    )
-                    
-                    self._create_deal_alert(alert)
-            
-            conn.close()
-            
+            self._create_deal_alerts(self._match_investors([lead]))
         except Exception as e:
             st.error(f"Error in auto-matching: {e}")
     
     def _calculate_match_score(self, lead: PropertyLead, investor: Dict[str, Any]) -> float:
-        """Calculate match score between property lead and investor criteria"""
+        """Calculate match score between property lead and investor criteria
+        
+        Per-pair reference for ``InvestorMatcher.score_leads``, which must
+        agree with it (see test_investor_matching.py).
+        """
         score = 0
         max_score = 100
         
@@ -410,40 +483,44 @@ class AutomatedDealSourcing:
     
     def _create_deal_alert(self, alert: DealAlert):
         """Create deal alert in database"""
+        self._create_deal_alerts([alert])
+    
+    def _create_deal_alerts(self, alerts: List[DealAlert]):
+        """Create deal alerts in database in one transaction"""
+        if not alerts:
+            return
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO deal_alerts 
-                (alert_id, investor_id, property_lead_id, match_score, alert_date, alert_sent)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                alert.alert_id,
-                alert.investor_id,
-                alert.property_lead_id,
-                alert.match_score,
-                alert.alert_date.isoformat(),
-                alert.alert_sent
-            ))
-            
-            conn.commit()
-            conn.close()
-            
+            with transaction(self.db_path) as conn:
+                self._insert_deal_alerts(conn, alerts)
         except Exception as e:
             st.error(f"Error creating deal alert: {e}")
     
+    @staticmethod
+    def _insert_deal_alerts(conn, alerts: List[DealAlert]):
+        conn.executemany('''
+            INSERT INTO deal_alerts 
+            (alert_id, investor_id, property_lead_id, match_score, alert_date, alert_sent)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(
+            alert.alert_id,
+            alert.investor_id,
+            alert.property_lead_id,
+            alert.match_score,
+            alert.alert_date.isoformat(),
+            alert.alert_sent
+        ) for alert in alerts])
+    
     def get_property_leads(self, status: str = None) -> List[Dict[str, Any]]:
         """Get property leads from database"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             
             if status:
                 query = "SELECT * FROM property_leads WHERE status = ?"
-                df = pd.read_sql_query(query, conn, params=[status])
+                df = pd.read_sql_query(query, conn.raw, params=[status])
             else:
                 query = "SELECT * FROM property_leads ORDER BY discovered_date DESC"
-                df = pd.read_sql_query(query, conn)
+                df = pd.read_sql_query(query, conn.raw)
             
             conn.close()
             return df.to_dict('records')
@@ -452,10 +529,40 @@ class AutomatedDealSourcing:
             st.error(f"Error getting property leads: {e}")
             return []
     
+    def get_property_leads_page(self, status: str = None, property_type: str = None,
+                                max_price: float = None, cursor: Optional[str] = None,
+                                page_size: int = DEFAULT_PAGE_SIZE) -> Page:
+        """Get one page of property leads (newest first) filtered in SQL"""
+        filters = []
+        if status:
+            filters.append(('status', '=', status))
+        if property_type:
+            filters.append(('property_type', '=', property_type))
+        if max_price is not None:
+            filters.append(('asking_price', '<=', max_price))
+        try:
+            return PROPERTY_LEAD_LIST_QUERY.fetch(self.db_path, filters, cursor, page_size)
+        except Exception as e:
+            st.error(f"Error getting property leads: {e}")
+            return Page()
+    
+    def get_property_lead_statuses(self) -> List[str]:
+        """Distinct property lead statuses"""
+        try:
+            conn = get_connection(self.db_path)
+            rows = conn.execute(
+                "SELECT DISTINCT status FROM property_leads WHERE status IS NOT NULL ORDER BY status"
+            ).fetchall()
+            conn.close()
+            return [row[0] for row in rows]
+        except Exception as e:
+            st.error(f"Error getting property lead statuses: {e}")
+            return []
+    
     def get_deal_alerts(self, investor_id: str = None) -> List[Dict[str, Any]]:
         """Get deal alerts from database"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             
             if investor_id:
                 query = """
@@ -465,7 +572,7 @@ class AutomatedDealSourcing:
                     WHERE da.investor_id = ?
                     ORDER BY da.alert_date DESC
                 """
-                df = pd.read_sql_query(query, conn, params=[investor_id])
+                df = pd.read_sql_query(query, conn.raw, params=[investor_id])
             else:
                 query = """
                     SELECT da.*, pl.property_address, pl.asking_price, pl.property_type,
@@ -475,7 +582,7 @@ class AutomatedDealSourcing:
                     JOIN investor_criteria ic ON da.investor_id = ic.investor_id
                     ORDER BY da.alert_date DESC
                 """
-                df = pd.read_sql_query(query, conn)
+                df = pd.read_sql_query(query, conn.raw)
             
             conn.close()
             return df.to_dict('records')
@@ -667,101 +774,133 @@ def show_property_leads_management(sourcing: AutomatedDealSourcing):
             st.rerun()
         show_add_property_lead_form(sourcing)
         return
+
+    show_bulk_lead_import(sourcing)
+
+    # Filters
+    col1, col2, col3 = st.columns(3)
     
-    # Get and display leads
-    leads = sourcing.get_property_leads()
+    with col1:
+        status_filter = st.selectbox("Filter by Status", 
+            ["All"] + sourcing.get_property_lead_statuses())
     
-    if leads:
-        # Filters
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            status_filter = st.selectbox("Filter by Status", 
-                ["All"] + list(set([l.get('status', '') for l in leads])))
-        
-        with col2:
-            property_type_filter = st.selectbox("Filter by Type",
-                ["All"] + [pt.value for pt in PropertyType])
-        
-        with col3:
-            max_price = st.number_input("Max Price Filter", min_value=0, value=500000, step=10000)
+    with col2:
+        property_type_filter = st.selectbox("Filter by Type",
+            ["All"] + [pt.value for pt in PropertyType])
+    
+    with col3:
+        max_price = st.number_input("Max Price Filter", min_value=0, value=500000, step=10000)
+    
+    # Fetch only the visible page, filtered in SQL
+    cursor = current_page_cursor("property_leads_page", (status_filter, property_type_filter, max_price))
+    page = sourcing.get_property_leads_page(
+        status=None if status_filter == "All" else status_filter,
+        property_type=None if property_type_filter == "All" else property_type_filter,
+        max_price=max_price,
+        cursor=cursor
+    )
+    filtered_leads = page.rows
+    
+    # Display leads table
+    if filtered_leads:
+        leads_data = []
+        for lead in filtered_leads:
+            asking_price = lead.get('asking_price') or 0
+            estimated_rehab = lead.get('estimated_rehab') or 0
+            estimated_arv = lead.get('estimated_arv') or 0
+            estimated_profit = estimated_arv - asking_price - estimated_rehab
+            roi = (estimated_profit / (asking_price + estimated_rehab)) * 100 if asking_price + estimated_rehab else 0
+            
+            leads_data.append({
+                '🏠 Address': lead.get('property_address', ''),
+                '🏢 City': lead.get('city', ''),
+                '📍 ZIP': lead.get('zip_code', ''),
+                '🏠 Type': lead.get('property_type', ''),
+                '💰 Price': f"${asking_price:,.0f}",
+                '🔨 Rehab': f"${estimated_rehab:,.0f}",
+                '📈 ARV': f"${estimated_arv:,.0f}",
+                '💵 Profit': f"${estimated_profit:,.0f}",
+                '📊 ROI': f"{roi:.1f}%",
+                '📅 Days': lead.get('days_on_market', 0),
+                '📋 Status': lead.get('status', ''),
+                '🔍 Source': lead.get('deal_source', '')
+            })
         
-        # Filter leads
-        filtered_leads = leads
-        if status_filter != "All":
-            filtered_leads = [l for l in filtered_leads if l.get('status') == status_filter]
-        if property_type_filter != "All":
-            filtered_leads = [l for l in filtered_leads if l.get('property_type') == property_type_filter]
-        filtered_leads = [l for l in filtered_leads if l.get('asking_price', 0) <= max_price]
+        df_leads = pd.DataFrame(leads_data)
+        st.dataframe(df_leads, use_container_width=True, height=400)
+        show_page_navigation("property_leads_page", page)
         
-        # Display leads table
+        # Lead details expander
+        st.subheader("📋 Lead Details")
         if filtered_leads:
-            leads_data = []
-            for lead in filtered_leads:
-                estimated_profit = lead.get('estimated_arv', 0) - lead.get('asking_price', 0) - lead.get('estimated_rehab', 0)
-                roi = (estimated_profit / (lead.get('asking_price', 1) + lead.get('estimated_rehab', 0))) * 100
-                
-                leads_data.append({
-                    '🏠 Address': lead.get('property_address', ''),
-                    '🏢 City': lead.get('city', ''),
-                    '📍 ZIP': lead.get('zip_code', ''),
-                    '🏠 Type': lead.get('property_type', ''),
-                    '💰 Price': f"${lead.get('asking_price', 0):,.0f}",
-                    '🔨 Rehab': f"${lead.get('estimated_rehab', 0):,.0f}",
-                    '📈 ARV': f"${lead.get('estimated_arv', 0):,.0f}",
-                    '💵 Profit': f"${estimated_profit:,.0f}",
-                    '📊 ROI': f"{roi:.1f}%",
-                    '📅 Days': lead.get('days_on_market', 0),
-                    '📋 Status': lead.get('status', ''),
-                    '🔍 Source': lead.get('deal_source', '')
-                })
-            
-            df_leads = pd.DataFrame(leads_data)
-            st.dataframe(df_leads, use_container_width=True, height=400)
+            selected_address = st.selectbox(
+                "Select property for details:",
+                [f"{l.get('property_address', '')} - {l.get('city', '')}" for l in filtered_leads]
+            )
             
-            # Lead details expander
-            st.subheader("📋 Lead Details")
-            if filtered_leads:
-                selected_address = st.selectbox(
-                    "Select property for details:",
-                    [f"{l.get('property_address', '')} - {l.get('city', '')}" for l in filtered_leads]
-                )
+            if selected_address:
+                selected_lead = next(l for l in filtered_leads 
+                                   if f"{l.get('property_address', '')} - {l.get('city', '')}" == selected_address)
                 
-                if selected_address:
-                    selected_lead = next(l for l in filtered_leads 
-                                       if f"{l.get('property_address', '')} - {l.get('city', '')}" == selected_address)
-                    
-                    col1, col2, col3 = st.columns(3)
-                    
-                    with col1:
-                        st.write("**Property Details:**")
-                        st.write(f"• Bedrooms: {selected_lead.get('bedrooms', 'N/A')}")
-                        st.write(f"• Bathrooms: {selected_lead.get('bathrooms', 'N/A')}")
-                        st.write(f"• Square Feet: {selected_lead.get('square_feet', 'N/A'):,}")
-                        st.write(f"• Year Built: {selected_lead.get('year_built', 'N/A')}")
-                        st.write(f"• Lot Size: {selected_lead.get('lot_size', 'N/A')} acres")
-                    
-                    with col2:
-                        st.write("**Financial Details:**")
-                        st.write(f"• Asking Price: ${selected_lead.get('asking_price', 0):,.0f}")
-                        st.write(f"• Estimated ARV: ${selected_lead.get('estimated_arv', 0):,.0f}")
-                        st.write(f"• Rehab Estimate: ${selected_lead.get('estimated_rehab', 0):,.0f}")
-                        st.write(f"• Condition: {selected_lead.get('property_condition', 'N/A')}")
-                    
-                    with col3:
-                        st.write("**Contact Information:**")
-                        st.write(f"• Listing Agent: {selected_lead.get('listing_agent', 'N/A')}")
-                        st.write(f"• Agent Phone: {selected_lead.get('listing_agent_phone', 'N/A')}")
-                        st.write(f"• Lead Source: {selected_lead.get('lead_source_contact', 'N/A')}")
-                        st.write(f"• Deal Source: {selected_lead.get('deal_source', 'N/A')}")
-                    
-                    if selected_lead.get('description'):
-                        st.write("**Description:**")
-                        st.write(selected_lead.get('description', ''))
-        else:
-            st.info("🔍 No leads match your current filters.")
+                col1, col2, col3 = st.columns(3)
+                
+                with col1:
+                    st.write("**Property Details:**")
+                    st.write(f"• Bedrooms: {selected_lead.get('bedrooms', 'N/A')}")
+                    st.write(f"• Bathrooms: {selected_lead.get('bathrooms', 'N/A')}")
+                    st.write(f"• Square Feet: {selected_lead.get('square_feet') or 0:,}")
+                    st.write(f"• Year Built: {selected_lead.get('year_built', 'N/A')}")
+                    st.write(f"• Lot Size: {selected_lead.get('lot_size', 'N/A')} acres")
+                
+                with col2:
+                    st.write("**Financial Details:**")
+                    st.write(f"• Asking Price: ${selected_lead.get('asking_price') or 0:,.0f}")
+                    st.write(f"• Estimated ARV: ${selected_lead.get('estimated_arv') or 0:,.0f}")
+                    st.write(f"• Rehab Estimate: ${selected_lead.get('estimated_rehab') or 0:,.0f}")
+                    st.write(f"• Condition: {selected_lead.get('property_condition', 'N/A')}")
+                
+                with col3:
+                    st.write("**Contact Information:**")
+                    st.write(f"• Listing Agent: {selected_lead.get('listing_agent', 'N/A')}")
+                    st.write(f"• Agent Phone: {selected_lead.get('listing_agent_phone', 'N/A')}")
+                    st.write(f"• Lead Source: {selected_lead.get('lead_source_contact', 'N/A')}")
+                    st.write(f"• Deal Source: {selected_lead.get('deal_source', 'N/A')}")
+                
+                if selected_lead.get('description'):
+                    st.write("**Description:**")
+                    st.write(selected_lead.get('description', ''))
     else:
-        st.info("📝 No property leads found. Add some leads to get started!")
+        st.info("🔍 No leads match your current filters. Add some leads to get started!")
+
+def show_bulk_lead_import(sourcing: AutomatedDealSourcing):
+    """Show bulk CSV/JSONL property lead import"""
+    from lead_import import PropertyLeadImporter
+
+    with st.expander("📥 Bulk Import Leads (CSV / JSONL)"):
+        st.caption("Columns: address, city, state, zip, type, beds, baths, sqft, price, arv, rehab, condition, source. "
+                   "Leads already on file (same normalized address) are skipped.")
+        uploaded_file = st.file_uploader("Choose lead file", type=["csv", "jsonl", "ndjson"], key="bulk_lead_file")
+
+        if uploaded_file and st.button("🚀 Import Leads", key="bulk_lead_import"):
+            progress = st.progress(0.0)
+            status = st.empty()
+            total_bytes = max(uploaded_file.size, 1)
+
+            def on_progress(report):
+                progress.progress(min(uploaded_file.tell() / total_bytes, 1.0))
+                status.text(f"Imported {report.imported:,} of {report.rows_read:,} rows "
+                            f"({report.rows_per_second:,.0f} rows/s)")
+
+            importer = PropertyLeadImporter(sourcing, progress_callback=on_progress)
+            report = importer.import_file(uploaded_file)
+            progress.progress(1.0)
+
+            st.success(f"✅ Imported {report.imported:,} leads in {report.elapsed_seconds:.1f}s "
+                       f"({report.duplicates:,} duplicates skipped, {report.invalid:,} invalid rows)")
+            if report.failed:
+                st.error(f"❌ {report.failed:,} rows could not be stored; see the problems below")
+            if report.errors:
+                st.dataframe(pd.DataFrame(report.errors, columns=["Row", "Problem"]), use_container_width=True)
 
 def show_add_property_lead_form(sourcing: AutomatedDealSourcing):
     """Show form to add new property lead"""
@@ -884,8 +1023,8 @@ def show_investor_criteria_management(sourcing: AutomatedDealSourcing):
     
     # Display existing criteria
     try:
-        conn = sqlite3.connect(sourcing.db_path)
-        df_criteria = pd.read_sql_query("SELECT * FROM investor_criteria ORDER BY created_date DESC", conn)
+        conn = get_connection(sourcing.db_path)
+        df_criteria = pd.read_sql_query("SELECT * FROM investor_criteria ORDER BY created_date DESC", conn.raw)
         conn.close()
         
         if not df_criteria.empty:
@@ -4,7 +4,7 @@ Subscription management, trial tracking, and payment processing
 """
 
 import streamlit as st
-import sqlite3
+from db_connection import get_connection
 import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
@@ -73,7 +73,7 @@ class BillingManager:
     
     def init_billing_database(self):
         """Initialize billing database"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -130,7 +130,7 @@ class BillingManager:
     def create_subscription(self, user_uuid: str, tier: str, billing_cycle: str = "monthly") -> Dict[str, Any]:
         """Create new subscription with trial"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             subscription_id = str(uuid.uuid4())
@@ -162,7 +162,7 @@ class BillingManager:
     def get_user_subscription(self, user_uuid: str) -> Dict[str, Any]:
         """Get user's current subscription"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -229,7 +229,7 @@ class BillingManager:
     def upgrade_subscription(self, user_uuid: str, new_tier: str, billing_cycle: str = "monthly") -> Dict[str, Any]:
         """Upgrade user subscription"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             tier_info = self.subscription_tiers.get(new_tier)
@@ -264,7 +264,7 @@ class BillingManager:
     def record_usage(self, user_uuid: str, usage_type: str, amount: int = 1):
         """Record usage for billing tracking"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             month_year = datetime.now().strftime("%Y-%m")
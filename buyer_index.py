@@ -0,0 +1,241 @@
+"""
+Buyer Criteria Index for NXTRIX CRM
+Finds the buyers whose criteria a deal can satisfy without scanning the buyer book:
+- Sorted NumPy columns on min ROI, max purchase price, max repairs and min bedrooms
+- Posting lists by preferred property type, deal type and target location
+- Candidates come from the most selective predicate; the rest are checked vectorized
+- Updated incrementally whenever a buyer is added, changed or removed
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+_INF = float('inf')
+
+# Numeric criteria kept both per slot and as sorted columns
+_RANGE_COLUMNS = ('min_roi', 'max_price', 'max_repairs', 'min_bedrooms')
+
+
+class _SortedColumn:
+    """Buyer slots ordered by one numeric criterion"""
+
+    def __init__(self):
+        self.values = np.empty(0)
+        self.slots = np.empty(0, dtype=np.int64)
+
+    def insert(self, value: float, slot: int):
+        position = np.searchsorted(self.values, value, side='right')
+        self.values = np.insert(self.values, position, value)
+        self.slots = np.insert(self.slots, position, slot)
+
+    def remove(self, value: float, slot: int):
+        start = np.searchsorted(self.values, value, side='left')
+        stop = np.searchsorted(self.values, value, side='right')
+        positions = start + np.flatnonzero(self.slots[start:stop] == slot)
+        self.values = np.delete(self.values, positions)
+        self.slots = np.delete(self.slots, positions)
+
+    def load(self, values: np.ndarray, slots: np.ndarray):
+        order = np.argsort(values, kind='stable')
+        self.values = values[order]
+        self.slots = slots[order]
+
+    def at_most(self, value: float) -> np.ndarray:
+        return self.slots[:np.searchsorted(self.values, value, side='right')]
+
+    def at_least(self, value: float) -> np.ndarray:
+        return self.slots[np.searchsorted(self.values, value, side='left'):]
+
+
+class BuyerCriteriaIndex:
+    """Index over active buyers' criteria (``BuyerCriteria`` objects)
+
+    ``candidates(deal)`` returns exactly the active buyers passing the checks
+    of ``BuyerCriteria.matches_deal``; callers may still re-check each one.
+    A criterion of 0 means "no limit", as in ``matches_deal``.
+    """
+
+    def __init__(self, buyers: Optional[Iterable[Any]] = None):
+        self.clear()
+        if buyers is not None:
+            self.rebuild(buyers)
+
+    # ---- Maintenance ----
+
+    def clear(self):
+        """Remove every buyer"""
+        self._slots: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        # Per-slot columns; a type mask of 0 means "any type"
+        self._columns: Dict[str, np.ndarray] = {name: np.empty(0) for name in _RANGE_COLUMNS}
+        self._columns['property_mask'] = np.empty(0, dtype=np.int64)
+        self._columns['deal_mask'] = np.empty(0, dtype=np.int64)
+        self._columns['any_location'] = np.empty(0, dtype=bool)
+        self._sorted = {name: _SortedColumn() for name in _RANGE_COLUMNS}
+        # Enum value -> bit, and posting lists of slots
+        self._bits: Dict[str, Dict[Any, int]] = {'property_types': {}, 'deal_types': {}}
+        self._postings: Dict[str, Dict[Any, Set[int]]] = {'property_types': {}, 'deal_types': {}, 'locations': {}}
+        self._wildcards: Dict[str, Set[int]] = {'property_types': set(), 'deal_types': set(), 'locations': set()}
+        self._entries: Dict[int, Dict[str, Any]] = {}
+
+    def rebuild(self, buyers: Iterable[Any]):
+        """Index a whole buyer book from scratch (sorts each column once)"""
+        self.clear()
+        for buyer in buyers:
+            self._store(buyer)
+        slots = np.arange(len(self._ids), dtype=np.int64)
+        for name in _RANGE_COLUMNS:
+            self._sorted[name].load(self._columns[name][slots], slots)
+
+    def add(self, buyer: Any):
+        """Index a buyer, replacing its previous entry; inactive buyers are dropped"""
+        self.remove(buyer.id)
+        slot = self._store(buyer)
+        if slot is not None:
+            for name in _RANGE_COLUMNS:
+                self._sorted[name].insert(self._columns[name][slot], slot)
+
+    def remove(self, buyer_id: str):
+        """Drop a buyer from the index (no-op if absent)"""
+        slot = self._slots.pop(buyer_id, None)
+        if slot is None:
+            return
+        for name in _RANGE_COLUMNS:
+            self._sorted[name].remove(self._columns[name][slot], slot)
+        entry = self._entries.pop(slot)
+        for attribute, values in entry.items():
+            self._wildcards[attribute].discard(slot)
+            for value in values:
+                posting = self._postings[attribute].get(value)
+                if posting is not None:
+                    posting.discard(slot)
+                    if not posting:
+                        del self._postings[attribute][value]
+        self._ids[slot] = None
+        self._free.append(slot)
+
+    # ---- Queries ----
+
+    def candidates(self, deal: Any, location: Optional[str] = None) -> Set[str]:
+        """Ids of active buyers whose criteria the deal satisfies
+
+        With ``location``, only buyers targeting it (or targeting nowhere in
+        particular) are kept.
+        """
+        if not self._slots:
+            return set()
+        roi, price = float(deal.estimated_roi), float(deal.purchase_price)
+        repairs, bedrooms = float(deal.estimated_repairs), float(deal.bedrooms)
+        normalized = self.normalize_location(location) if location else ''
+
+        # (candidate count, materializer) per predicate; only the smallest is walked
+        sorted_columns = self._sorted
+        sources: List[Tuple[int, Callable[[], np.ndarray]]] = [
+            self._range_source(sorted_columns['min_roi'].at_most(roi)),
+            self._range_source(sorted_columns['max_price'].at_least(price)),
+            self._range_source(sorted_columns['max_repairs'].at_least(repairs)),
+            self._range_source(sorted_columns['min_bedrooms'].at_most(bedrooms)),
+            self._posting_source('property_types', deal.property_type),
+            self._posting_source('deal_types', deal.deal_type)
+        ]
+        if normalized:
+            sources.append(self._posting_source('locations', normalized))
+        count, materialize = min(sources, key=lambda source: source[0])
+        if count == 0:
+            return set()
+
+        slots = materialize()
+        columns = self._columns
+        property_bit = self._bits['property_types'].get(deal.property_type, 0)
+        deal_bit = self._bits['deal_types'].get(deal.deal_type, 0)
+        property_mask = columns['property_mask'][slots]
+        deal_mask = columns['deal_mask'][slots]
+        keep = ((columns['min_roi'][slots] <= roi)
+                & (columns['max_price'][slots] >= price)
+                & (columns['max_repairs'][slots] >= repairs)
+                & (columns['min_bedrooms'][slots] <= bedrooms)
+                & ((property_mask == 0) | ((property_mask & property_bit) != 0))
+                & ((deal_mask == 0) | ((deal_mask & deal_bit) != 0)))
+        if normalized:
+            targeted = self._postings['locations'].get(normalized, set())
+            keep &= columns['any_location'][slots] | np.isin(slots, np.fromiter(targeted, dtype=np.int64))
+        return {self._ids[slot] for slot in slots[keep]}
+
+    def buyers_targeting(self, location: str) -> Set[str]:
+        """Ids of active buyers listing ``location`` as a target"""
+        posting = self._postings['locations'].get(self.normalize_location(location), set())
+        return {self._ids[slot] for slot in posting}
+
+    @staticmethod
+    def normalize_location(location: str) -> str:
+        return ' '.join((location or '').lower().split())
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, buyer_id: str) -> bool:
+        return buyer_id in self._slots
+
+    # ---- Internals ----
+
+    @staticmethod
+    def _range_source(slots: np.ndarray) -> Tuple[int, Callable[[], np.ndarray]]:
+        return len(slots), lambda: slots
+
+    def _posting_source(self, attribute: str, value: Any) -> Tuple[int, Callable[[], np.ndarray]]:
+        posting = self._postings[attribute].get(value, set())
+        wildcard = self._wildcards[attribute]
+        return (len(posting) + len(wildcard),
+                lambda: np.fromiter(posting | wildcard, dtype=np.int64, count=len(posting) + len(wildcard)))
+
+    def _store(self, buyer: Any) -> Optional[int]:
+        """Write a buyer's criteria into a free slot (not the sorted columns)"""
+        if not buyer.active:
+            return None
+        slot = self._free.pop() if self._free else self._grow()
+        self._slots[buyer.id] = slot
+        self._ids[slot] = buyer.id
+
+        columns = self._columns
+        columns['min_roi'][slot] = buyer.min_roi
+        columns['max_price'][slot] = buyer.max_purchase_price if buyer.max_purchase_price > 0 else _INF
+        columns['max_repairs'][slot] = buyer.max_repairs if buyer.max_repairs > 0 else _INF
+        columns['min_bedrooms'][slot] = buyer.min_bedrooms if buyer.min_bedrooms > 0 else -_INF
+
+        entry = {
+            'property_types': set(buyer.preferred_property_types),
+            'deal_types': set(buyer.preferred_deal_types),
+            'locations': {self.normalize_location(location) for location in buyer.target_locations} - {''}
+        }
+        self._entries[slot] = entry
+        for attribute, values in entry.items():
+            if not values:
+                self._wildcards[attribute].add(slot)
+            for value in values:
+                self._postings[attribute].setdefault(value, set()).add(slot)
+        columns['property_mask'][slot] = self._mask('property_types', entry['property_types'])
+        columns['deal_mask'][slot] = self._mask('deal_types', entry['deal_types'])
+        columns['any_location'][slot] = not entry['locations']
+        return slot
+
+    def _mask(self, attribute: str, values: Set[Any]) -> int:
+        bits = self._bits[attribute]
+        mask = 0
+        for value in values:
+            mask |= bits.setdefault(value, 1 << len(bits))
+        return mask
+
+    def _grow(self) -> int:
+        """Append a slot, doubling the column capacity when full"""
+        slot = len(self._ids)
+        self._ids.append(None)
+        capacity = len(self._columns['min_roi'])
+        if slot >= capacity:
+            new_capacity = max(16, capacity * 2)
+            for name, column in self._columns.items():
+                grown = np.zeros(new_capacity, dtype=column.dtype)
+                grown[:capacity] = column
+                self._columns[name] = grown
+        return slot
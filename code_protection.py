@@ -7,7 +7,7 @@ import os
 import hashlib
 import json
 import time
-import sqlite3
+from db_connection import get_connection
 from datetime import datetime
 from pathlib import Path
 import zipfile
@@ -40,7 +40,7 @@ class CodeProtectionSystem:
     
     def init_protection_database(self):
         """Initialize protection tracking database"""
-        conn = sqlite3.connect(self.protection_log)
+        conn = get_connection(self.protection_log)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -109,7 +109,7 @@ class CodeProtectionSystem:
             file_size = os.path.getsize(filename)
             line_count = self.count_lines(filename)
             
-            conn = sqlite3.connect(self.protection_log)
+            conn = get_connection(self.protection_log)
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO file_checksums (filename, checksum, file_size, line_count, notes)
@@ -158,7 +158,7 @@ class CodeProtectionSystem:
             return False, "Could not calculate hash"
         
         # Get latest known hash
-        conn = sqlite3.connect(self.protection_log)
+        conn = get_connection(self.protection_log)
         cursor = conn.cursor()
         cursor.execute('''
             SELECT checksum, line_count, file_size FROM file_checksums 
@@ -237,7 +237,7 @@ class CodeProtectionSystem:
     
     def log_event(self, event_type, filename, details):
         """Log protection events"""
-        conn = sqlite3.connect(self.protection_log)
+        conn = get_connection(self.protection_log)
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO protection_events (event_type, filename, details)
@@ -248,20 +248,20 @@ class CodeProtectionSystem:
     
     def get_protection_report(self):
         """Generate protection status report"""
-        conn = sqlite3.connect(self.protection_log)
+        conn = get_connection(self.protection_log)
         
         # Get recent events
         events = pd.read_sql('''
             SELECT * FROM protection_events 
             ORDER BY timestamp DESC LIMIT 10
-        ''', conn)
+        ''', conn.raw)
         
         # Get file status
         files = pd.read_sql('''
             SELECT filename, checksum, line_count, backup_created 
             FROM file_checksums 
             ORDER BY backup_created DESC
-        ''', conn)
+        ''', conn.raw)
         
         conn.close()
         
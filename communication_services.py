@@ -8,10 +8,30 @@ from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
 from datetime import datetime
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from db_connection import DEFAULT_DB_PATH
+from message_dispatch import DISPATCH_CONCURRENCY
+from message_outbox import OutboundMessage, enqueue, register_job_kind
 
 # Load environment variables
 load_dotenv()
 
+# (connect, read) timeout for provider API calls
+REQUEST_TIMEOUT_SECONDS = (5, 30)
+
+def _pooled_session(pool_size: int = DISPATCH_CONCURRENCY) -> requests.Session:
+    """HTTP session with keep-alive connections for concurrent sends to one API"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def _is_retryable(status_code: int) -> bool:
+    """Rate limiting and server errors are transient; other failures are not"""
+    return status_code == 429 or status_code >= 500
+
 @dataclass
 class EmailResult:
     """Result of email sending operation"""
@@ -19,6 +39,8 @@ class EmailResult:
     message_id: Optional[str] = None
     error_message: Optional[str] = None
     timestamp: datetime = None
+    retryable: bool = False
+    attempts: int = 1
     
     def __post_init__(self):
         if self.timestamp is None:
@@ -31,6 +53,8 @@ class SMSResult:
     message_sid: Optional[str] = None
     error_message: Optional[str] = None
     timestamp: datetime = None
+    retryable: bool = False
+    attempts: int = 1
     
     def __post_init__(self):
         if self.timestamp is None:
@@ -44,6 +68,8 @@ class TwilioSMSService:
         self.auth_token = os.getenv('TWILIO_AUTH_TOKEN')
         self.from_number = os.getenv('TWILIO_PHONE_NUMBER')
         self.enabled = os.getenv('ENABLE_SMS_NOTIFICATIONS', 'false').lower() == 'true'
+        self.api_url = os.getenv('TWILIO_API_URL', 'https://api.twilio.com')
+        self.session = _pooled_session()
         
         if not all([self.account_sid, self.auth_token, self.from_number]):
             self.enabled = False
@@ -62,7 +88,7 @@ class TwilioSMSService:
             to_number = self._clean_phone_number(to_number)
             
             # Twilio API endpoint
-            url = f"https://api.twilio.com/2010-04-01/Accounts/{self.account_sid}/Messages.json"
+            url = f"{self.api_url}/2010-04-01/Accounts/{self.account_sid}/Messages.json"
             
             # Prepare data
             data = {
@@ -72,10 +98,11 @@ class TwilioSMSService:
             }
             
             # Send request
-            response = requests.post(
+            response = self.session.post(
                 url,
                 data=data,
-                auth=(self.account_sid, self.auth_token)
+                auth=(self.account_sid, self.auth_token),
+                timeout=REQUEST_TIMEOUT_SECONDS
             )
             
             if response.status_code == 201:
@@ -86,12 +113,22 @@ class TwilioSMSService:
                     timestamp=datetime.now()
                 )
             else:
-                error_data = response.json()
+                try:
+                    error_message = response.json().get('message', 'Unknown error')
+                except ValueError:
+                    error_message = response.text or 'Unknown error'
                 return SMSResult(
                     success=False,
-                    error_message=error_data.get('message', 'Unknown error')
+                    error_message=error_message,
+                    retryable=_is_retryable(response.status_code)
                 )
                 
+        except (requests.ConnectionError, requests.Timeout) as e:
+            return SMSResult(
+                success=False,
+                error_message=f"SMS sending failed: {str(e)}",
+                retryable=True
+            )
         except Exception as e:
             return SMSResult(
                 success=False,
@@ -115,7 +152,12 @@ class TwilioSMSService:
     
     def send_deal_alert_sms(self, to_number: str, deal_data: Dict[str, Any]) -> SMSResult:
         """Send a deal alert via SMS"""
-        message = f"""🏠 DEAL ALERT!
+        return self.send_sms(to_number, self.deal_alert_message(deal_data))
+    
+    @staticmethod
+    def deal_alert_message(deal_data: Dict[str, Any]) -> str:
+        """Deal alert SMS text"""
+        return f"""🏠 DEAL ALERT!
         
 Property: {deal_data.get('address', 'N/A')}
 Price: ${deal_data.get('price', 0):,.0f}
@@ -123,7 +165,6 @@ ROI: {deal_data.get('roi', 0):.1f}%
 
 Reply STOP to opt out.
 """
-        return self.send_sms(to_number, message)
 
 class EmailJSService:
     """EmailJS email service integration"""
@@ -135,6 +176,8 @@ class EmailJSService:
         self.public_key = os.getenv('EMAILJS_PUBLIC_KEY')
         self.private_key = os.getenv('EMAILJS_PRIVATE_KEY')
         self.enabled = os.getenv('ENABLE_EMAIL_NOTIFICATIONS', 'false').lower() == 'true'
+        self.api_url = os.getenv('EMAILJS_API_URL', 'https://api.emailjs.com/api/v1.0/email/send')
+        self.session = _pooled_session()
         
         if not all([self.service_id, self.public_key]):
             self.enabled = False
@@ -153,9 +196,6 @@ class EmailJSService:
             )
         
         try:
-            # EmailJS API endpoint
-            url = "https://api.emailjs.com/api/v1.0/email/send"
-            
             # Prepare template parameters
             template_params = {
                 'to_email': to_email,
@@ -187,10 +227,11 @@ class EmailJSService:
                 'Origin': 'http://localhost'
             }
             
-            response = requests.post(
-                url, 
+            response = self.session.post(
+                self.api_url, 
                 data=json.dumps(payload),
-                headers=headers
+                headers=headers,
+                timeout=REQUEST_TIMEOUT_SECONDS
             )
             
             if response.status_code == 200:
@@ -202,9 +243,16 @@ class EmailJSService:
             else:
                 return EmailResult(
                     success=False,
-                    error_message=f"EmailJS API error: {response.text}"
+                    error_message=f"EmailJS API error: {response.text}",
+                    retryable=_is_retryable(response.status_code)
                 )
                 
+        except (requests.ConnectionError, requests.Timeout) as e:
+            return EmailResult(
+                success=False,
+                error_message=f"Email sending failed: {str(e)}",
+                retryable=True
+            )
         except Exception as e:
             return EmailResult(
                 success=False,
@@ -247,8 +295,16 @@ class EmailJSService:
                             deal_data: Dict[str, Any],
                             recipient_name: str = "Investor") -> EmailResult:
         """Send a deal alert via email"""
-        
-        template_data = {
+        return self.send_template_email(
+            to_email=to_email,
+            template_type='deal_alert',
+            variables=self.deal_alert_template_data(deal_data, recipient_name)
+        )
+    
+    @staticmethod
+    def deal_alert_template_data(deal_data: Dict[str, Any], recipient_name: str = "Investor") -> Dict[str, Any]:
+        """EmailJS template variables for a deal alert"""
+        return {
             'recipient_name': recipient_name,
             'property_address': deal_data.get('address', 'N/A'),
             'asking_price': f"${deal_data.get('price', 0):,.0f}",
@@ -258,12 +314,6 @@ class EmailJSService:
             'contact_phone': os.getenv('TWILIO_PHONE_NUMBER', ''),
             'contact_email': os.getenv('ADMIN_EMAIL', 'admin@nxtrix.com')
         }
-        
-        return self.send_template_email(
-            to_email=to_email,
-            template_type='deal_alert',
-            variables=template_data
-        )
 
 class CommunicationManager:
     """Unified communication manager for SMS and Email"""
@@ -335,50 +385,56 @@ class CommunicationManager:
     
     def send_deal_alert(self, 
                        deal_data: Dict[str, Any],
-                       recipients: List[Dict[str, str]]) -> List[Dict[str, Any]]:
-        """Send deal alert to multiple recipients"""
-        
-        alert_results = []
+                       recipients: List[Dict[str, str]],
+                       kind: str = 'deal_alert',
+                       db_path: str = DEFAULT_DB_PATH) -> str:
+        """Queue a deal alert to multiple recipients; returns the outbox job id
         
+        Emails and texts are delivered by the outbox workers. Use
+        message_outbox.job_progress (or show_job_progress) to follow them.
+        """
+        messages = []
         for recipient in recipients:
             name = recipient.get('name', 'Investor')
             email = recipient.get('email')
             phone = recipient.get('phone')
             
-            # Send email alert
+            # Email alert
             if email:
-                email_result = self.email_service.send_deal_alert_email(
-                    to_email=email,
-                    deal_data=deal_data,
-                    recipient_name=name
-                )
-                
-                alert_results.append({
-                    'recipient': name,
-                    'email': email,
-                    'type': 'email',
-                    'success': email_result.success,
-                    'message_id': email_result.message_id,
-                    'error': email_result.error_message
-                })
+                messages.append(OutboundMessage(
+                    channel='email',
+                    provider='emailjs',
+                    recipient=email,
+                    payload={
+                        'to_email': email,
+                        'subject': 'New Investment Opportunity Available',
+                        'message': '',  # Template will handle the message
+                        'template_data': self.email_service.deal_alert_template_data(deal_data, name)
+                    }
+                ))
             
-            # Send SMS alert
+            # SMS alert
             if phone:
-                sms_result = self.sms_service.send_deal_alert_sms(
-                    to_number=phone,
-                    deal_data=deal_data
-                )
-                
-                alert_results.append({
-                    'recipient': name,
-                    'phone': phone,
-                    'type': 'sms',
-                    'success': sms_result.success,
-                    'message_id': sms_result.message_sid,
-                    'error': sms_result.error_message
-                })
+                messages.append(OutboundMessage(
+                    channel='sms',
+                    provider='twilio',
+                    recipient=phone,
+                    payload={'to_number': phone, 'message': self.sms_service.deal_alert_message(deal_data)}
+                ))
         
-        return alert_results
+        return enqueue(kind, messages, reference_id=deal_data.get('id'), db_path=db_path)
+    
+    def log_deliveries(self, outcomes: List[Dict[str, Any]]):
+        """Add outbox delivery outcomes to the delivery log"""
+        for outcome in outcomes:
+            self.delivery_log.append({
+                'type': outcome['channel'],
+                'recipient': outcome['recipient'],
+                'success': outcome['status'] == 'sent',
+                'timestamp': datetime.now(),
+                'message_id': outcome['provider_message_id'],
+                'error': outcome['error']
+            })
     
     def get_delivery_stats(self) -> Dict[str, Any]:
         """Get delivery statistics"""
@@ -439,4 +495,6 @@ class CommunicationManager:
         return results
 
 # Initialize global communication manager
-communication_manager = CommunicationManager()
\ No newline at end of file
+communication_manager = CommunicationManager()
+
+register_job_kind('deal_alert', on_batch=lambda conn, job, outcomes: communication_manager.log_deliveries(outcomes))
\ No newline at end of file
@@ -0,0 +1,269 @@
+"""
+Indexed In-Memory Repository for NXTRIX CRM
+Keeps CRM entities in an id -> object map with secondary indexes:
+- O(1) lookup, update and delete by id
+- Posting lists per indexed attribute value (status, source, type, ...)
+- Filters return only the matching entities instead of scanning everything
+- Behaves like a read-only list for existing UI code (len, iteration, indexing)
+- Tracks dirty and deleted ids so persistence can flush only what changed
+"""
+
+from typing import Any, Callable, Dict, Generic, Iterable, Iterator, List, Optional, Set, Tuple, TypeVar
+
+T = TypeVar('T')
+
+_UNSET = object()
+
+
+class IndexedRepository(Generic[T]):
+    """Insertion-ordered entity store with secondary indexes
+
+    ``indexes`` maps an index name to a function extracting the indexed value
+    from an entity. Call ``reindex`` (or use ``update``) after changing an
+    indexed attribute so the posting lists stay correct. Every add, update,
+    reindex and removal is also recorded as a pending change until
+    ``pop_changes`` hands it to the persistence layer.
+    """
+
+    def __init__(self, indexes: Optional[Dict[str, Callable[[T], Any]]] = None,
+                 key: Callable[[T], str] = lambda entity: entity.id):
+        self._key = key
+        self._index_functions: Dict[str, Callable[[T], Any]] = dict(indexes or {})
+        self._entities: Dict[str, T] = {}
+        self._sequence: Dict[str, int] = {}
+        self._next_sequence = 0
+        # index name -> indexed value -> {entity id: entity}
+        self._postings: Dict[str, Dict[Any, Dict[str, T]]] = {name: {} for name in self._index_functions}
+        # index name -> entity id -> indexed value (to unlink on change)
+        self._indexed_values: Dict[str, Dict[str, Any]] = {name: {} for name in self._index_functions}
+        self._snapshot: Optional[List[T]] = None
+        # Unit-of-work change tracking
+        self._dirty: Set[str] = set()
+        self._deleted: Set[str] = set()
+
+    # ---- Mutation ----
+
+    def add(self, entity: T) -> T:
+        """Add an entity, replacing any existing entity with the same id in place"""
+        entity_id = self._key(entity)
+        if entity_id not in self._entities:
+            self._sequence[entity_id] = self._next_sequence
+            self._next_sequence += 1
+        self._entities[entity_id] = entity
+        self._index(entity_id, entity)
+        self._snapshot = None
+        self._dirty.add(entity_id)
+        self._deleted.discard(entity_id)
+        return entity
+
+    def append(self, entity: T):
+        """List-compatible alias for ``add``"""
+        self.add(entity)
+
+    def extend(self, entities: Iterable[T]):
+        """Add many entities"""
+        for entity in entities:
+            self.add(entity)
+
+    def reset(self, entities: Iterable[T]):
+        """Replace the whole contents"""
+        self.clear()
+        self.extend(entities)
+
+    def remove_by_id(self, entity_id: str) -> Optional[T]:
+        """Remove and return the entity with ``entity_id`` (None if absent)"""
+        entity = self._entities.pop(entity_id, None)
+        if entity is None:
+            return None
+        self._sequence.pop(entity_id, None)
+        self._unindex(entity_id)
+        self._snapshot = None
+        self._dirty.discard(entity_id)
+        self._deleted.add(entity_id)
+        return entity
+
+    def remove(self, entity: T):
+        """List-compatible removal; raises ValueError if the entity is absent"""
+        if self.remove_by_id(self._key(entity)) is None:
+            raise ValueError("entity not in repository")
+
+    def update(self, entity_id: str, updates: Dict[str, Any]) -> Optional[T]:
+        """Apply attribute updates to an entity and refresh its index entries"""
+        entity = self._entities.get(entity_id)
+        if entity is None:
+            return None
+        for attribute, value in updates.items():
+            if hasattr(entity, attribute):
+                setattr(entity, attribute, value)
+        self.reindex(entity)
+        return entity
+
+    def reindex(self, entity: T):
+        """Refresh the index entries of an entity changed in place and mark it dirty"""
+        entity_id = self._key(entity)
+        if entity_id in self._entities:
+            self._index(entity_id, entity)
+            self._dirty.add(entity_id)
+
+    def clear(self):
+        """Remove every entity"""
+        self._deleted.update(self._entities)
+        self._dirty.clear()
+        self._entities.clear()
+        self._sequence.clear()
+        for name in self._index_functions:
+            self._postings[name].clear()
+            self._indexed_values[name].clear()
+        self._snapshot = None
+
+    # ---- Change tracking ----
+
+    @property
+    def has_changes(self) -> bool:
+        """Whether any entity was added, changed or removed since the last flush"""
+        return bool(self._dirty or self._deleted)
+
+    def pop_changes(self) -> Tuple[List[T], List[str]]:
+        """Return (dirty entities, deleted ids) and reset the pending changes"""
+        dirty = [self._entities[entity_id] for entity_id in self._dirty if entity_id in self._entities]
+        deleted = list(self._deleted)
+        self._dirty = set()
+        self._deleted = set()
+        return self._in_order(dirty), deleted
+
+    def mark_dirty(self, entity_id: str):
+        """Record an in-place change that does not touch indexed attributes"""
+        if entity_id in self._entities:
+            self._dirty.add(entity_id)
+
+    def mark_deleted(self, entity_ids: Iterable[str]):
+        """Record removals again (e.g. after a failed delete) so the next flush retries them"""
+        self._deleted.update(entity_id for entity_id in entity_ids if entity_id not in self._entities)
+
+    def mark_clean(self):
+        """Forget pending changes (e.g. right after loading from storage)"""
+        self._dirty.clear()
+        self._deleted.clear()
+
+    # ---- Queries ----
+
+    def get(self, entity_id: str) -> Optional[T]:
+        """Entity by id"""
+        return self._entities.get(entity_id)
+
+    def get_many(self, entity_ids: Iterable[str]) -> List[T]:
+        """Entities for ``entity_ids`` in insertion order (unknown ids are skipped)"""
+        return self._in_order([self._entities[entity_id] for entity_id in set(entity_ids)
+                               if entity_id in self._entities])
+
+    def find(self, **criteria: Any) -> List[T]:
+        """Entities whose indexed values equal every criterion, in insertion order
+
+        Walks only the smallest matching posting list, so the cost is bounded
+        by the result size rather than the repository size.
+        """
+        criteria = {name: value for name, value in criteria.items() if value is not None}
+        if not criteria:
+            return self.to_list()
+
+        postings = []
+        for name, value in criteria.items():
+            if name not in self._postings:
+                raise KeyError(f"No index named '{name}'")
+            posting = self._postings[name].get(value)
+            if not posting:
+                return []
+            postings.append((name, value, posting))
+
+        postings.sort(key=lambda item: len(item[2]))
+        _, _, smallest = postings[0]
+        others = postings[1:]
+        results = [
+            entity for entity_id, entity in smallest.items()
+            if all(self._indexed_values[name].get(entity_id) == value for name, value, _ in others)
+        ]
+        return self._in_order(results)
+
+    def find_any(self, index_name: str, values: Iterable[Any]) -> List[T]:
+        """Entities whose indexed value is any of ``values``, in insertion order"""
+        if index_name not in self._postings:
+            raise KeyError(f"No index named '{index_name}'")
+        results = []
+        for value in set(values):
+            results.extend(self._postings[index_name].get(value, {}).values())
+        return self._in_order(results)
+
+    def count(self, index_name: str, value: Any) -> int:
+        """Number of entities with an indexed value"""
+        return len(self._postings[index_name].get(value, {}))
+
+    def values_for(self, index_name: str) -> Dict[Any, int]:
+        """Counts per distinct indexed value"""
+        return {value: len(posting) for value, posting in self._postings[index_name].items() if posting}
+
+    def to_list(self) -> List[T]:
+        """Entities as a new list in insertion order"""
+        return list(self._entities.values())
+
+    def copy(self) -> List[T]:
+        """List-compatible shallow copy"""
+        return self.to_list()
+
+    # ---- Sequence protocol ----
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self._ordered())
+
+    def __bool__(self) -> bool:
+        return bool(self._entities)
+
+    def __contains__(self, item: Any) -> bool:
+        if isinstance(item, str):
+            return item in self._entities
+        try:
+            return self._key(item) in self._entities
+        except AttributeError:
+            return False
+
+    def __getitem__(self, position):
+        return self._ordered()[position]
+
+    def __repr__(self) -> str:
+        return f"IndexedRepository({len(self)} entities, indexes={list(self._index_functions)})"
+
+    # ---- Internals ----
+
+    def _index(self, entity_id: str, entity: T):
+        for name, function in self._index_functions.items():
+            value = function(entity)
+            previous = self._indexed_values[name].get(entity_id, _UNSET)
+            if previous is not _UNSET and previous != value:
+                self._unlink(name, previous, entity_id)
+            self._postings[name].setdefault(value, {})[entity_id] = entity
+            self._indexed_values[name][entity_id] = value
+
+    def _unindex(self, entity_id: str):
+        for name in self._index_functions:
+            previous = self._indexed_values[name].pop(entity_id, _UNSET)
+            if previous is not _UNSET:
+                self._unlink(name, previous, entity_id)
+
+    def _unlink(self, name: str, value: Any, entity_id: str):
+        posting = self._postings[name].get(value)
+        if posting is not None:
+            posting.pop(entity_id, None)
+            if not posting:
+                del self._postings[name][value]
+
+    def _ordered(self) -> List[T]:
+        # Rebuilt after mutations and replaced rather than mutated, so iteration is safe
+        if self._snapshot is None:
+            self._snapshot = list(self._entities.values())
+        return self._snapshot
+
+    def _in_order(self, entities: List[T]) -> List[T]:
+        return sorted(entities, key=lambda entity: self._sequence[self._key(entity)])
+
@@ -0,0 +1,231 @@
+"""
+Full-Text Search Index for NXTRIX CRM
+SQLite FTS5 index over leads, contacts, buyers and deals in crm_data.db:
+- Kept in sync by triggers on the source tables, whoever writes them
+- Leads are the CRM pipeline's only; lead scoring rows (with a source) stay out
+- Prefix matching on every search term ("jo smi" finds "John Smith")
+- BM25 ranking with LIMIT/OFFSET pagination, no full-table loads
+"""
+
+import re
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+from db_connection import get_connection
+
+# Each entity type gets a rowid slot: search rowid = source rowid * 4 + code
+ENTITY_CODES = {'lead': 0, 'contact': 1, 'buyer': 2, 'deal': 3}
+
+# Source table, the rows it contributes and the expressions feeding each indexed column
+ENTITY_SOURCES = {
+    'lead': {
+        'table': 'leads',
+        # The leads table is shared with lead_scoring_system, whose rows have a source
+        'where': "{row}.source IS NULL",
+        'title': "{row}.name",
+        'email': "{row}.email",
+        'phone': "{row}.phone",
+        'address': "{row}.property_address",
+        'details': "COALESCE({row}.status, '') || ' ' || COALESCE({row}.lead_source, '') || ' ' || COALESCE({row}.notes, '')"
+    },
+    'contact': {
+        'table': 'contacts',
+        'title': "{row}.name",
+        'email': "{row}.email",
+        'phone': "{row}.phone",
+        'address': "{row}.location",
+        'details': "COALESCE({row}.company, '') || ' ' || COALESCE({row}.title, '') || ' ' || COALESCE({row}.notes, '')"
+    },
+    'buyer': {
+        'table': 'buyers',
+        'title': "{row}.name",
+        'email': "{row}.email",
+        'phone': "{row}.phone",
+        'address': "{row}.preferred_locations",
+        'details': "COALESCE({row}.property_types, '') || ' ' || COALESCE({row}.investment_strategy, '')"
+    },
+    'deal': {
+        'table': 'deals',
+        'title': "{row}.property_address",
+        'email': "NULL",
+        'phone': "NULL",
+        'address': "{row}.property_address",
+        'details': "COALESCE({row}.deal_type, '') || ' ' || COALESCE({row}.property_type, '') || ' ' || COALESCE({row}.status, '')"
+    }
+}
+
+_TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+class CRMSearchIndex:
+    """FTS5-backed search across CRM entities"""
+
+    def __init__(self, db_path: str = "crm_data.db"):
+        self.db_path = db_path
+        self.available = False
+        self.init_index()
+
+    def init_index(self):
+        """Create the FTS5 table and sync triggers; re-index when either is new or changed"""
+        try:
+            with get_connection(self.db_path) as conn:
+                cursor = conn.cursor()
+                existed = cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'crm_search'"
+                ).fetchone() is not None
+
+                cursor.execute('''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS crm_search USING fts5(
+                        entity_type UNINDEXED,
+                        entity_id UNINDEXED,
+                        title,
+                        email,
+                        phone,
+                        address,
+                        details,
+                        prefix = '2 3'
+                    )
+                ''')
+
+                stale = not existed
+                for entity_type, source in ENTITY_SOURCES.items():
+                    if self._table_exists(cursor, source['table']):
+                        for name, statement in self._trigger_statements(entity_type, source):
+                            stale = self._replace_trigger(cursor, name, statement) or stale
+
+                if stale:
+                    # Triggers from an older definition may have indexed rows they should not have
+                    cursor.execute('DELETE FROM crm_search')
+                    self._backfill(cursor)
+                conn.commit()
+                self.available = True
+        except sqlite3.OperationalError as e:
+            # SQLite builds without FTS5 fall back to in-memory search
+            print(f"⚠️ Full-text search unavailable: {str(e)}")
+            self.available = False
+
+    def rebuild(self) -> bool:
+        """Re-index every source row from scratch"""
+        try:
+            with get_connection(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM crm_search')
+                self._backfill(cursor)
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"❌ Error rebuilding search index: {str(e)}")
+            return False
+
+    def search(self, query: str, entity_types: Optional[List[str]] = None,
+               limit: int = 25, offset: int = 0) -> Dict[str, Any]:
+        """Ranked prefix search; returns one page of hits plus the total match count
+
+        A negative ``limit`` returns every match from ``offset`` on.
+        """
+        match = self.build_match_expression(query)
+        if not match or not self.available:
+            return {'results': [], 'total': 0, 'limit': limit, 'offset': offset}
+
+        where = 'crm_search MATCH ?'
+        params: List[Any] = [match]
+        if entity_types:
+            where += f" AND entity_type IN ({', '.join('?' for _ in entity_types)})"
+            params.extend(entity_types)
+
+        try:
+            with get_connection(self.db_path) as conn:
+                cursor = conn.cursor()
+                total = cursor.execute(f'SELECT COUNT(*) FROM crm_search WHERE {where}', params).fetchone()[0]
+                # Title matches weigh most, then contact details, then free text
+                cursor.execute(f'''
+                    SELECT entity_type, entity_id, title, email, phone, address,
+                           bm25(crm_search, 0, 0, 10.0, 5.0, 5.0, 3.0, 1.0) AS rank
+                    FROM crm_search
+                    WHERE {where}
+                    ORDER BY rank
+                    LIMIT ? OFFSET ?
+                ''', params + [limit, offset])
+                columns = [desc[0] for desc in cursor.description]
+                results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            return {'results': results, 'total': total, 'limit': limit, 'offset': offset}
+        except Exception as e:
+            print(f"❌ Error searching CRM: {str(e)}")
+            return {'results': [], 'total': 0, 'limit': limit, 'offset': offset}
+
+    @staticmethod
+    def build_match_expression(query: str) -> str:
+        """Turn free text into an FTS5 query: every term must match as a prefix"""
+        tokens = _TOKEN_PATTERN.findall(query or '')
+        return ' AND '.join(f'"{token}"*' for token in tokens)
+
+    def _trigger_statements(self, entity_type: str, source: Dict[str, str]) -> List[Tuple[str, str]]:
+        table = source['table']
+        code = ENTITY_CODES[entity_type]
+
+        def insert_from(row: str) -> str:
+            return (
+                f"INSERT INTO crm_search (rowid, entity_type, entity_id, title, email, phone, address, details) "
+                f"SELECT {row}.rowid * 4 + {code}, '{entity_type}', {row}.id, "
+                f"{source['title'].format(row=row)}, {source['email'].format(row=row)}, "
+                f"{source['phone'].format(row=row)}, {source['address'].format(row=row)}, "
+                f"{source['details'].format(row=row)} WHERE {source.get('where', '1').format(row=row)};"
+            )
+
+        return [
+            # INSERT OR REPLACE removes the old row without firing delete triggers,
+            # so drop its index entry before the insert happens
+            (f'{table}_search_before_insert', f'''
+            CREATE TRIGGER {table}_search_before_insert BEFORE INSERT ON {table} BEGIN
+                DELETE FROM crm_search WHERE rowid IN (SELECT rowid * 4 + {code} FROM {table} WHERE id = NEW.id);
+            END
+            '''),
+            (f'{table}_search_after_insert', f'''
+            CREATE TRIGGER {table}_search_after_insert AFTER INSERT ON {table} BEGIN
+                {insert_from('NEW')}
+            END
+            '''),
+            (f'{table}_search_after_update', f'''
+            CREATE TRIGGER {table}_search_after_update AFTER UPDATE ON {table} BEGIN
+                DELETE FROM crm_search WHERE rowid = OLD.rowid * 4 + {code};
+                {insert_from('NEW')}
+            END
+            '''),
+            (f'{table}_search_after_delete', f'''
+            CREATE TRIGGER {table}_search_after_delete AFTER DELETE ON {table} BEGIN
+                DELETE FROM crm_search WHERE rowid = OLD.rowid * 4 + {code};
+            END
+            ''')
+        ]
+
+    @staticmethod
+    def _replace_trigger(cursor: sqlite3.Cursor, name: str, statement: str) -> bool:
+        """Create the trigger, replacing one with a different definition; True if it changed"""
+        existing = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)
+        ).fetchone()
+        # SQLite stores the statement text from CREATE to END
+        if existing is not None and existing[0] == statement.strip():
+            return False
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(statement)
+        return True
+
+    def _backfill(self, cursor: sqlite3.Cursor):
+        for entity_type, source in ENTITY_SOURCES.items():
+            if not self._table_exists(cursor, source['table']):
+                continue
+            row = source['table']
+            cursor.execute(
+                f"INSERT INTO crm_search (rowid, entity_type, entity_id, title, email, phone, address, details) "
+                f"SELECT {row}.rowid * 4 + {ENTITY_CODES[entity_type]}, '{entity_type}', {row}.id, "
+                f"{source['title'].format(row=row)}, {source['email'].format(row=row)}, "
+                f"{source['phone'].format(row=row)}, {source['address'].format(row=row)}, "
+                f"{source['details'].format(row=row)} FROM {row} WHERE {source.get('where', '1').format(row=row)}"
+            )
+
+    @staticmethod
+    def _table_exists(cursor: sqlite3.Cursor, table: str) -> bool:
+        return cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone() is not None
@@ -0,0 +1,220 @@
+"""
+SQLite Connection Manager for NXTRIX CRM
+One pooled connection per thread and database file, shared by every subsystem:
+- WAL journal with synchronous=NORMAL so readers never block the writer
+- Busy timeout instead of immediate "database is locked" errors
+- Larger prepared-statement cache, reused across operations on the thread
+- Drop-in for sqlite3.connect: close() hands the connection back to the pool
+- Checkouts on one thread share a transaction; nest writes with transaction()
+- transaction() context manager with BEGIN IMMEDIATE and nested savepoints
+"""
+
+import os
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+DEFAULT_DB_PATH = "crm_data.db"
+
+BUSY_TIMEOUT_SECONDS = 30.0
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {'connections_opened': 0, 'checkouts': 0, 'transactions': 0, 'rollbacks': 0}
+
+
+def _count(name: str, amount: int = 1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+class _PoolEntry:
+    """A thread's open connection to one database file"""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        self.checkouts = 0
+        self.savepoints = 0
+
+
+def _release(entry: _PoolEntry):
+    """Return a checkout; the last one out discards uncommitted work like close() did"""
+    entry.checkouts = max(entry.checkouts - 1, 0)
+    if entry.checkouts == 0 and entry.savepoints == 0:
+        try:
+            if entry.connection.in_transaction:
+                entry.connection.rollback()
+                _count('rollbacks')
+        except sqlite3.Error:
+            pass
+
+
+class PooledConnection:
+    """Checkout of the thread's pooled connection
+
+    Behaves like ``sqlite3.Connection``. ``close()`` (or leaving a ``with``
+    block, or the handle being garbage collected) releases the checkout
+    instead of closing the underlying connection. ``row_factory`` is kept
+    per checkout so one module's setting never leaks into another's.
+
+    Every checkout on a thread shares one connection and therefore one
+    transaction. Inside a ``transaction()`` block, ``commit()`` and leaving
+    a ``with`` block are deferred to that transaction, so inner code can't
+    commit half of it. Outside one, a checkout's ``commit()``/``rollback()``
+    applies to everything pending on the thread. Nested writes should use
+    ``transaction()``, which turns them into savepoints. Uncommitted work is
+    discarded only when the last checkout is released.
+    """
+
+    def __init__(self, entry: _PoolEntry):
+        self._entry = entry
+        self.row_factory = None
+        entry.checkouts += 1
+        self._finalizer = weakref.finalize(self, _release, entry)
+        _count('checkouts')
+
+    @property
+    def raw(self) -> sqlite3.Connection:
+        """The underlying pooled connection (pass this to pandas.read_sql_query)"""
+        return self._entry.connection
+
+    def cursor(self, *args, **kwargs) -> sqlite3.Cursor:
+        cursor = self._entry.connection.cursor(*args, **kwargs)
+        if self.row_factory is not None:
+            cursor.row_factory = self.row_factory
+        return cursor
+
+    def execute(self, sql: str, parameters=()) -> sqlite3.Cursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters) -> sqlite3.Cursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script: str) -> sqlite3.Cursor:
+        return self.cursor().executescript(sql_script)
+
+    def commit(self):
+        """Commit, unless a transaction() block on this thread owns the transaction"""
+        if self._entry.savepoints == 0:
+            self._entry.connection.commit()
+
+    def close(self):
+        """Release the checkout; the connection stays open in the pool"""
+        self._finalizer()
+
+    def __getattr__(self, name):
+        return getattr(self._entry.connection, name)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Same commit/rollback as sqlite3.Connection, then give the checkout back.
+        # Within transaction() the enclosing block commits or rolls back instead.
+        try:
+            if self._entry.savepoints == 0:
+                if exc_type is None:
+                    self._entry.connection.commit()
+                else:
+                    self._entry.connection.rollback()
+        finally:
+            self.close()
+        return False
+
+
+def _pool_key(db_path: str) -> str:
+    return db_path if db_path == ':memory:' else os.path.abspath(db_path)
+
+
+def _open(db_path: str) -> sqlite3.Connection:
+    """Open a connection and apply the shared pragmas"""
+    connection = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_SECONDS,
+                                 cached_statements=CACHED_STATEMENTS)
+    connection.execute(f'PRAGMA busy_timeout = {int(BUSY_TIMEOUT_SECONDS * 1000)}')
+    if db_path != ':memory:':
+        connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute('PRAGMA synchronous = NORMAL')
+    _count('connections_opened')
+    return connection
+
+
+def _pool() -> Dict[str, _PoolEntry]:
+    pool = getattr(_local, 'connections', None)
+    if pool is None:
+        pool = _local.connections = {}
+    return pool
+
+
+def get_connection(db_path: str = DEFAULT_DB_PATH) -> PooledConnection:
+    """Pooled connection for the current thread (use instead of sqlite3.connect)"""
+    pool = _pool()
+    key = _pool_key(db_path)
+    entry = pool.get(key)
+    if entry is None:
+        entry = pool[key] = _PoolEntry(_open(db_path))
+    return PooledConnection(entry)
+
+
+@contextmanager
+def transaction(db_path: str = DEFAULT_DB_PATH) -> Iterator[PooledConnection]:
+    """Commit on success, roll back on error
+
+    The outermost block takes the write lock up front (BEGIN IMMEDIATE) so
+    concurrent writers wait on the busy timeout rather than failing mid-way;
+    nested blocks become savepoints.
+    """
+    conn = get_connection(db_path)
+    entry = conn._entry
+    raw = entry.connection
+    savepoint = None
+    if raw.in_transaction:
+        savepoint = f"sp_{entry.savepoints}"
+        raw.execute(f'SAVEPOINT {savepoint}')
+    else:
+        raw.execute('BEGIN IMMEDIATE')
+    entry.savepoints += 1
+    _count('transactions')
+
+    try:
+        yield conn
+    except BaseException:
+        entry.savepoints -= 1
+        if savepoint:
+            raw.execute(f'ROLLBACK TO SAVEPOINT {savepoint}')
+            raw.execute(f'RELEASE SAVEPOINT {savepoint}')
+        else:
+            raw.rollback()
+        _count('rollbacks')
+        raise
+    else:
+        entry.savepoints -= 1
+        if savepoint:
+            raw.execute(f'RELEASE SAVEPOINT {savepoint}')
+        else:
+            raw.commit()
+    finally:
+        conn.close()
+
+
+def close_connections(db_path: Optional[str] = None):
+    """Close the current thread's pooled connections (all, or one database)"""
+    pool = _pool()
+    keys = [_pool_key(db_path)] if db_path else list(pool)
+    for key in keys:
+        entry = pool.pop(key, None)
+        if entry is not None:
+            try:
+                entry.connection.close()
+            except sqlite3.Error:
+                pass
+
+
+def get_pool_statistics() -> Dict[str, int]:
+    """Connection and transaction counters for the performance dashboard"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['thread_connections'] = len(_pool())
+    return stats
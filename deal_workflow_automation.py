@@ -7,13 +7,14 @@ from __future__ import annotations
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
 from typing import List, Dict, Optional, Any, Set
 from enum import Enum
 import uuid
 import json
-import sqlite3
+from db_connection import get_connection
 
 class DealStage(Enum):
     """Deal pipeline stages"""
@@ -113,9 +114,17 @@ class SmartNotification:
     metadata: Dict[str, Any] = field(default_factory=dict)
 
 class DealMatchingEngine:
-    """Intelligent deal matching system"""
+    """Intelligent deal matching system
+
+    Single pairs are scored with ``calculate_match_score``. Bulk matching
+    encodes deals and criteria into NumPy columns (numeric arrays plus
+    property-type bitmasks and location membership matrices) and scores the
+    whole deal x criteria matrix in tiles of at most ``max_block_cells``
+    cells, so memory stays bounded however large both books get. Factor
+    explanations are only built for the matches that are returned.
+    """
     
-    def __init__(self):
+    def __init__(self, max_block_cells: int = 1 << 20):
         self.match_weights = {
             'property_type': 25,
             'price_range': 20,
@@ -124,6 +133,8 @@ class DealMatchingEngine:
             'cash_flow': 10,
             'rehab_budget': 10
         }
+        self.max_block_cells = max_block_cells
+        self.property_type_bits = {prop_type: 1 << bit for bit, prop_type in enumerate(PropertyType)}
     
     def calculate_match_score(self, deal: Dict[str, Any], criteria: InvestmentCriteria) -> float:
         """Calculate match score between deal and buyer criteria"""
@@ -151,7 +162,8 @@ class DealMatchingEngine:
         # ROI match
         deal_roi = deal.get('estimated_roi', 0)
         if deal_roi >= criteria.min_roi:
-            roi_score = min(deal_roi / criteria.min_roi, 2.0)  # Cap at 2x bonus
+            # No minimum means any ROI fully meets the target
+            roi_score = min(deal_roi / criteria.min_roi, 2.0) if criteria.min_roi else 1.0  # Cap at 2x bonus
             score += self.match_weights['roi_target'] * min(roi_score, 1.0)
             match_factors.append(f"ROI meets target: {deal_roi:.1f}%")
         
@@ -179,31 +191,204 @@ class DealMatchingEngine:
         return min(score, 100.0), match_factors
     
     def find_matches(self, deals: List[Dict[str, Any]], 
-                    all_criteria: List[InvestmentCriteria]) -> List[DealMatch]:
-        """Find all potential matches between deals and buyers"""
-        matches = []
+                    all_criteria: List[InvestmentCriteria],
+                    min_score: float = 30.0,
+                    top_k: Optional[int] = None) -> List[DealMatch]:
+        """Find all potential matches between deals and buyers
         
-        for deal in deals:
-            for criteria in all_criteria:
-                if not criteria.is_active:
-                    continue
-                
-                score, factors = self.calculate_match_score(deal, criteria)
-                
-                # Only create matches above threshold
-                if score >= 30.0:  # 30% minimum match
-                    match = DealMatch(
-                        deal_id=deal.get('id', ''),
-                        buyer_id=criteria.buyer_id,
-                        match_score=score,
-                        match_factors=factors,
-                        status="Pending"
-                    )
-                    matches.append(match)
+        Returns every pair scoring at least ``min_score`` (30% by default),
+        best first; with ``top_k`` only the best ``top_k`` buyers per deal.
+        """
+        active = [criteria for criteria in all_criteria if criteria.is_active]
+        if not deals or not active:
+            return []
+        
+        deal_columns = self._encode_deals(deals)
+        criteria_columns = self._encode_criteria(active)
+        found = []  # (score, deal index, criteria index)
+        
+        for rows, block in self._score_blocks(deal_columns, criteria_columns):
+            if top_k is not None:
+                columns = self._top_k_columns(block, top_k)
+                local_rows = np.repeat(np.arange(block.shape[0]), columns.shape[1])
+                columns = columns.ravel()
+                keep = block[local_rows, columns] >= min_score
+                local_rows, columns = local_rows[keep], columns[keep]
+            else:
+                local_rows, columns = np.nonzero(block >= min_score)
+            found.append((block[local_rows, columns], rows.start + local_rows, columns))
+        
+        if not found:
+            return []
+        scores = np.concatenate([part[0] for part in found])
+        deal_idx = np.concatenate([part[1] for part in found])
+        criteria_idx = np.concatenate([part[2] for part in found])
+        
+        # Sort by match score descending, deals then criteria in input order on ties
+        order = np.lexsort((criteria_idx, deal_idx, -scores))
+        return [self._build_match(deals[deal_idx[i]], active[criteria_idx[i]], scores[i]) for i in order]
+    
+    def find_top_buyers(self, deals: List[Dict[str, Any]], all_criteria: List[InvestmentCriteria],
+                        k: int = 10, min_score: float = 30.0) -> Dict[str, List[DealMatch]]:
+        """Best ``k`` buyer matches for each deal, keyed by deal id"""
+        results: Dict[str, List[DealMatch]] = {deal.get('id', ''): [] for deal in deals}
+        for match in self.find_matches(deals, all_criteria, min_score=min_score, top_k=k):
+            results[match.deal_id].append(match)
+        return results
+    
+    def find_top_deals(self, deals: List[Dict[str, Any]], all_criteria: List[InvestmentCriteria],
+                       k: int = 10, min_score: float = 30.0) -> Dict[str, List[DealMatch]]:
+        """Best ``k`` deal matches for each active criteria set, keyed by buyer id
+        
+        The running top-``k`` per criteria set is merged tile by tile, so only
+        ``k`` candidates per buyer are ever held besides the current tile.
+        """
+        active = [criteria for criteria in all_criteria if criteria.is_active]
+        results: Dict[str, List[DealMatch]] = {criteria.buyer_id: [] for criteria in active}
+        if not deals or not active or k <= 0:
+            return results
+        
+        deal_columns = self._encode_deals(deals)
+        criteria_columns = self._encode_criteria(active)
+        best_scores = np.full((0, len(active)), -np.inf)
+        best_deals = np.zeros((0, len(active)), dtype=np.int64)
+        
+        for rows, block in self._score_blocks(deal_columns, criteria_columns):
+            scores = np.vstack([best_scores, block])
+            deal_idx = np.vstack([best_deals, np.broadcast_to(np.arange(rows.start, rows.stop)[:, None], block.shape)])
+            keep = self._top_k_columns(scores.T, k).T
+            best_scores = np.take_along_axis(scores, keep, axis=0)
+            best_deals = np.take_along_axis(deal_idx, keep, axis=0)
+        
+        for column, criteria in enumerate(active):
+            order = np.lexsort((best_deals[:, column], -best_scores[:, column]))
+            for row in order:
+                score = best_scores[row, column]
+                if score >= min_score:
+                    results[criteria.buyer_id].append(
+                        self._build_match(deals[best_deals[row, column]], criteria, score))
+        return results
+    
+    def score_matrix(self, deals: List[Dict[str, Any]], all_criteria: List[InvestmentCriteria]) -> np.ndarray:
+        """Full (deals x criteria) score matrix; inactive criteria are included as-is"""
+        matrix = np.zeros((len(deals), len(all_criteria)))
+        if deals and all_criteria:
+            criteria_columns = self._encode_criteria(all_criteria)
+            for rows, block in self._score_blocks(self._encode_deals(deals), criteria_columns):
+                matrix[rows] = block
+        return matrix
+    
+    def _build_match(self, deal: Dict[str, Any], criteria: InvestmentCriteria, score: float) -> DealMatch:
+        _, factors = self.calculate_match_score(deal, criteria)
+        return DealMatch(
+            deal_id=deal.get('id', ''),
+            buyer_id=criteria.buyer_id,
+            match_score=float(score),
+            match_factors=factors,
+            status="Pending"
+        )
+    
+    @staticmethod
+    def _top_k_columns(block: np.ndarray, k: int) -> np.ndarray:
+        """Column indices of the ``k`` highest scores in each row (unordered)"""
+        if k >= block.shape[1]:
+            return np.broadcast_to(np.arange(block.shape[1]), block.shape).copy()
+        return np.argpartition(-block, k - 1, axis=1)[:, :k]
+    
+    def _encode_deals(self, deals: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Columnar view of the deals"""
+        def numbers(key):
+            return np.array([deal.get(key, 0) or 0 for deal in deals], dtype=float)
+        
+        deal_types = [(deal.get('property_type', '') or '').lower() for deal in deals]
+        type_masks = np.zeros(len(deals), dtype=np.int64)
+        for prop_type, bit in self.property_type_bits.items():
+            value = prop_type.value.lower()
+            type_masks |= np.array([bit if value in deal_type else 0 for deal_type in deal_types], dtype=np.int64)
+        
+        return {
+            'price': numbers('asking_price'),
+            'roi': numbers('estimated_roi'),
+            'cash_flow': numbers('estimated_cash_flow'),
+            'rehab': numbers('estimated_rehab'),
+            'type_mask': type_masks,
+            'location': [(deal.get('location', '') or '').lower() for deal in deals]
+        }
+    
+    def _encode_criteria(self, all_criteria: List[InvestmentCriteria]) -> Dict[str, Any]:
+        """Columnar view of the criteria, with a shared location vocabulary"""
+        vocabulary: Dict[str, int] = {}
+        memberships = []
+        for criteria in all_criteria:
+            terms = {vocabulary.setdefault(location.lower(), len(vocabulary))
+                     for location in criteria.preferred_locations}
+            memberships.append(terms)
+        
+        # criteria x vocabulary membership, multiplied against deal hits per tile
+        location_matrix = np.zeros((len(all_criteria), len(vocabulary)), dtype=np.float32)
+        for row, terms in enumerate(memberships):
+            location_matrix[row, list(terms)] = 1.0
+        
+        type_masks = np.array([
+            sum(self.property_type_bits[prop_type] for prop_type in set(criteria.property_types))
+            for criteria in all_criteria], dtype=np.int64)
+        
+        return {
+            'min_price': np.array([c.min_price for c in all_criteria], dtype=float),
+            'max_price': np.array([c.max_price for c in all_criteria], dtype=float),
+            'min_roi': np.array([c.min_roi for c in all_criteria], dtype=float),
+            'min_cash_flow': np.array([c.min_cash_flow for c in all_criteria], dtype=float),
+            'max_rehab': np.array([c.max_rehab_budget for c in all_criteria], dtype=float),
+            'type_mask': type_masks,
+            'vocabulary': list(vocabulary),
+            'locations': location_matrix
+        }
+    
+    def _score_blocks(self, deal_columns: Dict[str, Any], criteria_columns: Dict[str, Any]):
+        """Yield (deal row slice, score block) tiles covering the full matrix"""
+        num_deals = len(deal_columns['price'])
+        num_criteria = len(criteria_columns['min_price'])
+        block_rows = max(1, self.max_block_cells // max(num_criteria, 1))
+        vocabulary = criteria_columns['vocabulary']
+        
+        for start in range(0, num_deals, block_rows):
+            rows = slice(start, min(start + block_rows, num_deals))
+            yield rows, self._score_block(deal_columns, criteria_columns, rows, vocabulary)
+    
+    def _score_block(self, deals: Dict[str, Any], criteria: Dict[str, Any], rows: slice,
+                     vocabulary: List[str]) -> np.ndarray:
+        """Scores for one tile of deals against every criteria set
+        
+        Mirrors ``calculate_match_score`` term by term, in the same order, so
+        the tile scores equal the per-pair scores exactly.
+        """
+        weights = self.match_weights
+        price = deals['price'][rows, None]
+        roi = deals['roi'][rows, None]
+        
+        score = np.where((deals['type_mask'][rows, None] & criteria['type_mask'][None, :]) != 0,
+                         float(weights['property_type']), 0.0)
+        
+        in_range = (criteria['min_price'] <= price) & (price <= criteria['max_price'])
+        near_range = price < criteria['max_price'] * 1.1
+        score += np.where(in_range, weights['price_range'],
+                          np.where(near_range, weights['price_range'] * 0.5, 0.0))
+        
+        min_roi = criteria['min_roi'][None, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            roi_ratio = np.where(min_roi != 0, np.minimum(roi / min_roi, 2.0), 1.0)
+        score += np.where(roi >= min_roi, weights['roi_target'] * np.minimum(roi_ratio, 1.0), 0.0)
+        
+        if vocabulary:
+            hits = np.array([[term in location for term in vocabulary]
+                             for location in deals['location'][rows]], dtype=np.float32)
+            score += np.where(hits @ criteria['locations'].T > 0, float(weights['location']), 0.0)
         
-        # Sort by match score descending
-        matches.sort(key=lambda x: x.match_score, reverse=True)
-        return matches
+        score += np.where(deals['cash_flow'][rows, None] >= criteria['min_cash_flow'],
+                          float(weights['cash_flow']), 0.0)
+        score += np.where(deals['rehab'][rows, None] <= criteria['max_rehab'],
+                          float(weights['rehab_budget']), 0.0)
+        return np.minimum(score, 100.0)
 
 class DealPipelineManager:
     """Manages deal pipeline and automated workflows"""
@@ -218,7 +403,7 @@ class DealPipelineManager:
     def init_database(self):
         """Initialize workflow database tables"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with get_connection(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 # Workflow triggers table
@@ -414,7 +599,7 @@ class DealWorkflowAutomation:
     def load_data(self):
         """Load automation data from database"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with get_connection(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 # Load investment criteria
@@ -465,7 +650,7 @@ class DealWorkflowAutomation:
     def save_data(self):
         """Save automation data to database"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with get_connection(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 # Save investment criteria
@@ -13,7 +13,7 @@ from dataclasses import dataclass
 from pathlib import Path
 import hashlib
 import json
-import sqlite3
+from db_connection import get_connection
 from PIL import Image
 import io
 import base64
@@ -47,7 +47,7 @@ class DocumentManager:
     def init_database(self):
         """Initialize document database tables"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -179,7 +179,7 @@ class DocumentManager:
     def _save_document_to_db(self, doc_info: DocumentInfo):
         """Save document information to database"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -212,7 +212,7 @@ class DocumentManager:
     def get_documents(self, deal_id: str = None, category: str = None) -> List[DocumentInfo]:
         """Retrieve documents with optional filtering"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             query = "SELECT * FROM documents WHERE 1=1"
@@ -260,7 +260,7 @@ class DocumentManager:
     def get_categories(self) -> List[Dict[str, Any]]:
         """Get all document categories"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM document_categories ORDER BY name")
@@ -286,7 +286,7 @@ class DocumentManager:
     def delete_document(self, doc_id: str) -> bool:
         """Delete a document"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             # Get document info first
@@ -314,7 +314,7 @@ class DocumentManager:
     def get_document_stats(self, deal_id: str = None) -> Dict[str, Any]:
         """Get document statistics"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             query = "SELECT category, COUNT(*), SUM(file_size) FROM documents"
@@ -1,6 +1,8 @@
 """
 Email Marketing Automation System for NXTRIX CRM
 Professional email templates, drip campaigns, and automated follow-ups
+- Bulk sends dispatched concurrently under the provider's rate limit, with retries
+- Send records written in one batch per dispatch
 """
 
 from __future__ import annotations
@@ -9,7 +11,7 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Any
+from typing import Callable, List, Dict, Optional, Any
 from enum import Enum
 import uuid
 import json
@@ -22,7 +24,9 @@ except ImportError:
     REAL_SERVICES_AVAILABLE = False
     print("⚠️ Communication services not available - using simulation mode")
 
-import sqlite3
+from db_connection import get_connection, transaction
+from message_dispatch import BulkDispatcher, DISPATCH_CONCURRENCY
+from message_outbox import register_job_kind
 import plotly.graph_objects as go
 import plotly.express as px
 
@@ -398,7 +402,7 @@ class EmailAutomationManager:
     def init_database(self):
         """Initialize email automation database tables"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with get_connection(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 # Email templates table
@@ -524,125 +528,135 @@ class EmailAutomationManager:
                        template: EmailTemplate,
                        variables: Dict[str, Any] = None) -> Dict[str, Any]:
         """Send actual email using communication services"""
+        return self.send_bulk_emails([recipient_email], template, [variables or {}], concurrency=1)[0]
+    
+    def send_bulk_emails(self, 
+                        recipients: List[str],
+                        template: EmailTemplate,
+                        variables_list: List[Dict[str, Any]] = None,
+                        concurrency: int = DISPATCH_CONCURRENCY,
+                        on_progress: Optional[Callable[[int, int, str], None]] = None) -> List[Dict[str, Any]]:
+        """Send emails to multiple recipients
+        
+        Sends run concurrently (at most ``concurrency`` in flight) under the
+        EmailJS rate limit, transient failures are retried with backoff, and
+        all send records are written once at the end. Results are in
+        recipient order. ``on_progress(completed, total, recipient)`` is
+        called on the calling thread as each recipient finishes.
+        """
         if not REAL_SERVICES_AVAILABLE:
-            return {
+            return [{
+                'recipient': recipient,
                 'success': False,
                 'error': 'Real communication services not available',
                 'simulation': True
-            }
+            } for recipient in recipients]
+        
+        messages = []
+        for i, recipient in enumerate(recipients):
+            variables = variables_list[i] if variables_list and i < len(variables_list) else {}
+            subject, body_text, body_html = self._render(template, variables)
+            messages.append({'to_email': recipient, 'subject': subject, 'message': body_text, 'body_html': body_html})
+        
+        email_service = communication_manager.email_service
+        dispatcher = BulkDispatcher(
+            'emailjs',
+            # EmailJS will use HTML template
+            lambda message: email_service.send_email(message['to_email'], message['subject'], message['message']),
+            concurrency=concurrency
+        )
+        completed = 0
+        
+        def report_progress(index: int, result):
+            nonlocal completed
+            completed += 1
+            on_progress(completed, len(messages), messages[index]['to_email'])
         
         try:
-            # Personalize email content
-            subject = template.subject
-            body_text = template.body_text
-            body_html = template.body_html
-            
-            if variables:
-                for key, value in variables.items():
-                    placeholder = f"{{{key}}}"
-                    subject = subject.replace(placeholder, str(value))
-                    body_text = body_text.replace(placeholder, str(value))
-                    body_html = body_html.replace(placeholder, str(value))
-            
-            # Send email using EmailJS
-            result = communication_manager.email_service.send_email(
-                to_email=recipient_email,
-                subject=subject,
-                message=body_text  # EmailJS will use HTML template
-            )
-            
-            # Record email send
-            if result.success:
-                email_send = EmailSend(
-                    template_id=template.id,
-                    recipient_email=recipient_email,
-                    subject=subject,
-                    content=body_text,
-                    status=EmailStatus.SENT,
-                    sent_at=datetime.now(),
-                    tracking_id=result.message_id
-                )
-                self.email_sends.append(email_send)
-                self.save_data()
-            
-            return {
-                'success': result.success,
-                'message_id': result.message_id,
-                'error': result.error_message,
-                'simulation': False
-            }
-            
+            email_results = dispatcher.dispatch(messages, report_progress if on_progress else None)
         except Exception as e:
-            return {
+            return [{
+                'recipient': recipient,
                 'success': False,
                 'error': f"Email sending failed: {str(e)}",
                 'simulation': False
-            }
-    
-    def send_bulk_emails(self, 
-                        recipients: List[str],
-                        template: EmailTemplate,
-                        variables_list: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-        """Send emails to multiple recipients"""
-        results = []
+            } for recipient in recipients]
         
-        for i, recipient in enumerate(recipients):
-            variables = variables_list[i] if variables_list and i < len(variables_list) else {}
-            
-            result = self.send_real_email(
-                recipient_email=recipient,
-                template=template,
-                variables=variables
+        # Record every outcome in one write
+        sends = [
+            EmailSend(
+                template_id=template.id,
+                recipient_email=message['to_email'],
+                subject=message['subject'],
+                body_html=message['body_html'],
+                body_text=message['message'],
+                status=EmailStatus.SENT if result.success else EmailStatus.FAILED,
+                sent_at=datetime.now() if result.success else None,
+                bounce_reason=None if result.success else result.error_message,
+                tracking_id=result.message_id or str(uuid.uuid4())
             )
-            
-            results.append({
-                'recipient': recipient,
-                **result
-            })
+            for message, result in zip(messages, email_results)
+        ]
+        self.record_sends(sends)
+        
+        return [{
+            'recipient': message['to_email'],
+            'success': result.success,
+            'message_id': result.message_id,
+            'error': result.error_message,
+            'attempts': result.attempts,
+            'simulation': False
+        } for message, result in zip(messages, email_results)]
+    
+    @staticmethod
+    def _render(template: EmailTemplate, variables: Optional[Dict[str, Any]]) -> tuple:
+        """Personalize subject, text and HTML bodies"""
+        subject = template.subject
+        body_text = template.body_text
+        body_html = template.body_html
+        
+        for key, value in (variables or {}).items():
+            placeholder = f"{{{key}}}"
+            subject = subject.replace(placeholder, str(value))
+            body_text = body_text.replace(placeholder, str(value))
+            body_html = body_html.replace(placeholder, str(value))
+        return subject, body_text, body_html
+    
+    def record_sends(self, sends: List[EmailSend]):
+        """Append send records to memory, the database and session state in one pass each"""
+        if not sends:
+            return
+        self.email_sends.extend(sends)
+        
+        try:
+            with transaction(self.db_path) as conn:
+                _insert_email_sends(conn, sends)
+        except Exception as e:
+            print(f"❌ Error saving email sends: {e}")
         
-        return results
+        self.save_data()
     
     def send_deal_alert(self, 
                        recipients: List[Dict[str, str]], 
-                       deal_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Send deal alert to multiple recipients using real services"""
+                       deal_data: Dict[str, Any]) -> Optional[str]:
+        """Queue a deal alert to multiple recipients; returns the outbox job id
+        
+        Delivered emails are recorded in email_sends by the outbox worker.
+        Returns None when the communication services are unavailable.
+        """
         if not REAL_SERVICES_AVAILABLE:
-            return [{
-                'success': False,
-                'error': 'Real communication services not available',
-                'simulation': True
-            } for _ in recipients]
+            return None
         
         try:
-            # Use communication manager for deal alerts
-            alert_results = communication_manager.send_deal_alert(
+            return communication_manager.send_deal_alert(
                 deal_data=deal_data,
-                recipients=recipients
+                recipients=recipients,
+                kind='email_deal_alert',
+                db_path=self.db_path
             )
-            
-            # Record successful sends
-            for result in alert_results:
-                if result['success'] and result['type'] == 'email':
-                    email_send = EmailSend(
-                        template_id="deal_alert",
-                        recipient_email=result['email'],
-                        subject="New Investment Opportunity Available",
-                        content=f"Deal Alert: {deal_data.get('address', 'Property')}",
-                        status=EmailStatus.SENT,
-                        sent_at=datetime.now(),
-                        tracking_id=result.get('message_id')
-                    )
-                    self.email_sends.append(email_send)
-            
-            self.save_data()
-            return alert_results
-            
         except Exception as e:
-            return [{
-                'success': False,
-                'error': f"Deal alert failed: {str(e)}",
-                'simulation': False
-            } for _ in recipients]
+            print(f"❌ Error queueing deal alert: {e}")
+            return None
     
     def test_email_service(self) -> Dict[str, Any]:
         """Test email service connectivity"""
@@ -705,6 +719,34 @@ class EmailAutomationManager:
             'reply_rate': reply_rate
         }
 
+def _insert_email_sends(conn, sends: List[EmailSend]):
+    columns = list(sends[0].to_dict())
+    conn.executemany(
+        f"INSERT OR REPLACE INTO email_sends ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        [tuple(send.to_dict()[column] for column in columns) for send in sends]
+    )
+
+def _record_deal_alert_sends(conn, job: Dict[str, Any], outcomes: List[Dict[str, Any]]):
+    """Outbox callback: store delivered deal alert emails and log every outcome"""
+    sends = [
+        EmailSend(
+            template_id="deal_alert",
+            recipient_email=outcome['recipient'],
+            subject=outcome['payload'].get('subject', ''),
+            body_text=f"Deal Alert: {outcome['payload'].get('template_data', {}).get('property_address', 'Property')}",
+            status=EmailStatus.SENT,
+            sent_at=datetime.now(),
+            tracking_id=outcome['provider_message_id'] or str(uuid.uuid4())
+        )
+        for outcome in outcomes if outcome['status'] == 'sent' and outcome['channel'] == 'email'
+    ]
+    if sends:
+        _insert_email_sends(conn, sends)
+    communication_manager.log_deliveries(outcomes)
+
+if REAL_SERVICES_AVAILABLE:
+    register_job_kind('email_deal_alert', on_batch=_record_deal_alert_sends)
+
 # Global email automation manager
 @st.cache_resource
 def get_email_manager():
@@ -7,6 +7,7 @@ from __future__ import annotations
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
@@ -16,12 +17,19 @@ from typing import List, Dict, Optional, Any
 from enum import Enum
 import uuid
 import json
-import sqlite3
 import csv
 import io
 import os
+import logging
 from pathlib import Path
 from database import db_service
+from db_connection import get_connection, transaction
+from crm_repository import IndexedRepository
+from buyer_index import BuyerCriteriaIndex
+from crm_search import CRMSearchIndex
+from lead_scoring_engine import RuleScoringEngine, entities_to_frame
+from schema_migrations import ensure_schema
+from keyset_pagination import DEFAULT_PAGE_SIZE, KeysetQuery, Page
 from email_automation import get_email_manager, EmailAutomationManager
 from deal_workflow_automation import (
     get_workflow_manager, 
@@ -34,11 +42,29 @@ from deal_workflow_automation import (
 )
 from email_automation import get_email_manager, EmailTemplate, DripCampaign, EmailType, CampaignStatus
 from activity_tracker import get_activity_tracker, ActivityType, Priority, ActivityLog, OpportunityAlert
+from message_outbox import show_job_progress
 from advanced_deal_analytics import AdvancedDealAnalytics, show_advanced_deal_analytics
 from automated_deal_sourcing import show_automated_deal_sourcing
 from ai_enhancement_system import show_ai_enhancement_system
 from advanced_automation_system import show_advanced_automation_system
 
+logger = logging.getLogger(__name__)
+
+# CRM activity names -> activity tracker types; anything else is GENERAL_ACTIVITY.
+# Built at import so a renamed ActivityType member fails loudly here, not per event.
+CRM_ACTIVITY_TYPES: Dict[str, ActivityType] = {
+    "Lead Created": ActivityType.LEAD_CREATED,
+    "Deal Created": ActivityType.DEAL_CREATED,
+    "Contact Added": ActivityType.CONTACT_ADDED,
+    "Task Created": ActivityType.TASK_CREATED,
+    "Email Sent": ActivityType.EMAIL_SENT,
+    "SMS Sent": ActivityType.SMS_SENT,
+    "Call Made": ActivityType.CALL_LOGGED,
+    "Meeting Scheduled": ActivityType.MEETING_SCHEDULED,
+    "Buyer Matched": ActivityType.BUYER_MATCHED,
+    "Deal Closed": ActivityType.CONTRACT_SIGNED
+}
+
 # Optional subscription imports with error handling
 try:
     from subscription_manager import SubscriptionManager, SubscriptionTier, get_user_tier
@@ -414,267 +440,211 @@ class Activity:
             'created_at': self.created_at.isoformat()
         }
 
+# Default creative-finance scoring rules: (rule name, criteria, points)
+_EXPERIENCED_INVESTOR_TYPES = "('Wholesaler', 'Subject To Specialist', 'Owner Finance Specialist', 'Cash Buyer')"
+_HIGH_SELLER_MOTIVATIONS = "('Financial Distress', 'Avoiding Foreclosure', 'Need Quick Sale', 'Tired Landlord')"
+CRM_SCORING_RULES = [
+    # Lead category (25% weight)
+    ("Investor Lead", "lead_category == 'Investor Lead'", 25),
+    ("Seller Lead", "lead_category == 'Seller Lead'", 20),
+    ("Buyer Lead", "lead_category == 'Buyer Lead'", 15),
+    ("General Lead", "lead_category == 'General Lead'", 10),
+    # Budget (investors) / property value (everyone else) (20% weight)
+    ("Deal Value $500K+", "deal_value >= 500000", 20),
+    ("Deal Value $300K-$500K", "deal_value >= 300000 AND deal_value < 500000", 18),
+    ("Deal Value $150K-$300K", "deal_value >= 150000 AND deal_value < 300000", 15),
+    ("Deal Value $75K-$150K", "deal_value >= 75000 AND deal_value < 150000", 12),
+    ("Deal Value Under $75K", "deal_value > 0 AND deal_value < 75000", 8),
+    # Creative finance interest: 8 per high-value method, 4 per other, max 20 (20% weight)
+    ("Creative Finance 20", "finance_method_points >= 20", 20),
+    ("Creative Finance 16", "finance_method_points == 16", 16),
+    ("Creative Finance 12", "finance_method_points == 12", 12),
+    ("Creative Finance 8", "finance_method_points == 8", 8),
+    ("Creative Finance 4", "finance_method_points == 4", 4),
+    # Investor experience / seller motivation (15% weight)
+    ("Experienced Investor Type",
+     f"lead_category == 'Investor Lead' AND investor_type IN {_EXPERIENCED_INVESTOR_TYPES}", 15),
+    ("Other Investor Type",
+     f"lead_category == 'Investor Lead' AND investor_type IS NOT NULL AND investor_type NOT IN {_EXPERIENCED_INVESTOR_TYPES}", 10),
+    ("Highly Motivated Seller",
+     f"lead_category == 'Seller Lead' AND seller_motivation IN {_HIGH_SELLER_MOTIVATIONS}", 15),
+    ("Motivated Seller",
+     f"lead_category == 'Seller Lead' AND seller_motivation IS NOT NULL AND seller_motivation NOT IN {_HIGH_SELLER_MOTIVATIONS}", 10),
+    # Lead source (10% weight)
+    ("Referral Source", "lead_source == 'Referral'", 10),
+    ("Partner Source", "lead_source == 'Partner'", 9),
+    ("Networking Event Source", "lead_source == 'Networking Event'", 8),
+    ("Website Source", "lead_source == 'Website'", 7),
+    ("Social Media Source", "lead_source == 'Social Media'", 6),
+    ("Email Campaign Source", "lead_source == 'Email Campaign'", 5),
+    ("Advertisement Source", "lead_source == 'Advertisement'", 4),
+    ("Cold Outreach Source", "lead_source == 'Cold Outreach'", 3),
+    ("Other Source", "lead_source == 'Other'", 2),
+    # Contact completeness (10% weight)
+    ("Has Email", "email IS NOT NULL", 3),
+    ("Has Phone", "phone IS NOT NULL", 3),
+    ("Has Property Address", "property_address IS NOT NULL", 2),
+    ("Has Notes", "notes IS NOT NULL", 2)
+]
+
+_HIGH_VALUE_FINANCE_METHODS = {
+    CreativeFinanceMethod.SUBJECT_TO,
+    CreativeFinanceMethod.OWNER_FINANCING,
+    CreativeFinanceMethod.LEASE_OPTION,
+    CreativeFinanceMethod.PRIVATE_MONEY
+}
+
+# Computed lead columns the rules can reference
+LEAD_SCORING_FEATURES = {
+    'deal_value': lambda lead: lead.budget_max if lead.lead_category == LeadCategory.INVESTOR_LEAD else lead.property_value,
+    'finance_method_points': lambda lead: min(20, sum(8 if method in _HIGH_VALUE_FINANCE_METHODS else 4
+                                                      for method in lead.preferred_finance_methods))
+}
+
 class LeadScoringEngine:
-    """Advanced lead scoring system"""
+    """Advanced lead scoring system backed by the stored 'crm_leads' scoring rules"""
+    
+    RULE_SET = "crm_leads"
+    
+    def __init__(self, db_path: str = "crm_data.db"):
+        self.rules = RuleScoringEngine(db_path, rule_set=self.RULE_SET, default_rules=CRM_SCORING_RULES)
     
     def calculate_lead_score(self, lead: Lead) -> int:
         """Calculate lead score based on creative finance criteria"""
-        score = 0
-        
-        # Lead Category Score (25% weight)
-        category_scores = {
-            LeadCategory.INVESTOR_LEAD: 25,
-            LeadCategory.SELLER_LEAD: 20,
-            LeadCategory.BUYER_LEAD: 15,
-            LeadCategory.GENERAL_LEAD: 10
-        }
-        score += category_scores.get(lead.lead_category, 10)
-        
-        # Budget/Property Value Score (20% weight)
-        value_to_score = lead.budget_max if lead.lead_category == LeadCategory.INVESTOR_LEAD else lead.property_value
-        if value_to_score > 0:
-            if value_to_score >= 500000:
-                score += 20
-            elif value_to_score >= 300000:
-                score += 18
-            elif value_to_score >= 150000:
-                score += 15
-            elif value_to_score >= 75000:
-                score += 12
-            else:
-                score += 8
-        
-        # Creative Finance Interest Score (20% weight)
-        if lead.preferred_finance_methods:
-            # High-value creative methods get more points
-            high_value_methods = [
-                CreativeFinanceMethod.SUBJECT_TO,
-                CreativeFinanceMethod.OWNER_FINANCING,
-                CreativeFinanceMethod.LEASE_OPTION,
-                CreativeFinanceMethod.PRIVATE_MONEY
-            ]
-            creative_score = 0
-            for method in lead.preferred_finance_methods:
-                if method in high_value_methods:
-                    creative_score += 8
-                else:
-                    creative_score += 4
-            score += min(creative_score, 20)
-        
-        # Investor Experience/Seller Motivation Score (15% weight)
-        if lead.lead_category == LeadCategory.INVESTOR_LEAD and lead.investor_type:
-            experienced_types = [
-                InvestorType.WHOLESALER,
-                InvestorType.SUBJECT_TO,
-                InvestorType.OWNER_FINANCE,
-                InvestorType.CASH_BUYER
-            ]
-            if lead.investor_type in experienced_types:
-                score += 15
-            else:
-                score += 10
-        elif lead.lead_category == LeadCategory.SELLER_LEAD and lead.seller_motivation:
-            high_motivation = [
-                SellerMotivation.FINANCIAL_DISTRESS,
-                SellerMotivation.FORECLOSURE_AVOIDANCE,
-                SellerMotivation.QUICK_SALE_NEEDED,
-                SellerMotivation.TIRED_LANDLORD
-            ]
-            if lead.seller_motivation in high_motivation:
-                score += 15
-            else:
-                score += 10
-        
-        # Lead Source Score (10% weight)
-        source_scores = {
-            LeadSource.REFERRAL: 10,
-            LeadSource.PARTNER: 9,
-            LeadSource.NETWORKING_EVENT: 8,
-            LeadSource.WEBSITE: 7,
-            LeadSource.SOCIAL_MEDIA: 6,
-            LeadSource.EMAIL_CAMPAIGN: 5,
-            LeadSource.ADVERTISEMENT: 4,
-            LeadSource.COLD_OUTREACH: 3,
-            LeadSource.OTHER: 2
-        }
-        score += source_scores.get(lead.lead_source, 2)
-        
-        # Contact Completeness Score (10% weight)
-        contact_score = 0
-        if lead.email:
-            contact_score += 3
-        if lead.phone:
-            contact_score += 3
-        if lead.property_address:
-            contact_score += 2
-        if lead.notes:
-            contact_score += 2
-        score += min(contact_score, 10)
-        
-        return min(score, 100)  # Cap at 100
+        return int(self.score_leads([lead])[0])
+    
+    def score_leads(self, leads: List[Lead]) -> np.ndarray:
+        """Score many leads in one vectorized pass"""
+        return self.rules.score_frame(entities_to_frame(leads, LEAD_SCORING_FEATURES))
+
+# Persisted lead listing: newest first
+CRM_LEAD_LIST_QUERY = KeysetQuery(
+    'leads',
+    ['id', 'name', 'email', 'phone', 'status', 'lead_type', 'lead_source', 'property_address',
+     'property_value', 'budget', 'timeline', 'score', 'created_at', 'updated_at'],
+    order_by=[('created_at', 'DESC'), ('id', 'DESC')],
+    filterable={'source': 'source'}
+)
 
 class CRMDataPersistence:
     """Enhanced data persistence with SQLite and CSV export"""
     
+    LEAD_UPSERT_SQL = '''
+        INSERT OR REPLACE INTO leads
+        (id, name, email, phone, status, lead_type, lead_source,
+         property_address, property_value, budget, timeline, motivation,
+         notes, score, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    
     def __init__(self, db_path: str = "crm_data.db"):
         self.db_path = db_path
         self.init_database()
+        
+        # FTS5 index over leads, contacts, buyers and deals, kept in sync by triggers
+        self.search_index = CRMSearchIndex(db_path)
     
     def init_database(self):
-        """Initialize SQLite database with all necessary tables"""
+        """Initialize SQLite database with all necessary tables (schema owned by schema_migrations)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Create leads table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS leads (
-                        id TEXT PRIMARY KEY,
-                        name TEXT NOT NULL,
-                        email TEXT,
-                        phone TEXT,
-                        status TEXT,
-                        lead_type TEXT,
-                        lead_source TEXT,
-                        property_address TEXT,
-                        property_value REAL,
-                        budget REAL,
-                        timeline TEXT,
-                        motivation TEXT,
-                        notes TEXT,
-                        score INTEGER,
-                        created_at TEXT,
-                        updated_at TEXT
-                    )
-                ''')
-                
-                # Create contacts table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS contacts (
-                        id TEXT PRIMARY KEY,
-                        name TEXT NOT NULL,
-                        company TEXT,
-                        title TEXT,
-                        email TEXT,
-                        phone TEXT,
-                        contact_type TEXT,
-                        specializations TEXT,
-                        location TEXT,
-                        notes TEXT,
-                        created_at TEXT,
-                        updated_at TEXT
-                    )
-                ''')
-                
-                # Create buyers table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS buyers (
-                        id TEXT PRIMARY KEY,
-                        name TEXT NOT NULL,
-                        email TEXT,
-                        phone TEXT,
-                        min_price REAL,
-                        max_price REAL,
-                        preferred_locations TEXT,
-                        property_types TEXT,
-                        investment_strategy TEXT,
-                        min_roi REAL,
-                        cash_available REAL,
-                        financing_options TEXT,
-                        created_at TEXT,
-                        updated_at TEXT
-                    )
-                ''')
-                
-                # Create deals table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS deals (
-                        id TEXT PRIMARY KEY,
-                        property_address TEXT NOT NULL,
-                        deal_type TEXT,
-                        property_type TEXT,
-                        purchase_price REAL,
-                        arv REAL,
-                        repair_costs REAL,
-                        estimated_roi REAL,
-                        status TEXT,
-                        lead_id TEXT,
-                        created_at TEXT,
-                        updated_at TEXT
-                    )
-                ''')
-                
-                # Create activities table for tracking
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS activities (
-                        id TEXT PRIMARY KEY,
-                        activity_type TEXT,
-                        subject TEXT,
-                        description TEXT,
-                        related_lead_id TEXT,
-                        related_contact_id TEXT,
-                        related_deal_id TEXT,
-                        user_id TEXT,
-                        created_at TEXT
-                    )
-                ''')
-                
-                conn.commit()
-                print("✅ Connected to database successfully!")
-                
+            ensure_schema(self.db_path)
+            print("✅ Connected to database successfully!")
         except Exception as e:
             print(f"❌ Database initialization error: {str(e)}")
             raise e
     
+    def _lead_row(self, lead: 'Lead') -> tuple:
+        """Column values for a lead row (legacy columns the model lacks are stored as NULL)"""
+        lead_type = getattr(lead, 'lead_type', None)
+        return (
+            lead.id, lead.name, lead.email, lead.phone,
+            lead.status.value if lead.status else None,
+            lead_type.value if lead_type else None,
+            lead.lead_source.value if lead.lead_source else None,
+            lead.property_address, lead.property_value, getattr(lead, 'budget', None),
+            getattr(lead, 'timeline', None), getattr(lead, 'motivation', None), lead.notes, lead.score,
+            lead.created_at.isoformat(), lead.updated_at.isoformat()
+        )
+    
     def save_lead(self, lead: 'Lead') -> bool:
         """Save lead to database"""
+        return self.save_leads([lead])
+    
+    def save_leads(self, leads: List['Lead']) -> bool:
+        """Save many leads in a single transaction"""
+        if not leads:
+            return True
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with transaction(self.db_path) as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT OR REPLACE INTO leads 
-                    (id, name, email, phone, status, lead_type, lead_source, 
-                     property_address, property_value, budget, timeline, motivation, 
-                     notes, score, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    lead.id, lead.name, lead.email, lead.phone,
-                    lead.status.value if lead.status else None,
-                    lead.lead_type.value if lead.lead_type else None,
-                    lead.lead_source.value if lead.lead_source else None,
-                    lead.property_address, lead.property_value, lead.budget,
-                    lead.timeline, lead.motivation, lead.notes, lead.score,
-                    lead.created_at.isoformat(), lead.updated_at.isoformat()
-                ))
-                conn.commit()
+                cursor.executemany(self.LEAD_UPSERT_SQL, [self._lead_row(lead) for lead in leads])
+                return True
+        except Exception as e:
+            print(f"❌ Error saving leads: {str(e)}")
+            return False
+    
+    def save_lead_changes(self, leads: List['Lead'], deleted_ids: List[str]) -> bool:
+        """Upsert changed leads and delete removed ones in a single transaction"""
+        if not leads and not deleted_ids:
+            return True
+        try:
+            with transaction(self.db_path) as conn:
+                cursor = conn.cursor()
+                if leads:
+                    cursor.executemany(self.LEAD_UPSERT_SQL, [self._lead_row(lead) for lead in leads])
+                if deleted_ids:
+                    cursor.executemany('DELETE FROM leads WHERE id = ?', [(lead_id,) for lead_id in deleted_ids])
                 return True
         except Exception as e:
-            print(f"❌ Error saving lead: {str(e)}")
+            print(f"❌ Error saving lead changes: {str(e)}")
             return False
     
     def load_leads(self) -> List[Dict[str, Any]]:
         """Load all leads from database"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with get_connection(self.db_path) as conn:
                 cursor = conn.cursor()
-                cursor.execute('SELECT * FROM leads ORDER BY created_at DESC')
+                # The leads table is shared with lead scoring, whose rows carry a source
+                cursor.execute('''
+                    SELECT id, name, email, phone, status, lead_type, lead_source,
+                           property_address, property_value, budget, timeline, motivation,
+                           notes, score, created_at, updated_at
+                    FROM leads WHERE source IS NULL ORDER BY created_at DESC
+                ''')
                 columns = [desc[0] for desc in cursor.description]
                 return [dict(zip(columns, row)) for row in cursor.fetchall()]
         except Exception as e:
             print(f"❌ Error loading leads: {str(e)}")
             return []
     
+    def load_leads_page(self, status: Optional[str] = None, cursor: Optional[str] = None,
+                        page_size: int = DEFAULT_PAGE_SIZE) -> Page:
+        """Load one page of leads (newest first) without the notes column"""
+        filters = [('source', 'IS', None)]
+        if status:
+            filters.append(('status', '=', status))
+        try:
+            return CRM_LEAD_LIST_QUERY.fetch(self.db_path, filters, cursor, page_size)
+        except Exception as e:
+            print(f"❌ Error loading leads page: {str(e)}")
+            return Page()
+    
     def delete_lead(self, lead_id: str) -> bool:
         """Delete lead from database"""
+        return self.delete_leads([lead_id]) > 0
+    
+    def delete_leads(self, lead_ids: List[str]) -> int:
+        """Delete many leads in a single transaction; returns rows deleted"""
+        if not lead_ids:
+            return 0
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with transaction(self.db_path) as conn:
                 cursor = conn.cursor()
-                cursor.execute('DELETE FROM leads WHERE id = ?', (lead_id,))
-                conn.commit()
-                return cursor.rowcount > 0
+                cursor.executemany('DELETE FROM leads WHERE id = ?', [(lead_id,) for lead_id in lead_ids])
+                return cursor.rowcount
         except Exception as e:
-            print(f"❌ Error deleting lead: {str(e)}")
-            return False
+            print(f"❌ Error deleting leads: {str(e)}")
+            return 0
     
     def export_leads_csv(self) -> bytes:
         """Export leads to CSV format"""
@@ -703,7 +673,7 @@ class CRMDataPersistence:
     def export_buyers_csv(self) -> bytes:
         """Export buyers to CSV format"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with get_connection(self.db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT * FROM buyers ORDER BY created_at DESC')
                 columns = [desc[0] for desc in cursor.description]
@@ -726,7 +696,7 @@ class CRMDataPersistence:
     def export_contacts_csv(self) -> bytes:
         """Export contacts to CSV format"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with get_connection(self.db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT * FROM contacts ORDER BY created_at DESC')
                 columns = [desc[0] for desc in cursor.description]
@@ -750,17 +720,30 @@ class CRMManager:
     """Main CRM management class"""
     
     def __init__(self):
-        self.leads: List[Lead] = []
-        self.contacts: List[Contact] = []
-        self.tasks: List[Task] = []
+        # Indexed repositories: O(1) lookups by id plus secondary indexes for filters
+        self.leads: IndexedRepository[Lead] = IndexedRepository({
+            'status': lambda lead: lead.status,
+            'lead_source': lambda lead: lead.lead_source,
+            'lead_type': lambda lead: getattr(lead, 'lead_type', None)
+        })
+        self.contacts: IndexedRepository[Contact] = IndexedRepository()
+        self.tasks: IndexedRepository[Task] = IndexedRepository()
         self.activities: List[Activity] = []
-        self.deals: List[Deal] = []
-        self.buyers: List[BuyerCriteria] = []
-        self.messages: List[Message] = []
+        self.deals: IndexedRepository[Deal] = IndexedRepository({
+            'status': lambda deal: deal.status
+        })
+        self.buyers: IndexedRepository[BuyerCriteria] = IndexedRepository({
+            'active': lambda buyer: buyer.active
+        })
+        self.buyer_index = BuyerCriteriaIndex()
+        self.messages: IndexedRepository[Message] = IndexedRepository()
         self.deal_alerts: List[DealAlert] = []
         self.scoring_engine = LeadScoringEngine()
         self.matching_engine = DealMatchingEngine()
         
+        # Entries of the append-only logs already copied into session state
+        self._synced_log_counts: Dict[str, int] = {}
+        
         # Initialize enhanced persistence system
         self.persistence = CRMDataPersistence()
         
@@ -770,40 +753,67 @@ class CRMManager:
     def load_data(self):
         """Load CRM data from database and session state"""
         # Load from database first (persistent storage)
+        db_lead_ids = set()
         try:
             leads_data = self.persistence.load_leads()
             for lead_data in leads_data:
                 lead = self._load_lead_from_db(lead_data)
-                if lead and lead not in self.leads:
-                    self.leads.append(lead)
+                if lead and lead.id not in self.leads:
+                    self.leads.add(lead)
+                    db_lead_ids.add(lead.id)
         except Exception as e:
             print(f"⚠️ Could not load leads from database: {str(e)}")
         
         # Then load from session state (current session data)
         try:
             if 'crm_leads' in st.session_state:
-                session_leads = [Lead(**data) for data in st.session_state.crm_leads]
+                session_leads = [Lead(**data) for data in self._session_records('crm_leads')]
+                # Session copies are the most recent edits, so they replace DB rows by id
                 for lead in session_leads:
-                    if lead not in self.leads:
-                        self.leads.append(lead)
+                    self.leads.add(lead)
                         
             if 'crm_contacts' in st.session_state:
-                self.contacts = [Contact(**data) for data in st.session_state.crm_contacts]
+                self.contacts.reset(Contact(**data) for data in self._session_records('crm_contacts'))
             if 'crm_tasks' in st.session_state:
-                self.tasks = [Task(**data) for data in st.session_state.crm_tasks]
+                self.tasks.reset(Task(**data) for data in self._session_records('crm_tasks'))
             if 'crm_activities' in st.session_state:
-                self.activities = [Activity(**data) for data in st.session_state.crm_activities]
+                self.activities = [Activity(**data) for data in self._session_records('crm_activities')]
             if 'crm_deals' in st.session_state:
-                self.deals = [self._load_deal(data) for data in st.session_state.crm_deals]
+                self.deals.reset(self._load_deal(data) for data in self._session_records('crm_deals'))
             if 'crm_buyers' in st.session_state:
-                self.buyers = [self._load_buyer(data) for data in st.session_state.crm_buyers]
+                self.buyers.reset(self._load_buyer(data) for data in self._session_records('crm_buyers'))
             if 'crm_messages' in st.session_state:
-                self.messages = [self._load_message(data) for data in st.session_state.crm_messages]
+                self.messages.reset(self._load_message(data) for data in self._session_records('crm_messages'))
         except Exception:
             # If we're not in a Streamlit context, skip session state loading
             pass
         if 'crm_deal_alerts' in st.session_state:
-            self.deal_alerts = [self._load_deal_alert(data) for data in st.session_state.crm_deal_alerts]
+            self.deal_alerts = [self._load_deal_alert(data) for data in self._session_records('crm_deal_alerts')]
+        
+        # Everything just loaded is already stored; only session leads missing from the DB need a write
+        for repository in self._repositories().values():
+            repository.mark_clean()
+        for lead in self.leads:
+            if lead.id not in db_lead_ids:
+                self.leads.mark_dirty(lead.id)
+        self.buyer_index.rebuild(self.buyers)
+        self._synced_log_counts = {'crm_activities': len(self.activities), 'crm_deal_alerts': len(self.deal_alerts)}
+    
+    def _session_records(self, key: str) -> List[Dict[str, Any]]:
+        """Session-state snapshot records (stored keyed by id, or as a legacy list)"""
+        records = st.session_state[key]
+        return list(records.values()) if isinstance(records, dict) else list(records)
+    
+    def _repositories(self) -> Dict[str, IndexedRepository]:
+        """Indexed collections keyed by their session-state snapshot name"""
+        return {
+            'crm_leads': self.leads,
+            'crm_contacts': self.contacts,
+            'crm_tasks': self.tasks,
+            'crm_deals': self.deals,
+            'crm_buyers': self.buyers,
+            'crm_messages': self.messages
+        }
     
     def _load_lead_from_db(self, data: Dict[str, Any]) -> Optional[Lead]:
         """Load lead from database dictionary with proper type conversion"""
@@ -824,7 +834,9 @@ class CRMManager:
             if data_copy.get('updated_at'):
                 data_copy['updated_at'] = datetime.fromisoformat(data_copy['updated_at'])
             
-            return Lead(**data_copy)
+            # Legacy columns without a Lead field (lead_type, budget, ...) are ignored
+            lead_fields = Lead.__dataclass_fields__
+            return Lead(**{key: value for key, value in data_copy.items() if key in lead_fields})
         except Exception as e:
             st.warning(f"Error loading lead from database: {str(e)}")
             return None
@@ -897,37 +909,65 @@ class CRMManager:
         
         return DealAlert(**data_copy)
     
-    def save_data(self):
-        """Save CRM data to both session state and database"""
+    def save_data(self) -> bool:
+        """Flush pending changes to session state and the database
+        
+        Only entities added, changed or deleted since the last flush are
+        written: session-state snapshots are patched by id and dirty leads
+        and deleted leads go to SQLite in one transaction. Returns False if
+        the database write failed; the changes then stay pending.
+        """
+        changes = {key: repository.pop_changes() for key, repository in self._repositories().items()}
+        
         # Save to session state for immediate access (only in Streamlit context)
         try:
-            st.session_state.crm_leads = [lead.to_dict() for lead in self.leads]
-            st.session_state.crm_contacts = [contact.to_dict() for contact in self.contacts]
-            st.session_state.crm_tasks = [task.to_dict() for task in self.tasks]
-            st.session_state.crm_activities = [activity.to_dict() for activity in self.activities]
-            st.session_state.crm_deals = [deal.to_dict() for deal in self.deals]
-            st.session_state.crm_buyers = [buyer.to_dict() for buyer in self.buyers]
-            st.session_state.crm_messages = [message.to_dict() for message in self.messages]
-            st.session_state.crm_deal_alerts = [alert.to_dict() for alert in self.deal_alerts]
+            for key, (dirty, deleted) in changes.items():
+                repository = self._repositories()[key]
+                snapshot = st.session_state.get(key)
+                if not isinstance(snapshot, dict):
+                    # First save this session (or a legacy list snapshot): write the full collection once
+                    st.session_state[key] = {entity.id: entity.to_dict() for entity in repository}
+                    continue
+                for entity in dirty:
+                    snapshot[entity.id] = entity.to_dict()
+                for entity_id in deleted:
+                    snapshot.pop(entity_id, None)
+            
+            self._sync_log_snapshots()
         except Exception:
             # If we're not in a Streamlit context, skip session state saving
             pass
         
-        # Save leads to database for persistence
-        for lead in self.leads:
-            self.persistence.save_lead(lead)
+        # Save changed leads to database for persistence
+        dirty_leads, deleted_lead_ids = changes['crm_leads']
+        success = self.persistence.save_lead_changes(dirty_leads, deleted_lead_ids)
+        if not success:
+            # Keep failed writes pending so the next flush retries them
+            for lead in dirty_leads:
+                self.leads.mark_dirty(lead.id)
+            self.leads.mark_deleted(deleted_lead_ids)
+        return success
+    
+    def _sync_log_snapshots(self):
+        """Append new activities and deal alerts to their session-state snapshots"""
+        # Activities and deal alerts are append-only logs; only new entries are serialized
+        for key, entries in (('crm_activities', self.activities), ('crm_deal_alerts', self.deal_alerts)):
+            snapshot = st.session_state.get(key)
+            synced = self._synced_log_counts.get(key, 0)
+            if not isinstance(snapshot, list) or synced > len(entries):
+                st.session_state[key] = [entry.to_dict() for entry in entries]
+            else:
+                snapshot.extend(entry.to_dict() for entry in entries[synced:])
+            self._synced_log_counts[key] = len(entries)
     
     def add_lead(self, lead: Lead) -> str:
         """Add new lead with database persistence"""
         lead.score = self.scoring_engine.calculate_lead_score(lead)
-        self.leads.append(lead)
+        self.leads.add(lead)
         
         # Save to both session state and database
         self.save_data()
         
-        # Also save directly to database for immediate persistence
-        self.persistence.save_lead(lead)
-        
         # Log activity
         self.log_activity(
             activity_type="Lead Created",
@@ -940,64 +980,93 @@ class CRMManager:
     
     def update_lead(self, lead_id: str, updates: Dict[str, Any]) -> bool:
         """Update existing lead with database persistence"""
-        for lead in self.leads:
-            if lead.id == lead_id:
-                for key, value in updates.items():
-                    if hasattr(lead, key):
-                        setattr(lead, key, value)
-                lead.updated_at = datetime.now()
-                lead.score = self.scoring_engine.calculate_lead_score(lead)
-                
-                # Save to both session state and database
-                self.save_data()
-                self.persistence.save_lead(lead)
-                
-                # Log activity
-                self.log_activity(
-                    activity_type="Lead Updated",
-                    subject=f"Lead updated: {lead.name}",
-                    description=f"Lead information updated",
-                    related_lead_id=lead.id,
-                    user_id="system"
-                )
-                return True
-        return False
-    
+        lead = self.leads.update(lead_id, updates)
+        if lead is None:
+            return False
+        
+        lead.updated_at = datetime.now()
+        lead.score = self.scoring_engine.calculate_lead_score(lead)
+        
+        # Save to both session state and database
+        self.save_data()
+        
+        # Log activity
+        self.log_activity(
+            activity_type="Lead Updated",
+            subject=f"Lead updated: {lead.name}",
+            description=f"Lead information updated",
+            related_lead_id=lead.id,
+            user_id="system"
+        )
+        return True
+
+    def rescore_leads(self, leads: Optional[List[Lead]] = None) -> int:
+        """Rescore leads (all by default) in one pass and persist the changes in one flush
+
+        Returns the number of leads whose score changed.
+        """
+        leads = list(self.leads) if leads is None else leads
+        if not leads:
+            return 0
+
+        scores = self.scoring_engine.score_leads(leads)
+        now = datetime.now()
+        updated_count = 0
+        for lead, score in zip(leads, scores.tolist()):
+            if score != lead.score:
+                lead.score = score
+                lead.updated_at = now
+                self.leads.mark_dirty(lead.id)
+                updated_count += 1
+
+        if updated_count:
+            self.save_data()
+            self.log_activity(
+                activity_type="Leads Rescored",
+                subject=f"Lead scores updated: {updated_count} leads",
+                description=f"Rescored {len(leads)} leads against the current scoring rules",
+                user_id="system"
+            )
+        return updated_count
+
     def delete_lead(self, lead_id: str) -> bool:
         """Delete lead from both memory and database"""
-        for i, lead in enumerate(self.leads):
-            if lead.id == lead_id:
-                lead_name = lead.name
-                
-                # Remove from memory
-                self.leads.pop(i)
-                
-                # Remove from database
-                success = self.persistence.delete_lead(lead_id)
-                
-                # Update session state
-                self.save_data()
-                
-                # Log activity
-                self.log_activity(
-                    activity_type="Lead Deleted",
-                    subject=f"Lead deleted: {lead_name}",
-                    description=f"Lead permanently removed from system",
-                    user_id="system"
-                )
-                
-                return success
-        return False
+        # Remove from memory
+        lead = self.leads.remove_by_id(lead_id)
+        if lead is None:
+            return False
+        
+        # Remove from session state and database
+        success = self.save_data()
+        
+        # Log activity
+        self.log_activity(
+            activity_type="Lead Deleted",
+            subject=f"Lead deleted: {lead.name}",
+            description=f"Lead permanently removed from system",
+            user_id="system"
+        )
+        
+        return success
     
     def get_lead_by_id(self, lead_id: str) -> Optional[Lead]:
         """Get lead by ID"""
-        for lead in self.leads:
-            if lead.id == lead_id:
-                return lead
-        return None
-    
-    def search_leads(self, query: str) -> List[Lead]:
-        """Search leads by name, email, phone, or address"""
+        return self.leads.get(lead_id)
+    
+    def search_leads(self, query: str, limit: Optional[int] = None, offset: int = 0) -> List[Lead]:
+        """Search leads by name, email, phone, or address (ranked prefix match)"""
+        if not query.strip():
+            return self.leads.to_list()
+        
+        search_index = self.persistence.search_index
+        if search_index.available:
+            # The index holds CRM pipeline leads only, so LIMIT/OFFSET page them directly
+            page = search_index.search(query, entity_types=['lead'], limit=limit or -1, offset=offset)
+            leads = (self.leads.get(hit['entity_id']) for hit in page['results'])
+            # Only a lead another process added since load_data() is missing here
+            return [lead for lead in leads if lead is not None]
+        
+        # Fallback when SQLite lacks FTS5: substring scan
         query = query.lower()
         results = []
         for lead in self.leads:
@@ -1006,22 +1075,18 @@ class CRMManager:
                 (lead.phone and query in lead.phone.lower()) or
                 (lead.property_address and query in lead.property_address.lower())):
                 results.append(lead)
-        return results
+        return results[offset:offset + limit] if limit else results[offset:]
+    
+    def search(self, query: str, entity_types: Optional[List[str]] = None,
+               limit: int = 25, offset: int = 0) -> Dict[str, Any]:
+        """Ranked full-text search across leads, contacts, buyers and deals (one page)"""
+        return self.persistence.search_index.search(query, entity_types, limit, offset)
     
     def filter_leads(self, status: Optional[LeadStatus] = None, 
                     lead_type: Optional[LeadType] = None,
                     lead_source: Optional[LeadSource] = None) -> List[Lead]:
         """Filter leads by various criteria"""
-        results = self.leads.copy()
-        
-        if status:
-            results = [lead for lead in results if lead.status == status]
-        if lead_type:
-            results = [lead for lead in results if lead.lead_type == lead_type]
-        if lead_source:
-            results = [lead for lead in results if lead.lead_source == lead_source]
-            
-        return results
+        return self.leads.find(status=status, lead_type=lead_type, lead_source=lead_source)
     
     def export_leads_csv(self) -> bytes:
         """Export leads to CSV format"""
@@ -1037,30 +1102,34 @@ class CRMManager:
     
     def add_contact(self, contact: Contact) -> str:
         """Add new contact"""
-        self.contacts.append(contact)
+        self.contacts.add(contact)
         self.save_data()
         return contact.id
     
     def add_task(self, task: Task) -> str:
         """Add new task"""
-        self.tasks.append(task)
+        self.tasks.add(task)
         self.save_data()
         return task.id
     
     def complete_task(self, task_id: str) -> bool:
         """Mark task as completed"""
-        for task in self.tasks:
-            if task.id == task_id:
-                task.completed = True
-                task.completed_at = datetime.now()
-                self.save_data()
-                return True
-        return False
+        task = self.tasks.update(task_id, {'completed': True, 'completed_at': datetime.now()})
+        if task is None:
+            return False
+        self.save_data()
+        return True
     
     def log_activity(self, activity_type: str, subject: str, description: str, 
                     related_lead_id: str = None, related_contact_id: str = None, 
                     user_id: str = "user") -> str:
-        """Log new activity"""
+        """Log new activity
+        
+        Only the session-state activity log is updated on the request thread;
+        the durable write is submitted to the activity tracker's background
+        queue (see CRM_ACTIVITY_TYPES). Pending entity changes are left to
+        the caller's own save_data().
+        """
         activity = Activity(
             activity_type=activity_type,
             subject=subject,
@@ -1070,46 +1139,33 @@ class CRMManager:
             user_id=user_id
         )
         self.activities.append(activity)
-        self.save_data()
-        
-        # Also log to activity tracker for advanced tracking
         try:
-            activity_tracker = get_activity_tracker()
-            
-            # Map activity types to ActivityType enum
-            activity_type_mapping = {
-                "Lead Created": ActivityType.LEAD_CREATED,
-                "Deal Created": ActivityType.DEAL_CREATED,
-                "Contact Added": ActivityType.CONTACT_ADDED,
-                "Task Created": ActivityType.TASK_CREATED,
-                "Email Sent": ActivityType.EMAIL_SENT,
-                "SMS Sent": ActivityType.SMS_SENT,
-                "Call Made": ActivityType.CALL_MADE,
-                "Meeting Scheduled": ActivityType.MEETING_SCHEDULED,
-                "Buyer Matched": ActivityType.BUYER_MATCHED,
-                "Deal Closed": ActivityType.DEAL_CLOSED
-            }
-            
-            mapped_activity_type = activity_type_mapping.get(activity_type, ActivityType.GENERAL_ACTIVITY)
-            
-            # Determine priority based on activity type
+            self._sync_log_snapshots()
+        except Exception:
+            # If we're not in a Streamlit context, skip session state saving
+            pass
+        
+        # The activity tracker is the durable write path for CRM activities
+        mapped_activity_type = CRM_ACTIVITY_TYPES.get(activity_type, ActivityType.GENERAL_ACTIVITY)
+        
+        # Determine priority based on activity type
+        if "Deal" in activity_type or "Buyer" in activity_type:
+            priority = Priority.HIGH
+        elif "Email" in activity_type or "SMS" in activity_type:
             priority = Priority.MEDIUM
-            if "Deal" in activity_type or "Buyer" in activity_type:
-                priority = Priority.HIGH
-            elif "Email" in activity_type or "SMS" in activity_type:
-                priority = Priority.MEDIUM
-            else:
-                priority = Priority.LOW
-            
-            # Create metadata
-            metadata = {
-                "related_lead_id": related_lead_id,
-                "related_contact_id": related_contact_id,
-                "original_activity_id": activity.id
-            }
-            
-            # Log to activity tracker
-            activity_tracker.log_activity(
+        else:
+            priority = Priority.LOW
+        
+        # Create metadata
+        metadata = {
+            "related_lead_id": related_lead_id,
+            "related_contact_id": related_contact_id,
+            "original_activity_id": activity.id,
+            "crm_activity_type": activity_type
+        }
+        
+        try:
+            get_activity_tracker().log_activity(
                 activity_type=mapped_activity_type,
                 title=subject,
                 description=description,
@@ -1117,9 +1173,9 @@ class CRMManager:
                 priority=priority,
                 metadata=metadata
             )
-        except Exception as e:
-            # Don't break the main flow if activity tracking fails
-            print(f"Activity tracking error: {e}")
+        except Exception:
+            # Don't break the main flow, but a lost activity must be visible
+            logger.exception("Activity tracking failed for %r activity %s", activity_type, activity.id)
         
         return activity.id
     
@@ -1127,7 +1183,7 @@ class CRMManager:
         """Get sales pipeline summary"""
         pipeline = {}
         for status in LeadStatus:
-            pipeline[status.value] = len([lead for lead in self.leads if lead.status == status])
+            pipeline[status.value] = self.leads.count('status', status)
         return pipeline
     
     def get_lead_conversion_rate(self) -> float:
@@ -1135,9 +1191,8 @@ class CRMManager:
         if not self.leads:
             return 0.0
         
-        closed_won = len([lead for lead in self.leads if lead.status == LeadStatus.CLOSED_WON])
-        total_closed = len([lead for lead in self.leads 
-                          if lead.status in [LeadStatus.CLOSED_WON, LeadStatus.CLOSED_LOST]])
+        closed_won = self.leads.count('status', LeadStatus.CLOSED_WON)
+        total_closed = closed_won + self.leads.count('status', LeadStatus.CLOSED_LOST)
         
         return (closed_won / total_closed * 100) if total_closed > 0 else 0.0
     
@@ -1155,26 +1210,16 @@ class CRMManager:
                 if not task.completed and task.due_date 
                 and now <= task.due_date <= future]
     
-    def get_lead_by_id(self, lead_id: str) -> Optional[Lead]:
-        """Get lead by ID"""
-        for lead in self.leads:
-            if lead.id == lead_id:
-                return lead
-        return None
-    
     def get_contact_by_id(self, contact_id: str) -> Optional[Contact]:
         """Get contact by ID"""
-        for contact in self.contacts:
-            if contact.id == contact_id:
-                return contact
-        return None
+        return self.contacts.get(contact_id)
     
     # ==== DEAL MANAGEMENT METHODS ====
     
     def add_deal(self, deal: Deal) -> str:
         """Add new deal"""
         deal.estimated_roi = deal.calculate_roi()
-        self.deals.append(deal)
+        self.deals.add(deal)
         self.save_data()
         
         # Log activity
@@ -1188,20 +1233,17 @@ class CRMManager:
     
     def update_deal(self, deal_id: str, updates: Dict[str, Any]) -> bool:
         """Update existing deal"""
-        for deal in self.deals:
-            if deal.id == deal_id:
-                for key, value in updates.items():
-                    if hasattr(deal, key):
-                        setattr(deal, key, value)
-                deal.updated_at = datetime.now()
-                deal.estimated_roi = deal.calculate_roi()
-                self.save_data()
-                return True
-        return False
+        deal = self.deals.update(deal_id, updates)
+        if deal is None:
+            return False
+        deal.updated_at = datetime.now()
+        deal.estimated_roi = deal.calculate_roi()
+        self.save_data()
+        return True
     
     def get_deals_by_status(self, status: DealStatus) -> List[Deal]:
         """Get deals by status"""
-        return [deal for deal in self.deals if deal.status == status]
+        return self.deals.find(status=status)
     
     def get_active_deals(self) -> List['Deal']:
         """Get active deals (not dead or closed)"""
@@ -1209,11 +1251,14 @@ class CRMManager:
             DealStatus.LEAD, DealStatus.ANALYZING, DealStatus.UNDER_CONTRACT,
             DealStatus.DUE_DILIGENCE, DealStatus.FINANCING, DealStatus.CLOSING
         ]
-        return [deal for deal in self.deals if deal.status in active_statuses]
+        return self.deals.find_any('status', active_statuses)
     
     def find_matching_buyers_for_deal(self, deal: 'Deal') -> List[Dict[str, Any]]:
         """Find buyers that match deal criteria"""
-        matching_buyers = self.matching_engine.find_matching_buyers(deal, self.buyers)
+        # The index narrows the book to buyers passing every criterion; the
+        # engine re-checks them so a stale entry can never produce a false match
+        candidates = self.buyers.get_many(self.buyer_index.candidates(deal))
+        matching_buyers = self.matching_engine.find_matching_buyers(deal, candidates)
         results = []
         
         for buyer in matching_buyers:
@@ -1231,7 +1276,8 @@ class CRMManager:
     
     def add_buyer(self, buyer: BuyerCriteria) -> str:
         """Add new buyer"""
-        self.buyers.append(buyer)
+        self.buyers.add(buyer)
+        self.buyer_index.add(buyer)
         self.save_data()
         
         # Log activity
@@ -1245,24 +1291,22 @@ class CRMManager:
     
     def update_buyer(self, buyer_id: str, updates: Dict[str, Any]) -> bool:
         """Update existing buyer"""
-        for buyer in self.buyers:
-            if buyer.id == buyer_id:
-                for key, value in updates.items():
-                    if hasattr(buyer, key):
-                        setattr(buyer, key, value)
-                self.save_data()
-                return True
-        return False
+        buyer = self.buyers.update(buyer_id, updates)
+        if buyer is None:
+            return False
+        self.buyer_index.add(buyer)
+        self.save_data()
+        return True
     
     def get_active_buyers(self) -> List[BuyerCriteria]:
         """Get active buyers"""
-        return [buyer for buyer in self.buyers if buyer.active]
+        return self.buyers.find(active=True)
     
     def send_deal_to_buyers(self, deal: 'Deal', buyer_ids: List[str] = None) -> Dict[str, Any]:
         """Send deal to matching buyers or specified buyers"""
         if buyer_ids:
             # Send to specific buyers
-            selected_buyers = [buyer for buyer in self.buyers if buyer.id in buyer_ids]
+            selected_buyers = [self.buyers.get(buyer_id) for buyer_id in buyer_ids if buyer_id in self.buyers]
         else:
             # Send to all matching buyers
             matches = self.find_matching_buyers_for_deal(deal)
@@ -1303,7 +1347,7 @@ class CRMManager:
             related_deal_id=related_deal_id
         )
         
-        self.messages.append(message)
+        self.messages.add(message)
         self.save_data()
         
         # Log activity
@@ -1397,18 +1441,16 @@ class CRMManager:
     
     def mark_message_as_read(self, message_id: str) -> bool:
         """Mark message as read"""
-        for message in self.messages:
-            if message.id == message_id:
-                message.status = MessageStatus.READ
-                message.read_at = datetime.now()
-                self.save_data()
-                return True
-        return False
+        message = self.messages.update(message_id, {'status': MessageStatus.READ, 'read_at': datetime.now()})
+        if message is None:
+            return False
+        self.save_data()
+        return True
     
     def get_portfolio_summary(self) -> Dict[str, Any]:
         """Get portfolio performance summary"""
         active_deals = self.get_active_deals()
-        closed_deals = [deal for deal in self.deals if deal.status == DealStatus.CLOSED]
+        closed_deals = self.get_deals_by_status(DealStatus.CLOSED)
         
         total_value = sum(deal.purchase_price for deal in closed_deals)
         total_profit = sum(deal.projected_profit for deal in closed_deals)
@@ -1755,7 +1797,7 @@ class DealMatchingEngine:
         
         # ROI score (30% weight)
         if deal.estimated_roi >= buyer.min_roi:
-            roi_score = min((deal.estimated_roi / buyer.min_roi) * 30, 30)
+            roi_score = min((deal.estimated_roi / buyer.min_roi) * 30, 30) if buyer.min_roi else 30
             score += roi_score
         
         # Property type preference (20% weight)
@@ -2266,15 +2308,8 @@ def show_lead_management(crm: CRMManager):
         
         with col_bulk3:
             if st.button("🔄 Update All Scores", use_container_width=True):
-                # Recalculate all lead scores
-                updated_count = 0
-                for lead in filtered_leads:
-                    old_score = lead.score
-                    # Recalculate score based on current criteria
-                    new_score = crm.scoring_engine.calculate_lead_score(lead)
-                    if new_score != old_score:
-                        crm.update_lead(lead.id, {"score": new_score})
-                        updated_count += 1
+                # Recalculate all lead scores against the current scoring rules in one pass
+                updated_count = crm.rescore_leads(filtered_leads)
                 st.success(f"✅ Updated scores for {updated_count} leads")
                 if updated_count > 0:
                     st.rerun()
@@ -4832,62 +4867,49 @@ Best regards,
             success_count = 0
             failed_count = 0
             
-            # Progress bar for bulk sending
+            # One bulk dispatch: concurrent sends under the provider rate limit
+            if use_template and 'template' in locals() and template:
+                send_template = template
+            else:
+                # Create temporary template for custom email
+                from email_automation import EmailTemplate, EmailType
+                send_template = EmailTemplate(
+                    name="Custom Email",
+                    email_type=EmailType.CUSTOM,
+                    subject=subject,
+                    body_html=f"<html><body><p>{email_body.replace(chr(10), '</p><p>')}</p></body></html>",
+                    body_text=email_body
+                )
+            
+            variables_list = [{
+                'first_name': recipient.split('@')[0],  # Simple name extraction
+                'email': recipient,
+                'agent_name': 'NXTRIX Team'
+            } for recipient in recipients]
+            
+            # Progress bar for bulk sending, advanced as each recipient completes
+            on_progress = None
             if len(recipients) > 1:
                 progress_bar = st.progress(0)
                 status_text = st.empty()
-            
-            # Send emails using real services
-            for i, recipient in enumerate(recipients):
-                try:
-                    if use_template and 'template' in locals() and template:
-                        # Send using template with real email service
-                        result = email_manager.send_real_email(
-                            recipient_email=recipient,
-                            template=template,
-                            variables={
-                                'first_name': recipient.split('@')[0],  # Simple name extraction
-                                'email': recipient,
-                                'agent_name': 'NXTRIX Team'
-                            }
-                        )
-                    else:
-                        # Create temporary template for custom email
-                        from email_automation import EmailTemplate, EmailType
-                        temp_template = EmailTemplate(
-                            name="Custom Email",
-                            email_type=EmailType.GENERAL,
-                            subject=subject,
-                            body_html=f"<html><body><p>{email_body.replace(chr(10), '</p><p>')}</p></body></html>",
-                            body_text=email_body
-                        )
-                        
-                        result = email_manager.send_real_email(
-                            recipient_email=recipient,
-                            template=temp_template,
-                            variables={
-                                'first_name': recipient.split('@')[0],
-                                'email': recipient,
-                                'agent_name': 'NXTRIX Team'
-                            }
-                        )
-                    
-                    if result['success']:
-                        success_count += 1
-                    else:
-                        failed_count += 1
-                        if not result.get('simulation', False):
-                            st.error(f"❌ Failed to send to {recipient}: {result.get('error', 'Unknown error')}")
                 
-                except Exception as e:
+                def on_progress(completed, total, recipient):
+                    progress_bar.progress(completed / total)
+                    status_text.text(f"Sending... {completed}/{total} ({recipient})")
+            
+            try:
+                results = email_manager.send_bulk_emails(recipients, send_template, variables_list,
+                                                         on_progress=on_progress)
+            except Exception as e:
+                results = [{'recipient': recipient, 'success': False, 'error': str(e)} for recipient in recipients]
+            
+            for result in results:
+                if result['success']:
+                    success_count += 1
+                else:
                     failed_count += 1
-                    st.error(f"❌ Error sending to {recipient}: {str(e)}")
-                
-                # Update progress for bulk sends
-                if len(recipients) > 1:
-                    progress = (i + 1) / len(recipients)
-                    progress_bar.progress(progress)
-                    status_text.text(f"Sending... {i + 1}/{len(recipients)}")
+                    if not result.get('simulation', False):
+                        st.error(f"❌ Failed to send to {result['recipient']}: {result.get('error', 'Unknown error')}")
             
             # Show results
             if success_count > 0:
@@ -5420,18 +5442,14 @@ Your Investment Team"""
                         'phone': getattr(recipient, 'phone', None)
                     })
                 
-                # Send real deal alerts
-                with st.spinner("Sending deal alerts..."):
+                # Queue real deal alerts; the outbox workers deliver them in the background
+                with st.spinner("Queueing deal alerts..."):
                     if send_email:
-                        alert_results = email_manager.send_deal_alert(
+                        job_id = email_manager.send_deal_alert(
                             recipients=recipient_list,
                             deal_data=deal_data
                         )
                         
-                        # Count successful sends
-                        email_success = len([r for r in alert_results if r['success'] and r['type'] == 'email'])
-                        sms_success = len([r for r in alert_results if r['success'] and r['type'] == 'sms'])
-                        
                         # Create deal alert record
                         deal_alert = DealAlert(
                             deal_id=selected_deal.id,
@@ -5445,22 +5463,12 @@ Your Investment Team"""
                         crm.deal_alerts.append(deal_alert)
                         crm.save_data()
                         
-                        # Show detailed results
-                        if email_success > 0:
-                            st.success(f"✅ Deal alert sent successfully! {email_success} emails sent")
-                            if email_success == len(recipients):
-                                st.balloons()
-                        
-                        if sms_success > 0:
-                            st.success(f"📱 {sms_success} SMS alerts sent")
-                        
-                        # Show any failures
-                        failed_results = [r for r in alert_results if not r['success']]
-                        if failed_results:
-                            st.warning(f"⚠️ {len(failed_results)} alerts failed to send")
-                            with st.expander("View Failed Sends"):
-                                for result in failed_results:
-                                    st.error(f"❌ {result['recipient']}: {result.get('error', 'Unknown error')}")
+                        # Live delivery progress
+                        if job_id:
+                            st.success(f"✅ Deal alert queued for {len(recipients)} recipients")
+                            show_job_progress(job_id, email_manager.db_path, label="Sending deal alerts")
+                        else:
+                            st.error("❌ Deal alerts could not be queued - communication services unavailable")
                     
                     else:
                         # Just create record without sending
@@ -5563,8 +5571,7 @@ def show_message_inbox(crm: CRMManager):
             with col2:
                 if message.status == MessageStatus.SENT:
                     if st.button(f"✅ Mark as Read", key=f"read_{message.id}"):
-                        message.status = MessageStatus.READ
-                        crm.save_data()
+                        crm.mark_message_as_read(message.id)
                         st.rerun()
                 
                 if st.button(f"↩️ Reply", key=f"reply_{message.id}"):
@@ -6731,6 +6738,20 @@ def show_activity_settings(activity_tracker):
             st.success("✅ Activity tracking settings saved successfully!")
             st.rerun()
 
+    # Background ingestion health
+    if activity_tracker.ingestion is not None:
+        st.markdown("### 📥 Activity Ingestion Queue")
+        metrics = activity_tracker.ingestion.metrics()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Queue Depth", f"{metrics['depth']:,} / {metrics['capacity']:,}")
+        with col2:
+            st.metric("Stored", f"{metrics['stored']:,}", delta=f"{metrics['failed']:,} failed", delta_color="inverse")
+        with col3:
+            st.metric("Written Inline (Queue Full)", f"{metrics['rejected_full']:,}")
+        with col4:
+            st.metric("Last Batch", f"{metrics['last_batch_size']} in {metrics['last_batch_ms']:.0f} ms")
+
 # Contact Communication Functions for Enhanced CRM
 def show_contact_email_composer():
     """Show email composer for CRM contacts"""
@@ -10,12 +10,15 @@ import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
-from dataclasses import dataclass
-from typing import List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass, fields
+from typing import List, Dict, Any, Optional, Tuple, Sequence
 from enum import Enum
 import warnings
 warnings.filterwarnings('ignore')
 
+from financial_cache import cached_analysis
+from financial_math import amortization_schedule
+
 class FinancingType(Enum):
     """Property financing options"""
     CASH = "Cash Purchase"
@@ -68,6 +71,7 @@ class EnhancedFinancialModeling:
         self.market_appreciation = 0.05  # 5% annual appreciation
         self.rent_growth = 0.03  # 3% annual rent growth
     
+    @cached_analysis('enhanced_financial_modeling.calculate_comprehensive_roi')
     def calculate_comprehensive_roi(self, model: FinancialModel) -> Dict[str, Any]:
         """Calculate comprehensive ROI analysis"""
         
@@ -87,7 +91,7 @@ class EnhancedFinancialModeling:
         fifty_percent_rule_net = model.monthly_rent * 0.5 - monthly_payment
         
         # Advanced metrics
-        debt_service_coverage = (model.monthly_rent * (1 - model.vacancy_rate)) / monthly_payment if monthly_payment > 0 else float('inf')
+        debt_service_coverage = (model.monthly_rent * (1 - model.vacancy_rate / 100)) / monthly_payment if monthly_payment > 0 else float('inf')
         loan_to_value = loan_amount / model.purchase_price * 100
         
         # Exit strategy analysis
@@ -195,9 +199,11 @@ class EnhancedFinancialModeling:
             annual_cash_flow = monthly_cash_flow * 12 * (1 + self.rent_growth) ** year
             total_cash_flow += annual_cash_flow
         
-        # Equity build-up (simplified)
+        # Equity build-up from the amortized loan balance at the end of the hold
         loan_amount = self._calculate_loan_amount(model)
-        remaining_balance = loan_amount * 0.85  # Approximate remaining balance
+        hold_months = int(round(model.hold_period_years * 12))
+        schedule = amortization_schedule(loan_amount, model.interest_rate / 100, model.loan_term_years * 12, hold_months)
+        remaining_balance = float(schedule['balance'][0, -1]) if hold_months > 0 else loan_amount
         equity_buildup = loan_amount - remaining_balance
         
         # Total return
@@ -322,86 +328,247 @@ class EnhancedFinancialModeling:
         else:
             return "D Poor"
     
-    def create_cash_flow_projection(self, model: FinancialModel, years: int = 10) -> pd.DataFrame:
-        """Create detailed cash flow projection"""
+    @cached_analysis('enhanced_financial_modeling.create_cash_flow_projection')
+    def create_cash_flow_projection(self, model: FinancialModel, years: int = 10,
+                                    frequency: str = 'annual') -> pd.DataFrame:
+        """Create detailed cash flow projection
         
-        projections = []
-        monthly_payment = self._calculate_monthly_payment(model, self._calculate_loan_amount(model))
-        base_cash_flow = self._calculate_monthly_cash_flow(model, monthly_payment)
-        
-        for year in range(1, years + 1):
-            # Account for rent growth and inflation
-            adjusted_rent = model.monthly_rent * (1 + self.rent_growth) ** year
-            adjusted_expenses = (
-                model.insurance_monthly * (1 + self.inflation_rate) ** year +
-                model.property_taxes_monthly * (1 + self.inflation_rate) ** year +
-                model.hoa_fees * (1 + self.inflation_rate) ** year
-            )
-            
-            annual_cash_flow = (base_cash_flow * (1 + self.rent_growth) ** year) * 12
-            property_value = model.estimated_arv * (1 + self.market_appreciation) ** year
-            
-            projections.append({
-                'Year': year,
-                'Property Value': property_value,
-                'Monthly Rent': adjusted_rent,
-                'Annual Cash Flow': annual_cash_flow,
-                'Cumulative Cash Flow': sum([p['Annual Cash Flow'] for p in projections]) + annual_cash_flow
-            })
+        ``frequency`` is ``'annual'`` or ``'monthly'``. Debt service comes from
+        the full loan amortization schedule rather than a fixed payment.
+        """
+        
+        projection = self.create_batch_cash_flow_projection([model], years, frequency)
+        return projection.drop(columns=['Deal'])
+    
+    def create_batch_cash_flow_projection(self, models: List[FinancialModel], years: int = 10,
+                                          frequency: str = 'annual') -> pd.DataFrame:
+        """Cash flow projections for many deals in one array pass
+        
+        Returns a long DataFrame with a ``Deal`` column (the index into ``models``)
+        and one row per deal per period.
+        """
+        
+        if frequency not in ('annual', 'monthly'):
+            raise ValueError("frequency must be 'annual' or 'monthly'")
+        
+        arrays = self._projection_arrays(models, years)
+        num_deals = len(models)
+        
+        if frequency == 'monthly':
+            periods = years * 12
+            period_columns = {
+                'Month': np.tile(np.arange(1, periods + 1), num_deals),
+                'Year': np.tile(arrays['year'], num_deals)
+            }
+            values = arrays
+            cash_flow_column = 'Monthly Cash Flow'
+        else:
+            periods = years
+            period_columns = {'Year': np.tile(np.arange(1, years + 1), num_deals)}
+            # Roll months up into years; balances and values are year-end
+            values = {key: arrays[key].reshape(num_deals, years, 12).sum(axis=2)
+                      for key in ('cash_flow', 'principal', 'interest', 'debt_service')}
+            for key in ('property_value', 'monthly_rent', 'balance'):
+                values[key] = arrays[key][:, 11::12]
+            cash_flow_column = 'Annual Cash Flow'
+        
+        cumulative_cash_flow = np.cumsum(values['cash_flow'], axis=1)
+        equity = values['property_value'] - values['balance']
+        
+        return pd.DataFrame({
+            'Deal': np.repeat(np.arange(num_deals), periods),
+            **period_columns,
+            'Property Value': values['property_value'].ravel(),
+            'Monthly Rent': values['monthly_rent'].ravel(),
+            cash_flow_column: values['cash_flow'].ravel(),
+            'Cumulative Cash Flow': cumulative_cash_flow.ravel(),
+            'Debt Service': values['debt_service'].ravel(),
+            'Principal Paid': values['principal'].ravel(),
+            'Interest Paid': values['interest'].ravel(),
+            'Loan Balance': values['balance'].ravel(),
+            'Equity': equity.ravel()
+        })
+    
+    def _projection_arrays(self, models: List[FinancialModel], years: int) -> Dict[str, np.ndarray]:
+        """Monthly (deals x months) projection arrays
+        
+        Growth steps once per projection year, matching the annual view:
+        every month of year ``y`` uses ``(1 + growth) ** y``.
+        """
+        
+        months = years * 12
+        year = np.arange(months) // 12 + 1
+        
+        rent = np.array([m.monthly_rent for m in models], dtype=float)[:, None]
+        arv = np.array([m.estimated_arv for m in models], dtype=float)[:, None]
+        loan_amounts = np.array([self._calculate_loan_amount(m) for m in models], dtype=float)
+        rates = np.array([m.interest_rate / 100 for m in models], dtype=float)
+        terms = np.array([m.loan_term_years * 12 for m in models], dtype=float)
         
-        return pd.DataFrame(projections)
+        # Net operating cash flow before debt service, from the same helper as the ROI view
+        operating_cash_flow = np.array([self._calculate_monthly_cash_flow(m, 0) for m in models], dtype=float)[:, None]
+        
+        rent_growth = (1 + self.rent_growth) ** year
+        loan = amortization_schedule(loan_amounts, rates, terms, months)
+        
+        return {
+            'year': year,
+            'monthly_rent': rent * rent_growth,
+            'property_value': arv * (1 + self.market_appreciation) ** year,
+            'cash_flow': operating_cash_flow * rent_growth - loan['payment'],
+            'debt_service': loan['payment'],
+            'principal': loan['principal'],
+            'interest': loan['interest'],
+            'balance': loan['balance']
+        }
     
+    @cached_analysis('enhanced_financial_modeling.create_sensitivity_analysis')
     def create_sensitivity_analysis(self, model: FinancialModel) -> Dict[str, Any]:
         """Perform sensitivity analysis on key variables"""
         
-        base_roi = self.calculate_comprehensive_roi(model)
-        base_cash_flow = base_roi['net_monthly_cash_flow']
-        
         # Variable ranges
         rent_variations = [-20, -10, 0, 10, 20]  # % changes
         vacancy_variations = [2, 5, 8, 12, 15]  # % vacancy rates
         interest_variations = [3.5, 4.5, 5.5, 6.5, 7.5]  # % interest rates
         
-        sensitivity_data = {
-            'rent_sensitivity': [],
-            'vacancy_sensitivity': [],
-            'interest_sensitivity': []
+        # Each sweep varies one field from the base model; the caller's model is never mutated
+        rent_grid = self.create_scenario_grid(
+            model, {'monthly_rent': [model.monthly_rent * (1 + change / 100) for change in rent_variations]}
+        )
+        vacancy_grid = self.create_scenario_grid(model, {'vacancy_rate': vacancy_variations})
+        interest_grid = self.create_scenario_grid(model, {'interest_rate': interest_variations})
+        
+        return {
+            'rent_sensitivity': [
+                {'change': change, 'cash_flow': row['net_monthly_cash_flow'], 'roi': row['cash_on_cash_return']}
+                for change, (_, row) in zip(rent_variations, rent_grid.iterrows())
+            ],
+            'vacancy_sensitivity': [
+                {'vacancy_rate': row['vacancy_rate'], 'cash_flow': row['net_monthly_cash_flow'], 'roi': row['cash_on_cash_return']}
+                for _, row in vacancy_grid.iterrows()
+            ],
+            'interest_sensitivity': [
+                {'interest_rate': row['interest_rate'], 'cash_flow': row['net_monthly_cash_flow'], 'roi': row['cash_on_cash_return']}
+                for _, row in interest_grid.iterrows()
+            ]
         }
+    
+    def create_scenario_grid(self, model: FinancialModel, variations: Dict[str, Sequence[float]]) -> pd.DataFrame:
+        """Evaluate the full Cartesian grid of field variations in one vectorized pass
         
-        # Rent sensitivity
-        for rent_change in rent_variations:
-            modified_model = model
-            modified_model.monthly_rent = model.monthly_rent * (1 + rent_change / 100)
-            roi = self.calculate_comprehensive_roi(modified_model)
-            sensitivity_data['rent_sensitivity'].append({
-                'change': rent_change,
-                'cash_flow': roi['net_monthly_cash_flow'],
-                'roi': roi['cash_on_cash_return']
-            })
+        ``variations`` maps numeric ``FinancialModel`` field names to the values
+        to test, e.g. ``{'monthly_rent': [...], 'vacancy_rate': [...], 'interest_rate': [...]}``.
+        Returns one row per grid point with the varied fields and core metrics.
+        """
         
-        # Vacancy sensitivity
-        for vacancy in vacancy_variations:
-            modified_model = model
-            modified_model.vacancy_rate = vacancy
-            roi = self.calculate_comprehensive_roi(modified_model)
-            sensitivity_data['vacancy_sensitivity'].append({
-                'vacancy_rate': vacancy,
-                'cash_flow': roi['net_monthly_cash_flow'],
-                'roi': roi['cash_on_cash_return']
-            })
+        numeric_fields = self._numeric_model_fields(model)
+        for name in variations:
+            if name not in numeric_fields:
+                raise ValueError(f"Cannot vary '{name}': not a numeric FinancialModel field")
+        
+        names = list(variations.keys())
+        axes = [np.asarray(variations[name], dtype=float) for name in names]
+        mesh = np.meshgrid(*axes, indexing='ij') if axes else []
         
-        # Interest rate sensitivity
-        for rate in interest_variations:
-            modified_model = model
-            modified_model.interest_rate = rate
-            roi = self.calculate_comprehensive_roi(modified_model)
-            sensitivity_data['interest_sensitivity'].append({
-                'interest_rate': rate,
-                'cash_flow': roi['net_monthly_cash_flow'],
-                'roi': roi['cash_on_cash_return']
+        inputs = {name: np.asarray(getattr(model, name), dtype=float) for name in numeric_fields}
+        for name, values in zip(names, mesh):
+            inputs[name] = values.ravel()
+        
+        metrics = self._evaluate_model_arrays(inputs, model.financing_type)
+        size = max([values.size for values in inputs.values()] + [1])
+        
+        grid = pd.DataFrame({name: values.ravel() for name, values in zip(names, mesh)})
+        for key, values in metrics.items():
+            grid[key] = np.broadcast_to(values, (size,))
+        
+        return grid
+    
+    def create_tornado_table(self, model: FinancialModel, variations: Dict[str, Tuple[float, float]],
+                             metric: str = 'cash_on_cash_return') -> pd.DataFrame:
+        """One-at-a-time low/high swings for each field, sorted by impact on ``metric``"""
+        
+        base_value = float(self.create_scenario_grid(model, {})[metric].iloc[0])
+        rows = []
+        
+        for name, (low, high) in variations.items():
+            grid = self.create_scenario_grid(model, {name: [low, high]})
+            low_value, high_value = grid[metric].tolist()
+            rows.append({
+                'variable': name,
+                'low_input': low,
+                'high_input': high,
+                'low_value': low_value,
+                'high_value': high_value,
+                'low_impact': low_value - base_value,
+                'high_impact': high_value - base_value,
+                'swing': abs(high_value - low_value)
             })
         
-        return sensitivity_data
+        return pd.DataFrame(rows).sort_values('swing', ascending=False).reset_index(drop=True)
+    
+    def create_heatmap_table(self, model: FinancialModel, row_field: str, row_values: Sequence[float],
+                             column_field: str, column_values: Sequence[float],
+                             metric: str = 'net_monthly_cash_flow') -> pd.DataFrame:
+        """2-D table of ``metric`` over two varied fields (rows x columns)"""
+        
+        grid = self.create_scenario_grid(model, {row_field: row_values, column_field: column_values})
+        values = grid[metric].to_numpy().reshape(len(row_values), len(column_values))
+        return pd.DataFrame(values, index=pd.Index(row_values, name=row_field),
+                            columns=pd.Index(column_values, name=column_field))
+    
+    def _numeric_model_fields(self, model: FinancialModel) -> List[str]:
+        """Names of the numeric FinancialModel fields that can be varied"""
+        return [f.name for f in fields(model)
+                if isinstance(getattr(model, f.name), (int, float)) and not isinstance(getattr(model, f.name), bool)]
+    
+    def _evaluate_model_arrays(self, inputs: Dict[str, np.ndarray], financing_type: FinancingType) -> Dict[str, np.ndarray]:
+        """Array form of the core calculate_comprehensive_roi metrics
+        
+        Mirrors the scalar helpers above; every input broadcasts, so a whole
+        scenario grid is evaluated without building per-point models.
+        """
+        
+        price = inputs['purchase_price']
+        rent = inputs['monthly_rent']
+        down_payment_percent = inputs['down_payment_percent']
+        
+        total_investment = (price * (down_payment_percent / 100) + inputs['rehab_costs'] +
+                            inputs['acquisition_costs'] + inputs['holding_costs'])
+        
+        if financing_type == FinancingType.CASH:
+            loan_amount = np.zeros_like(price)
+        else:
+            loan_amount = price * (1 - down_payment_percent / 100)
+        
+        monthly_rate = inputs['interest_rate'] / 100 / 12
+        num_payments = inputs['loan_term_years'] * 12
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth = (1 + monthly_rate) ** num_payments
+            amortized = loan_amount * (monthly_rate * growth) / (growth - 1)
+            monthly_payment = np.where(loan_amount == 0, 0.0,
+                                       np.where(monthly_rate == 0, loan_amount / num_payments, amortized))
+            
+            percent_of_rent = (inputs['property_management_rate'] + inputs['maintenance_reserve'] +
+                               inputs['capex_reserve']) / 100
+            fixed_monthly = inputs['insurance_monthly'] + inputs['property_taxes_monthly'] + inputs['hoa_fees']
+            gross_monthly_income = rent * (1 - inputs['vacancy_rate'] / 100)
+            net_monthly_cash_flow = gross_monthly_income - (monthly_payment + fixed_monthly + rent * percent_of_rent)
+            
+            annual_expenses = fixed_monthly * 12 + rent * 12 * (percent_of_rent + inputs['vacancy_rate'] / 100)
+            cash_on_cash_return = (net_monthly_cash_flow * 12) / total_investment * 100
+            cap_rate = (rent * 12 - annual_expenses) / price * 100
+            debt_service_coverage = np.where(monthly_payment > 0, gross_monthly_income / monthly_payment, np.inf)
+        
+        return {
+            'total_investment': total_investment,
+            'loan_amount': loan_amount,
+            'monthly_payment': monthly_payment,
+            'net_monthly_cash_flow': net_monthly_cash_flow,
+            'annual_cash_flow': net_monthly_cash_flow * 12,
+            'cash_on_cash_return': cash_on_cash_return,
+            'cap_rate': cap_rate,
+            'debt_service_coverage': debt_service_coverage
+        }
 
 def show_enhanced_financial_modeling():
     """Display enhanced financial modeling interface"""
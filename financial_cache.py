@@ -0,0 +1,440 @@
+"""
+Financial Analysis Cache for NXTRIX CRM
+Memoizes deal analyses so Streamlit reruns don't recompute them:
+- Keys are a stable hash of the analysis inputs plus the model version
+- In-process LRU tier shared by every session in the server process, bounded by entries and bytes
+- Optional on-disk SQLite tier with size-based eviction, stored as tagged JSON
+- Hit/miss counters for the performance dashboard
+"""
+
+import copy
+import functools
+import hashlib
+import inspect
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import fields, is_dataclass
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from db_connection import get_connection
+
+# Bump whenever a cached calculation changes so stale results are never served
+FINANCIAL_MODEL_VERSION = "2"
+
+_MISSING = object()
+
+
+def _normalize(value: Any) -> Any:
+    """Convert analysis inputs into a JSON-serializable canonical form"""
+    if isinstance(value, Enum):
+        return {'__enum__': type(value).__name__, 'value': _normalize(value.value)}
+    if is_dataclass(value) and not isinstance(value, type):
+        return {'__dataclass__': type(value).__name__,
+                'fields': {f.name: _normalize(getattr(value, f.name)) for f in fields(value)}}
+    if isinstance(value, pd.DataFrame):
+        return {'__dataframe__': [str(c) for c in value.columns],
+                'index': _normalize(value.index.tolist()),
+                'values': _normalize(value.to_numpy().tolist())}
+    if isinstance(value, pd.Series):
+        return {'__series__': str(value.name), 'values': _normalize(value.tolist())}
+    if isinstance(value, np.ndarray):
+        return {'__ndarray__': list(value.shape), 'values': _normalize(value.tolist())}
+    if isinstance(value, np.generic):
+        return _normalize(value.item())
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_normalize(v) for v in value), key=repr)
+    if isinstance(value, float) and not math.isfinite(value):
+        return {'__float__': repr(value)}
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return repr(value)
+
+
+def make_cache_key(namespace: str, *parts: Any) -> str:
+    """Stable SHA-256 key for a namespace, the model version and any inputs"""
+    payload = json.dumps([namespace, FINANCIAL_MODEL_VERSION, _normalize(parts)],
+                         sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+_CODEC_TAGS = ('__items__', '__tuple__', '__float__', '__datetime__', '__date__',
+               '__npscalar__', '__ndarray__', '__series__', '__dataframe__', '__rangeindex__')
+_NUMERIC_KINDS = 'biufc'
+
+
+def _encode_array(values: np.ndarray) -> Dict[str, Any]:
+    if values.dtype.kind in _NUMERIC_KINDS and values.dtype.kind != 'c':
+        return {'__ndarray__': values.dtype.str, 'shape': list(values.shape),
+                'values': [_encode_value(v) for v in values.ravel().tolist()]}
+    if values.dtype.kind == 'O':
+        return {'__ndarray__': 'O', 'shape': list(values.shape),
+                'values': [_encode_value(v) for v in values.ravel().tolist()]}
+    raise TypeError(f"unsupported array dtype {values.dtype}")
+
+
+def _encode_index(index: pd.Index) -> Any:
+    if isinstance(index, pd.RangeIndex):
+        return {'__rangeindex__': [index.start, index.stop, index.step], 'name': _encode_value(index.name)}
+    return {'__series__': _encode_array(index.to_numpy()), 'name': _encode_value(index.name)}
+
+
+def _encode_value(value: Any) -> Any:
+    """Convert a cached result into tagged JSON-safe data; TypeError if it can't round-trip"""
+    if value is None or isinstance(value, (str, bool, int)) and not isinstance(value, np.generic):
+        return value
+    if isinstance(value, np.generic):
+        if value.dtype.kind not in _NUMERIC_KINDS or value.dtype.kind == 'c':
+            raise TypeError(f"unsupported scalar dtype {value.dtype}")
+        return {'__npscalar__': value.dtype.str, 'value': _encode_value(value.item())}
+    if isinstance(value, float):
+        return value if math.isfinite(value) else {'__float__': repr(value)}
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value) and not any(k in _CODEC_TAGS for k in value):
+            return {k: _encode_value(v) for k, v in value.items()}
+        return {'__items__': [[_encode_value(k), _encode_value(v)] for k, v in value.items()]}
+    if isinstance(value, list):
+        return [_encode_value(v) for v in value]
+    if isinstance(value, tuple):
+        return {'__tuple__': [_encode_value(v) for v in value]}
+    if isinstance(value, np.ndarray):
+        return _encode_array(value)
+    if isinstance(value, pd.Series):
+        return {'__series__': _encode_array(value.to_numpy()), 'name': _encode_value(value.name),
+                'index': _encode_index(value.index)}
+    if isinstance(value, pd.DataFrame):
+        return {'__dataframe__': [_encode_value(c) for c in value.columns],
+                'columns': [_encode_array(value[c].to_numpy()) for c in value.columns],
+                'index': _encode_index(value.index)}
+    raise TypeError(f"unsupported cached type {type(value).__name__}")
+
+
+def _decode_array(data: Dict[str, Any]) -> np.ndarray:
+    values = [_decode_value(v) for v in data['values']]
+    if data['__ndarray__'] == 'O':
+        array = np.empty(len(values), dtype=object)
+        array[:] = values
+        return array.reshape(data['shape'])
+    return np.array(values, dtype=np.dtype(data['__ndarray__'])).reshape(data['shape'])
+
+
+def _decode_index(data: Dict[str, Any]) -> pd.Index:
+    name = _decode_value(data['name'])
+    if '__rangeindex__' in data:
+        return pd.RangeIndex(*data['__rangeindex__'], name=name)
+    return pd.Index(_decode_array(data['__series__']), name=name)
+
+
+def _decode_value(data: Any) -> Any:
+    """Inverse of ``_encode_value``"""
+    if isinstance(data, list):
+        return [_decode_value(v) for v in data]
+    if not isinstance(data, dict):
+        return data
+    if '__items__' in data:
+        return {_decode_value(k): _decode_value(v) for k, v in data['__items__']}
+    if '__tuple__' in data:
+        return tuple(_decode_value(v) for v in data['__tuple__'])
+    if '__float__' in data:
+        return float(data['__float__'])
+    if '__datetime__' in data:
+        return datetime.fromisoformat(data['__datetime__'])
+    if '__date__' in data:
+        return date.fromisoformat(data['__date__'])
+    if '__npscalar__' in data:
+        return np.dtype(data['__npscalar__']).type(_decode_value(data['value']))
+    if '__ndarray__' in data:
+        return _decode_array(data)
+    if '__series__' in data:
+        return pd.Series(_decode_array(data['__series__']), index=_decode_index(data['index']),
+                         name=_decode_value(data['name']))
+    if '__dataframe__' in data:
+        columns: List[Any] = [_decode_value(c) for c in data['__dataframe__']]
+        frame = pd.DataFrame({i: _decode_array(col) for i, col in enumerate(data['columns'])},
+                             index=_decode_index(data['index']))
+        frame.columns = columns
+        return frame
+    return {k: _decode_value(v) for k, v in data.items()}
+
+
+def dumps_cached_value(value: Any) -> str:
+    """Serialize a cached result to JSON; raises TypeError for types that can't round-trip"""
+    return json.dumps(_encode_value(value), separators=(',', ':'), allow_nan=False)
+
+
+def loads_cached_value(text: str) -> Any:
+    """Rebuild a cached result from ``dumps_cached_value`` output"""
+    return _decode_value(json.loads(text))
+
+
+def approximate_size(value: Any) -> int:
+    """Approximate bytes held by a cached result (frames and arrays by their buffers)"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(approximate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class AnalysisCache:
+    """Two-tier (memory LRU + optional SQLite) cache for financial analyses"""
+
+    def __init__(self, max_entries: int = 128, db_path: Optional[str] = None,
+                 max_disk_bytes: int = 50 * 1024 * 1024, max_memory_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._memory_sizes: Dict[str, int] = {}
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'disk_evictions': 0}
+
+        if self.db_path:
+            self._init_disk_tier()
+
+    def _init_disk_tier(self):
+        """Create the on-disk cache table"""
+        try:
+            conn = get_connection(self.db_path)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS analysis_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_access ON analysis_cache(last_access)')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error initializing analysis cache database: {e}")
+            self.db_path = None
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Look up a key in memory, then on disk; returns (hit, value)"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return True, copy.deepcopy(self._memory[key])
+
+        value = self._disk_get(key)
+        with self._lock:
+            if value is _MISSING:
+                self._stats['misses'] += 1
+                return False, None
+            self._stats['disk_hits'] += 1
+            self._memory_put(key, value)
+        return True, copy.deepcopy(value)
+
+    def set(self, key: str, value: Any):
+        """Store a value in both tiers"""
+        with self._lock:
+            self._memory_put(key, copy.deepcopy(value))
+        self._disk_put(key, value)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for ``key`` or compute and store it"""
+        hit, value = self.get(key)
+        if hit:
+            return value
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def clear(self):
+        """Drop every cached entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_sizes.clear()
+            self._memory_bytes = 0
+        if self.db_path:
+            try:
+                conn = get_connection(self.db_path)
+                conn.execute('DELETE FROM analysis_cache')
+                conn.commit()
+                conn.close()
+            except Exception as e:
+                print(f"Error clearing analysis cache: {e}")
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+            stats['memory_bytes'] = self._memory_bytes
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups * 100 if lookups else 0.0
+        stats['disk_enabled'] = bool(self.db_path)
+        stats['disk_entries'], stats['disk_bytes'] = self._disk_usage()
+        return stats
+
+    def _memory_put(self, key: str, value: Any):
+        """Insert into the LRU tier, evicting the least recently used entries (lock held)
+
+        The tier is bounded by ``max_entries`` and by ``max_memory_bytes`` of
+        approximate value size; a value larger than the whole byte budget is
+        left to the disk tier.
+        """
+        self._memory_pop(key)
+        size = approximate_size(value)
+        if size > self.max_memory_bytes:
+            return
+        self._memory[key] = value
+        self._memory_sizes[key] = size
+        self._memory_bytes += size
+        while len(self._memory) > self.max_entries or self._memory_bytes > self.max_memory_bytes:
+            self._memory_pop(next(iter(self._memory)))
+            self._stats['evictions'] += 1
+
+    def _memory_pop(self, key: str):
+        if key in self._memory:
+            del self._memory[key]
+            self._memory_bytes -= self._memory_sizes.pop(key)
+
+    def _disk_get(self, key: str) -> Any:
+        if not self.db_path:
+            return _MISSING
+        try:
+            conn = get_connection(self.db_path)
+            row = conn.execute('SELECT value FROM analysis_cache WHERE cache_key = ?', (key,)).fetchone()
+            if row is None:
+                conn.close()
+                return _MISSING
+            try:
+                raw = row[0]
+                value = loads_cached_value(raw.decode('utf-8') if isinstance(raw, bytes) else raw)
+            except Exception as e:
+                # Corrupt or legacy (pickled) entry: drop it and recompute
+                print(f"Evicting unreadable analysis cache entry: {e}")
+                conn.execute('DELETE FROM analysis_cache WHERE cache_key = ?', (key,))
+                conn.commit()
+                conn.close()
+                with self._lock:
+                    self._stats['disk_evictions'] += 1
+                return _MISSING
+            conn.execute('UPDATE analysis_cache SET last_access = ? WHERE cache_key = ?', (time.time(), key))
+            conn.commit()
+            conn.close()
+            return value
+        except Exception as e:
+            print(f"Error reading analysis cache: {e}")
+            return _MISSING
+
+    def _disk_put(self, key: str, value: Any):
+        if not self.db_path:
+            return
+        try:
+            try:
+                blob = dumps_cached_value(value)
+            except (TypeError, ValueError):
+                return  # Not JSON-representable: keep it in the memory tier only
+            if len(blob) > self.max_disk_bytes:
+                return
+
+            conn = get_connection(self.db_path)
+            conn.execute('''
+                INSERT OR REPLACE INTO analysis_cache (cache_key, value, size_bytes, last_access)
+                VALUES (?, ?, ?, ?)
+            ''', (key, blob, len(blob), time.time()))
+
+            # Evict least recently used rows until the tier fits its byte budget
+            total = conn.execute('SELECT COALESCE(SUM(size_bytes), 0) FROM analysis_cache').fetchone()[0]
+            if total > self.max_disk_bytes:
+                rows = conn.execute('SELECT cache_key, size_bytes FROM analysis_cache ORDER BY last_access').fetchall()
+                stale = []
+                for cache_key, size in rows:
+                    if total <= self.max_disk_bytes:
+                        break
+                    stale.append((cache_key,))
+                    total -= size
+                conn.executemany('DELETE FROM analysis_cache WHERE cache_key = ?', stale)
+                with self._lock:
+                    self._stats['disk_evictions'] += len(stale)
+
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error writing analysis cache: {e}")
+
+    def _disk_usage(self) -> Tuple[int, int]:
+        if not self.db_path:
+            return 0, 0
+        try:
+            conn = get_connection(self.db_path)
+            count, size = conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM analysis_cache').fetchone()
+            conn.close()
+            return count, size
+        except Exception:
+            return 0, 0
+
+
+_analysis_cache: Optional[AnalysisCache] = None
+_analysis_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> AnalysisCache:
+    """Process-wide cache shared by every session
+
+    Set ``NXTRIX_ANALYSIS_CACHE_DB`` to a file path to enable the on-disk tier
+    and ``NXTRIX_ANALYSIS_CACHE_MEMORY_MB`` to change the memory tier's budget.
+    """
+    global _analysis_cache
+    with _analysis_cache_lock:
+        if _analysis_cache is None:
+            memory_mb = float(os.getenv('NXTRIX_ANALYSIS_CACHE_MEMORY_MB', '64'))
+            _analysis_cache = AnalysisCache(db_path=os.getenv('NXTRIX_ANALYSIS_CACHE_DB') or None,
+                                            max_memory_bytes=int(memory_mb * 1024 * 1024))
+        return _analysis_cache
+
+
+def cached_analysis(namespace: str, cache_if: Optional[Callable[[Dict[str, Any]], bool]] = None):
+    """Memoize an analysis method on its inputs and the instance's assumptions
+
+    The instance's attributes (growth rates, horizons, ...) are part of the
+    key, so changing an assumption never returns a stale result. ``cache_if``
+    receives the bound arguments; calls it rejects run uncached.
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            inputs = dict(bound.arguments)
+            inputs.pop('self', None)
+            if cache_if is not None and not cache_if(inputs):
+                return method(self, *args, **kwargs)
+            key = make_cache_key(namespace, vars(self), inputs)
+            return get_analysis_cache().get_or_compute(key, lambda: method(self, *args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,149 @@
+"""
+Vectorized Financial Math for NXTRIX CRM
+NPV and IRR kernels that solve many cash-flow vectors at once:
+- Cash flows are a 1-D array (one deal) or a 2-D array (deals x periods)
+- IRR uses vectorized Newton-Raphson with a bracketed bisection fallback
+- Rows without a solution return NaN instead of a silent default
+- Closed-form monthly loan amortization for many loans at once
+"""
+
+import numpy as np
+from typing import Union, Sequence
+
+ArrayLike = Union[Sequence[float], Sequence[Sequence[float]], np.ndarray]
+
+
+def _as_2d(cash_flows: ArrayLike):
+    """Return cash flows as a float (deals x periods) array and whether the input was 1-D"""
+    flows = np.asarray(cash_flows, dtype=float)
+    single = flows.ndim == 1
+    return np.atleast_2d(flows), single
+
+
+def _discount_factors(rates: np.ndarray, periods: int) -> np.ndarray:
+    """(deals x periods) discount factors 1 / (1 + rate) ** t"""
+    return (1.0 + rates)[:, None] ** -np.arange(periods, dtype=float)
+
+
+def npv(cash_flows: ArrayLike, discount_rate: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
+    """Net Present Value of each cash-flow row, period 0 undiscounted"""
+    flows, single = _as_2d(cash_flows)
+    rates = np.broadcast_to(np.asarray(discount_rate, dtype=float), (flows.shape[0],))
+    values = (flows * _discount_factors(rates, flows.shape[1])).sum(axis=1)
+    return float(values[0]) if single else values
+
+
+def _npv_and_derivative(flows: np.ndarray, rates: np.ndarray):
+    """NPV and d(NPV)/d(rate) for each row at its own rate"""
+    periods = np.arange(flows.shape[1], dtype=float)
+    factors = _discount_factors(rates, flows.shape[1])
+    values = (flows * factors).sum(axis=1)
+    derivatives = (-periods * flows * factors).sum(axis=1) / (1.0 + rates)
+    return values, derivatives
+
+
+def irr(cash_flows: ArrayLike, guess: float = 0.1, tol: float = 1e-10, max_iter: int = 100,
+        lower: float = -0.99, upper: float = 10.0) -> Union[float, np.ndarray]:
+    """Internal Rate of Return of each cash-flow row
+
+    Newton-Raphson runs on all rows together; rows that fail to converge
+    inside ``[lower, upper]`` are solved by bisection when NPV changes
+    sign across the bracket, otherwise their IRR is NaN.
+    """
+    flows, single = _as_2d(cash_flows)
+    num_rows = flows.shape[0]
+    rates = np.full(num_rows, float(guess))
+    active = np.ones(num_rows, dtype=bool)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for _ in range(max_iter):
+            if not active.any():
+                break
+            values, derivatives = _npv_and_derivative(flows[active], rates[active])
+            step = values / derivatives
+            step[~np.isfinite(step)] = np.nan
+            new_rates = rates[active] - step
+
+            idx = np.flatnonzero(active)
+            rates[idx] = new_rates
+            done = np.abs(step) < tol
+            active[idx[done | np.isnan(step)]] = False
+
+        # Anything unconverged, non-finite or outside the bracket falls back to bisection
+        values, _ = _npv_and_derivative(flows, np.clip(np.nan_to_num(rates, nan=guess), lower, upper))
+        scale = np.maximum(np.abs(flows).sum(axis=1), 1.0)
+        failed = (active | ~np.isfinite(rates) | (rates < lower) | (rates > upper)
+                  | (np.abs(values) > 1e-6 * scale))
+        if failed.any():
+            rates[failed] = _bisect(flows[failed], lower, upper, tol)
+
+    return float(rates[0]) if single else rates
+
+
+def _bisect(flows: np.ndarray, lower: float, upper: float, tol: float) -> np.ndarray:
+    """Vectorized bisection on [lower, upper]; NaN where NPV does not change sign"""
+    num_rows = flows.shape[0]
+    low = np.full(num_rows, lower)
+    high = np.full(num_rows, upper)
+    low_values = npv(flows, low)
+    high_values = npv(flows, high)
+    bracketed = np.sign(low_values) != np.sign(high_values)
+
+    # Enough halvings to shrink the bracket below tol
+    iterations = int(np.ceil(np.log2((upper - lower) / tol))) + 1
+    for _ in range(iterations):
+        mid = (low + high) / 2
+        mid_values = npv(flows, mid)
+        same_side = np.sign(mid_values) == np.sign(low_values)
+        low = np.where(same_side, mid, low)
+        low_values = np.where(same_side, mid_values, low_values)
+        high = np.where(same_side, high, mid)
+
+    result = (low + high) / 2
+    result[~bracketed] = np.nan
+    return result
+
+
+def amortization_schedule(principal: ArrayLike, annual_rate: ArrayLike, term_months: ArrayLike,
+                          num_months: int) -> dict:
+    """Monthly amortization for one or many fixed-rate loans
+
+    ``principal``, ``annual_rate`` (decimal) and ``term_months`` are scalars or
+    1-D arrays (one entry per loan). Returns (loans x months) arrays of
+    payment, interest, principal paid and ending balance for months
+    1..``num_months``; payments stop once a loan's term is over.
+    """
+    principal = np.atleast_1d(np.asarray(principal, dtype=float))
+    monthly_rate = np.atleast_1d(np.asarray(annual_rate, dtype=float)) / 12
+    term = np.atleast_1d(np.asarray(term_months, dtype=float))
+    principal, monthly_rate, term = np.broadcast_arrays(principal, monthly_rate, term)
+
+    rate = monthly_rate[:, None]
+    months = np.arange(0, num_months + 1, dtype=float)[None, :]
+    elapsed = np.minimum(months, term[:, None])
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        growth_term = (1 + monthly_rate) ** term
+        payment = np.where(monthly_rate == 0,
+                           principal / np.where(term > 0, term, 1),
+                           principal * monthly_rate * growth_term / (growth_term - 1))
+        payment = np.where((principal == 0) | (term <= 0), 0.0, payment)
+
+        # Closed-form remaining balance after k payments
+        growth = (1 + rate) ** elapsed
+        balance = np.where(rate == 0,
+                           principal[:, None] - payment[:, None] * elapsed,
+                           principal[:, None] * growth - payment[:, None] * (growth - 1) / rate)
+    balance = np.maximum(balance, 0.0)
+
+    principal_paid = balance[:, :-1] - balance[:, 1:]
+    in_term = months[:, 1:] <= term[:, None]
+    payments = np.where(in_term, payment[:, None], 0.0)
+    interest = payments - principal_paid
+
+    return {
+        'payment': payments,
+        'interest': interest,
+        'principal': principal_paid,
+        'balance': balance[:, 1:]
+    }
@@ -15,14 +15,33 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 import streamlit as st
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Optional
 import random
 
+from financial_cache import cached_analysis
+from financial_math import irr as vectorized_irr, npv as vectorized_npv
+
+def _is_seeded(inputs: Dict[str, Any]) -> bool:
+    """Only seeded simulations are reproducible, so only those are cached"""
+    return inputs.get('seed') is not None
+
 class AdvancedFinancialModeling:
     def __init__(self):
         self.scenarios = ['Conservative', 'Base Case', 'Optimistic']
         self.projection_years = 10
         
+        # Monte Carlo market variables: (mean, std, lower bound, upper bound)
+        self.market_variables = {
+            'rent_growth': (0.03, 0.02, -0.05, 0.15),  # 3% ± 2%
+            'expense_growth': (0.03, 0.015, 0, 0.10),  # 3% ± 1.5%
+            'vacancy_rate': (0.05, 0.02, 0, 0.20),  # 5% ± 2%
+            'appreciation': (0.03, 0.02, -0.10, 0.20),  # 3% ± 2%
+            'interest_rate': (0.06, 0.01, 0.03, 0.12)  # 6% ± 1%
+        }
+        # Variables shared by every deal on a portfolio path (market-wide shocks)
+        self.systemic_variables = ('interest_rate', 'appreciation', 'rent_growth', 'expense_growth')
+        
+    @cached_analysis('financial_modeling.generate_cash_flow_projections')
     def generate_cash_flow_projections(self, deal_data: Dict) -> Dict:
         """Generate detailed 10-year cash flow projections with multiple scenarios"""
         
@@ -82,76 +101,225 @@ class AdvancedFinancialModeling:
         
         return projections
     
-    def monte_carlo_simulation(self, deal_data: Dict, num_simulations: int = 1000) -> Dict:
-        """Run Monte Carlo simulation for risk analysis"""
+    @cached_analysis('financial_modeling.monte_carlo_simulation', cache_if=_is_seeded)
+    def monte_carlo_simulation(self, deal_data: Dict, num_simulations: int = 1000,
+                               seed: Optional[int] = None, chunk_size: int = 50000) -> Dict:
+        """Run Monte Carlo simulation for risk analysis
         
-        results = []
+        All paths are drawn and evolved as NumPy arrays, in chunks of at most
+        ``chunk_size`` paths so memory stays bounded for very large runs.
+        Pass ``seed`` for reproducible results.
+        """
         
-        for _ in range(num_simulations):
-            # Random variables with normal distributions
-            rent_growth = np.random.normal(0.03, 0.02)  # 3% ± 2%
-            expense_growth = np.random.normal(0.03, 0.015)  # 3% ± 1.5%
-            vacancy_rate = np.random.normal(0.05, 0.02)  # 5% ± 2%
-            appreciation = np.random.normal(0.03, 0.02)  # 3% ± 2%
-            interest_rate = np.random.normal(0.06, 0.01)  # 6% ± 1%
-            
-            # Ensure reasonable bounds
-            rent_growth = max(-0.05, min(0.15, rent_growth))
-            expense_growth = max(0, min(0.10, expense_growth))
-            vacancy_rate = max(0, min(0.20, vacancy_rate))
-            appreciation = max(-0.10, min(0.20, appreciation))
-            interest_rate = max(0.03, min(0.12, interest_rate))
-            
-            # Calculate 10-year returns
-            total_cash_flow = 0
-            purchase_price = deal_data.get('purchase_price', 0)
-            monthly_rent = deal_data.get('monthly_rent', 0)
-            annual_expenses = self._calculate_annual_expenses(deal_data)
-            
-            current_rent = monthly_rent * 12
-            current_expenses = annual_expenses
-            
-            for year in range(1, 11):
-                annual_rent = current_rent * (1 - vacancy_rate)
-                noi = annual_rent - current_expenses
-                loan_amount = purchase_price * 0.8
-                debt_service = loan_amount * (interest_rate + 0.012)  # Interest + principal
-                cash_flow = noi - debt_service
-                total_cash_flow += cash_flow
-                
-                current_rent *= (1 + rent_growth)
-                current_expenses *= (1 + expense_growth)
-            
-            # Final property value and equity
-            final_value = purchase_price * ((1 + appreciation) ** 10)
-            remaining_loan = loan_amount * 0.7  # Approximate after 10 years
-            final_equity = final_value - remaining_loan
-            
-            total_return = total_cash_flow + final_equity - (purchase_price * 0.2)  # Minus down payment
-            roi = (total_return / (purchase_price * 0.2)) * 100
-            
-            results.append({
-                'total_return': total_return,
-                'roi': roi,
-                'final_value': final_value,
-                'total_cash_flow': total_cash_flow
-            })
+        rng = np.random.default_rng(seed)
+        chunk_size = max(1, int(chunk_size))
+        
+        chunks = []
+        remaining = int(num_simulations)
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            chunks.append(self._simulate_paths(deal_data, rng, size))
+            remaining -= size
+        
+        if chunks:
+            results = {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+        else:
+            results = {key: np.empty(0) for key in ('total_return', 'roi', 'final_value', 'total_cash_flow')}
         
         df = pd.DataFrame(results)
+        roi = results['roi']
         
         return {
             'results': df,
-            'statistics': {
-                'mean_roi': df['roi'].mean(),
-                'median_roi': df['roi'].median(),
-                'std_roi': df['roi'].std(),
-                'percentile_5': df['roi'].quantile(0.05),
-                'percentile_95': df['roi'].quantile(0.95),
-                'probability_positive': (df['roi'] > 0).mean() * 100,
-                'probability_target': (df['roi'] > 15).mean() * 100  # Prob of >15% ROI
-            }
+            'statistics': self._roi_statistics(roi)
+        }
+    
+    @cached_analysis('financial_modeling.portfolio_monte_carlo_simulation', cache_if=_is_seeded)
+    def portfolio_monte_carlo_simulation(self, deals: List[Dict], num_simulations: int = 1000,
+                                         seed: Optional[int] = None, chunk_size: int = 10000,
+                                         market_correlation: float = 1.0) -> Dict:
+        """Run one shared-scenario Monte Carlo simulation across a portfolio of deals
+        
+        Every path is a market scenario applied to all deals at once as an
+        (N deals x S paths) array. Systemic variables (rates, appreciation,
+        rent and expense growth) share a market shock per path; with
+        ``market_correlation`` below 1.0 each deal also gets an idiosyncratic
+        component. Vacancy is always deal-specific.
+        """
+        
+        num_deals = len(deals)
+        num_simulations = int(num_simulations)
+        rng = np.random.default_rng(seed)
+        chunk_size = max(1, int(chunk_size))
+        market_correlation = min(1.0, max(0.0, float(market_correlation)))
+        
+        purchase_prices = np.array([d.get('purchase_price', 0) for d in deals], dtype=float)[:, None]
+        monthly_rents = np.array([d.get('monthly_rent', 0) for d in deals], dtype=float)[:, None]
+        annual_expenses = np.array([self._calculate_annual_expenses(d) for d in deals], dtype=float)[:, None]
+        down_payments = purchase_prices[:, 0] * 0.2
+        
+        deal_roi = np.empty((num_deals, num_simulations))
+        portfolio_return = np.empty(num_simulations)
+        
+        start = 0
+        while start < num_simulations:
+            size = min(chunk_size, num_simulations - start)
+            variables = self._draw_portfolio_variables(rng, num_deals, size, market_correlation)
+            paths = self._evolve_paths(purchase_prices, monthly_rents, annual_expenses, variables)
+            
+            deal_roi[:, start:start + size] = paths['roi']
+            portfolio_return[start:start + size] = paths['total_return'].sum(axis=0)
+            start += size
+        
+        total_invested = down_payments.sum()
+        if total_invested > 0:
+            portfolio_roi = portfolio_return / total_invested * 100
+        else:
+            portfolio_roi = np.zeros(num_simulations)
+        portfolio_loss = np.maximum(-portfolio_return, 0)
+        
+        if num_simulations:
+            p5, p25, p50, p75, p95 = np.percentile(deal_roi, [5, 25, 50, 75, 95], axis=1)
+        else:
+            p5 = p25 = p50 = p75 = p95 = np.full(num_deals, np.nan)
+        
+        per_deal = pd.DataFrame({
+            'deal': [d.get('id', d.get('address', i)) for i, d in enumerate(deals)],
+            'mean_roi': deal_roi.mean(axis=1) if num_simulations else np.full(num_deals, np.nan),
+            'percentile_5': p5,
+            'percentile_25': p25,
+            'median_roi': p50,
+            'percentile_75': p75,
+            'percentile_95': p95,
+            'probability_positive': (deal_roi > 0).mean(axis=1) * 100 if num_simulations else np.full(num_deals, np.nan)
+        })
+        
+        statistics = self._roi_statistics(portfolio_roi)
+        if num_simulations:
+            value_at_risk = np.percentile(-portfolio_return, 95)
+            tail = portfolio_loss[-portfolio_return >= value_at_risk]  # Worst 5% of paths
+            statistics.update({
+                'total_invested': float(total_invested),
+                'mean_total_return': float(portfolio_return.mean()),
+                'expected_loss': float(portfolio_loss.mean()),
+                'probability_loss': float((portfolio_return < 0).mean() * 100),
+                'value_at_risk_95': float(max(value_at_risk, 0)),
+                'conditional_value_at_risk_95': float(tail.mean()) if tail.size else 0.0
+            })
+        
+        return {
+            'per_deal': per_deal,
+            'portfolio_results': pd.DataFrame({
+                'total_return': portfolio_return,
+                'roi': portfolio_roi,
+                'loss': portfolio_loss
+            }),
+            'statistics': statistics
+        }
+    
+    def _draw_portfolio_variables(self, rng: np.random.Generator, num_deals: int, size: int,
+                                  market_correlation: float) -> Dict[str, np.ndarray]:
+        """Draw (N deals x S paths) market variables with shared systemic shocks"""
+        variables = {}
+        market_weight = np.sqrt(market_correlation)
+        deal_weight = np.sqrt(1 - market_correlation)
+        
+        for name in self.market_variables:
+            if name in self.systemic_variables:
+                z = market_weight * rng.standard_normal(size)[None, :]
+                if deal_weight > 0:
+                    z = z + deal_weight * rng.standard_normal((num_deals, size))
+                else:
+                    z = np.broadcast_to(z, (num_deals, size))
+            else:
+                z = rng.standard_normal((num_deals, size))
+            variables[name] = self._scale_market_variable(name, z)
+        
+        return variables
+    
+    def _draw_market_variables(self, rng: np.random.Generator, size) -> Dict[str, np.ndarray]:
+        """Draw bounded market variables for ``size`` simulation paths"""
+        return {
+            name: self._scale_market_variable(name, rng.standard_normal(size))
+            for name in self.market_variables
+        }
+    
+    def _scale_market_variable(self, name: str, z: np.ndarray) -> np.ndarray:
+        """Map standard normal draws onto a bounded market variable"""
+        mean, std, lower, upper = self.market_variables[name]
+        return np.clip(mean + std * z, lower, upper)
+    
+    def _evolve_paths(self, purchase_price, monthly_rent, annual_expenses,
+                      variables: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Evolve every path across the holding period at once
+        
+        Deal inputs may be scalars or arrays that broadcast against the
+        market variables (e.g. shape ``(N, 1)`` against ``(S,)`` draws).
+        """
+        purchase_price = np.asarray(purchase_price, dtype=float)
+        loan_amount = purchase_price * 0.8
+        down_payment = purchase_price * 0.2
+        debt_service = loan_amount * (variables['interest_rate'] + 0.012)  # Interest + principal
+        
+        rent_factor = 1 + variables['rent_growth']
+        expense_factor = 1 + variables['expense_growth']
+        occupancy = 1 - variables['vacancy_rate']
+        
+        current_rent = np.asarray(monthly_rent, dtype=float) * 12
+        current_expenses = np.asarray(annual_expenses, dtype=float)
+        total_cash_flow = np.zeros(np.broadcast(purchase_price, rent_factor).shape)
+        
+        for _ in range(self.projection_years):
+            noi = current_rent * occupancy - current_expenses
+            total_cash_flow += noi - debt_service
+            current_rent = current_rent * rent_factor
+            current_expenses = current_expenses * expense_factor
+        
+        # Final property value and equity
+        final_value = purchase_price * (1 + variables['appreciation']) ** self.projection_years
+        remaining_loan = loan_amount * 0.7  # Approximate after 10 years
+        final_equity = final_value - remaining_loan
+        
+        total_return = total_cash_flow + final_equity - down_payment  # Minus down payment
+        with np.errstate(divide='ignore', invalid='ignore'):
+            roi = np.where(down_payment > 0, total_return / down_payment * 100, 0.0)
+        
+        return {
+            'total_return': total_return,
+            'roi': roi,
+            'final_value': final_value,
+            'total_cash_flow': total_cash_flow
         }
     
+    def _simulate_paths(self, deal_data: Dict, rng: np.random.Generator, size: int) -> Dict[str, np.ndarray]:
+        """Simulate one chunk of independent paths for a single deal"""
+        variables = self._draw_market_variables(rng, size)
+        return self._evolve_paths(
+            deal_data.get('purchase_price', 0),
+            deal_data.get('monthly_rent', 0),
+            self._calculate_annual_expenses(deal_data),
+            variables
+        )
+    
+    def _roi_statistics(self, roi: np.ndarray) -> Dict[str, float]:
+        """Summary statistics for a 1-D array of simulated ROI values"""
+        if roi.size == 0:
+            return {key: float('nan') for key in (
+                'mean_roi', 'median_roi', 'std_roi', 'percentile_5', 'percentile_95',
+                'probability_positive', 'probability_target')}
+        
+        percentile_5, median_roi, percentile_95 = np.percentile(roi, [5, 50, 95])
+        return {
+            'mean_roi': float(roi.mean()),
+            'median_roi': float(median_roi),
+            'std_roi': float(roi.std(ddof=1)) if roi.size > 1 else float('nan'),
+            'percentile_5': float(percentile_5),
+            'percentile_95': float(percentile_95),
+            'probability_positive': float((roi > 0).mean() * 100),
+            'probability_target': float((roi > 15).mean() * 100)  # Prob of >15% ROI
+        }
+    
+    @cached_analysis('financial_modeling.sensitivity_analysis')
     def sensitivity_analysis(self, deal_data: Dict) -> Dict:
         """Analyze sensitivity of returns to key variables"""
         
@@ -195,6 +363,7 @@ class AdvancedFinancialModeling:
         
         return sensitivity_results
     
+    @cached_analysis('financial_modeling.exit_strategy_analysis')
     def exit_strategy_analysis(self, deal_data: Dict) -> Dict:
         """Compare different exit strategies: Hold, Flip, BRRRR"""
         
@@ -258,8 +427,31 @@ class AdvancedFinancialModeling:
             'capital_recovered': brrrr_capital_recovered
         }
         
+        # Annualized IRR per strategy from the cash actually invested and returned;
+        # each strategy's cash_flows add up to its profit. Hold and BRRRR share a
+        # 5-year annual timeline.
+        flip_capital = purchase_price + repair_costs
+        flip_flows = [-flip_capital, flip_capital + flip_profit]  # One 6-month period
+        flip_irr = vectorized_irr(flip_flows)
+        
+        hold_capital = purchase_price + repair_costs
+        hold_flows = [-hold_capital] + [annual_noi] * hold_years
+        hold_flows[-1] += hold_capital + appreciation - selling_costs
+        # The refinance returns brrrr_refi_value of the purchase and rehab at t0
+        brrrr_flows = [-(purchase_price + repair_costs) + brrrr_refi_value] + [brrrr_annual_cash_flow] * 5
+        brrrr_flows[-1] += brrrr_equity
+        hold_irr, brrrr_irr = vectorized_irr([hold_flows, brrrr_flows])
+        
+        strategies['Flip']['irr'] = float(((1 + flip_irr) ** (12 / flip_timeline) - 1) * 100)
+        strategies['Flip']['cash_flows'] = flip_flows
+        strategies['Hold']['irr'] = float(hold_irr * 100)
+        strategies['Hold']['cash_flows'] = hold_flows
+        strategies['BRRRR']['irr'] = float(brrrr_irr * 100)
+        strategies['BRRRR']['cash_flows'] = brrrr_flows
+        
         return strategies
     
+    @cached_analysis('financial_modeling.calculate_advanced_metrics')
     def calculate_advanced_metrics(self, deal_data: Dict, projections: Dict) -> Dict:
         """Calculate IRR, NPV, and other advanced financial metrics"""
         
@@ -267,8 +459,11 @@ class AdvancedFinancialModeling:
         down_payment = purchase_price * 0.2
         
         metrics = {}
+        scenarios = list(projections.keys())
+        cash_flow_rows = []
         
-        for scenario, df in projections.items():
+        for scenario in scenarios:
+            df = projections[scenario]
             cash_flows = [-down_payment] + df['cash_flow'].tolist()
             
             # Add final sale proceeds
@@ -277,21 +472,24 @@ class AdvancedFinancialModeling:
             selling_costs = final_value * 0.06
             final_proceeds = final_value - loan_balance - selling_costs
             cash_flows[-1] += final_proceeds
-            
-            # Calculate IRR using numpy
-            irr = self._calculate_irr(cash_flows)
-            
-            # Calculate NPV at 10% discount rate
-            npv = self._calculate_npv(cash_flows, 0.10)
+            cash_flow_rows.append(cash_flows)
+        
+        # Solve IRR and NPV at 10% for every scenario in one pass
+        cash_flow_matrix = np.array(cash_flow_rows, dtype=float).reshape(len(scenarios), -1)
+        irrs = vectorized_irr(cash_flow_matrix)
+        npvs = vectorized_npv(cash_flow_matrix, 0.10)
+        
+        for i, scenario in enumerate(scenarios):
+            df = projections[scenario]
             
             # Calculate total return and ROI
             total_invested = down_payment
-            total_return = sum(cash_flows[1:])  # Exclude initial investment
+            total_return = cash_flow_matrix[i, 1:].sum()  # Exclude initial investment
             roi = (total_return / total_invested) * 100 if total_invested > 0 else 0
             
             metrics[scenario] = {
-                'irr': irr * 100,  # Convert to percentage
-                'npv': npv,
+                'irr': irrs[i] * 100,  # Convert to percentage
+                'npv': npvs[i],
                 'total_return': total_return,
                 'roi': roi,
                 'cash_on_cash': df['cash_flow'].mean() / down_payment * 100,
@@ -331,39 +529,16 @@ class AdvancedFinancialModeling:
         }
     
     def _calculate_irr(self, cash_flows: List[float]) -> float:
-        """Calculate Internal Rate of Return using Newton-Raphson method"""
-        try:
-            # Simple IRR calculation using numpy's approximation
-            return np.irr(cash_flows) if hasattr(np, 'irr') else self._irr_approximation(cash_flows)
-        except:
-            return self._irr_approximation(cash_flows)
+        """Calculate Internal Rate of Return (NaN when no rate solves the cash flows)"""
+        return vectorized_irr(cash_flows)
     
     def _irr_approximation(self, cash_flows: List[float]) -> float:
         """Approximation method for IRR calculation"""
-        try:
-            # Newton-Raphson method approximation
-            rate = 0.1  # Initial guess
-            for _ in range(100):  # Max iterations
-                npv = sum([cf / (1 + rate) ** i for i, cf in enumerate(cash_flows)])
-                derivative = sum([-i * cf / (1 + rate) ** (i + 1) for i, cf in enumerate(cash_flows)])
-                
-                if abs(derivative) < 1e-10:
-                    break
-                    
-                new_rate = rate - npv / derivative
-                
-                if abs(new_rate - rate) < 1e-10:
-                    break
-                    
-                rate = new_rate
-            
-            return rate
-        except:
-            return 0.10  # Default to 10% if calculation fails
+        return vectorized_irr(cash_flows)
     
     def _calculate_npv(self, cash_flows: List[float], discount_rate: float) -> float:
         """Calculate Net Present Value"""
-        return sum([cf / (1 + discount_rate) ** i for i, cf in enumerate(cash_flows)])
+        return vectorized_npv(cash_flows, discount_rate)
 
 
 # Visualization functions for the financial modeling
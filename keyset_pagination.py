@@ -0,0 +1,187 @@
+"""
+Keyset Pagination for NXTRIX CRM
+Paginated listing queries that never materialize a whole table:
+- Keyset (seek) cursors on the listing's sort key, ending in a unique column
+- Projected columns and server-side filters only
+- Opaque cursor tokens that carry the sort key of the last row shown
+- Total count computed once per listing walk and carried in the cursor
+- Streamlit previous/next navigation kept in session state
+"""
+
+import base64
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import streamlit as st
+
+from db_connection import get_connection
+
+DEFAULT_PAGE_SIZE = 50
+
+_OPERATORS = {'=', '!=', '<', '<=', '>', '>=', 'IN', 'LIKE', 'IS', 'IS NOT'}
+_ALIAS_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+@dataclass
+class Page:
+    """One page of a keyset listing"""
+    rows: List[Any] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    total_estimate: int = 0
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+class KeysetQuery:
+    """Paginated listing over a table (or join) ordered by a unique sort key
+
+    ``columns`` are the projected output columns, either names or a mapping
+    of output alias -> SQL expression. ``order_by`` lists (alias, 'ASC'|'DESC')
+    and must end with a unique column so every row has a distinct position.
+    Sort key columns should be NOT NULL. ``filterable`` adds filter-only
+    aliases. Source, expressions and aliases come from code, never from users;
+    filter values are always bound as parameters.
+    """
+
+    def __init__(self, source: str, columns: Union[Sequence[str], Dict[str, str]],
+                 order_by: Sequence[Tuple[str, str]], filterable: Optional[Dict[str, str]] = None):
+        self.source = source
+        self.columns = dict(columns) if isinstance(columns, dict) else {name: name for name in columns}
+        self.filterable = {**self.columns, **(filterable or {})}
+        self.order_by = [(name, direction.upper()) for name, direction in order_by]
+        for name in list(self.columns) + list(self.filterable):
+            if not _ALIAS_PATTERN.match(name):
+                raise ValueError(f"Invalid column alias: {name!r}")
+        for name, direction in self.order_by:
+            if name not in self.columns or direction not in ('ASC', 'DESC'):
+                raise ValueError(f"Invalid sort key: {name} {direction}")
+
+    def fetch(self, db_path: str, filters: Sequence[Tuple[str, str, Any]] = (),
+              cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE) -> Page:
+        """Fetch the page after ``cursor`` (first page when None)
+
+        ``filters`` are (alias, operator, value) with operators
+        =, !=, <, <=, >, >=, IN (value is a sequence), LIKE and IS / IS NOT
+        (value None tests for NULL).
+        """
+        where, params = self._filter_clause(filters)
+        position, total = self._decode_cursor(cursor)
+
+        conn = get_connection(db_path)
+        try:
+            if total is None:
+                total = conn.execute(f"SELECT COUNT(*) FROM {self.source} {self._where(where)}", params).fetchone()[0]
+
+            seek_where, seek_params = list(where), list(params)
+            if position is not None:
+                clause, values = self._seek_clause(position)
+                seek_where.append(clause)
+                seek_params.extend(values)
+
+            projection = ', '.join(expression if expression == alias else f"{expression} AS {alias}"
+                                   for alias, expression in self.columns.items())
+            ordering = ', '.join(f"{self.columns[name]} {direction}" for name, direction in self.order_by)
+            result = conn.execute(f'''
+                SELECT {projection} FROM {self.source} {self._where(seek_where)}
+                ORDER BY {ordering} LIMIT ?
+            ''', seek_params + [page_size + 1])
+            names = [description[0] for description in result.description]
+            rows = [dict(zip(names, row)) for row in result.fetchall()]
+        finally:
+            conn.close()
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = self._encode_cursor([rows[-1][name] for name, _ in self.order_by], total)
+        return Page(rows=rows, next_cursor=next_cursor, total_estimate=total)
+
+    def _filter_clause(self, filters: Sequence[Tuple[str, str, Any]]) -> Tuple[List[str], List[Any]]:
+        clauses, params = [], []
+        for name, operator, value in filters:
+            operator = operator.upper()
+            if name not in self.filterable or operator not in _OPERATORS:
+                raise ValueError(f"Unsupported filter: {name} {operator}")
+            expression = self.filterable[name]
+            if operator == 'IN':
+                values = list(value)
+                if not values:
+                    clauses.append('0')
+                    continue
+                clauses.append(f"{expression} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+            else:
+                clauses.append(f"{expression} {operator} ?")
+                params.append(value)
+        return clauses, params
+
+    def _seek_clause(self, position: List[Any]) -> Tuple[str, List[Any]]:
+        """Rows strictly after ``position`` in sort order"""
+        expressions = [self.columns[name] for name, _ in self.order_by]
+        directions = {direction for _, direction in self.order_by}
+        if len(directions) == 1:
+            # Uniform direction: a row-value comparison lets SQLite seek the sort index
+            operator = '<' if directions == {'DESC'} else '>'
+            return (f"({', '.join(expressions)}) {operator} ({', '.join('?' * len(expressions))})",
+                    list(position))
+
+        alternatives, params = [], []
+        for index, (name, direction) in enumerate(self.order_by):
+            equal = [f"{expression} = ?" for expression in expressions[:index]]
+            operator = '<' if direction == 'DESC' else '>'
+            alternatives.append('(' + ' AND '.join(equal + [f"{expressions[index]} {operator} ?"]) + ')')
+            params.extend(position[:index + 1])
+        return '(' + ' OR '.join(alternatives) + ')', params
+
+    @staticmethod
+    def _where(clauses: List[str]) -> str:
+        return f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+    def _encode_cursor(self, position: List[Any], total: int) -> str:
+        payload = json.dumps({'k': position, 't': total}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def _decode_cursor(self, cursor: Optional[str]) -> Tuple[Optional[List[Any]], Optional[int]]:
+        if not cursor:
+            return None, None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            position = payload['k']
+            if len(position) != len(self.order_by):
+                raise ValueError("cursor does not match this listing")
+            return position, payload.get('t')
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid page cursor: {e}")
+
+
+def current_page_cursor(state_key: str, filters_signature: Any) -> Optional[str]:
+    """Cursor of the page to show; navigation restarts when the filters change"""
+    state = st.session_state.get(state_key)
+    if not state or state['filters'] != filters_signature:
+        state = {'filters': filters_signature, 'cursors': [None]}
+        st.session_state[state_key] = state
+    return state['cursors'][-1]
+
+
+def show_page_navigation(state_key: str, page: Page, page_size: int = DEFAULT_PAGE_SIZE):
+    """Previous/next buttons and position for a keyset listing"""
+    state = st.session_state[state_key]
+    page_number = len(state['cursors'])
+    first_row = (page_number - 1) * page_size + 1 if page.rows else 0
+    last_row = first_row + len(page.rows) - 1 if page.rows else 0
+
+    col1, col2, col3 = st.columns([1, 3, 1])
+    with col1:
+        if page_number > 1 and st.button("⬅️ Previous", key=f"{state_key}_previous"):
+            state['cursors'].pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Page {page_number} · rows {first_row:,}-{last_row:,} of about {page.total_estimate:,}")
+    with col3:
+        if page.has_more and st.button("Next ➡️", key=f"{state_key}_next"):
+            state['cursors'].append(page.next_cursor)
+            st.rerun()
@@ -0,0 +1,349 @@
+"""
+Bulk Property Lead Import for NXTRIX CRM
+Streaming ingestion of list-provider files into automated deal sourcing:
+- Reads CSV or JSONL row by row, never the whole file at once
+- Validates and normalizes each row into a PropertyLead (header aliases, "$1,200" prices, enum names)
+- Skips leads already on file or repeated in the upload, by normalized address
+- Writes in batched transactions with executemany; investor matching runs per batch
+- Batches that fail to write are counted in the report, never dropped silently
+- Progress callback after every batch, plus a throughput benchmark
+"""
+
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from automated_deal_sourcing import (
+    AutomatedDealSourcing, DealSourceType, PropertyCondition, PropertyLead, PropertyType
+)
+from db_connection import get_connection
+
+# Provider column names -> PropertyLead fields
+COLUMN_ALIASES = {
+    'address': 'property_address',
+    'street_address': 'property_address',
+    'street': 'property_address',
+    'zip': 'zip_code',
+    'zipcode': 'zip_code',
+    'postal_code': 'zip_code',
+    'type': 'property_type',
+    'beds': 'bedrooms',
+    'baths': 'bathrooms',
+    'sqft': 'square_feet',
+    'square_footage': 'square_feet',
+    'lot_acres': 'lot_size',
+    'price': 'asking_price',
+    'list_price': 'asking_price',
+    'arv': 'estimated_arv',
+    'after_repair_value': 'estimated_arv',
+    'rehab': 'estimated_rehab',
+    'repairs': 'estimated_rehab',
+    'condition': 'property_condition',
+    'dom': 'days_on_market',
+    'agent': 'listing_agent',
+    'agent_phone': 'listing_agent_phone',
+    'source': 'deal_source',
+    'contact': 'lead_source_contact'
+}
+
+# Street words reduced to the USPS abbreviation before comparing addresses
+ADDRESS_ABBREVIATIONS = {
+    'street': 'st', 'avenue': 'ave', 'av': 'ave', 'road': 'rd', 'drive': 'dr', 'boulevard': 'blvd',
+    'lane': 'ln', 'court': 'ct', 'place': 'pl', 'terrace': 'ter', 'circle': 'cir', 'highway': 'hwy',
+    'parkway': 'pkwy', 'square': 'sq', 'trail': 'trl', 'way': 'way',
+    'north': 'n', 'south': 's', 'east': 'e', 'west': 'w',
+    'northeast': 'ne', 'northwest': 'nw', 'southeast': 'se', 'southwest': 'sw',
+    'apartment': 'unit', 'apt': 'unit', 'suite': 'unit', 'ste': 'unit'
+}
+
+_WORD_PATTERN = re.compile(r'[a-z0-9]+')
+_NUMBER_PATTERN = re.compile(r'[^0-9.\-]')
+
+MAX_REPORTED_ERRORS = 100
+
+
+@dataclass
+class ImportReport:
+    """Outcome of a bulk import"""
+    rows_read: int = 0
+    imported: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    failed: int = 0  # valid rows lost because their batch failed to write
+    batches: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)  # (row number, message)
+    started_at: float = field(default_factory=time.perf_counter)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'rows_read': self.rows_read,
+            'imported': self.imported,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'failed': self.failed,
+            'batches': self.batches,
+            'errors': list(self.errors),
+            'elapsed_seconds': self.elapsed_seconds,
+            'rows_per_second': self.rows_per_second
+        }
+
+
+def normalize_address(address: str, city: str = '', state: str = '', zip_code: str = '') -> str:
+    """Comparable key for a property: abbreviated street words plus ZIP (or city/state)"""
+    words = [ADDRESS_ABBREVIATIONS.get(word, word) for word in _WORD_PATTERN.findall((address or '').lower())]
+    zip5 = ''.join(_WORD_PATTERN.findall((zip_code or '').lower()))[:5]
+    locality = zip5 or ' '.join(_WORD_PATTERN.findall(f"{city or ''} {state or ''}".lower()))
+    return f"{' '.join(words)}|{locality}"
+
+
+def read_records(source: Union[str, os.PathLike, io.IOBase, Any], file_format: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Stream dict rows from a CSV or JSONL path or file object (text or binary)"""
+    if file_format is None:
+        name = str(getattr(source, 'name', source))
+        file_format = 'jsonl' if name.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'r', encoding='utf-8-sig', newline='') as handle:
+            yield from _read_handle(handle, file_format)
+        return
+
+    handle = source
+    if isinstance(source.read(0), bytes):
+        handle = io.TextIOWrapper(source, encoding='utf-8-sig', newline='')
+    try:
+        yield from _read_handle(handle, file_format)
+    finally:
+        if handle is not source:
+            handle.detach()
+
+
+def _read_handle(handle, file_format: str) -> Iterator[Dict[str, Any]]:
+    if file_format == 'jsonl':
+        for line in handle:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    else:
+        yield from csv.DictReader(handle)
+
+
+def _canonical_column(name: str) -> str:
+    key = re.sub(r'[\s\-]+', '_', str(name).strip().lower())
+    return COLUMN_ALIASES.get(key, key)
+
+
+def _blank(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _number(value: Any, default: float = 0.0) -> float:
+    if _blank(value):
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    cleaned = _NUMBER_PATTERN.sub('', str(value))
+    if cleaned in ('', '-', '.'):
+        raise ValueError(f"not a number: {value!r}")
+    return float(cleaned)
+
+
+def _enum(enum_cls, value: Any, default):
+    """Enum member by value or name, case- and punctuation-insensitive; prefixes of values accepted"""
+    if _blank(value):
+        return default
+    if isinstance(value, enum_cls):
+        return value
+    wanted = ''.join(_WORD_PATTERN.findall(str(value).lower()))
+    for member in enum_cls:
+        member_value = ''.join(_WORD_PATTERN.findall(member.value.lower()))
+        member_name = ''.join(_WORD_PATTERN.findall(member.name.lower()))
+        if wanted in (member_value, member_name) or (len(wanted) >= 4 and member_value.startswith(wanted)):
+            return member
+    raise ValueError(f"unknown {enum_cls.__name__}: {value!r}")
+
+
+def _date(value: Any, default: datetime) -> datetime:
+    if _blank(value):
+        return default
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).strip())
+
+
+def row_to_property_lead(row: Dict[str, Any], now: Optional[datetime] = None,
+                         default_source: DealSourceType = DealSourceType.ONLINE_PLATFORMS) -> PropertyLead:
+    """Validate and normalize one provider row; raises ValueError when unusable"""
+    now = now or datetime.now()
+    data = {_canonical_column(key): value for key, value in row.items() if key is not None}
+
+    address = ' '.join(str(data.get('property_address') or '').split())
+    city = ' '.join(str(data.get('city') or '').split())
+    if not address:
+        raise ValueError("missing property address")
+    if not city and _blank(data.get('zip_code')):
+        raise ValueError("missing city and ZIP code")
+
+    asking_price = _number(data.get('asking_price'))
+    if asking_price <= 0:
+        raise ValueError("asking price must be positive")
+
+    photos = data.get('photos') or []
+    if isinstance(photos, str):
+        photos = json.loads(photos) if photos.strip().startswith('[') else [p.strip() for p in photos.split(',') if p.strip()]
+
+    return PropertyLead(
+        lead_id=str(data.get('lead_id') or uuid.uuid4()),
+        property_address=address,
+        city=city.title() if city.isupper() or city.islower() else city,
+        state=str(data.get('state') or '').strip().upper(),
+        zip_code=str(data.get('zip_code') or '').strip(),
+        property_type=_enum(PropertyType, data.get('property_type'), PropertyType.SINGLE_FAMILY),
+        bedrooms=int(_number(data.get('bedrooms'))),
+        bathrooms=_number(data.get('bathrooms')),
+        square_feet=int(_number(data.get('square_feet'))),
+        lot_size=_number(data.get('lot_size')),
+        year_built=int(_number(data.get('year_built'))),
+        asking_price=asking_price,
+        estimated_arv=_number(data.get('estimated_arv')),
+        estimated_rehab=_number(data.get('estimated_rehab')),
+        property_condition=_enum(PropertyCondition, data.get('property_condition'), PropertyCondition.FAIR),
+        days_on_market=int(_number(data.get('days_on_market'))),
+        listing_agent=str(data.get('listing_agent') or '').strip(),
+        listing_agent_phone=str(data.get('listing_agent_phone') or '').strip(),
+        deal_source=_enum(DealSourceType, data.get('deal_source'), default_source),
+        lead_source_contact=str(data.get('lead_source_contact') or '').strip(),
+        description=str(data.get('description') or '').strip(),
+        photos=list(photos),
+        discovered_date=_date(data.get('discovered_date'), now),
+        last_updated=now,
+        status=str(data.get('status') or 'New').strip() or 'New',
+        notes=str(data.get('notes') or '').strip()
+    )
+
+
+class PropertyLeadImporter:
+    """Streaming CSV/JSONL import into ``AutomatedDealSourcing``
+
+    Rows are validated one at a time and written ``batch_size`` at a time
+    through ``AutomatedDealSourcing.store_property_lead_batch`` (one
+    transaction per batch, investor matching included). A batch that fails
+    is counted in ``ImportReport.failed`` with its error in ``errors``, and
+    the import moves on. ``progress_callback`` receives the running
+    ``ImportReport`` after every batch.
+    """
+
+    def __init__(self, sourcing: Optional[AutomatedDealSourcing] = None, batch_size: int = 1000,
+                 progress_callback: Optional[Callable[[ImportReport], None]] = None,
+                 default_source: DealSourceType = DealSourceType.ONLINE_PLATFORMS):
+        self.sourcing = sourcing or AutomatedDealSourcing()
+        self.batch_size = batch_size
+        self.progress_callback = progress_callback
+        self.default_source = default_source
+
+    def existing_address_keys(self) -> Set[str]:
+        """Normalized addresses of every lead already stored"""
+        conn = get_connection(self.sourcing.db_path)
+        try:
+            cursor = conn.execute('SELECT property_address, city, state, zip_code FROM property_leads')
+            return {normalize_address(*row) for row in cursor}
+        finally:
+            conn.close()
+
+    def import_file(self, source, file_format: Optional[str] = None) -> ImportReport:
+        """Import a CSV/JSONL path or file object"""
+        return self.import_records(read_records(source, file_format))
+
+    def import_records(self, records: Iterable[Dict[str, Any]]) -> ImportReport:
+        """Import already-parsed rows (dicts keyed by column name)"""
+        report = ImportReport()
+        seen = self.existing_address_keys()
+        now = datetime.now()
+
+        def leads() -> Iterator[Tuple[int, PropertyLead]]:
+            for row_number, row in enumerate(records, start=1):
+                report.rows_read += 1
+                try:
+                    lead = row_to_property_lead(row, now, self.default_source)
+                except (ValueError, TypeError, json.JSONDecodeError) as e:
+                    report.invalid += 1
+                    if len(report.errors) < MAX_REPORTED_ERRORS:
+                        report.errors.append((row_number, str(e)))
+                    continue
+                key = normalize_address(lead.property_address, lead.city, lead.state, lead.zip_code)
+                if key in seen:
+                    report.duplicates += 1
+                    continue
+                seen.add(key)
+                yield row_number, lead
+
+        stream = leads()
+        while True:
+            batch = list(islice(stream, self.batch_size))
+            if not batch:
+                break
+            try:
+                report.imported += self.sourcing.store_property_lead_batch([lead for _, lead in batch])
+            except Exception as e:
+                report.failed += len(batch)
+                # Batch failures are always reported, even past the per-row error limit
+                report.errors.append((batch[0][0], f"rows {batch[0][0]}-{batch[-1][0]} not stored: {e}"))
+            report.batches += 1
+            report.elapsed_seconds = time.perf_counter() - report.started_at
+            if self.progress_callback:
+                self.progress_callback(report)
+
+        report.elapsed_seconds = time.perf_counter() - report.started_at
+        return report
+
+
+def benchmark_import(num_rows: int = 50000, batch_size: int = 1000, duplicate_rate: float = 0.05,
+                     db_path: Optional[str] = None) -> Dict[str, Any]:
+    """Import a synthetic provider CSV into a scratch database and report throughput"""
+    workdir = tempfile.mkdtemp(prefix='nxtrix_import_')
+    db_path = db_path or os.path.join(workdir, 'benchmark.db')
+    csv_path = os.path.join(workdir, 'leads.csv')
+
+    cities = [("Atlanta", "GA", "30309"), ("Phoenix", "AZ", "85001"), ("Dallas", "TX", "75201"),
+              ("Houston", "TX", "77001"), ("Orlando", "FL", "32801"), ("Memphis", "TN", "38103")]
+    types = [pt.value for pt in PropertyType]
+    with open(csv_path, 'w', newline='', encoding='utf-8') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(['Address', 'City', 'State', 'Zip', 'Type', 'Beds', 'Baths', 'SqFt',
+                         'Price', 'ARV', 'Rehab', 'Condition', 'DOM'])
+        for i in range(num_rows):
+            # Every so often repeat an earlier address, spelled differently
+            number = i - 1 if i and (i * 7919) % 1000 < duplicate_rate * 1000 else i
+            suffix = 'Street' if number == i else 'St.'
+            city, state, zip_code = cities[number % len(cities)]
+            price = 50000 + (number * 37) % 350000
+            writer.writerow([f"{100 + number} Main {suffix}", city, state, zip_code, types[number % len(types)],
+                             2 + number % 4, 1 + number % 3, 800 + number % 2200, f"${price:,}",
+                             int(price * 1.3), 5000 + number % 70000, 'Fair', number % 120])
+
+    sourcing = AutomatedDealSourcing(db_path)
+    report = PropertyLeadImporter(sourcing, batch_size=batch_size).import_file(csv_path)
+    return {'db_path': db_path, 'csv_path': csv_path, **report.to_dict()}
+
+
+if __name__ == "__main__":
+    results = benchmark_import()
+    print(f"Imported {results['imported']:,} of {results['rows_read']:,} rows "
+          f"({results['duplicates']:,} duplicates, {results['invalid']:,} invalid, {results['failed']:,} failed) "
+          f"in {results['elapsed_seconds']:.2f}s - {results['rows_per_second']:,.0f} rows/s")
+    if results['failed']:
+        for row_number, problem in results['errors']:
+            print(f"❌ Row {row_number}: {problem}")
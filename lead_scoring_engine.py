@@ -0,0 +1,494 @@
+"""
+Rule-Driven Lead Scoring Engine for NXTRIX CRM
+Scores leads from the rules stored in the scoring_rules table:
+- Rule criteria are parsed once into vectorized predicates (no eval)
+- A whole lead DataFrame is scored in one pass: sum of matching rule points, capped 0-100
+- Separate rule sets per lead model share one table and one engine
+- Rules are read on every scoring pass, so edits apply immediately everywhere
+
+Criteria language (SQL-like, case-insensitive keywords):
+    budget_max >= 250000 AND budget_max < 500000
+    source == 'referral'  |  source IN ('website', 'networking')
+    phone IS NOT NULL AND email IS NOT NULL      (NULL also matches empty text)
+    NOT (status = 'rejected' OR status = 'converted')
+    last_contact >= date('now', '-30 days')  |  days_since(last_contact) <= 7
+Unknown columns read as NULL; comparisons with NULL are false.
+"""
+
+import operator as operator_module
+import re
+import uuid
+from dataclasses import fields, is_dataclass
+from datetime import datetime
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from db_connection import get_connection, transaction
+from schema_migrations import ensure_schema
+
+DEFAULT_RULE_SET = "lead_scoring"
+MAX_SCORE = 100
+
+
+class RuleSyntaxError(ValueError):
+    """Raised when rule criteria cannot be parsed"""
+
+
+# ---- Parsing ----
+
+_TOKEN_PATTERN = re.compile(r"""\s*(?:
+    (?P<number>\d+(?:\.\d*)?|\.\d+) |
+    (?P<string>'(?:[^']|'')*'|"(?:[^"]|"")*") |
+    (?P<op>==|!=|<>|>=|<=|=|<|>|\(|\)|,) |
+    (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+)""", re.VERBOSE)
+
+_KEYWORDS = {'and', 'or', 'not', 'is', 'null', 'in', 'true', 'false'}
+_COMPARISONS = {'==': 'eq', '=': 'eq', '!=': 'ne', '<>': 'ne', '>=': 'ge', '<=': 'le', '>': 'gt', '<': 'lt'}
+_REFLECTED = {'eq': 'eq', 'ne': 'ne', 'ge': 'le', 'le': 'ge', 'gt': 'lt', 'lt': 'gt'}
+_FUNCTIONS = {'date', 'datetime', 'days_since'}
+_MODIFIER_PATTERN = re.compile(r'^\s*([+-]?\d+(?:\.\d+)?)\s+(minute|hour|day|week|month|year)s?\s*$', re.IGNORECASE)
+
+
+def _tokenize(text: str) -> List[Tuple[str, Any]]:
+    tokens, position = [], 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN_PATTERN.match(text, position)
+        if not match or match.end() == position:
+            raise RuleSyntaxError(f"Unexpected character at position {position}: {text[position:position + 10]!r}")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'number':
+            tokens.append(('const', float(value) if '.' in value else int(value)))
+        elif kind == 'string':
+            tokens.append(('const', value[1:-1].replace(value[0] * 2, value[0])))
+        elif kind == 'name' and value.lower() in _KEYWORDS:
+            tokens.append(('kw', value.lower()))
+        else:
+            tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser producing a small tuple AST"""
+
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def parse(self):
+        if not self.tokens:
+            raise RuleSyntaxError("Empty criteria")
+        node = self._or()
+        if self.position != len(self.tokens):
+            raise RuleSyntaxError(f"Unexpected token {self.tokens[self.position][1]!r}")
+        return node
+
+    def _peek(self, offset: int = 0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def _accept(self, kind: str, value: Any = None) -> bool:
+        token_kind, token_value = self._peek()
+        if token_kind == kind and (value is None or token_value == value):
+            self.position += 1
+            return True
+        return False
+
+    def _expect(self, kind: str, value: Any = None):
+        if not self._accept(kind, value):
+            raise RuleSyntaxError(f"Expected {value or kind}, found {self._peek()[1]!r}")
+
+    def _or(self):
+        node = self._and()
+        while self._accept('kw', 'or'):
+            node = ('or', node, self._and())
+        return node
+
+    def _and(self):
+        node = self._not()
+        while self._accept('kw', 'and'):
+            node = ('and', node, self._not())
+        return node
+
+    def _not(self):
+        if self._accept('kw', 'not'):
+            return ('not', self._not())
+        return self._comparison()
+
+    def _comparison(self):
+        left = self._operand()
+        kind, value = self._peek()
+        if kind == 'op' and value in _COMPARISONS:
+            self.position += 1
+            return ('cmp', _COMPARISONS[value], left, self._operand())
+        if self._accept('kw', 'is'):
+            negated = self._accept('kw', 'not')
+            self._expect('kw', 'null')
+            return ('not', ('isnull', left)) if negated else ('isnull', left)
+        negated = kind == 'kw' and value == 'not' and self._peek(1) == ('kw', 'in')
+        if negated:
+            self.position += 1
+        if self._accept('kw', 'in'):
+            self._expect('op', '(')
+            values = [self._constant()]
+            while self._accept('op', ','):
+                values.append(self._constant())
+            self._expect('op', ')')
+            node = ('in', left, tuple(values))
+            return ('not', ('and', node, ('not', ('isnull', left)))) if negated else node
+        return ('truthy', left)
+
+    def _constant(self):
+        kind, value = self._peek()
+        if kind != 'const':
+            raise RuleSyntaxError(f"Expected a literal, found {value!r}")
+        self.position += 1
+        return value
+
+    def _operand(self):
+        kind, value = self._peek()
+        if kind == 'const':
+            self.position += 1
+            return ('const', value)
+        if kind == 'kw' and value in ('true', 'false', 'null'):
+            self.position += 1
+            return ('const', {'true': True, 'false': False, 'null': None}[value])
+        if kind == 'op' and value == '(':
+            self.position += 1
+            node = self._or()
+            self._expect('op', ')')
+            return node
+        if kind == 'name':
+            self.position += 1
+            if self._accept('op', '('):
+                name = value.lower()
+                if name not in _FUNCTIONS:
+                    raise RuleSyntaxError(f"Unknown function {value}()")
+                args = [] if self._accept('op', ')') else self._arguments()
+                return ('call', name, tuple(args))
+            return ('col', value)
+        raise RuleSyntaxError(f"Unexpected token {value!r}" if kind else "Unexpected end of criteria")
+
+    def _arguments(self):
+        args = [self._operand()]
+        while self._accept('op', ','):
+            args.append(self._operand())
+        self._expect('op', ')')
+        return args
+
+
+@lru_cache(maxsize=1024)
+def parse_criteria(criteria: str):
+    """Parse rule criteria into an AST (cached per criteria text)"""
+    return _Parser(criteria).parse()
+
+
+def referenced_columns(criteria: str) -> List[str]:
+    """Column names a rule reads"""
+    found = []
+
+    def walk(node):
+        if isinstance(node, tuple):
+            if node[0] == 'col' and node[1] not in found:
+                found.append(node[1])
+            for child in node[1:]:
+                walk(child)
+    walk(parse_criteria(criteria))
+    return found
+
+
+def day_thresholds(criteria: str, column: str) -> List[float]:
+    """Day counts a rule compares ``days_since(column)`` (or a date('now', ...) offset) against"""
+    thresholds = []
+
+    def walk(node):
+        if not isinstance(node, tuple):
+            return
+        if node[0] == 'cmp':
+            sides = (node[2], node[3])
+            for side, other in (sides, sides[::-1]):
+                if side == ('call', 'days_since', (('col', column),)) and other[0] == 'const':
+                    thresholds.append(float(other[1]))
+                if side == ('col', column) and other[0] == 'call' and other[1] in ('date', 'datetime'):
+                    offset = _modifier_days(other[2][1:])
+                    if offset is not None:
+                        thresholds.append(abs(offset))
+        for child in node[1:]:
+            walk(child)
+    walk(parse_criteria(criteria))
+    return sorted(set(thresholds))
+
+
+def _modifier_days(modifiers) -> Optional[float]:
+    days = 0.0
+    per_unit = {'minute': 1 / 1440, 'hour': 1 / 24, 'day': 1, 'week': 7, 'month': 30, 'year': 365}
+    for modifier in modifiers:
+        match = _MODIFIER_PATTERN.match(str(modifier[1])) if modifier[0] == 'const' else None
+        if not match:
+            return None
+        days += float(match.group(1)) * per_unit[match.group(2).lower()]
+    return days
+
+
+# ---- Evaluation ----
+
+def _is_text(values: pd.Series) -> bool:
+    return values.dtype == object or pd.api.types.is_string_dtype(values.dtype)
+
+
+def _is_null(values) -> Any:
+    if isinstance(values, pd.Series):
+        nulls = values.isna()
+        if _is_text(values):
+            nulls |= values.eq('')
+        return nulls.to_numpy(dtype=bool)
+    return values is None or values == '' or (isinstance(values, float) and np.isnan(values))
+
+
+class _Evaluator:
+    """Evaluates a parsed rule over a DataFrame"""
+
+    def __init__(self, frame: pd.DataFrame, now: datetime):
+        self.frame = frame
+        self.now = pd.Timestamp(now)
+        self.size = len(frame)
+
+    def predicate(self, node) -> np.ndarray:
+        kind = node[0]
+        if kind == 'and':
+            return self.predicate(node[1]) & self.predicate(node[2])
+        if kind == 'or':
+            return self.predicate(node[1]) | self.predicate(node[2])
+        if kind == 'not':
+            return ~self.predicate(node[1])
+        if kind == 'isnull':
+            return self._broadcast(_is_null(self.value(node[1])))
+        if kind == 'in':
+            values = self.value(node[1])
+            if isinstance(values, pd.Series):
+                return values.isin(node[2]).to_numpy(dtype=bool)
+            return self._broadcast(values in node[2])
+        if kind == 'cmp':
+            return self._compare(node[1], self.value(node[2]), self.value(node[3]))
+        if kind == 'truthy':
+            values = self.value(node[1])
+            if isinstance(values, pd.Series):
+                return ~_is_null(values) & values.astype(bool).to_numpy(dtype=bool)
+            return self._broadcast(bool(values) and not _is_null(values))
+        raise RuleSyntaxError(f"Not a condition: {node!r}")
+
+    def value(self, node):
+        kind = node[0]
+        if kind == 'const':
+            return node[1]
+        if kind == 'col':
+            if node[1] in self.frame.columns:
+                return self.frame[node[1]]
+            return pd.Series([None] * self.size, index=self.frame.index, dtype=object)
+        if kind == 'call':
+            return self._call(node[1], node[2])
+        return pd.Series(self.predicate(node), index=self.frame.index)
+
+    def _call(self, name: str, args):
+        if name == 'days_since':
+            if len(args) != 1:
+                raise RuleSyntaxError("days_since() takes one column")
+            elapsed = self.now - self._as_datetime(self.value(args[0]))
+            return elapsed.dt.days.astype(float) if isinstance(elapsed, pd.Series) else float(elapsed.days)
+
+        if not args or args[0] != ('const', 'now'):
+            raise RuleSyntaxError(f"{name}() only supports 'now' with optional offsets")
+        offset = _modifier_days(args[1:])
+        if offset is None:
+            raise RuleSyntaxError(f"Unsupported {name}() modifier")
+        moment = self.now + pd.Timedelta(days=offset)
+        return moment.normalize() if name == 'date' else moment
+
+    @staticmethod
+    def _as_datetime(values):
+        if isinstance(values, pd.Series):
+            if pd.api.types.is_datetime64_any_dtype(values):
+                return values.dt.tz_localize(None) if values.dt.tz is not None else values
+            return pd.to_datetime(values, errors='coerce', format='mixed')
+        return pd.Timestamp(values) if values is not None else pd.NaT
+
+    def _compare(self, operator: str, left, right) -> np.ndarray:
+        # Align types: dates against dates, numbers against numbers
+        if isinstance(left, pd.Timestamp) or isinstance(right, pd.Timestamp):
+            left, right = self._as_datetime(left), self._as_datetime(right)
+        else:
+            left, right = self._numeric_if_needed(left, right), self._numeric_if_needed(right, left)
+
+        if not isinstance(left, pd.Series) and isinstance(right, pd.Series):
+            left, right, operator = right, left, _REFLECTED[operator]
+        try:
+            with np.errstate(invalid='ignore'):
+                result = getattr(operator_module, operator)(left, right)
+        except TypeError:
+            # Incomparable types (e.g. a number column against text) never match
+            return np.zeros(self.size, dtype=bool)
+        if isinstance(result, pd.Series):
+            result = result.fillna(False).to_numpy(dtype=bool)
+        result = self._broadcast(result)
+        # SQL semantics: any comparison with NULL is false
+        return result & ~self._broadcast(_is_null(left)) & ~self._broadcast(_is_null(right))
+
+    @staticmethod
+    def _numeric_if_needed(values, other):
+        if isinstance(values, pd.Series) and _is_text(values) and isinstance(other, (int, float)) \
+                and not isinstance(other, bool):
+            return pd.to_numeric(values, errors='coerce')
+        return values
+
+    def _broadcast(self, values) -> np.ndarray:
+        values = np.asarray(values, dtype=bool)
+        return np.broadcast_to(values, (self.size,)).copy() if values.shape != (self.size,) else values
+
+
+def compile_criteria(criteria: str) -> Callable[[pd.DataFrame, Optional[datetime]], np.ndarray]:
+    """Compile criteria into ``predicate(frame, now=None) -> bool array``; raises RuleSyntaxError"""
+    tree = parse_criteria(criteria)
+
+    def predicate(frame: pd.DataFrame, now: Optional[datetime] = None) -> np.ndarray:
+        return _Evaluator(frame, now or datetime.now()).predicate(tree)
+    return predicate
+
+
+def entities_to_frame(entities: Iterable[Any], derived: Optional[Dict[str, Callable[[Any], Any]]] = None) -> pd.DataFrame:
+    """DataFrame of dataclass entities for scoring: enums become their values
+
+    ``derived`` adds computed columns (column name -> function of the entity).
+    """
+    entities = list(entities)
+    records = []
+    names = [f.name for f in fields(entities[0])] if entities and is_dataclass(entities[0]) else []
+    for entity in entities:
+        record = {}
+        for name in names:
+            value = getattr(entity, name)
+            if isinstance(value, Enum):
+                value = value.value
+            elif isinstance(value, list):
+                value = [item.value if isinstance(item, Enum) else item for item in value]
+            record[name] = value
+        for name, function in (derived or {}).items():
+            record[name] = function(entity)
+        records.append(record)
+    return pd.DataFrame.from_records(records, columns=names + list(derived or {}))
+
+
+# ---- Engine ----
+
+class RuleScoringEngine:
+    """Scores lead frames with one rule set from the scoring_rules table"""
+
+    def __init__(self, db_path: str = "crm_data.db", rule_set: str = DEFAULT_RULE_SET,
+                 default_rules: Sequence[Tuple[str, str, int]] = (),
+                 legacy_rules: Optional[Dict[str, Tuple[str, int]]] = None):
+        self.db_path = db_path
+        self.rule_set = rule_set
+        self.ensure_rules_table()
+        self.install_default_rules(default_rules, legacy_rules or {})
+
+    def ensure_rules_table(self):
+        """Make sure scoring_rules exists (schema owned by schema_migrations)"""
+        ensure_schema(self.db_path)
+
+    def install_default_rules(self, default_rules: Sequence[Tuple[str, str, int]],
+                              legacy_rules: Dict[str, Tuple[str, int]]) -> bool:
+        """Insert missing default rules; upgrade untouched ones shipped with older criteria"""
+        existing = {rule['rule_name']: rule for rule in self.get_rules()}
+        inserts, updates = [], []
+        for name, criteria, points in default_rules:
+            rule = existing.get(name)
+            if rule is None:
+                inserts.append((str(uuid.uuid4()), name, criteria, points, self.rule_set))
+            elif name in legacy_rules and (rule['criteria'], rule['points']) == legacy_rules[name]:
+                updates.append((criteria, points, rule['id']))
+        if not inserts and not updates:
+            return False
+        with transaction(self.db_path) as conn:
+            conn.executemany('''
+                INSERT INTO scoring_rules (id, rule_name, criteria, points, rule_set) VALUES (?, ?, ?, ?, ?)
+            ''', inserts)
+            conn.executemany('UPDATE scoring_rules SET criteria = ?, points = ? WHERE id = ?', updates)
+        return True
+
+    def get_rules(self, active_only: bool = False) -> List[Dict[str, Any]]:
+        """Rules of this rule set, oldest first"""
+        query = "SELECT id, rule_name, criteria, points, is_active FROM scoring_rules WHERE rule_set = ?"
+        if active_only:
+            query += " AND is_active = 1"
+        conn = get_connection(self.db_path)
+        try:
+            rows = conn.execute(query + " ORDER BY created_at, rowid", (self.rule_set,)).fetchall()
+        finally:
+            conn.close()
+        return [{'id': row[0], 'rule_name': row[1], 'criteria': row[2], 'points': row[3], 'is_active': bool(row[4])}
+                for row in rows]
+
+    def get_rule_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        return next((rule for rule in self.get_rules() if rule['rule_name'] == name), None)
+
+    def create_rule(self, name: str, criteria: str, points: int) -> str:
+        """Validate and store a rule; returns its id"""
+        compile_criteria(criteria)
+        rule_id = str(uuid.uuid4())
+        with transaction(self.db_path) as conn:
+            conn.execute('''
+                INSERT INTO scoring_rules (id, rule_name, criteria, points, rule_set) VALUES (?, ?, ?, ?, ?)
+            ''', (rule_id, name, criteria, int(points), self.rule_set))
+        return rule_id
+
+    def update_rule(self, rule_id: str, **changes) -> bool:
+        """Change a rule's name, criteria, points or active flag"""
+        allowed = {key: value for key, value in changes.items()
+                   if key in ('rule_name', 'criteria', 'points', 'is_active') and value is not None}
+        if 'criteria' in allowed:
+            compile_criteria(allowed['criteria'])
+        if not allowed:
+            return False
+        assignments = ', '.join(f"{key} = ?" for key in allowed)
+        with transaction(self.db_path) as conn:
+            cursor = conn.execute(f"UPDATE scoring_rules SET {assignments} WHERE id = ? AND rule_set = ?",
+                                  list(allowed.values()) + [rule_id, self.rule_set])
+            return cursor.rowcount > 0
+
+    def compiled_rules(self) -> List[Tuple[Dict[str, Any], Callable]]:
+        """Active rules with their predicates; unparsable rules are reported and skipped"""
+        compiled = []
+        for rule in self.get_rules(active_only=True):
+            try:
+                compiled.append((rule, compile_criteria(rule['criteria'])))
+            except RuleSyntaxError as e:
+                print(f"⚠️ Skipping scoring rule '{rule['rule_name']}': {e}")
+        return compiled
+
+    def score_frame(self, frame: pd.DataFrame, now: Optional[datetime] = None) -> np.ndarray:
+        """Integer scores for every row: sum of matching rule points, capped to 0-100"""
+        now = now or datetime.now()
+        scores = np.zeros(len(frame), dtype=np.int64)
+        if len(frame):
+            for rule, predicate in self.compiled_rules():
+                scores += np.where(predicate(frame, now), int(rule['points']), 0)
+        return np.clip(scores, 0, MAX_SCORE)
+
+    def explain(self, frame: pd.DataFrame, row: int = 0, now: Optional[datetime] = None) -> List[Tuple[str, int]]:
+        """(rule name, points) of the rules matching one row"""
+        single = frame.iloc[[row]]
+        return [(rule['rule_name'], int(rule['points'])) for rule, predicate in self.compiled_rules()
+                if predicate(single, now or datetime.now())[0]]
+
+    def day_thresholds(self, column: str) -> List[float]:
+        """Every day threshold the active rules apply to ``column``"""
+        thresholds = set()
+        for rule, _ in self.compiled_rules():
+            thresholds.update(day_thresholds(rule['criteria'], column))
+        return sorted(thresholds)
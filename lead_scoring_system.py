@@ -9,12 +9,64 @@ from typing import List, Dict, Optional, Any
 from dataclasses import dataclass, field
 from enum import Enum
 import json
-import sqlite3
+import threading
+import time
+from db_connection import get_connection, transaction
+from lead_scoring_engine import RuleScoringEngine, entities_to_frame
+from schema_migrations import ensure_schema
+from keyset_pagination import DEFAULT_PAGE_SIZE, KeysetQuery, Page, current_page_cursor, show_page_navigation
 import uuid
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
+LEAD_RULE_SET = "lead_scoring"
+
+# Background rescoring of time-decayed scores
+RESCORE_INTERVAL_SECONDS = 3600
+RESCORE_BATCH_SIZE = 1000
+
+# Lead listing: highest score first, newest first within a score
+LEAD_LIST_QUERY = KeysetQuery(
+    'leads',
+    ['id', 'name', 'email', 'phone', 'source', 'status', 'budget_min', 'budget_max',
+     'investment_timeline', 'experience_level', 'created_at', 'last_contact', 'score'],
+    order_by=[('score', 'DESC'), ('created_at', 'DESC'), ('id', 'DESC')]
+)
+
+# (rule name, criteria, points); see lead_scoring_engine for the criteria language
+DEFAULT_SCORING_RULES = [
+    ("High Investment Budget", "budget_max >= 500000", 25),
+    ("Medium Investment Budget", "budget_max >= 250000 AND budget_max < 500000", 15),
+    ("Low Investment Budget", "budget_max >= 100000 AND budget_max < 250000", 10),
+    ("Starter Investment Budget", "budget_max >= 50000 AND budget_max < 100000", 5),
+    ("Referral Source", "source == 'referral'", 20),
+    ("Website Source", "source == 'website'", 15),
+    ("Networking Source", "source == 'networking'", 15),
+    ("Social Media Source", "source == 'social_media'", 10),
+    ("Email Campaign Source", "source == 'email_campaign'", 8),
+    ("Advertisement Source", "source == 'advertisement'", 5),
+    ("Cold Outreach Source", "source == 'cold_outreach'", 3),
+    ("Other Source", "source == 'other'", 2),
+    ("Experienced Investor", "experience_level == 'experienced'", 15),
+    ("Intermediate Investor", "experience_level == 'intermediate'", 10),
+    ("Beginner Investor", "experience_level == 'beginner'", 5),
+    ("Ready to Invest", "investment_timeline == 'immediately'", 15),
+    ("6 Month Timeline", "investment_timeline == '6_months'", 10),
+    ("1 Year Timeline", "investment_timeline == '1_year'", 5),
+    ("Complete Contact Info", "phone IS NOT NULL AND email IS NOT NULL", 10),
+    ("Partial Contact Info", "(phone IS NOT NULL OR email IS NOT NULL) AND (phone IS NULL OR email IS NULL)", 5),
+    ("Very Recent Activity", "days_since(last_contact) <= 7", 10),
+    ("Recent Activity", "days_since(last_contact) > 7 AND days_since(last_contact) <= 30", 5)
+]
+
+# Defaults shipped before scoring moved onto the rule engine; upgraded if never edited
+LEGACY_SCORING_RULES = {
+    "Ready to Invest": ("investment_timeline == 'immediately'", 20),
+    "6 Month Timeline": ("investment_timeline == '6_months'", 15),
+    "Recent Activity": ("last_contact >= date('now', '-30 days')", 10)
+}
+
 class LeadStatus(Enum):
     NEW = "new"
     CONTACTED = "contacted"
@@ -60,58 +112,12 @@ class LeadScoringSystem:
         self.init_database()
     
     def init_database(self):
-        """Initialize lead scoring database tables"""
+        """Initialize lead scoring database tables (schema owned by schema_migrations)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS leads (
-                    id TEXT PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    email TEXT NOT NULL,
-                    phone TEXT,
-                    source TEXT NOT NULL,
-                    status TEXT NOT NULL DEFAULT 'new',
-                    property_interest TEXT,
-                    budget_min REAL DEFAULT 0,
-                    budget_max REAL DEFAULT 0,
-                    investment_timeline TEXT,
-                    experience_level TEXT,
-                    preferred_areas TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_contact TIMESTAMP,
-                    score INTEGER DEFAULT 0,
-                    notes TEXT
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS lead_activities (
-                    id TEXT PRIMARY KEY,
-                    lead_id TEXT NOT NULL,
-                    activity_type TEXT NOT NULL,
-                    activity_data TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (lead_id) REFERENCES leads (id)
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS scoring_rules (
-                    id TEXT PRIMARY KEY,
-                    rule_name TEXT NOT NULL,
-                    criteria TEXT NOT NULL,
-                    points INTEGER NOT NULL,
-                    is_active BOOLEAN DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            ensure_schema(self.db_path)
             
-            conn.commit()
-            conn.close()
-            
-            # Setup default scoring rules
+            # Scoring rules live in scoring_rules and are evaluated by the rule engine
+            self.scoring_engine = RuleScoringEngine(self.db_path, rule_set=LEAD_RULE_SET)
             self.setup_default_scoring_rules()
             
         except Exception as e:
@@ -119,132 +125,171 @@ class LeadScoringSystem:
     
     def setup_default_scoring_rules(self):
         """Setup default lead scoring rules"""
-        default_rules = [
-            ("High Investment Budget", "budget_max >= 500000", 25),
-            ("Medium Investment Budget", "budget_max >= 250000 AND budget_max < 500000", 15),
-            ("Low Investment Budget", "budget_max >= 100000 AND budget_max < 250000", 10),
-            ("Referral Source", "source == 'referral'", 20),
-            ("Website Source", "source == 'website'", 15),
-            ("Experienced Investor", "experience_level == 'experienced'", 15),
-            ("Intermediate Investor", "experience_level == 'intermediate'", 10),
-            ("Ready to Invest", "investment_timeline == 'immediately'", 20),
-            ("6 Month Timeline", "investment_timeline == '6_months'", 15),
-            ("Complete Contact Info", "phone IS NOT NULL AND email IS NOT NULL", 10),
-            ("Recent Activity", "last_contact >= date('now', '-30 days')", 10)
-        ]
-        
-        # Insert rules if they don't exist
-        for rule_name, criteria, points in default_rules:
-            if not self.get_scoring_rule_by_name(rule_name):
-                self.create_scoring_rule(rule_name, criteria, points)
+        if self.scoring_engine.install_default_rules(DEFAULT_SCORING_RULES, LEGACY_SCORING_RULES):
+            self.rescore_all_leads()
     
     def get_scoring_rule_by_name(self, name: str) -> Optional[Dict[str, Any]]:
         """Get scoring rule by name"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM scoring_rules WHERE rule_name = ?", (name,))
-            row = cursor.fetchone()
-            
-            if row:
-                return {
-                    'id': row[0],
-                    'rule_name': row[1],
-                    'criteria': row[2],
-                    'points': row[3],
-                    'is_active': bool(row[4])
-                }
-            
-            conn.close()
-            return None
-            
+            return self.scoring_engine.get_rule_by_name(name)
         except Exception as e:
             return None
     
+    def get_scoring_rules(self) -> List[Dict[str, Any]]:
+        """Get all scoring rules"""
+        try:
+            return self.scoring_engine.get_rules()
+        except Exception as e:
+            st.error(f"Error loading scoring rules: {e}")
+            return []
+    
     def create_scoring_rule(self, name: str, criteria: str, points: int) -> bool:
-        """Create a new scoring rule"""
+        """Create a new scoring rule and rescore every lead"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            rule_id = str(uuid.uuid4())
-            cursor.execute('''
-                INSERT INTO scoring_rules (id, rule_name, criteria, points)
-                VALUES (?, ?, ?, ?)
-            ''', (rule_id, name, criteria, points))
-            
-            conn.commit()
-            conn.close()
+            self.scoring_engine.create_rule(name, criteria, points)
+            self.rescore_all_leads()
             return True
             
         except Exception as e:
             st.error(f"Error creating scoring rule: {e}")
             return False
     
+    def update_scoring_rule(self, rule_id: str, **changes) -> bool:
+        """Update a scoring rule (name, criteria, points, is_active) and rescore every lead"""
+        try:
+            if not self.scoring_engine.update_rule(rule_id, **changes):
+                return False
+            self.rescore_all_leads()
+            return True
+            
+        except Exception as e:
+            st.error(f"Error updating scoring rule: {e}")
+            return False
+    
     def calculate_lead_score(self, lead: Lead) -> int:
         """Calculate comprehensive lead score"""
-        score = 0
-        
-        # Budget scoring (40 points max)
-        if lead.budget_max >= 500000:
-            score += 25
-        elif lead.budget_max >= 250000:
-            score += 15
-        elif lead.budget_max >= 100000:
-            score += 10
-        elif lead.budget_max >= 50000:
-            score += 5
-        
-        # Source scoring (20 points max)
-        source_scores = {
-            LeadSource.REFERRAL: 20,
-            LeadSource.WEBSITE: 15,
-            LeadSource.NETWORKING: 15,
-            LeadSource.SOCIAL_MEDIA: 10,
-            LeadSource.EMAIL_CAMPAIGN: 8,
-            LeadSource.ADVERTISEMENT: 5,
-            LeadSource.COLD_OUTREACH: 3,
-            LeadSource.OTHER: 2
-        }
-        score += source_scores.get(lead.source, 2)
+        return int(self.scoring_engine.score_frame(entities_to_frame([lead]))[0])
+    
+    def rescore_all_leads(self) -> int:
+        """Rescore every stored lead in one pass; returns the number of scores that changed"""
+        try:
+            conn = get_connection(self.db_path)
+            try:
+                frame = pd.read_sql_query("SELECT * FROM leads WHERE source IS NOT NULL", conn.raw)
+            finally:
+                conn.close()
+            return self._write_rescored(frame, datetime.now())
+            
+        except Exception as e:
+            st.error(f"Error rescoring leads: {e}")
+            return 0
+    
+    def rescore_time_decayed_leads(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Rescore only the leads whose recency points can have changed since the last run
         
-        # Experience level scoring (15 points max)
-        if lead.experience_level == "experienced":
-            score += 15
-        elif lead.experience_level == "intermediate":
-            score += 10
-        elif lead.experience_level == "beginner":
-            score += 5
+        A lead's recency rules flip when its ``last_contact`` age crosses one of
+        the day thresholds the active rules use (7 and 30 days by default), so
+        only leads whose ``last_contact`` fell into a threshold window between
+        the previous successful run and now are read, via idx_leads_last_contact.
+        Failed runs don't count, so their window is covered again; with no
+        successful run yet everything is rescored. Every run is recorded in
+        lead_rescore_runs.
+        """
+        now = now or datetime.now()
+        started = time.perf_counter()
+        previous = self.get_rescore_runs(limit=1, successful_only=True)
+        run = {'started_at': now.isoformat(), 'full_rescore': not previous, 'leads_checked': 0, 'leads_updated': 0}
         
-        # Timeline scoring (15 points max)
-        if lead.investment_timeline == "immediately":
-            score += 15
-        elif lead.investment_timeline == "6_months":
-            score += 10
-        elif lead.investment_timeline == "1_year":
-            score += 5
+        try:
+            if not previous:
+                conn = get_connection(self.db_path)
+                try:
+                    frame = pd.read_sql_query("SELECT * FROM leads WHERE source IS NOT NULL", conn.raw)
+                finally:
+                    conn.close()
+            else:
+                frame = self._leads_crossing_thresholds(datetime.fromisoformat(previous[0]['started_at']), now)
+            run['leads_checked'] = len(frame)
+            run['leads_updated'] = self._write_rescored(frame, now)
+        except Exception as e:
+            print(f"❌ Error rescoring time-decayed leads: {e}")
+            run['error'] = str(e)
         
-        # Contact completeness (10 points max)
-        if lead.email and lead.phone:
-            score += 10
-        elif lead.email or lead.phone:
-            score += 5
+        run['duration_seconds'] = time.perf_counter() - started
+        self._record_rescore_run(run)
+        return run
+    
+    def _leads_crossing_thresholds(self, last_run: datetime, now: datetime) -> pd.DataFrame:
+        """Leads whose last_contact age passed a recency threshold in (last_run, now]"""
+        # days_since() floors, and date('now', ...) rounds to midnight: pad each window by a day
+        windows = sorted((last_run - timedelta(days=days + 2), now - timedelta(days=days - 1))
+                         for days in self.scoring_engine.day_thresholds('last_contact'))
+        merged: List[List[datetime]] = []
+        for start, end in windows:
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        if not merged:
+            return pd.DataFrame()
         
-        # Recency bonus (10 points max)
-        if lead.last_contact:
-            days_since_contact = (datetime.now() - lead.last_contact).days
-            if days_since_contact <= 7:
-                score += 10
-            elif days_since_contact <= 30:
-                score += 5
+        clauses = " OR ".join("(last_contact >= ? AND last_contact < ?)" for _ in merged)
+        params = [bound.isoformat() for window in merged for bound in window]
+        conn = get_connection(self.db_path)
+        try:
+            return pd.read_sql_query(f"SELECT * FROM leads WHERE source IS NOT NULL AND ({clauses})",
+                                     conn.raw, params=params)
+        finally:
+            conn.close()
+    
+    def _write_rescored(self, frame: pd.DataFrame, now: datetime) -> int:
+        """Score a frame of stored leads and write changed scores in batches"""
+        if frame.empty:
+            return 0
+        scores = self.scoring_engine.score_frame(frame, now)
+        changed = scores != frame['score'].fillna(0).to_numpy(dtype=int)
+        updates = list(zip(scores[changed].tolist(), frame['id'][changed].tolist()))
         
-        return min(100, score)  # Cap at 100
+        for offset in range(0, len(updates), RESCORE_BATCH_SIZE):
+            with transaction(self.db_path) as conn:
+                conn.executemany("UPDATE leads SET score = ? WHERE id = ?",
+                                 updates[offset:offset + RESCORE_BATCH_SIZE])
+        return len(updates)
+    
+    def _record_rescore_run(self, run: Dict[str, Any]):
+        try:
+            with transaction(self.db_path) as conn:
+                conn.execute('''
+                    INSERT INTO lead_rescore_runs
+                    (id, started_at, duration_seconds, leads_checked, leads_updated, full_rescore, error)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (str(uuid.uuid4()), run['started_at'], run['duration_seconds'], run['leads_checked'],
+                      run['leads_updated'], int(run['full_rescore']), run.get('error')))
+        except Exception as e:
+            print(f"❌ Error recording rescore run: {e}")
+    
+    def get_rescore_runs(self, limit: int = 10, successful_only: bool = False) -> List[Dict[str, Any]]:
+        """Most recent rescoring runs, newest first (only those without an error if ``successful_only``)"""
+        try:
+            conn = get_connection(self.db_path)
+            try:
+                rows = conn.execute(f'''
+                    SELECT started_at, duration_seconds, leads_checked, leads_updated, full_rescore, error
+                    FROM lead_rescore_runs {"WHERE error IS NULL" if successful_only else ""}
+                    ORDER BY started_at DESC LIMIT ?
+                ''', (limit,)).fetchall()
+            finally:
+                conn.close()
+            return [{'started_at': row[0], 'duration_seconds': row[1], 'leads_checked': row[2],
+                     'leads_updated': row[3], 'full_rescore': bool(row[4]), 'error': row[5]} for row in rows]
+        except Exception as e:
+            print(f"❌ Error loading rescore runs: {e}")
+            return []
     
     def save_lead(self, lead: Lead) -> bool:
         """Save lead to database"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             # Calculate score before saving
@@ -287,10 +332,11 @@ class LeadScoringSystem:
                   min_score: int = 0) -> List[Lead]:
         """Get leads with optional filtering"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
-            query = "SELECT * FROM leads WHERE score >= ?"
+            # The leads table is shared with the CRM, whose rows have no source
+            query = "SELECT * FROM leads WHERE source IS NOT NULL AND score >= ?"
             params = [min_score]
             
             if status:
@@ -300,29 +346,8 @@ class LeadScoringSystem:
             query += " ORDER BY score DESC, created_at DESC"
             
             cursor.execute(query, params)
-            rows = cursor.fetchall()
-            
-            leads = []
-            for row in rows:
-                lead = Lead(
-                    id=row[0],
-                    name=row[1],
-                    email=row[2],
-                    phone=row[3] or "",
-                    source=LeadSource(row[4]),
-                    status=LeadStatus(row[5]),
-                    property_interest=row[6] or "",
-                    budget_min=row[7] or 0,
-                    budget_max=row[8] or 0,
-                    investment_timeline=row[9] or "",
-                    experience_level=row[10] or "",
-                    preferred_areas=json.loads(row[11]) if row[11] else [],
-                    created_at=datetime.fromisoformat(row[12]),
-                    last_contact=datetime.fromisoformat(row[13]) if row[13] else None,
-                    score=row[14] or 0,
-                    notes=row[15] or ""
-                )
-                leads.append(lead)
+            names = [description[0] for description in cursor.description]
+            leads = [self._lead_from_record(dict(zip(names, row))) for row in cursor.fetchall()]
             
             conn.close()
             return leads
@@ -330,11 +355,52 @@ class LeadScoringSystem:
         except Exception as e:
             st.error(f"Error retrieving leads: {e}")
             return []
-    
+
+    def get_leads_page(self, status: Optional[LeadStatus] = None, min_score: int = 0,
+                       source: Optional[LeadSource] = None, cursor: Optional[str] = None,
+                       page_size: int = DEFAULT_PAGE_SIZE) -> Page:
+        """Get one page of leads (highest score first) with the listing columns only"""
+        filters = [('score', '>=', min_score)]
+        if status:
+            filters.append(('status', '=', status.value))
+        if source:
+            filters.append(('source', '=', source.value))
+        else:
+            filters.append(('source', 'IS NOT', None))
+        try:
+            page = LEAD_LIST_QUERY.fetch(self.db_path, filters, cursor, page_size)
+            page.rows = [self._lead_from_record(record) for record in page.rows]
+            return page
+        except Exception as e:
+            st.error(f"Error retrieving leads: {e}")
+            return Page()
+
+    @staticmethod
+    def _lead_from_record(record: Dict[str, Any]) -> Lead:
+        """Build a Lead from a (possibly projected) leads row"""
+        return Lead(
+            id=record['id'],
+            name=record.get('name') or "",
+            email=record.get('email') or "",
+            phone=record.get('phone') or "",
+            source=LeadSource(record['source']),
+            status=LeadStatus(record['status']),
+            property_interest=record.get('property_interest') or "",
+            budget_min=record.get('budget_min') or 0,
+            budget_max=record.get('budget_max') or 0,
+            investment_timeline=record.get('investment_timeline') or "",
+            experience_level=record.get('experience_level') or "",
+            preferred_areas=json.loads(record['preferred_areas']) if record.get('preferred_areas') else [],
+            created_at=datetime.fromisoformat(record['created_at']),
+            last_contact=datetime.fromisoformat(record['last_contact']) if record.get('last_contact') else None,
+            score=record.get('score') or 0,
+            notes=record.get('notes') or ""
+        )
+
     def get_lead_statistics(self) -> Dict[str, Any]:
         """Get lead scoring statistics"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             # Total leads by score range
@@ -348,6 +414,7 @@ class LeadScoringSystem:
                     END as score_range,
                     COUNT(*) as count
                 FROM leads 
+                WHERE source IS NOT NULL
                 GROUP BY score_range
             """)
             score_distribution = dict(cursor.fetchall())
@@ -356,6 +423,7 @@ class LeadScoringSystem:
             cursor.execute("""
                 SELECT source, AVG(score) as avg_score, COUNT(*) as count
                 FROM leads 
+                WHERE source IS NOT NULL
                 GROUP BY source
                 ORDER BY avg_score DESC
             """)
@@ -367,6 +435,7 @@ class LeadScoringSystem:
                     COUNT(CASE WHEN status = 'converted' THEN 1 END) * 100.0 / COUNT(*) as conversion_rate,
                     AVG(score) as avg_score
                 FROM leads
+                WHERE source IS NOT NULL
             """)
             conversion_data = cursor.fetchone()
             
@@ -383,6 +452,64 @@ class LeadScoringSystem:
             st.error(f"Error getting lead statistics: {e}")
             return {}
 
+class LeadRescoringScheduler:
+    """Background thread that keeps time-decayed lead scores current"""
+    
+    def __init__(self, scoring_system: LeadScoringSystem, interval_seconds: float = RESCORE_INTERVAL_SECONDS):
+        self.scoring_system = scoring_system
+        self.interval_seconds = interval_seconds
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        """Start the background job (no-op if already running)"""
+        with self._lock:
+            if self.is_running:
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="lead-rescoring", daemon=True)
+            self._thread.start()
+    
+    def stop(self, timeout: float = 5.0):
+        """Stop the background job and wait for a run in progress to finish"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def run_once(self) -> Dict[str, Any]:
+        with self._lock:
+            return self.scoring_system.rescore_time_decayed_leads()
+    
+    def seconds_until_due(self) -> float:
+        runs = self.scoring_system.get_rescore_runs(limit=1)
+        if not runs:
+            return 0.0
+        elapsed = (datetime.now() - datetime.fromisoformat(runs[0]['started_at'])).total_seconds()
+        return max(0.0, self.interval_seconds - elapsed)
+    
+    def _run(self):
+        # Catch up immediately if the last run (possibly from a previous process) is overdue
+        while not self._stop_event.wait(self.seconds_until_due()):
+            self.run_once()
+
+_rescoring_schedulers: Dict[str, LeadRescoringScheduler] = {}
+_rescoring_schedulers_lock = threading.Lock()
+
+def get_lead_rescoring_scheduler(scoring_system: LeadScoringSystem) -> LeadRescoringScheduler:
+    """Process-wide rescoring scheduler for the scoring system's database, started on first use"""
+    with _rescoring_schedulers_lock:
+        scheduler = _rescoring_schedulers.get(scoring_system.db_path)
+        if scheduler is None:
+            scheduler = LeadRescoringScheduler(scoring_system)
+            _rescoring_schedulers[scoring_system.db_path] = scheduler
+    scheduler.start()
+    return scheduler
+
 def show_lead_scoring_system():
     """Show lead scoring system interface"""
     st.header("📊 Lead Scoring Algorithms")
@@ -394,6 +521,9 @@ def show_lead_scoring_system():
     
     scoring_system = st.session_state.lead_scoring_system
     
+    # Keep recency-based scores current in the background
+    get_lead_rescoring_scheduler(scoring_system)
+    
     # Get statistics
     stats = scoring_system.get_lead_statistics()
     
@@ -576,17 +706,18 @@ def show_all_leads(scoring_system: LeadScoringSystem):
         source_filter = st.selectbox("Source", 
             ["All"] + [s.value.replace('_', ' ').title() for s in LeadSource])
     
-    # Get filtered leads
+    # Get filtered leads, one page at a time
     status_filter_enum = None
     if status_filter != "All":
         status_filter_enum = LeadStatus(status_filter.lower())
-    
-    leads = scoring_system.get_leads(status=status_filter_enum, min_score=min_score_filter)
-    
-    # Apply source filter
+    source_filter_enum = None
     if source_filter != "All":
-        source_enum = LeadSource(source_filter.lower().replace(' ', '_'))
-        leads = [lead for lead in leads if lead.source == source_enum]
+        source_filter_enum = LeadSource(source_filter.lower().replace(' ', '_'))
+    
+    cursor = current_page_cursor("all_leads_page", (status_filter, min_score_filter, source_filter))
+    page = scoring_system.get_leads_page(status=status_filter_enum, min_score=min_score_filter,
+                                         source=source_filter_enum, cursor=cursor)
+    leads = page.rows
     
     # Display leads
     if leads:
@@ -608,10 +739,26 @@ def show_all_leads(scoring_system: LeadScoringSystem):
         
         df = pd.DataFrame(leads_data)
         st.dataframe(df, use_container_width=True, height=400)
+        show_page_navigation("all_leads_page", page)
         
         # Export option
         if st.button("📊 Export to CSV"):
-            csv = df.to_csv(index=False)
+            # Export the full filtered listing, not just the visible page
+            export_leads = scoring_system.get_leads(status=status_filter_enum, min_score=min_score_filter)
+            if source_filter_enum:
+                export_leads = [lead for lead in export_leads if lead.source == source_filter_enum]
+            csv = pd.DataFrame([{
+                'Name': lead.name,
+                'Email': lead.email,
+                'Phone': lead.phone,
+                'Score': lead.score,
+                'Status': lead.status.value.title(),
+                'Source': lead.source.value.replace('_', ' ').title(),
+                'Budget Range': f"${lead.budget_min:,.0f} - ${lead.budget_max:,.0f}",
+                'Timeline': lead.investment_timeline.replace('_', ' ').title(),
+                'Experience': lead.experience_level.title(),
+                'Created': lead.created_at.strftime('%m/%d/%Y')
+            } for lead in export_leads]).to_csv(index=False)
             st.download_button(
                 label="📥 Download CSV",
                 data=csv,
@@ -703,52 +850,57 @@ def show_scoring_rules(scoring_system: LeadScoringSystem):
     """Show and manage scoring rules"""
     st.subheader("⚙️ Lead Scoring Rules")
     
-    st.info("🔧 Advanced scoring rule management coming soon!")
-    
-    # Display current scoring criteria
-    st.markdown("### 📋 Current Scoring Criteria")
-    
-    scoring_criteria = {
-        "Investment Budget": {
-            "≥ $500K": 25,
-            "$250K - $500K": 15,
-            "$100K - $250K": 10,
-            "< $100K": 5
-        },
-        "Lead Source": {
-            "Referral": 20,
-            "Website": 15,
-            "Networking": 15,
-            "Social Media": 10,
-            "Email Campaign": 8,
-            "Advertisement": 5,
-            "Cold Outreach": 3
-        },
-        "Experience Level": {
-            "Experienced": 15,
-            "Intermediate": 10,
-            "Beginner": 5
-        },
-        "Investment Timeline": {
-            "Immediately": 15,
-            "6 Months": 10,
-            "1 Year": 5
-        },
-        "Contact Completeness": {
-            "Email + Phone": 10,
-            "Email or Phone": 5
-        },
-        "Recent Activity": {
-            "Last 7 days": 10,
-            "Last 30 days": 5
-        }
-    }
-    
-    for category, rules in scoring_criteria.items():
-        with st.expander(f"📊 {category}"):
-            for criteria, points in rules.items():
-                st.markdown(f"• **{criteria}**: {points} points")
+    # Display current scoring rules
+    st.markdown("### 📋 Current Scoring Rules")
     
+    rules = scoring_system.get_scoring_rules()
+    if rules:
+        rules_df = pd.DataFrame(rules)[['rule_name', 'criteria', 'points', 'is_active']]
+        rules_df.columns = ['Rule', 'Criteria', 'Points', 'Active']
+        st.dataframe(rules_df, use_container_width=True)
+    else:
+        st.info("No scoring rules defined yet.")
+    
+    if rules:
+        with st.expander("✏️ Edit Rule"):
+            rule_names = [rule['rule_name'] for rule in rules]
+            selected = st.selectbox("Rule", rule_names)
+            rule = rules[rule_names.index(selected)]
+            with st.form("edit_scoring_rule"):
+                criteria = st.text_input("Criteria", value=rule['criteria'])
+                points = st.number_input("Points", value=int(rule['points']), step=1)
+                is_active = st.checkbox("Active", value=rule['is_active'])
+                if st.form_submit_button("💾 Save & Rescore Leads"):
+                    if scoring_system.update_scoring_rule(rule['id'], criteria=criteria,
+                                                          points=int(points), is_active=is_active):
+                        st.success(f"✅ Rule '{selected}' updated and all leads rescored")
+                        st.rerun()
+    
+    with st.expander("➕ Add Rule"):
+        with st.form("add_scoring_rule"):
+            name = st.text_input("Rule Name")
+            criteria = st.text_input("Criteria", placeholder="budget_max >= 250000 AND source == 'referral'")
+            points = st.number_input("Points", value=10, step=1)
+            st.caption("Compare lead fields with ==, !=, <, <=, >, >=, IN (...), IS [NOT] NULL; "
+                       "combine with AND / OR / NOT; dates via days_since(last_contact).")
+            if st.form_submit_button("➕ Add & Rescore Leads"):
+                if not name or not criteria:
+                    st.error("Rule name and criteria are required")
+                elif scoring_system.create_scoring_rule(name, criteria, int(points)):
+                    st.success(f"✅ Rule '{name}' added and all leads rescored")
+                    st.rerun()
+    
+    if st.button("🔄 Rescore All Leads"):
+        changed = scoring_system.rescore_all_leads()
+        st.success(f"✅ Rescored all leads ({changed} scores changed)")
+
+    runs = scoring_system.get_rescore_runs(limit=10)
+    if runs:
+        with st.expander("⏱️ Recent Rescoring Runs"):
+            runs_df = pd.DataFrame(runs)[['started_at', 'duration_seconds', 'leads_checked', 'leads_updated', 'full_rescore']]
+            runs_df.columns = ['Started', 'Duration (s)', 'Leads Checked', 'Leads Updated', 'Full Rescore']
+            st.dataframe(runs_df, use_container_width=True)
+
     st.markdown("### 🎯 Total Score Interpretation")
     st.markdown("""
     - **90-100**: 🔴 **Extremely Hot** - Immediate follow-up required
@@ -15,7 +15,7 @@ import json
 from dataclasses import dataclass
 from typing import List, Dict, Any, Optional, Tuple
 from enum import Enum
-import sqlite3
+from db_connection import get_connection
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -80,7 +80,7 @@ class MarketIntelligenceEngine:
     
     def initialize_market_tables(self):
         """Initialize market intelligence database tables"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         # Market metrics table
@@ -0,0 +1,130 @@
+"""
+Bulk Message Dispatch for NXTRIX CRM
+Concurrent delivery of many messages through one provider:
+- Bounded worker pool with a configurable concurrency limit
+- Per-provider token-bucket rate limits shared by every dispatch in the process
+- Retries with jittered exponential backoff for transient failures only
+- Results returned in input order so callers record them in one batched write
+- Optional completion callback on the calling thread, for progress reporting
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+DISPATCH_CONCURRENCY = int(os.getenv('DISPATCH_CONCURRENCY', '8'))
+DISPATCH_MAX_ATTEMPTS = 4
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+
+# Requests per second and burst size per provider, overridable from the environment
+PROVIDER_RATE_LIMITS = {
+    'emailjs': (float(os.getenv('EMAILJS_RATE_PER_SECOND', '5')), int(os.getenv('EMAILJS_RATE_BURST', '5'))),
+    'twilio': (float(os.getenv('TWILIO_RATE_PER_SECOND', '10')), int(os.getenv('TWILIO_RATE_BURST', '10'))),
+}
+DEFAULT_RATE_LIMIT = (5.0, 5)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens per second, at most ``capacity`` saved up"""
+
+    def __init__(self, rate: float, capacity: int):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("rate must be positive and capacity at least 1")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Take one token, waiting for it if needed; False if ``timeout`` passes first"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+_rate_limiters: Dict[str, TokenBucket] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> TokenBucket:
+    """Process-wide token bucket for a provider, so concurrent dispatches share its quota"""
+    with _rate_limiters_lock:
+        bucket = _rate_limiters.get(provider)
+        if bucket is None:
+            bucket = TokenBucket(*PROVIDER_RATE_LIMITS.get(provider, DEFAULT_RATE_LIMIT))
+            _rate_limiters[provider] = bucket
+        return bucket
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE_SECONDS, cap: float = BACKOFF_MAX_SECONDS) -> float:
+    """Full-jitter exponential backoff before retry number ``attempt`` (1-based)"""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+class BulkDispatcher:
+    """Send many payloads through one provider with bounded concurrency
+
+    ``send`` takes one payload and returns a result object with ``success``
+    and ``retryable`` attributes (EmailResult / SMSResult). Retryable
+    failures are retried up to ``max_attempts`` times; the returned result's
+    ``attempts`` is set to the number of tries it took.
+    """
+
+    def __init__(self, provider: str, send: Callable[[Any], Any],
+                 concurrency: int = DISPATCH_CONCURRENCY, max_attempts: int = DISPATCH_MAX_ATTEMPTS,
+                 rate_limiter: Optional[TokenBucket] = None):
+        self.provider = provider
+        self.send = send
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.rate_limiter = rate_limiter or get_rate_limiter(provider)
+
+    def dispatch(self, payloads: Sequence[Any],
+                 on_complete: Optional[Callable[[int, Any], None]] = None) -> List[Any]:
+        """Send every payload; results are in the same order as ``payloads``
+
+        ``on_complete(index, result)`` is called as each payload finishes, in
+        completion order, on the calling thread (so it may update Streamlit
+        widgets).
+        """
+        if not payloads:
+            return []
+        workers = min(self.concurrency, len(payloads))
+        results: List[Any] = [None] * len(payloads)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"dispatch-{self.provider}") as pool:
+            futures = {pool.submit(self._deliver, payload): index for index, payload in enumerate(payloads)}
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                if on_complete is not None:
+                    on_complete(index, results[index])
+        return results
+
+    def _deliver(self, payload: Any) -> Any:
+        attempt = 0
+        while True:
+            attempt += 1
+            self.rate_limiter.acquire()
+            result = self.send(payload)
+            if result.success or not getattr(result, 'retryable', False) or attempt >= self.max_attempts:
+                result.attempts = attempt
+                return result
+            time.sleep(backoff_delay(attempt))
@@ -0,0 +1,475 @@
+"""
+Durable Message Outbox for NXTRIX CRM
+Email and SMS sends queued in SQLite and delivered by background workers:
+- enqueue() stores every message of a job in one transaction and returns a job id
+- Workers claim batches per channel under a lease, so several processes can share the queue
+- Per-channel concurrency and provider rate limits through BulkDispatcher
+- Status transitions (queued -> sending -> sent / failed, retries) recorded in message_outbox_events
+- Expired leases are reclaimed, so a crash mid-campaign resumes on restart (at-least-once delivery)
+- Job callbacks update campaign tables in the same transaction as the delivery state
+- Progress read from the outbox, with a Streamlit panel that refreshes itself
+"""
+
+import atexit
+import importlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import streamlit as st
+
+from db_connection import DEFAULT_DB_PATH, get_connection, transaction
+from message_dispatch import BulkDispatcher, backoff_delay, get_rate_limiter
+from schema_migrations import ensure_schema
+
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_POLL_SECONDS = 2.0
+OUTBOX_LEASE_SECONDS = 300
+OUTBOX_MAX_ATTEMPTS = 5
+
+# Sends in flight per channel for one worker
+CHANNEL_CONCURRENCY = {'email': 8, 'sms': 4}
+
+# Modules that register senders and job callbacks; imported when a worker starts
+OUTBOX_PLUGIN_MODULES = ('email_automation', 'sms_marketing', 'advanced_automation_system')
+
+
+@dataclass
+class OutboundMessage:
+    """One message to deliver; ``payload`` holds the sender's keyword arguments"""
+    channel: str
+    provider: str
+    recipient: str
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class DeliveryResult:
+    """Sender outcome; EmailResult and SMSResult have the same shape"""
+    success: bool
+    message_id: Optional[str] = None
+    error_message: Optional[str] = None
+    retryable: bool = False
+    attempts: int = 1
+
+
+@dataclass
+class _Sender:
+    send: Callable[[Dict[str, Any]], Any]
+    rate_limit_key: str
+
+
+@dataclass
+class _JobKind:
+    on_batch: Optional[Callable] = None
+    on_complete: Optional[Callable] = None
+
+
+_senders: Dict[str, _Sender] = {}
+_job_kinds: Dict[str, _JobKind] = {}
+
+
+def register_sender(provider: str, send: Callable[[Dict[str, Any]], Any], rate_limit_key: Optional[str] = None):
+    """Deliver ``provider`` messages with ``send(payload)``
+
+    ``send`` returns an object with ``success``, ``retryable`` and
+    ``error_message`` plus ``message_id`` or ``message_sid``. Providers that
+    share an account quota pass the same ``rate_limit_key``.
+    """
+    _senders[provider] = _Sender(send, rate_limit_key or provider)
+
+
+def register_job_kind(kind: str, on_batch: Optional[Callable] = None, on_complete: Optional[Callable] = None):
+    """Callbacks for a job kind, run inside the worker's transaction
+
+    ``on_batch(conn, job, outcomes)`` gets the messages that reached sent or
+    failed in a batch, as dicts with channel, recipient, status,
+    provider_message_id, error and payload. ``on_complete(conn, job, counts)`` runs once when no
+    message of the job is pending.
+    """
+    _job_kinds[kind] = _JobKind(on_batch, on_complete)
+
+
+def _send_emailjs(payload: Dict[str, Any]):
+    from communication_services import communication_manager
+    return communication_manager.email_service.send_email(**payload)
+
+
+def _send_twilio(payload: Dict[str, Any]):
+    from communication_services import communication_manager
+    return communication_manager.sms_service.send_sms(**payload)
+
+
+register_sender('emailjs', _send_emailjs)
+register_sender('twilio', _send_twilio)
+
+
+# ---- Producers ----
+
+def enqueue(kind: str, messages: Sequence[OutboundMessage], reference_id: Optional[str] = None,
+            db_path: str = DEFAULT_DB_PATH, start_worker: bool = True) -> str:
+    """Store a job and its messages; returns the job id immediately"""
+    ensure_schema(db_path)
+    job_id = str(uuid.uuid4())
+    now = datetime.now().isoformat()
+    with transaction(db_path) as conn:
+        conn.execute('''
+            INSERT INTO outbox_jobs (id, kind, reference_id, total, status, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (job_id, kind, reference_id, len(messages), 'queued' if messages else 'completed', now))
+        conn.executemany('''
+            INSERT INTO message_outbox
+            (id, job_id, channel, provider, recipient, payload, status, attempts, available_at, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, 'queued', 0, ?, ?, ?)
+        ''', [
+            (str(uuid.uuid4()), job_id, message.channel, message.provider, message.recipient,
+             json.dumps(message.payload), now, now, now)
+            for message in messages
+        ])
+        if not messages:
+            conn.execute("UPDATE outbox_jobs SET completed_at = ? WHERE id = ?", (now, job_id))
+
+    if start_worker and messages:
+        get_outbox_worker(db_path).wake()
+    return job_id
+
+
+def job_progress(job_id: str, db_path: str = DEFAULT_DB_PATH) -> Dict[str, Any]:
+    """Job status with message counts per delivery status"""
+    conn = get_connection(db_path)
+    try:
+        job = conn.execute(
+            "SELECT kind, reference_id, total, status, created_at, completed_at FROM outbox_jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if not job:
+            return {}
+        counts = dict(conn.execute(
+            "SELECT status, COUNT(*) FROM message_outbox WHERE job_id = ? GROUP BY status", (job_id,)
+        ).fetchall())
+    finally:
+        conn.close()
+
+    kind, reference_id, total, status, created_at, completed_at = job
+    finished = counts.get('sent', 0) + counts.get('failed', 0)
+    return {
+        'job_id': job_id,
+        'kind': kind,
+        'reference_id': reference_id,
+        'status': status,
+        'total': total,
+        'queued': counts.get('queued', 0),
+        'sending': counts.get('sending', 0),
+        'sent': counts.get('sent', 0),
+        'failed': counts.get('failed', 0),
+        'progress': finished / total if total else 1.0,
+        'done': status == 'completed',
+        'created_at': created_at,
+        'completed_at': completed_at
+    }
+
+
+def latest_job_id(kind: str, reference_id: str, db_path: str = DEFAULT_DB_PATH) -> Optional[str]:
+    """Most recent job of ``kind`` for a campaign or other source record"""
+    conn = get_connection(db_path)
+    try:
+        row = conn.execute(
+            "SELECT id FROM outbox_jobs WHERE kind = ? AND reference_id = ? ORDER BY created_at DESC LIMIT 1",
+            (kind, reference_id)
+        ).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def stream_job_progress(job_id: str, db_path: str = DEFAULT_DB_PATH,
+                        poll_seconds: float = 1.0, timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """Yield job progress each time it changes until the job completes (or ``timeout``)"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    last = None
+    while True:
+        progress = job_progress(job_id, db_path)
+        snapshot = (progress.get('status'), progress.get('sent'), progress.get('failed'), progress.get('sending'))
+        if snapshot != last:
+            last = snapshot
+            yield progress
+        if not progress or progress['done'] or (deadline is not None and time.monotonic() >= deadline):
+            return
+        time.sleep(poll_seconds)
+
+
+def _auto_refreshing(run_every: float):
+    """``st.fragment(run_every=...)`` on Streamlit 1.37+; older versions get a plain, static panel"""
+    fragment = getattr(st, 'fragment', None)
+    if fragment is None:
+        return lambda function: function
+    return fragment(run_every=run_every)
+
+
+@_auto_refreshing(run_every=2)
+def show_job_progress(job_id: str, db_path: str = DEFAULT_DB_PATH, label: str = "Sending"):
+    """Progress bar for an outbox job; refreshes itself without rerunning the page (Streamlit 1.37+)"""
+    progress = job_progress(job_id, db_path)
+    if not progress:
+        st.caption("Delivery job not found")
+        return
+    if progress['done']:
+        st.progress(1.0, text=f"✅ {label} complete: {progress['sent']:,} sent, {progress['failed']:,} failed")
+    else:
+        st.progress(progress['progress'],
+                    text=f"📤 {label}: {progress['sent'] + progress['failed']:,} of {progress['total']:,} "
+                         f"({progress['failed']:,} failed)")
+
+
+# ---- Workers ----
+
+class OutboxWorker:
+    """Background threads (one per channel) that deliver queued messages"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, channels: Sequence[str] = tuple(CHANNEL_CONCURRENCY),
+                 batch_size: int = OUTBOX_BATCH_SIZE, poll_seconds: float = OUTBOX_POLL_SECONDS):
+        self.db_path = db_path
+        self.channels = tuple(channels)
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop_event = threading.Event()
+        self._wake_events = {channel: threading.Event() for channel in self.channels}
+        self._threads: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads.values())
+
+    def start(self):
+        """Start one thread per channel (no-op for threads already running)"""
+        with self._lock:
+            ensure_schema(self.db_path)
+            _load_plugins()
+            self._stop_event.clear()
+            for channel in self.channels:
+                thread = self._threads.get(channel)
+                if thread is None or not thread.is_alive():
+                    thread = threading.Thread(target=self._run, args=(channel,),
+                                              name=f"outbox-{channel}", daemon=True)
+                    self._threads[channel] = thread
+                    thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop after the batches in progress; anything unfinished is reclaimed after its lease"""
+        self._stop_event.set()
+        for event in self._wake_events.values():
+            event.set()
+        for thread in self._threads.values():
+            thread.join(timeout)
+
+    def wake(self):
+        """Claim new work now instead of at the next poll"""
+        for event in self._wake_events.values():
+            event.set()
+
+    def run_once(self, channel: str) -> int:
+        """Claim and deliver one batch; returns the number of messages handled"""
+        batch = self._claim(channel)
+        if batch:
+            self._deliver(channel, batch)
+        return len(batch)
+
+    def _run(self, channel: str):
+        wake = self._wake_events[channel]
+        while not self._stop_event.is_set():
+            try:
+                handled = self.run_once(channel)
+            except Exception as e:
+                print(f"❌ Error processing {channel} outbox: {e}")
+                handled = 0
+            if not handled:
+                wake.wait(self.poll_seconds)
+                wake.clear()
+
+    def _claim(self, channel: str) -> List[Dict[str, Any]]:
+        """Lease the next batch: queued messages that are due and sends whose lease expired"""
+        now = datetime.now()
+        lease_until = (now + timedelta(seconds=OUTBOX_LEASE_SECONDS)).isoformat()
+        with transaction(self.db_path) as conn:
+            rows = conn.execute('''
+                SELECT id, job_id, provider, recipient, payload, status, attempts FROM message_outbox
+                WHERE channel = ? AND status IN ('queued', 'sending') AND available_at <= ?
+                ORDER BY available_at LIMIT ?
+            ''', (channel, now.isoformat(), self.batch_size)).fetchall()
+
+            batch, exhausted = [], []
+            for message_id, job_id, provider, recipient, payload, status, attempts in rows:
+                if attempts >= OUTBOX_MAX_ATTEMPTS:
+                    # A send that kept dying mid-flight; stop retrying it
+                    exhausted.append({'id': message_id, 'job_id': job_id, 'channel': channel, 'recipient': recipient,
+                                      'payload': json.loads(payload), 'status': 'failed',
+                                      'provider_message_id': None,
+                                      'error': f"Gave up after {attempts} attempts"})
+                    continue
+                batch.append({'id': message_id, 'job_id': job_id, 'channel': channel, 'provider': provider,
+                              'recipient': recipient, 'payload': json.loads(payload), 'attempts': attempts + 1})
+
+            conn.executemany('''
+                UPDATE message_outbox SET status = 'sending', attempts = attempts + 1, claimed_by = ?,
+                available_at = ?, updated_at = ? WHERE id = ?
+            ''', [(self.worker_id, lease_until, now.isoformat(), message['id']) for message in batch])
+            if exhausted:
+                self._finish(conn, exhausted, [])
+        return batch
+
+    def _deliver(self, channel: str, batch: List[Dict[str, Any]]):
+        by_provider: Dict[str, List[Dict[str, Any]]] = {}
+        for message in batch:
+            by_provider.setdefault(message['provider'], []).append(message)
+
+        outcomes, retries = [], []
+        for provider, messages in by_provider.items():
+            sender = _senders.get(provider)
+            if sender is None:
+                results = [DeliveryResult(False, error_message=f"No sender registered for {provider}",
+                                          retryable=True) for _ in messages]
+            else:
+                # Retries are rescheduled through the outbox, so each claim sends once
+                dispatcher = BulkDispatcher(provider, lambda message, send=sender.send: _safe_send(send, message),
+                                            concurrency=CHANNEL_CONCURRENCY.get(channel, 4), max_attempts=1,
+                                            rate_limiter=get_rate_limiter(sender.rate_limit_key))
+                results = dispatcher.dispatch(messages)
+
+            for message, result in zip(messages, results):
+                error = getattr(result, 'error_message', None)
+                if result.success:
+                    message_id = getattr(result, 'message_id', None) or getattr(result, 'message_sid', None)
+                    outcomes.append({**message, 'status': 'sent', 'provider_message_id': message_id, 'error': None})
+                elif getattr(result, 'retryable', False) and message['attempts'] < OUTBOX_MAX_ATTEMPTS:
+                    retries.append({**message, 'error': error})
+                else:
+                    outcomes.append({**message, 'status': 'failed', 'provider_message_id': None, 'error': error})
+
+        with transaction(self.db_path) as conn:
+            self._finish(conn, outcomes, retries)
+
+    def _finish(self, conn, outcomes: List[Dict[str, Any]], retries: List[Dict[str, Any]]):
+        """Record final states and reschedules, then run job callbacks and close finished jobs"""
+        now = datetime.now()
+        conn.executemany('''
+            UPDATE message_outbox SET status = ?, provider_message_id = ?, error = ?, claimed_by = NULL,
+            updated_at = ? WHERE id = ?
+        ''', [(outcome['status'], outcome['provider_message_id'], outcome['error'], now.isoformat(), outcome['id'])
+              for outcome in outcomes])
+        conn.executemany('''
+            UPDATE message_outbox SET status = 'queued', error = ?, claimed_by = NULL, available_at = ?,
+            updated_at = ? WHERE id = ?
+        ''', [(retry['error'], (now + timedelta(seconds=backoff_delay(retry['attempts']))).isoformat(),
+               now.isoformat(), retry['id']) for retry in retries])
+
+        by_job: Dict[str, List[Dict[str, Any]]] = {}
+        for outcome in outcomes:
+            by_job.setdefault(outcome['job_id'], []).append(outcome)
+
+        for job_id, job_outcomes in by_job.items():
+            job = self._job(conn, job_id)
+            if job is None:
+                continue
+            kind = _job_kinds.get(job['kind'])
+            if kind and kind.on_batch:
+                self._callback(kind.on_batch, conn, job, job_outcomes)
+
+            pending = conn.execute(
+                "SELECT COUNT(*) FROM message_outbox WHERE job_id = ? AND status IN ('queued', 'sending')",
+                (job_id,)
+            ).fetchone()[0]
+            if pending:
+                if job['status'] == 'queued':
+                    conn.execute("UPDATE outbox_jobs SET status = 'running' WHERE id = ?", (job_id,))
+                continue
+
+            conn.execute("UPDATE outbox_jobs SET status = 'completed', completed_at = ? WHERE id = ?",
+                         (now.isoformat(), job_id))
+            if kind and kind.on_complete:
+                counts = dict(conn.execute(
+                    "SELECT status, COUNT(*) FROM message_outbox WHERE job_id = ? GROUP BY status", (job_id,)
+                ).fetchall())
+                self._callback(kind.on_complete, conn, job, counts)
+
+    @staticmethod
+    def _job(conn, job_id: str) -> Optional[Dict[str, Any]]:
+        row = conn.execute("SELECT id, kind, reference_id, total, status FROM outbox_jobs WHERE id = ?",
+                           (job_id,)).fetchone()
+        if not row:
+            return None
+        return dict(zip(('id', 'kind', 'reference_id', 'total', 'status'), row))
+
+    def _callback(self, callback: Callable, conn, *args):
+        # A savepoint keeps a failing callback from undoing the delivery state
+        try:
+            with transaction(self.db_path):
+                callback(conn, *args)
+        except Exception as e:
+            print(f"❌ Error in outbox job callback: {e}")
+
+
+def _safe_send(send: Callable[[Dict[str, Any]], Any], message: Dict[str, Any]):
+    try:
+        return send(message['payload'])
+    except Exception as e:
+        return DeliveryResult(False, error_message=f"Sending failed: {e}", retryable=True)
+
+
+_plugins_loaded = False
+
+
+def _load_plugins():
+    """Import the modules that register senders and job kinds"""
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+    for module in OUTBOX_PLUGIN_MODULES:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print(f"⚠️ Outbox plugin {module} not loaded: {e}")
+
+
+_outbox_workers: Dict[str, OutboxWorker] = {}
+_outbox_workers_lock = threading.Lock()
+
+
+def get_outbox_worker(db_path: str = DEFAULT_DB_PATH) -> OutboxWorker:
+    """Process-wide outbox worker for a database, started on first use"""
+    with _outbox_workers_lock:
+        worker = _outbox_workers.get(db_path)
+        if worker is None:
+            worker = OutboxWorker(db_path)
+            _outbox_workers[db_path] = worker
+    worker.start()
+    return worker
+
+
+@atexit.register
+def _stop_outbox_workers():
+    with _outbox_workers_lock:
+        workers = list(_outbox_workers.values())
+    for worker in workers:
+        worker.stop()
+
+
+if __name__ == "__main__":
+    # Standalone worker process: python message_outbox.py [db_path]
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB_PATH
+    worker = get_outbox_worker(path)
+    print(f"📤 Outbox worker {worker.worker_id} delivering {', '.join(worker.channels)} from {path}")
+    try:
+        while worker.is_running:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        worker.stop()
@@ -9,7 +9,8 @@ from typing import List, Dict, Optional, Any
 from dataclasses import dataclass, field
 from enum import Enum
 import json
-import sqlite3
+from db_connection import get_connection
+from schema_migrations import ensure_schema
 import uuid
 
 class NotificationType(Enum):
@@ -49,42 +50,9 @@ class NotificationCenter:
         self.init_database()
     
     def init_database(self):
-        """Initialize notifications database tables"""
+        """Initialize notifications database tables (schema owned by schema_migrations)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS notifications (
-                    id TEXT PRIMARY KEY,
-                    title TEXT NOT NULL,
-                    message TEXT NOT NULL,
-                    type TEXT NOT NULL,
-                    priority TEXT NOT NULL,
-                    is_read BOOLEAN DEFAULT 0,
-                    is_dismissed BOOLEAN DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    read_at TIMESTAMP,
-                    data TEXT,
-                    action_url TEXT
-                )
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS notification_settings (
-                    id TEXT PRIMARY KEY,
-                    user_id TEXT NOT NULL,
-                    notification_type TEXT NOT NULL,
-                    is_enabled BOOLEAN DEFAULT 1,
-                    email_enabled BOOLEAN DEFAULT 0,
-                    sms_enabled BOOLEAN DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            conn.commit()
-            conn.close()
-            
+            ensure_schema(self.db_path)
         except Exception as e:
             st.error(f"Error initializing notifications database: {e}")
     
@@ -105,7 +73,7 @@ class NotificationCenter:
                 action_url=action_url
             )
             
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -140,7 +108,7 @@ class NotificationCenter:
                          limit: int = 50) -> List[Notification]:
         """Get notifications with optional filtering"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             query = "SELECT * FROM notifications WHERE is_dismissed = 0"
@@ -186,7 +154,7 @@ class NotificationCenter:
     def mark_as_read(self, notification_id: str) -> bool:
         """Mark notification as read"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -206,7 +174,7 @@ class NotificationCenter:
     def dismiss_notification(self, notification_id: str) -> bool:
         """Dismiss a notification"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -226,7 +194,7 @@ class NotificationCenter:
     def get_notification_stats(self) -> Dict[str, Any]:
         """Get notification statistics"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             # Total counts
@@ -1,9 +1,24 @@
-import sqlite3
+from db_connection import get_connection
+from keyset_pagination import DEFAULT_PAGE_SIZE, KeysetQuery, Page
+from report_rollups import ensure_rollups
 import datetime
 import json
 import os
 from typing import Dict, List, Optional, Any
 
+# Deal listing with contact details: newest first
+DEAL_LIST_QUERY = KeysetQuery(
+    'deals d LEFT JOIN contacts c ON d.contact_id = c.id',
+    {
+        'id': 'd.id', 'property_address': 'd.property_address', 'purchase_price': 'd.purchase_price',
+        'deal_type': 'd.deal_type', 'expected_roi': 'd.expected_roi', 'status': 'd.status',
+        'contact_id': 'd.contact_id', 'arv': 'd.arv', 'profit_projection': 'd.profit_projection',
+        'closing_date': 'd.closing_date', 'created_at': 'd.created_at',
+        'contact_name': 'c.name', 'contact_email': 'c.email'
+    },
+    order_by=[('created_at', 'DESC'), ('id', 'DESC')]
+)
+
 class NXTRIXDatabase:
     def __init__(self, db_path="nxtrix.db"):
         self.db_path = db_path
@@ -11,7 +26,7 @@ class NXTRIXDatabase:
     
     def init_database(self):
         """Initialize the database with all required tables"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         # Contacts table
@@ -106,13 +121,20 @@ class NXTRIXDatabase:
         )
         ''')
         
+        # Keyset listing order for deals
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_deals_created ON deals (created_at, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_deals_status_created ON deals (status, created_at, id)")
+        
         conn.commit()
         conn.close()
+        
+        # Daily rollups the dashboard metrics read instead of scanning contacts and deals
+        ensure_rollups(self.db_path)
         print("Database initialized successfully!")
     
     def get_connection(self):
         """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        return get_connection(self.db_path)
     
     # CONTACT OPERATIONS
     def add_contact(self, contact_data: Dict) -> int:
@@ -245,6 +267,12 @@ class NXTRIXDatabase:
         """Get all deals - alias for get_all_deals"""
         return self.get_all_deals()
     
+    def get_deals_page(self, status: Optional[str] = None, cursor: Optional[str] = None,
+                       page_size: int = DEFAULT_PAGE_SIZE) -> Page:
+        """Get one page of deals (newest first) with listing columns and contact information"""
+        filters = [('status', '=', status)] if status else []
+        return DEAL_LIST_QUERY.fetch(self.db_path, filters, cursor, page_size)
+    
     def get_all_deals(self) -> List[Dict]:
         """Get all deals with contact information"""
         conn = self.get_connection()
@@ -366,44 +394,36 @@ class NXTRIXDatabase:
     
     # ANALYTICS OPERATIONS
     def get_dashboard_metrics(self) -> Dict:
-        """Get dashboard metrics"""
+        """Get dashboard metrics from the daily contact and deal rollups"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Total contacts
-        cursor.execute('SELECT COUNT(*) FROM contacts')
-        total_contacts = cursor.fetchone()[0]
-        
-        # Active deals
-        cursor.execute('SELECT COUNT(*) FROM deals WHERE status="active"')
-        active_deals = cursor.fetchone()[0]
-        
-        # Total deal value
-        cursor.execute('SELECT SUM(purchase_price) FROM deals WHERE status="active"')
-        result = cursor.fetchone()[0]
-        total_value = result if result else 0
-        
-        # Average ROI
-        cursor.execute('SELECT AVG(expected_roi) FROM deals WHERE expected_roi > 0')
-        result = cursor.fetchone()[0]
-        avg_roi = round(result, 1) if result else 0
-        
-        # Recent activity
-        cursor.execute('SELECT COUNT(*) FROM contacts WHERE created_at >= date("now", "-30 days")')
-        new_contacts = cursor.fetchone()[0]
+        # Total and recent contacts
+        cursor.execute('''
+            SELECT SUM(row_count), SUM(CASE WHEN day >= date("now", "-30 days") THEN row_count END)
+            FROM rollup_contacts_daily
+        ''')
+        total_contacts, new_contacts = cursor.fetchone()
         
-        cursor.execute('SELECT COUNT(*) FROM deals WHERE created_at >= date("now", "-30 days")')
-        new_deals = cursor.fetchone()[0]
+        # Active deals, their value, average ROI and recent deals
+        cursor.execute('''
+            SELECT SUM(CASE WHEN status = "active" THEN row_count END),
+                   SUM(CASE WHEN status = "active" THEN purchase_price_sum END),
+                   SUM(positive_roi_sum) / NULLIF(SUM(positive_roi_count), 0),
+                   SUM(CASE WHEN day >= date("now", "-30 days") THEN row_count END)
+            FROM rollup_deals_daily
+        ''')
+        active_deals, total_value, avg_roi, new_deals = cursor.fetchone()
         
         conn.close()
         
         return {
-            'total_contacts': total_contacts,
-            'active_deals': active_deals,
-            'total_value': total_value,
-            'avg_roi': avg_roi,
-            'new_contacts': new_contacts,
-            'new_deals': new_deals
+            'total_contacts': total_contacts or 0,
+            'active_deals': active_deals or 0,
+            'total_value': total_value or 0,
+            'avg_roi': round(avg_roi, 1) if avg_roi else 0,
+            'new_contacts': new_contacts or 0,
+            'new_deals': new_deals or 0
         }
     
     def add_sample_data(self):
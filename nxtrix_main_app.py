@@ -6,7 +6,7 @@ Built November 28-29, 2025
 
 import streamlit as st
 import pandas as pd
-import sqlite3
+from db_connection import get_connection
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta, timezone
@@ -66,7 +66,7 @@ else:
 # Database initialization
 def init_database():
     """Initialize local database for CRM functionality"""
-    conn = sqlite3.connect('nxtrix.db')
+    conn = get_connection('nxtrix.db')
     cursor = conn.cursor()
     
     # Create contacts table
@@ -179,23 +179,23 @@ def render_dashboard():
     col1, col2, col3, col4 = st.columns(4)
     
     # Get data from database
-    conn = sqlite3.connect('nxtrix.db')
+    conn = get_connection('nxtrix.db')
     
     try:
         # Total contacts
-        contacts_count = pd.read_sql("SELECT COUNT(*) as count FROM contacts", conn).iloc[0]['count']
+        contacts_count = pd.read_sql("SELECT COUNT(*) as count FROM contacts", conn.raw).iloc[0]['count']
         
         # Total deals
-        deals_count = pd.read_sql("SELECT COUNT(*) as count FROM deals", conn).iloc[0]['count']
+        deals_count = pd.read_sql("SELECT COUNT(*) as count FROM deals", conn.raw).iloc[0]['count']
         
         # Total deal value
-        deal_value = pd.read_sql("SELECT COALESCE(SUM(amount), 0) as total FROM deals", conn).iloc[0]['total']
+        deal_value = pd.read_sql("SELECT COALESCE(SUM(amount), 0) as total FROM deals", conn.raw).iloc[0]['total']
         
         # Activities this month
         activities_count = pd.read_sql("""
             SELECT COUNT(*) as count FROM activities 
             WHERE created_at >= date('now', 'start of month')
-        """, conn).iloc[0]['count']
+        """, conn.raw).iloc[0]['count']
     except:
         contacts_count = deals_count = deal_value = activities_count = 0
     
@@ -221,13 +221,13 @@ def render_dashboard():
     with col1:
         st.subheader("📊 Deal Pipeline by Stage")
         
-        conn = sqlite3.connect('nxtrix.db')
+        conn = get_connection('nxtrix.db')
         try:
             pipeline_data = pd.read_sql("""
                 SELECT stage, COUNT(*) as count, COALESCE(SUM(amount), 0) as value
                 FROM deals 
                 GROUP BY stage
-            """, conn)
+            """, conn.raw)
             conn.close()
             
             if not pipeline_data.empty:
@@ -286,7 +286,7 @@ def render_contacts():
             
             if st.form_submit_button("Add Contact"):
                 if name:
-                    conn = sqlite3.connect('nxtrix.db')
+                    conn = get_connection('nxtrix.db')
                     cursor = conn.cursor()
                     
                     cursor.execute("""
@@ -305,9 +305,9 @@ def render_contacts():
     # Display contacts
     st.subheader("📋 All Contacts")
     
-    conn = sqlite3.connect('nxtrix.db')
+    conn = get_connection('nxtrix.db')
     try:
-        contacts_df = pd.read_sql("SELECT * FROM contacts ORDER BY created_at DESC", conn)
+        contacts_df = pd.read_sql("SELECT * FROM contacts ORDER BY created_at DESC", conn.raw)
     except:
         contacts_df = pd.DataFrame()
     conn.close()
@@ -347,9 +347,9 @@ def render_deals():
                 close_date = st.date_input("Expected Close Date")
                 
                 # Contact selection
-                conn = sqlite3.connect('nxtrix.db')
+                conn = get_connection('nxtrix.db')
                 try:
-                    contacts_df = pd.read_sql("SELECT id, name FROM contacts", conn)
+                    contacts_df = pd.read_sql("SELECT id, name FROM contacts", conn.raw)
                     conn.close()
                     
                     if not contacts_df.empty:
@@ -368,7 +368,7 @@ def render_deals():
             
             if st.form_submit_button("Add Deal"):
                 if title:
-                    conn = sqlite3.connect('nxtrix.db')
+                    conn = get_connection('nxtrix.db')
                     cursor = conn.cursor()
                     
                     cursor.execute("""
@@ -387,14 +387,14 @@ def render_deals():
     # Display deals
     st.subheader("📋 All Deals")
     
-    conn = sqlite3.connect('nxtrix.db')
+    conn = get_connection('nxtrix.db')
     try:
         deals_df = pd.read_sql("""
             SELECT d.*, c.name as contact_name 
             FROM deals d 
             LEFT JOIN contacts c ON d.contact_id = c.id 
             ORDER BY d.created_at DESC
-        """, conn)
+        """, conn.raw)
     except:
         deals_df = pd.DataFrame()
     conn.close()
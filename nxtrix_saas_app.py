@@ -159,6 +159,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Apply pending schema migrations once per process before any module touches the database
+try:
+    from schema_migrations import ensure_schema
+    ensure_schema()
+except Exception as e:
+    st.error(f"Database migration failed: {e}")
+
 # Initialize authentication system globally
 auth = StreamlitAuth()
 
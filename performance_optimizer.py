@@ -13,6 +13,8 @@ from datetime import datetime
 import threading
 import queue
 
+from financial_cache import get_analysis_cache
+
 class PerformanceOptimizer:
     """Performance optimization and monitoring system"""
     
@@ -96,6 +98,9 @@ class PerformanceOptimizer:
             if hasattr(st, 'cache_resource'):
                 st.cache_resource.clear()
             
+            # Clear memoized deal analyses
+            get_analysis_cache().clear()
+            
             return {
                 'cache_cleared': True,
                 'cache_clear_time': datetime.now().isoformat()
@@ -108,6 +113,13 @@ class PerformanceOptimizer:
                 'cache_clear_time': datetime.now().isoformat()
             }
     
+    def get_cache_statistics(self) -> Dict[str, Any]:
+        """Get financial analysis cache hit/miss statistics"""
+        try:
+            return get_analysis_cache().get_statistics()
+        except Exception as e:
+            return {'error': str(e)}
+    
     def get_performance_recommendations(self) -> list:
         """Get performance optimization recommendations"""
         recommendations = []
@@ -229,6 +241,26 @@ class PerformanceOptimizer:
                     delta=None
                 )
             
+            # Financial analysis cache
+            cache_stats = self.get_cache_statistics()
+            if 'error' not in cache_stats:
+                st.subheader("Analysis Cache")
+                
+                col1, col2, col3, col4 = st.columns(4)
+                
+                with col1:
+                    st.metric("Hit Rate", f"{cache_stats['hit_rate']:.1f}%")
+                
+                with col2:
+                    st.metric("Hits", f"{cache_stats['memory_hits'] + cache_stats['disk_hits']}")
+                
+                with col3:
+                    st.metric("Misses", f"{cache_stats['misses']}")
+                
+                with col4:
+                    st.metric("Cached Analyses", f"{cache_stats['memory_entries']}",
+                              f"{cache_stats['memory_bytes'] / (1024 * 1024):.1f} MB", delta_color="off")
+            
             # Optimization controls
             st.subheader("Optimization Controls")
             
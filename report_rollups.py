@@ -0,0 +1,326 @@
+"""
+Daily Rollups for NXTRIX CRM
+Materialized per-day aggregates that reports and dashboards read instead of raw rows:
+- One rollup table per source table and date column, keyed by day and dimensions (user, status, type)
+- Kept current on every write by SQLite triggers, whichever module or process writes
+- Updates that leave a row's day, dimensions and measures unchanged skip the rollup
+- Rollup changes bump report_data_versions, which invalidates cached reports
+- Dimensions and measures whose source columns a database lacks are left out
+- Rebuilt from the source table when the definition or the source columns change
+- Rows moved to an archive table on retention pruning stay counted
+- rebuild_rollups() recomputes rollups from scratch (compaction after bulk loads or drift)
+"""
+
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from db_connection import DEFAULT_DB_PATH, transaction
+
+_ROW_COLUMN = re.compile(r'\{row\}\.([A-Za-z_][A-Za-z0-9_]*)')
+
+
+@dataclass
+class Rollup:
+    """Per-day aggregate of one source table
+
+    ``measures`` map a rollup column to an SQL expression over one source row,
+    written with ``{row}.column`` so the same expression serves the backfill
+    (the source table) and the triggers (NEW / OLD). Every rollup also keeps
+    ``row_count``. Rows deleted from the source after being copied to
+    ``archive`` (retention pruning) keep their contribution.
+    """
+    name: str
+    source: str
+    date_column: str
+    dimensions: Tuple[str, ...] = ()
+    measures: Dict[str, str] = field(default_factory=dict)
+    key_column: str = 'id'
+    archive: Optional[str] = None
+
+    @property
+    def table(self) -> str:
+        return f"rollup_{self.name}"
+
+
+def _sum(column: str) -> str:
+    return f"COALESCE({{row}}.{column}, 0)"
+
+
+def _present(column: str) -> str:
+    return f"({{row}}.{column} IS NOT NULL)"
+
+
+ROLLUPS: List[Rollup] = [
+    # Dashboard deals (nxtrix_backend): status tiles and new-deal counts
+    Rollup('deals_daily', 'deals', 'created_at', ('status', 'assigned_to'), {
+        'purchase_price_sum': _sum('purchase_price'),
+        'positive_roi_sum': "CASE WHEN {row}.expected_roi > 0 THEN {row}.expected_roi ELSE 0 END",
+        'positive_roi_count': "COALESCE({row}.expected_roi > 0, 0)"
+    }),
+    # Advanced reporting deals, dated by date_added
+    Rollup('deal_reporting_daily', 'deals', 'date_added', ('status', 'assigned_to'), {
+        'purchase_price_sum': _sum('purchase_price'),
+        'ai_score_sum': _sum('ai_score'),
+        'ai_score_count': _present('ai_score'),
+        'cap_rate_sum': _sum('cap_rate'),
+        'cap_rate_count': _present('cap_rate'),
+        'cash_on_cash_return_sum': _sum('cash_on_cash_return'),
+        'cash_on_cash_return_count': _present('cash_on_cash_return'),
+        'projected_income_sum': "COALESCE({row}.monthly_rent, 0) * 12"
+    }),
+    Rollup('contacts_daily', 'contacts', 'created_at', ('contact_type',)),
+    Rollup('leads_daily', 'leads', 'created_at', ('status',), {
+        'hot_leads': "COALESCE({row}.score >= 80, 0)"
+    }),
+    Rollup('activity_daily', 'activity_logs', 'created_at', ('user_id', 'activity_type', 'priority'), {
+        'actions_open': "COALESCE({row}.requires_action AND NOT {row}.is_completed, 0)"
+    }, archive='activity_logs_archive'),
+    Rollup('opportunities_daily', 'opportunity_alerts', 'created_at', ('opportunity_type', 'priority'), {
+        'potential_value_sum': _sum('potential_value')
+    }),
+]
+
+_TRIGGER_SUFFIXES = ('before_insert', 'after_insert', 'after_delete', 'update_old', 'update_new')
+
+
+def _columns(conn, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _resolve(rollup: Rollup, source_columns: Sequence[str]) -> Optional[Tuple[List[str], Dict[str, str]]]:
+    """Dimensions and measures this database can support (None when the rollup cannot exist)"""
+    available = set(source_columns)
+    if rollup.date_column not in available or rollup.key_column not in available:
+        return None
+    dimensions = [dimension for dimension in rollup.dimensions if dimension in available]
+    measures = {name: expression for name, expression in rollup.measures.items()
+                if set(_ROW_COLUMN.findall(expression)) <= available}
+    return dimensions, measures
+
+
+class _RollupSQL:
+    """Statements for one resolved rollup"""
+
+    def __init__(self, rollup: Rollup, dimensions: List[str], measures: Dict[str, str],
+                 archive: Optional[str] = None):
+        self.rollup = rollup
+        self.dimensions = dimensions
+        self.measures = measures
+        self.archive = archive
+        self.key = ['day'] + dimensions
+        self.values = ['row_count'] + list(measures)
+
+    def source_columns(self) -> List[str]:
+        """Source columns the rollup reads"""
+        return sorted({self.rollup.key_column, self.rollup.date_column, *self.dimensions,
+                       *(column for expression in self.measures.values()
+                         for column in _ROW_COLUMN.findall(expression))})
+
+    def row_values(self, row: str) -> List[str]:
+        """day, dimension and measure expressions over one source row"""
+        return ([f"substr({row}.{self.rollup.date_column}, 1, 10)"]
+                + [f"COALESCE({row}.{dimension}, '')" for dimension in self.dimensions]
+                + ['1']
+                + [expression.format(row=row) for expression in self.measures.values()])
+
+    def create_table(self) -> str:
+        columns = (['day TEXT NOT NULL']
+                   + [f"{dimension} TEXT NOT NULL DEFAULT ''" for dimension in self.dimensions]
+                   + ['row_count INTEGER NOT NULL DEFAULT 0']
+                   + [f"{measure} REAL NOT NULL DEFAULT 0" for measure in self.measures])
+        return (f"CREATE TABLE {self.rollup.table} ({', '.join(columns)}, "
+                f"PRIMARY KEY ({', '.join(self.key)})) WITHOUT ROWID")
+
+    def backfill(self) -> str:
+        source = self.rollup.source
+        expressions = self.row_values(source)
+        aggregated = expressions[:len(self.key)] + ['COUNT(*)'] + [f"SUM({value})" for value in
+                                                                 expressions[len(self.key) + 1:]]
+        rows = source
+        if self.archive:
+            columns = ', '.join(self.source_columns())
+            rows = (f"(SELECT {columns} FROM {source} UNION ALL "
+                    f"SELECT {columns} FROM {self.archive}) AS {source}")
+        return (f"INSERT INTO {self.rollup.table} ({', '.join(self.key + self.values)}) "
+                f"SELECT {', '.join(aggregated)} FROM {rows} "
+                f"WHERE {source}.{self.rollup.date_column} IS NOT NULL "
+                f"GROUP BY {', '.join(str(position) for position in range(1, len(self.key) + 1))}")
+
+    def add(self, row: str) -> str:
+        updates = ', '.join(f"{value} = {value} + excluded.{value}" for value in self.values)
+        return (f"INSERT INTO {self.rollup.table} ({', '.join(self.key + self.values)}) "
+                f"VALUES ({', '.join(self.row_values(row))}) "
+                f"ON CONFLICT ({', '.join(self.key)}) DO UPDATE SET {updates};")
+
+    def subtract(self, row: str, source_clause: str = '') -> str:
+        """Remove one row's contribution; ``source_clause`` reads it from the table instead of OLD"""
+        table = self.rollup.table
+        names = self.key + self.values
+        if not source_clause:
+            expressions = dict(zip(names, self.row_values(row)))
+            updates = ', '.join(f"{value} = {value} - ({expressions[value]})" for value in self.values)
+            matches = ' AND '.join(f"{column} = {expressions[column]}" for column in self.key)
+            return f"UPDATE {table} SET {updates} WHERE {matches};"
+        selected = ', '.join(f"{expression} AS {name}" for expression, name in zip(self.row_values(row), names))
+        updates = ', '.join(f"{value} = {table}.{value} - gone.{value}" for value in self.values)
+        matches = ' AND '.join(f"{table}.{column} = gone.{column}" for column in self.key)
+        return (f"UPDATE {table} SET {updates} "
+                f"FROM (SELECT {selected} {source_clause}) AS gone WHERE {matches};")
+
+    def changed(self) -> str:
+        """True when an update moves the row to another rollup key or changes a measure"""
+        return ' OR '.join(f"({old}) IS NOT ({new})" for old, new in zip(self.row_values('OLD'), self.row_values('NEW'))
+                           if old != '1')
+
+    def triggers(self) -> List[str]:
+        rollup = self.rollup
+        table, source, date_column = rollup.table, rollup.source, rollup.date_column
+        watched = [column for column in self.source_columns() if column != rollup.key_column]
+        archived = ''
+        if self.archive:
+            archived = (f" AND NOT EXISTS (SELECT 1 FROM {self.archive} "
+                        f"WHERE {self.archive}.{rollup.key_column} = OLD.{rollup.key_column})")
+        # Reports cache on this version (see advanced_reporting); bump it whenever the rollup changes
+        bump = f"UPDATE report_data_versions SET version = version + 1 WHERE table_name = '{source}';"
+        return [
+            # INSERT OR REPLACE removes the old row without firing delete triggers,
+            # so take its contribution out before the insert happens
+            f'''
+            CREATE TRIGGER {table}_before_insert BEFORE INSERT ON {source} BEGIN
+                {self.subtract('existing', f"FROM {source} AS existing WHERE existing.{rollup.key_column} = NEW.{rollup.key_column} AND existing.{date_column} IS NOT NULL")}
+            END
+            ''',
+            f'''
+            CREATE TRIGGER {table}_after_insert AFTER INSERT ON {source}
+            WHEN NEW.{date_column} IS NOT NULL BEGIN
+                {self.add('NEW')}
+                {bump}
+            END
+            ''',
+            f'''
+            CREATE TRIGGER {table}_after_delete AFTER DELETE ON {source}
+            WHEN OLD.{date_column} IS NOT NULL{archived} BEGIN
+                {self.subtract('OLD')}
+                {bump}
+            END
+            ''',
+            f'''
+            CREATE TRIGGER {table}_update_old AFTER UPDATE OF {', '.join(watched)} ON {source}
+            WHEN OLD.{date_column} IS NOT NULL AND ({self.changed()}) BEGIN
+                {self.subtract('OLD')}
+                {bump}
+            END
+            ''',
+            f'''
+            CREATE TRIGGER {table}_update_new AFTER UPDATE OF {', '.join(watched)} ON {source}
+            WHEN NEW.{date_column} IS NOT NULL AND ({self.changed()}) BEGIN
+                {self.add('NEW')}
+                {bump}
+            END
+            '''
+        ]
+
+
+def _create_registry(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS report_rollups (
+            name TEXT PRIMARY KEY,
+            source_table TEXT NOT NULL,
+            signature TEXT NOT NULL,
+            rebuilt_at TEXT NOT NULL,
+            row_count INTEGER
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS report_data_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+
+def _drop(conn, rollup: Rollup):
+    for suffix in _TRIGGER_SUFFIXES:
+        conn.execute(f"DROP TRIGGER IF EXISTS {rollup.table}_{suffix}")
+    conn.execute(f"DROP TABLE IF EXISTS {rollup.table}")
+    conn.execute("DELETE FROM report_rollups WHERE name = ?", (rollup.name,))
+
+
+def _rebuild(conn, statements: '_RollupSQL', signature: str) -> int:
+    rollup = statements.rollup
+    _drop(conn, rollup)
+    conn.execute(statements.create_table())
+    conn.execute(statements.backfill())
+    for trigger in statements.triggers():
+        conn.execute(trigger)
+    rows = conn.execute(f"SELECT COUNT(*) FROM {rollup.table}").fetchone()[0]
+    conn.execute("INSERT OR IGNORE INTO report_data_versions (table_name, version) VALUES (?, 0)", (rollup.source,))
+    conn.execute("UPDATE report_data_versions SET version = version + 1 WHERE table_name = ?", (rollup.source,))
+    conn.execute('''
+        INSERT INTO report_rollups (name, source_table, signature, rebuilt_at, row_count) VALUES (?, ?, ?, ?, ?)
+    ''', (rollup.name, rollup.source, signature, datetime.now().isoformat(), rows))
+    return rows
+
+
+def _is_current(conn, rollup: Rollup, signature: str) -> bool:
+    row = conn.execute("SELECT signature FROM report_rollups WHERE name = ?", (rollup.name,)).fetchone()
+    if not row or row[0] != signature:
+        return False
+    names = {f"{rollup.table}_{suffix}" for suffix in _TRIGGER_SUFFIXES}
+    placeholders = ', '.join('?' * len(names))
+    found = conn.execute(f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN ({placeholders})",
+                         list(names)).fetchone()[0]
+    return found == len(names)
+
+
+def reconcile_rollups(db_path: str = DEFAULT_DB_PATH, force: bool = False) -> List[str]:
+    """Create or rebuild every rollup whose definition or source columns changed; returns rebuilt names"""
+    rebuilt = []
+    with transaction(db_path) as conn:
+        _create_registry(conn)
+        for rollup in ROLLUPS:
+            resolved = _resolve(rollup, _columns(conn, rollup.source))
+            if resolved is None:
+                # The source table is missing or lacks the date column here
+                _drop(conn, rollup)
+                continue
+            dimensions, measures = resolved
+            statements = _RollupSQL(rollup, dimensions, measures)
+            if rollup.archive and set(statements.source_columns()) <= set(_columns(conn, rollup.archive)):
+                statements.archive = rollup.archive
+            signature = json.dumps({'date': rollup.date_column, 'dimensions': dimensions, 'measures': measures,
+                                    'archive': statements.archive}, sort_keys=True)
+            if force or not _is_current(conn, rollup, signature):
+                _rebuild(conn, statements, signature)
+                rebuilt.append(rollup.name)
+    return rebuilt
+
+
+def rebuild_rollups(db_path: str = DEFAULT_DB_PATH) -> List[str]:
+    """Recompute all rollups from their source tables (compaction)"""
+    return reconcile_rollups(db_path, force=True)
+
+
+_reconciled_paths = set()
+_reconcile_lock = threading.Lock()
+
+
+def ensure_rollups(db_path: str = DEFAULT_DB_PATH):
+    """Reconcile rollups once per process and path (for databases outside schema_migrations)"""
+    key = os.path.abspath(db_path)
+    if key in _reconciled_paths:
+        return
+    with _reconcile_lock:
+        if key not in _reconciled_paths:
+            reconcile_rollups(db_path)
+            _reconciled_paths.add(key)
+
+
+def rollup_columns(conn, name: str) -> List[str]:
+    """Columns of a rollup table; empty when this database has no such rollup"""
+    return _columns(conn, f"rollup_{name}")
@@ -0,0 +1,728 @@
+"""
+Schema Migrations for NXTRIX CRM
+Versioned migration runner that owns the crm_data.db schema:
+- Ordered, numbered migrations recorded in schema_migrations
+- Each pending migration applied once, in its own IMMEDIATE transaction
+- Covering indexes for the hot lead, deal, alert and notification queries
+- Daily report rollups reconciled on every startup (see report_rollups)
+- Data versions for cached reports, bumped by the rollup triggers
+- Durable message outbox with a status-transition log (see message_outbox)
+- Investor criteria version, bumped by triggers so resident matchers reload
+- Runs once per process at startup; module constructors only call ensure_schema()
+- EXPLAIN QUERY PLAN checks that the hot queries keep using their indexes
+"""
+
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from db_connection import DEFAULT_DB_PATH, get_connection, transaction
+from report_rollups import reconcile_rollups
+
+
+@dataclass
+class Migration:
+    """One schema change, applied at most once per database"""
+    version: int
+    name: str
+    apply: Callable
+
+
+def _executor(*statements: str) -> Callable:
+    def apply(conn):
+        for statement in statements:
+            conn.execute(statement)
+    return apply
+
+
+def _columns(conn, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+# ---- Migration 1: tables of the CRM, lead scoring, sourcing, activity, notification and reporting modules ----
+
+_BASELINE_TABLES = (
+    # Leads are shared by the CRM pipeline (enhanced_crm) and lead scoring
+    # (lead_scoring_system); rows of the latter are the ones with a source
+    '''
+    CREATE TABLE IF NOT EXISTS leads (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        email TEXT,
+        phone TEXT,
+        status TEXT,
+        lead_type TEXT,
+        lead_source TEXT,
+        property_address TEXT,
+        property_value REAL,
+        budget REAL,
+        timeline TEXT,
+        motivation TEXT,
+        notes TEXT,
+        score INTEGER DEFAULT 0,
+        created_at TEXT,
+        updated_at TEXT,
+        source TEXT,
+        property_interest TEXT,
+        budget_min REAL DEFAULT 0,
+        budget_max REAL DEFAULT 0,
+        investment_timeline TEXT,
+        experience_level TEXT,
+        preferred_areas TEXT,
+        last_contact TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS contacts (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        company TEXT,
+        title TEXT,
+        email TEXT,
+        phone TEXT,
+        contact_type TEXT,
+        specializations TEXT,
+        location TEXT,
+        notes TEXT,
+        created_at TEXT,
+        updated_at TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS buyers (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        email TEXT,
+        phone TEXT,
+        min_price REAL,
+        max_price REAL,
+        preferred_locations TEXT,
+        property_types TEXT,
+        investment_strategy TEXT,
+        min_roi REAL,
+        cash_available REAL,
+        financing_options TEXT,
+        created_at TEXT,
+        updated_at TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS deals (
+        id TEXT PRIMARY KEY,
+        property_address TEXT NOT NULL,
+        deal_type TEXT,
+        property_type TEXT,
+        purchase_price REAL,
+        arv REAL,
+        repair_costs REAL,
+        estimated_roi REAL,
+        status TEXT,
+        lead_id TEXT,
+        created_at TEXT,
+        updated_at TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS activities (
+        id TEXT PRIMARY KEY,
+        activity_type TEXT,
+        subject TEXT,
+        description TEXT,
+        related_lead_id TEXT,
+        related_contact_id TEXT,
+        related_deal_id TEXT,
+        user_id TEXT,
+        created_at TEXT
+    )
+    ''',
+    # Lead scoring
+    '''
+    CREATE TABLE IF NOT EXISTS lead_activities (
+        id TEXT PRIMARY KEY,
+        lead_id TEXT NOT NULL,
+        activity_type TEXT NOT NULL,
+        activity_data TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (lead_id) REFERENCES leads (id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS scoring_rules (
+        id TEXT PRIMARY KEY,
+        rule_name TEXT NOT NULL,
+        criteria TEXT NOT NULL,
+        points INTEGER NOT NULL,
+        is_active BOOLEAN DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        rule_set TEXT NOT NULL DEFAULT 'lead_scoring'
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS lead_rescore_runs (
+        id TEXT PRIMARY KEY,
+        started_at TIMESTAMP NOT NULL,
+        duration_seconds REAL,
+        leads_checked INTEGER DEFAULT 0,
+        leads_updated INTEGER DEFAULT 0,
+        full_rescore BOOLEAN DEFAULT 0,
+        error TEXT
+    )
+    ''',
+    # Automated deal sourcing
+    '''
+    CREATE TABLE IF NOT EXISTS investor_criteria (
+        investor_id TEXT PRIMARY KEY,
+        investor_name TEXT,
+        min_price REAL,
+        max_price REAL,
+        preferred_property_types TEXT,
+        target_locations TEXT,
+        min_roi REAL,
+        min_cash_flow REAL,
+        max_rehab_budget REAL,
+        preferred_conditions TEXT,
+        investment_strategy TEXT,
+        deal_sources TEXT,
+        alert_frequency TEXT,
+        active BOOLEAN,
+        created_date TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS property_leads (
+        lead_id TEXT PRIMARY KEY,
+        property_address TEXT,
+        city TEXT,
+        state TEXT,
+        zip_code TEXT,
+        property_type TEXT,
+        bedrooms INTEGER,
+        bathrooms REAL,
+        square_feet INTEGER,
+        lot_size REAL,
+        year_built INTEGER,
+        asking_price REAL,
+        estimated_arv REAL,
+        estimated_rehab REAL,
+        property_condition TEXT,
+        days_on_market INTEGER,
+        listing_agent TEXT,
+        listing_agent_phone TEXT,
+        deal_source TEXT,
+        lead_source_contact TEXT,
+        description TEXT,
+        photos TEXT,
+        discovered_date TEXT,
+        last_updated TEXT,
+        status TEXT,
+        notes TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS deal_alerts (
+        alert_id TEXT PRIMARY KEY,
+        investor_id TEXT,
+        property_lead_id TEXT,
+        match_score REAL,
+        alert_date TEXT,
+        alert_sent BOOLEAN,
+        investor_response TEXT,
+        response_date TEXT,
+        FOREIGN KEY (investor_id) REFERENCES investor_criteria (investor_id),
+        FOREIGN KEY (property_lead_id) REFERENCES property_leads (lead_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS sourcing_activity (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        activity_type TEXT,
+        description TEXT,
+        property_lead_id TEXT,
+        investor_id TEXT,
+        activity_date TEXT,
+        result TEXT,
+        notes TEXT
+    )
+    ''',
+    # Activity tracking
+    '''
+    CREATE TABLE IF NOT EXISTS activity_logs (
+        id TEXT PRIMARY KEY,
+        user_id TEXT,
+        activity_type TEXT,
+        title TEXT,
+        description TEXT,
+        entity_type TEXT,
+        entity_id TEXT,
+        metadata TEXT,
+        priority TEXT,
+        created_at TEXT,
+        requires_action BOOLEAN,
+        action_deadline TEXT,
+        is_completed BOOLEAN,
+        completed_at TEXT,
+        tags TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS opportunity_alerts (
+        id TEXT PRIMARY KEY,
+        opportunity_type TEXT,
+        title TEXT,
+        description TEXT,
+        entity_id TEXT,
+        potential_value REAL,
+        confidence_score REAL,
+        priority TEXT,
+        created_at TEXT,
+        expires_at TEXT,
+        is_acted_upon BOOLEAN,
+        action_taken TEXT,
+        action_date TEXT,
+        outcome TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS user_notifications (
+        id TEXT PRIMARY KEY,
+        user_id TEXT,
+        title TEXT,
+        message TEXT,
+        notification_type TEXT,
+        priority TEXT,
+        channels TEXT,
+        related_entity_type TEXT,
+        related_entity_id TEXT,
+        scheduled_for TEXT,
+        sent_at TEXT,
+        read_at TEXT,
+        is_sent BOOLEAN,
+        is_read BOOLEAN,
+        action_url TEXT,
+        metadata TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS reminder_rules (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        entity_type TEXT,
+        trigger_condition TEXT,
+        trigger_value INTEGER,
+        reminder_message TEXT,
+        priority TEXT,
+        channels TEXT,
+        is_active BOOLEAN,
+        created_at TEXT
+    )
+    ''',
+    # Notification center
+    '''
+    CREATE TABLE IF NOT EXISTS notifications (
+        id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        message TEXT NOT NULL,
+        type TEXT NOT NULL,
+        priority TEXT NOT NULL,
+        is_read BOOLEAN DEFAULT 0,
+        is_dismissed BOOLEAN DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        read_at TIMESTAMP,
+        data TEXT,
+        action_url TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS notification_settings (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        notification_type TEXT NOT NULL,
+        is_enabled BOOLEAN DEFAULT 1,
+        email_enabled BOOLEAN DEFAULT 0,
+        sms_enabled BOOLEAN DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    # Advanced reporting
+    '''
+    CREATE TABLE IF NOT EXISTS kpi_metrics (
+        id TEXT PRIMARY KEY,
+        metric_name TEXT NOT NULL,
+        metric_value REAL NOT NULL,
+        period_start TIMESTAMP NOT NULL,
+        period_end TIMESTAMP NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS report_log (
+        id TEXT PRIMARY KEY,
+        report_type TEXT NOT NULL,
+        parameters TEXT,
+        generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        user_id TEXT
+    )
+    '''
+)
+
+
+# ---- Migration 2: columns older databases may lack ----
+
+_ADDED_COLUMNS = {
+    # Whichever module created leads first left out the other's columns
+    'leads': [
+        ('email', 'TEXT'), ('phone', 'TEXT'), ('status', 'TEXT'), ('lead_type', 'TEXT'), ('lead_source', 'TEXT'),
+        ('property_address', 'TEXT'), ('property_value', 'REAL'), ('budget', 'REAL'), ('timeline', 'TEXT'),
+        ('motivation', 'TEXT'), ('notes', 'TEXT'), ('score', 'INTEGER DEFAULT 0'), ('created_at', 'TEXT'),
+        ('updated_at', 'TEXT'), ('source', 'TEXT'), ('property_interest', 'TEXT'), ('budget_min', 'REAL DEFAULT 0'),
+        ('budget_max', 'REAL DEFAULT 0'), ('investment_timeline', 'TEXT'), ('experience_level', 'TEXT'),
+        ('preferred_areas', 'TEXT'), ('last_contact', 'TIMESTAMP')
+    ],
+    'scoring_rules': [('rule_set', "TEXT NOT NULL DEFAULT 'lead_scoring'")]
+}
+
+
+def _add_missing_columns(conn):
+    for table, columns in _ADDED_COLUMNS.items():
+        existing = set(_columns(conn, table))
+        for name, definition in columns:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+
+# ---- Migration 3: indexes for the hot query shapes ----
+
+_HOT_QUERY_INDEXES = (
+    # Lead listings: score-ordered (per status) and newest-first; time-decay rescoring by last_contact
+    "CREATE INDEX IF NOT EXISTS idx_leads_score_created ON leads (score, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_leads_status_score ON leads (status, score, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_leads_created ON leads (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_leads_last_contact ON leads (last_contact)",
+    "CREATE INDEX IF NOT EXISTS idx_scoring_rules_set ON scoring_rules (rule_set, is_active)",
+    "CREATE INDEX IF NOT EXISTS idx_lead_rescore_runs_started ON lead_rescore_runs (started_at)",
+    "CREATE INDEX IF NOT EXISTS idx_contacts_created ON contacts (created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_buyers_created ON buyers (created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_deals_status_created ON deals (status, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_deals_created ON deals (created_at)",
+    # Property leads and investor alerts
+    "CREATE INDEX IF NOT EXISTS idx_property_leads_discovered ON property_leads (discovered_date, lead_id)",
+    "CREATE INDEX IF NOT EXISTS idx_property_leads_status_discovered ON property_leads (status, discovered_date, lead_id)",
+    "CREATE INDEX IF NOT EXISTS idx_deal_alerts_investor_date ON deal_alerts (investor_id, alert_date)",
+    "CREATE INDEX IF NOT EXISTS idx_deal_alerts_date ON deal_alerts (alert_date)",
+    "CREATE INDEX IF NOT EXISTS idx_deal_alerts_property ON deal_alerts (property_lead_id)",
+    "CREATE INDEX IF NOT EXISTS idx_investor_criteria_active ON investor_criteria (active, created_date)",
+    # Activity feeds and notifications: newest first, unread/undismissed filters
+    "CREATE INDEX IF NOT EXISTS idx_activity_logs_created ON activity_logs (created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_opportunity_alerts_created ON opportunity_alerts (created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_user_notifications_scheduled ON user_notifications (scheduled_for)",
+    "CREATE INDEX IF NOT EXISTS idx_notifications_feed ON notifications (is_dismissed, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_notifications_unread ON notifications (is_dismissed, is_read, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_kpi_metrics_name_period ON kpi_metrics (metric_name, period_start)",
+    "CREATE INDEX IF NOT EXISTS idx_report_log_generated ON report_log (generated_at)"
+)
+
+
+# ---- Migration 4: data versions that invalidate cached reports ----
+
+REPORT_VERSIONED_TABLES = ('deals', 'leads')
+
+
+def _report_data_versions(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS report_data_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for table in REPORT_VERSIONED_TABLES:
+        conn.execute("INSERT OR IGNORE INTO report_data_versions (table_name, version) VALUES (?, 0)", (table,))
+        # Any committed write bumps the version, whichever module or process made it
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_report_version
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE report_data_versions SET version = version + 1 WHERE table_name = '{table}';
+                END
+            ''')
+
+
+# ---- Migration 5: rollup triggers take over the report data versions ----
+
+def _drop_source_version_triggers(conn):
+    # report_rollups bumps the versions only when a rollup changes, so
+    # rescoring and other updates that leave reports untouched stay cheap
+    for table in REPORT_VERSIONED_TABLES:
+        for event in ('insert', 'update', 'delete'):
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{event}_report_version")
+
+
+# ---- Migration 6: append-only activity storage ----
+
+_ACTIVITY_ARCHIVE = (
+    # Activities past retention move here (see ActivityTracker.prune_history)
+    '''
+    CREATE TABLE IF NOT EXISTS activity_logs_archive (
+        id TEXT PRIMARY KEY,
+        user_id TEXT,
+        activity_type TEXT,
+        title TEXT,
+        description TEXT,
+        entity_type TEXT,
+        entity_id TEXT,
+        metadata TEXT,
+        priority TEXT,
+        created_at TEXT,
+        requires_action BOOLEAN,
+        action_deadline TEXT,
+        is_completed BOOLEAN,
+        completed_at TEXT,
+        tags TEXT
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_activity_logs_archive_created ON activity_logs_archive (created_at)",
+    # Windowed reads that replaced the in-memory activity, opportunity and notification lists
+    "CREATE INDEX IF NOT EXISTS idx_activity_logs_pending ON activity_logs (created_at) "
+    "WHERE requires_action = 1 AND is_completed = 0",
+    "CREATE INDEX IF NOT EXISTS idx_opportunity_alerts_open ON opportunity_alerts (is_acted_upon, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_user_notifications_user ON user_notifications (user_id, is_read, scheduled_for)"
+)
+
+# Durable outbox shared by email and SMS sends (see message_outbox)
+_MESSAGE_OUTBOX = (
+    '''
+    CREATE TABLE IF NOT EXISTS outbox_jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        reference_id TEXT,
+        total INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'queued',
+        created_at TEXT NOT NULL,
+        completed_at TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS message_outbox (
+        id TEXT PRIMARY KEY,
+        job_id TEXT NOT NULL,
+        channel TEXT NOT NULL,
+        provider TEXT NOT NULL,
+        recipient TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        available_at TEXT NOT NULL,
+        claimed_by TEXT,
+        provider_message_id TEXT,
+        error TEXT,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    ''',
+    # Claims scan due messages per channel; progress counts per job
+    "CREATE INDEX IF NOT EXISTS idx_message_outbox_claim ON message_outbox (channel, status, available_at)",
+    "CREATE INDEX IF NOT EXISTS idx_message_outbox_job ON message_outbox (job_id, status)",
+    "CREATE INDEX IF NOT EXISTS idx_outbox_jobs_reference ON outbox_jobs (kind, reference_id, created_at)",
+    '''
+    CREATE TABLE IF NOT EXISTS message_outbox_events (
+        message_id TEXT NOT NULL,
+        from_status TEXT,
+        to_status TEXT NOT NULL,
+        attempt INTEGER NOT NULL,
+        error TEXT,
+        created_at TEXT NOT NULL
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_message_outbox_events_message ON message_outbox_events (message_id)",
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_message_outbox_transition
+    AFTER UPDATE OF status ON message_outbox
+    BEGIN
+        INSERT INTO message_outbox_events (message_id, from_status, to_status, attempt, error, created_at)
+        VALUES (NEW.id, OLD.status, NEW.status, NEW.attempts, NEW.error, NEW.updated_at);
+    END
+    '''
+)
+
+
+# ---- Migration 8: investor criteria version for resident matchers ----
+
+def _investor_criteria_version(conn):
+    # Every process's InvestorMatcher compares this before matching a batch
+    conn.execute("INSERT OR IGNORE INTO report_data_versions (table_name, version) VALUES ('investor_criteria', 0)")
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_investor_criteria_{event.lower()}_version
+            AFTER {event} ON investor_criteria
+            BEGIN
+                UPDATE report_data_versions SET version = version + 1 WHERE table_name = 'investor_criteria';
+            END
+        ''')
+
+
+SCHEMA_MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline_tables", _executor(*_BASELINE_TABLES)),
+    Migration(2, "shared_lead_columns", _add_missing_columns),
+    Migration(3, "hot_query_indexes", _executor(*_HOT_QUERY_INDEXES)),
+    Migration(4, "report_data_versions", _report_data_versions),
+    Migration(5, "rollup_report_versions", _drop_source_version_triggers),
+    Migration(6, "activity_log_archive", _executor(*_ACTIVITY_ARCHIVE)),
+    Migration(7, "message_outbox", _executor(*_MESSAGE_OUTBOX)),
+    Migration(8, "investor_criteria_version", _investor_criteria_version),
+]
+
+# Indexes on tables or columns other modules create (or add) later; reconciled on every startup
+CONDITIONAL_INDEXES: List[Tuple[str, str, Tuple[str, ...]]] = [
+    ("idx_deals_date_added", "deals", ("date_added",)),
+    ("idx_sms_delivery_log_campaign", "sms_delivery_log", ("campaign_id", "status")),
+    ("idx_email_sends_campaign", "email_sends", ("campaign_id", "status")),
+]
+
+
+# ---- Runner ----
+
+_migrated_paths = set()
+_migrate_lock = threading.Lock()
+
+
+def ensure_schema(db_path: str = DEFAULT_DB_PATH):
+    """Bring a database to the current schema (once per process and path)"""
+    key = os.path.abspath(db_path)
+    if key in _migrated_paths:
+        return
+    with _migrate_lock:
+        if key not in _migrated_paths:
+            migrate(db_path)
+            _migrated_paths.add(key)
+
+
+def migrate(db_path: str = DEFAULT_DB_PATH) -> List[int]:
+    """Apply pending migrations in order; returns the versions applied"""
+    conn = get_connection(db_path)
+    try:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL,
+                duration_ms REAL
+            )
+        ''')
+        conn.commit()
+    finally:
+        conn.close()
+
+    applied = []
+    for migration in SCHEMA_MIGRATIONS:
+        # IMMEDIATE transaction: concurrent processes serialize here and re-check
+        with transaction(db_path) as conn:
+            done = conn.execute("SELECT 1 FROM schema_migrations WHERE version = ?",
+                                (migration.version,)).fetchone()
+            if done:
+                continue
+            started = time.perf_counter()
+            migration.apply(conn)
+            conn.execute('''
+                INSERT INTO schema_migrations (version, name, applied_at, duration_ms) VALUES (?, ?, ?, ?)
+            ''', (migration.version, migration.name, datetime.now().isoformat(),
+                  (time.perf_counter() - started) * 1000))
+            applied.append(migration.version)
+
+    _create_conditional_indexes(db_path)
+    reconcile_rollups(db_path)
+    return applied
+
+
+def _create_conditional_indexes(db_path: str):
+    with transaction(db_path) as conn:
+        for name, table, columns in CONDITIONAL_INDEXES:
+            existing = set(_columns(conn, table))
+            if existing and set(columns) <= existing:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+
+
+def schema_version(db_path: str = DEFAULT_DB_PATH) -> int:
+    """Highest applied migration version (0 for an unmigrated database)"""
+    conn = get_connection(db_path)
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+        return row[0] or 0
+    except Exception:
+        return 0
+    finally:
+        conn.close()
+
+
+# ---- Query plan regression checks ----
+
+# (name, query, parameters, index the plan must use)
+HOT_QUERIES: List[Tuple[str, str, Sequence, str]] = [
+    ("leads by score",
+     "SELECT id FROM leads WHERE score >= ? ORDER BY score DESC, created_at DESC, id DESC LIMIT 50",
+     (0,), "idx_leads_score_created"),
+    ("leads by status and score",
+     "SELECT id FROM leads WHERE status = ? AND score >= ? ORDER BY score DESC, created_at DESC, id DESC LIMIT 50",
+     ('new', 0), "idx_leads_status_score"),
+    ("leads newest first",
+     "SELECT id FROM leads ORDER BY created_at DESC, id DESC LIMIT 50", (), "idx_leads_created"),
+    ("leads contacted in window",
+     "SELECT id FROM leads WHERE last_contact >= ? AND last_contact < ?", ('', ''), "idx_leads_last_contact"),
+    ("property leads by status",
+     "SELECT lead_id FROM property_leads WHERE status = ? ORDER BY discovered_date DESC, lead_id DESC LIMIT 50",
+     ('new',), "idx_property_leads_status_discovered"),
+    ("deal alerts for investor",
+     "SELECT alert_id FROM deal_alerts WHERE investor_id = ? ORDER BY alert_date DESC",
+     ('x',), "idx_deal_alerts_investor_date"),
+    ("unread notifications",
+     "SELECT id FROM notifications WHERE is_dismissed = 0 AND is_read = 0 ORDER BY created_at DESC LIMIT 50",
+     (), "idx_notifications_unread"),
+    ("notification feed",
+     "SELECT id FROM notifications WHERE is_dismissed = 0 ORDER BY created_at DESC LIMIT 50",
+     (), "idx_notifications_feed"),
+    ("activity feed",
+     "SELECT id FROM activity_logs ORDER BY created_at DESC LIMIT 1000", (), "idx_activity_logs_created"),
+    ("pending actions",
+     "SELECT id FROM activity_logs WHERE requires_action = 1 AND is_completed = 0 ORDER BY created_at DESC LIMIT 1000",
+     (), "idx_activity_logs_pending"),
+    ("open opportunities",
+     "SELECT id FROM opportunity_alerts WHERE is_acted_upon = 0 ORDER BY created_at DESC LIMIT 1000",
+     (), "idx_opportunity_alerts_open"),
+    ("notifications for user",
+     "SELECT id FROM user_notifications WHERE user_id = ? AND is_read = 0 ORDER BY scheduled_for DESC LIMIT 500",
+     ('admin',), "idx_user_notifications_user"),
+    ("outbox claim",
+     "SELECT id FROM message_outbox WHERE channel = ? AND status IN ('queued', 'sending') AND available_at <= ? "
+     "ORDER BY available_at LIMIT 100",
+     ('email', '9999'), "idx_message_outbox_claim"),
+    ("outbox job progress",
+     "SELECT status, COUNT(*) FROM message_outbox WHERE job_id = ? GROUP BY status",
+     ('job',), "idx_message_outbox_job"),
+]
+
+
+def check_query_plans(db_path: str = DEFAULT_DB_PATH) -> Dict[str, Optional[str]]:
+    """EXPLAIN QUERY PLAN each hot query; maps name -> problem (None when it uses its index)"""
+    ensure_schema(db_path)
+    results = {}
+    conn = get_connection(db_path)
+    try:
+        for name, query, params, index in HOT_QUERIES:
+            plan = ' | '.join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+            results[name] = None if index in plan else f"expected {index}, got: {plan}"
+    finally:
+        conn.close()
+    return results
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB_PATH
+    print(f"Applied migrations: {migrate(path) or 'none'} (schema version {schema_version(path)})")
+    problems = {name: problem for name, problem in check_query_plans(path).items() if problem}
+    for name, problem in problems.items():
+        print(f"❌ {name}: {problem}")
+    print("✅ All hot queries use their indexes" if not problems else "")
+    sys.exit(1 if problems else 0)
@@ -1,18 +1,37 @@
 """
 SMS Marketing Campaign System for NXTRIX CRM
 Bulk SMS messaging for Business plan users
+- Campaign sends queued in the message outbox and delivered by background workers
+- Pre-send stage: numbers normalized, invalid numbers, duplicates and opt-outs dropped in one pass
 """
 
 import streamlit as st
-import sqlite3
+from db_connection import get_connection
+from message_outbox import (DeliveryResult, OutboundMessage, enqueue, latest_job_id, register_job_kind,
+                            register_sender, show_job_progress)
 import json
+import threading
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 import uuid
 import re
 
+_PHONE_PUNCTUATION = str.maketrans('', '', ' ()-.+')
+_NON_DIGITS = re.compile(r'[^0-9]')
+
+def normalize_phone(phone: Any) -> Optional[str]:
+    """E.164 form of a phone number (10-digit numbers are taken as US), None if invalid"""
+    digits = str(phone or '').translate(_PHONE_PUNCTUATION)
+    if not (digits.isascii() and digits.isdigit()):
+        digits = _NON_DIGITS.sub('', digits)
+    if len(digits) == 10:
+        digits = '1' + digits
+    if not 8 <= len(digits) <= 15:
+        return None
+    return '+' + digits
+
 class CampaignStatus(Enum):
     DRAFT = "draft"
     SCHEDULED = "scheduled"
@@ -78,7 +97,7 @@ class SMSMarketingManager:
     def init_database(self):
         """Initialize SMS campaign database tables"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             # SMS campaigns table
@@ -151,7 +170,7 @@ class SMSMarketingManager:
                 scheduled_time=scheduled_time
             )
             
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -188,7 +207,7 @@ class SMSMarketingManager:
                 contacts=contacts
             )
             
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -214,7 +233,7 @@ class SMSMarketingManager:
     def get_campaigns(self, status: Optional[CampaignStatus] = None) -> List[SMSCampaign]:
         """Get SMS campaigns"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             query = "SELECT * FROM sms_campaigns"
@@ -257,7 +276,7 @@ class SMSMarketingManager:
     def get_contact_lists(self) -> List[ContactList]:
         """Get contact lists"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM sms_contact_lists ORDER BY created_at DESC")
@@ -281,15 +300,19 @@ class SMSMarketingManager:
             st.error(f"Error retrieving contact lists: {e}")
             return []
     
-    def send_campaign(self, campaign_id: str) -> bool:
-        """Send SMS campaign"""
+    def send_campaign(self, campaign_id: str) -> Optional[str]:
+        """Queue an SMS campaign for delivery
+        
+        Returns the outbox job id at once (None on error); workers send the
+        texts, log deliveries and mark the campaign completed.
+        """
         if not self.twilio_available:
             st.error("🚫 SMS sending requires Twilio configuration")
-            return False
+            return None
         
         try:
             # Get campaign details
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM sms_campaigns WHERE id = ?", (campaign_id,))
@@ -297,7 +320,7 @@ class SMSMarketingManager:
             
             if not campaign_row:
                 st.error("Campaign not found")
-                return False
+                return None
             
             # Get contact list
             cursor.execute("SELECT contacts FROM sms_contact_lists WHERE id = ?", (campaign_row[3],))
@@ -305,94 +328,52 @@ class SMSMarketingManager:
             
             if not contacts_row:
                 st.error("Contact list not found")
-                return False
+                return None
             
             contacts = json.loads(contacts_row[0])
             message = campaign_row[2]
             
-            # Update campaign status
-            cursor.execute("UPDATE sms_campaigns SET status = ? WHERE id = ?", 
-                         (CampaignStatus.SENDING.value, campaign_id))
-            conn.commit()
-            
-            sent_count = 0
-            failed_count = 0
-            
-            # Send to each contact
-            for contact in contacts:
-                phone = contact.get('phone', '').strip()
-                if not phone:
-                    continue
-                
-                # Check opt-out status
-                cursor.execute("SELECT phone_number FROM sms_opt_outs WHERE phone_number = ?", (phone,))
-                if cursor.fetchone():
-                    continue  # Skip opted-out numbers
-                
-                try:
-                    # Personalize message
-                    personalized_message = self._personalize_message(message, contact)
-                    
-                    # Send via Twilio
-                    twilio_message = self.twilio_client.messages.create(
-                        body=personalized_message,
-                        from_=self.twilio_phone,
-                        to=phone
-                    )
-                    
-                    # Log delivery
-                    cursor.execute('''
-                        INSERT INTO sms_delivery_log 
-                        (id, campaign_id, phone_number, message_sid, status, created_at)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (
-                        str(uuid.uuid4()),
-                        campaign_id,
-                        phone,
-                        twilio_message.sid,
-                        'sent',
-                        datetime.now().isoformat()
-                    ))
-                    
-                    sent_count += 1
-                    
-                except Exception as e:
-                    # Log failure
-                    cursor.execute('''
-                        INSERT INTO sms_delivery_log 
-                        (id, campaign_id, phone_number, status, failed_reason, created_at)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (
-                        str(uuid.uuid4()),
-                        campaign_id,
-                        phone,
-                        'failed',
-                        str(e),
-                        datetime.now().isoformat()
-                    ))
-                    
-                    failed_count += 1
+            messages = [
+                OutboundMessage(
+                    channel='sms',
+                    provider='twilio_marketing',
+                    recipient=phone,
+                    payload={'body': self._personalize_message(message, contact), 'from_': self.twilio_phone, 'to': phone}
+                )
+                for phone, contact in self._campaign_recipients(conn, contacts)
+            ]
             
-            # Update campaign with results
+            # Update campaign status; counts are filled in as deliveries complete
             cursor.execute('''
-                UPDATE sms_campaigns 
-                SET status = ?, sent_count = ?, failed_count = ?
-                WHERE id = ?
-            ''', (
-                CampaignStatus.COMPLETED.value,
-                sent_count,
-                failed_count,
-                campaign_id
-            ))
-            
+                UPDATE sms_campaigns SET status = ?, sent_count = 0, failed_count = 0 WHERE id = ?
+            ''', ((CampaignStatus.SENDING if messages else CampaignStatus.COMPLETED).value, campaign_id))
             conn.commit()
             conn.close()
             
-            return True
+            return enqueue('sms_campaign', messages, reference_id=campaign_id, db_path=self.db_path)
             
         except Exception as e:
             st.error(f"Error sending campaign: {e}")
-            return False
+            return None
+    
+    def _campaign_recipients(self, conn, contacts: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+        """Pre-send stage: (normalized number, contact) per deliverable recipient
+        
+        Opt-outs are read once into a set of normalized numbers, so stored
+        formatting differences cannot let an opted-out number through.
+        Invalid numbers and repeats of a number are dropped; the first
+        contact with a number is kept.
+        """
+        opted_out = {normalize_phone(row[0]) for row in conn.execute("SELECT phone_number FROM sms_opt_outs")}
+        seen = set()
+        recipients = []
+        for contact in contacts:
+            phone = normalize_phone(contact.get('phone'))
+            if phone is None or phone in opted_out or phone in seen:
+                continue
+            seen.add(phone)
+            recipients.append((phone, contact))
+        return recipients
     
     def _personalize_message(self, message: str, contact: Dict[str, Any]) -> str:
         """Personalize SMS message with contact data"""
@@ -419,7 +400,7 @@ class SMSMarketingManager:
     def get_campaign_analytics(self, campaign_id: str) -> Dict[str, Any]:
         """Get campaign analytics"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             # Get campaign info
@@ -453,6 +434,52 @@ class SMSMarketingManager:
             st.error(f"Error getting campaign analytics: {e}")
             return {}
 
+_marketing_client = None
+_marketing_client_lock = threading.Lock()
+
+def _send_marketing_sms(payload: Dict[str, Any]) -> DeliveryResult:
+    """Outbox sender for campaign texts, using the Twilio account in Streamlit secrets"""
+    global _marketing_client
+    with _marketing_client_lock:
+        if _marketing_client is None:
+            from twilio.rest import Client
+            _marketing_client = Client(st.secrets["TWILIO"]["ACCOUNT_SID"], st.secrets["TWILIO"]["AUTH_TOKEN"])
+    
+    try:
+        twilio_message = _marketing_client.messages.create(**payload)
+        return DeliveryResult(True, message_id=twilio_message.sid)
+    except Exception as e:
+        # Twilio API errors carry an HTTP status; network errors do not
+        status = getattr(e, 'status', None)
+        return DeliveryResult(False, error_message=str(e),
+                              retryable=status is None or status == 429 or status >= 500)
+
+def _log_campaign_deliveries(conn, job: Dict[str, Any], outcomes: List[Dict[str, Any]]):
+    """Delivery log rows and campaign counters for one outbox batch"""
+    now = datetime.now().isoformat()
+    conn.executemany('''
+        INSERT INTO sms_delivery_log 
+        (id, campaign_id, phone_number, message_sid, status, failed_reason, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (str(uuid.uuid4()), job['reference_id'], outcome['recipient'], outcome['provider_message_id'],
+         outcome['status'], outcome['error'], now)
+        for outcome in outcomes
+    ])
+    sent_count = sum(1 for outcome in outcomes if outcome['status'] == 'sent')
+    conn.execute('''
+        UPDATE sms_campaigns 
+        SET sent_count = sent_count + ?, failed_count = failed_count + ?
+        WHERE id = ?
+    ''', (sent_count, len(outcomes) - sent_count, job['reference_id']))
+
+def _complete_campaign(conn, job: Dict[str, Any], counts: Dict[str, int]):
+    conn.execute("UPDATE sms_campaigns SET status = ? WHERE id = ?",
+                 (CampaignStatus.COMPLETED.value, job['reference_id']))
+
+register_sender('twilio_marketing', _send_marketing_sms, rate_limit_key='twilio')
+register_job_kind('sms_campaign', on_batch=_log_campaign_deliveries, on_complete=_complete_campaign)
+
 def show_sms_marketing():
     """Show SMS marketing interface"""
     st.header("📱 SMS Marketing Campaigns")
@@ -549,11 +576,10 @@ def show_sms_campaigns(sms_manager: SMSMarketingManager):
                         st.success(f"✅ Campaign '{campaign_name}' created successfully!")
                         
                         if send_immediately:
-                            with st.spinner("📱 Sending SMS campaign..."):
-                                if sms_manager.send_campaign(campaign_id):
-                                    st.success("🚀 Campaign sent successfully!")
-                                else:
-                                    st.error("❌ Failed to send campaign")
+                            if sms_manager.send_campaign(campaign_id):
+                                st.success("🚀 Campaign queued for sending!")
+                            else:
+                                st.error("❌ Failed to send campaign")
                         else:
                             st.info(f"📅 Campaign scheduled for {scheduled_time.strftime('%m/%d/%Y %H:%M')}")
                         
@@ -599,10 +625,15 @@ def show_sms_campaigns(sms_manager: SMSMarketingManager):
                 with col4:
                     if campaign.status == CampaignStatus.DRAFT:
                         if st.button("📱 Send", key=f"send_{campaign.id}"):
-                            with st.spinner("Sending..."):
-                                if sms_manager.send_campaign(campaign.id):
-                                    st.success("Sent!")
-                                    st.rerun()
+                            if sms_manager.send_campaign(campaign.id):
+                                st.success("Queued!")
+                                st.rerun()
+                
+                # Live delivery progress while the outbox works through the campaign
+                if campaign.status == CampaignStatus.SENDING:
+                    job_id = latest_job_id('sms_campaign', campaign.id, sms_manager.db_path)
+                    if job_id:
+                        show_job_progress(job_id, sms_manager.db_path, label="Sending texts")
                 
                 # Show message preview
                 with st.expander(f"👀 Preview: {campaign.message[:50]}..."):
@@ -812,7 +843,7 @@ def show_sms_settings(sms_manager: SMSMarketingManager):
     
     # Show opt-out statistics
     try:
-        conn = sqlite3.connect(sms_manager.db_path)
+        conn = get_connection(sms_manager.db_path)
         cursor = conn.cursor()
         cursor.execute("SELECT COUNT(*) FROM sms_opt_outs")
         opt_out_count = cursor.fetchone()[0]
@@ -9,7 +9,7 @@ from typing import List, Dict, Optional, Any
 from dataclasses import dataclass, field
 from enum import Enum
 import json
-import sqlite3
+from db_connection import get_connection
 import uuid
 
 class TaskStatus(Enum):
@@ -53,7 +53,7 @@ class TaskManager:
     def init_database(self):
         """Initialize task database tables"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -95,7 +95,7 @@ class TaskManager:
     def create_task(self, task: Task) -> bool:
         """Create a new task"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -132,7 +132,7 @@ class TaskManager:
                   priority: Optional[TaskPriority] = None) -> List[Task]:
         """Get tasks with optional filtering"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             query = "SELECT * FROM tasks WHERE 1=1"
@@ -185,7 +185,7 @@ class TaskManager:
     def update_task_status(self, task_id: str, status: TaskStatus) -> bool:
         """Update task status"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             completed_at = datetime.now() if status == TaskStatus.COMPLETED else None
@@ -207,7 +207,7 @@ class TaskManager:
     def get_task_stats(self) -> Dict[str, Any]:
         """Get task statistics"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             # Get counts by status
@@ -0,0 +1,40 @@
+"""
+Analysis Cache Regression Test for NXTRIX CRM
+Fails when the in-process cache tier can outgrow its memory budget:
+- Caches Monte Carlo-sized path frames in a small byte budget
+- Checks LRU eviction by size and that oversized values skip the memory tier
+"""
+
+import numpy as np
+import pandas as pd
+
+from financial_cache import AnalysisCache, approximate_size
+
+
+def _paths(seed: int, rows: int = 10_000) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.normal(size=(rows, 10)), columns=[f"year_{year}" for year in range(10)])
+
+
+def test_memory_tier_stays_within_its_byte_budget():
+    frame_bytes = approximate_size({'paths': _paths(0)})
+    cache = AnalysisCache(max_entries=128, max_memory_bytes=int(frame_bytes * 3.5))
+
+    for seed in range(10):
+        cache.set(f"simulation-{seed}", {'paths': _paths(seed)})
+    stats = cache.get_statistics()
+
+    assert stats['memory_entries'] == 3
+    assert stats['memory_bytes'] <= cache.max_memory_bytes
+    assert stats['evictions'] == 7
+    assert cache.get('simulation-9')[0] and not cache.get('simulation-0')[0]
+
+
+def test_value_larger_than_the_budget_is_not_kept_in_memory():
+    cache = AnalysisCache(max_memory_bytes=1024)
+    cache.set('small', {'irr': 0.12})
+    cache.set('large', {'paths': _paths(1)})
+
+    assert cache.get('small')[0]
+    assert not cache.get('large')[0]
+    assert cache.get_statistics()['memory_bytes'] <= 1024
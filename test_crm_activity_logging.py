@@ -0,0 +1,38 @@
+"""
+CRM Activity Logging Regression Test for NXTRIX CRM
+Fails when CRMManager.log_activity stops reaching activity_logs:
+- Routes CRMManager's activity tracker to a scratch database
+- Logs CRM activities, flushes the background queue and reads the rows back
+"""
+
+import json
+import os
+import tempfile
+
+import enhanced_crm
+from activity_tracker import ActivityTracker, ActivityType
+from db_connection import close_connections, get_connection
+
+
+def test_crm_activities_land_in_activity_logs(monkeypatch):
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'crm_data.db')
+        monkeypatch.chdir(workdir)
+        tracker = ActivityTracker(db_path=db_path)
+        monkeypatch.setattr(enhanced_crm, 'get_activity_tracker', lambda: tracker)
+        try:
+            crm = enhanced_crm.CRMManager()
+            created_id = crm.log_activity("Lead Created", "New lead", "Lead added", related_lead_id="lead-1")
+            other_id = crm.log_activity("Status Update", "Status changed", "Lead moved to Qualified")
+            assert tracker.flush_activities(timeout=10)
+
+            rows = get_connection(db_path).execute(
+                "SELECT activity_type, title, metadata FROM activity_logs"
+            ).fetchall()
+            logged = {json.loads(metadata)['original_activity_id']: (activity_type, title)
+                      for activity_type, title, metadata in rows}
+            assert logged[created_id] == (ActivityType.LEAD_CREATED.value, "New lead")
+            assert logged[other_id] == (ActivityType.GENERAL_ACTIVITY.value, "Status changed")
+        finally:
+            tracker.ingestion.stop()
+            close_connections(db_path)
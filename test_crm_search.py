@@ -0,0 +1,68 @@
+"""
+CRM Search Regression Test for NXTRIX CRM
+Fails when lead search pages or counts rows that are not CRM pipeline leads:
+- Shares the leads table between a CRM lead and lead scoring rows (with a source)
+- Searches through the FTS index and through CRMManager.search_leads
+- Upgrades an index built by triggers that indexed every leads row
+"""
+
+import os
+import tempfile
+
+import enhanced_crm
+from crm_search import CRMSearchIndex
+from db_connection import close_connections, transaction
+from schema_migrations import ensure_schema
+
+
+def _insert_leads(db_path: str):
+    with transaction(db_path) as conn:
+        conn.execute("INSERT INTO leads (id, name, status, created_at) VALUES ('crm-1', 'John Crm', 'New', '2026-01-01')")
+        conn.executemany(
+            "INSERT INTO leads (id, name, source, created_at) VALUES (?, ?, 'Website', '2026-01-01')",
+            [(f"scorer-{index}", f"John Scorer {index}") for index in range(5)]
+        )
+
+
+def test_lead_search_covers_crm_leads_only(monkeypatch):
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'crm_data.db')
+        monkeypatch.chdir(workdir)
+        try:
+            ensure_schema(db_path)
+            CRMSearchIndex(db_path)
+            _insert_leads(db_path)
+
+            page = CRMSearchIndex(db_path).search('john', ['lead'], limit=3)
+            assert page['total'] == 1
+            assert [hit['entity_id'] for hit in page['results']] == ['crm-1']
+
+            crm = enhanced_crm.CRMManager()
+            assert [lead.id for lead in crm.search_leads('john')] == ['crm-1']
+            assert [lead.id for lead in crm.search_leads('john', limit=3)] == ['crm-1']
+            assert crm.search_leads('john', limit=3, offset=1) == []
+        finally:
+            close_connections(db_path)
+
+
+def test_index_built_by_older_triggers_is_rebuilt():
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'crm_data.db')
+        try:
+            ensure_schema(db_path)
+            search_index = CRMSearchIndex(db_path)
+            with transaction(db_path) as conn:
+                # Stand-in for the earlier trigger, which indexed every leads row
+                conn.execute("DROP TRIGGER leads_search_after_insert")
+                conn.execute('''
+                    CREATE TRIGGER leads_search_after_insert AFTER INSERT ON leads BEGIN
+                        INSERT INTO crm_search (rowid, entity_type, entity_id, title)
+                        VALUES (NEW.rowid * 4, 'lead', NEW.id, NEW.name);
+                    END
+                ''')
+            _insert_leads(db_path)
+            assert search_index.search('john', ['lead'])['total'] == 6
+
+            assert CRMSearchIndex(db_path).search('john', ['lead'])['total'] == 1
+        finally:
+            close_connections(db_path)
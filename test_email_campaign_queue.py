@@ -0,0 +1,91 @@
+"""
+Email Campaign Queueing Regression Test for NXTRIX CRM
+Fails when a campaign's status and its outbox job can be committed separately:
+- Queues a scheduled campaign through AdvancedAutomationSystem
+- Makes enqueue fail after writing its rows and checks nothing is left behind
+"""
+
+import json
+import os
+import tempfile
+from datetime import datetime
+
+import advanced_automation_system
+from advanced_automation_system import AdvancedAutomationSystem, EmailTemplate
+from db_connection import close_connections, get_connection
+from message_outbox import latest_job_id
+
+
+class _Worker:
+    def __init__(self):
+        self.wakes = 0
+
+    def wake(self):
+        self.wakes += 1
+
+
+def _system(db_path: str) -> AdvancedAutomationSystem:
+    system = AdvancedAutomationSystem(db_path)
+    system.email_templates.append(EmailTemplate(
+        id='template-1', name='Update', subject='Deal update', body='Hello {{recipient_email}}',
+        template_type='deal_update', variables=['recipient_email'], is_active=True, created_at=datetime.now()
+    ))
+    conn = get_connection(db_path)
+    conn.execute("INSERT INTO email_campaigns (id, name, template_id, recipient_list, status) VALUES (?, ?, ?, ?, ?)",
+                 ('campaign-1', 'Update', 'template-1', json.dumps(['a@example.com', 'b@example.com']), 'scheduled'))
+    conn.commit()
+    conn.close()
+    return system
+
+
+def _campaign_status(db_path: str) -> str:
+    conn = get_connection(db_path)
+    try:
+        return conn.execute("SELECT status FROM email_campaigns WHERE id = 'campaign-1'").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_campaign_status_and_job_commit_together(monkeypatch):
+    worker = _Worker()
+    monkeypatch.setattr(advanced_automation_system, 'get_outbox_worker', lambda db_path: worker)
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'campaigns.db')
+        try:
+            system = _system(db_path)
+            campaign = {'id': 'campaign-1', 'template_id': 'template-1',
+                        'recipient_list': json.dumps(['a@example.com', 'b@example.com'])}
+
+            job_id = system._execute_email_campaign(campaign)
+
+            assert job_id == latest_job_id('automation_email_campaign', 'campaign-1', db_path)
+            assert _campaign_status(db_path) == 'sending'
+            assert worker.wakes == 1
+        finally:
+            close_connections(db_path)
+
+
+def test_failed_enqueue_leaves_campaign_unchanged(monkeypatch):
+    worker = _Worker()
+    monkeypatch.setattr(advanced_automation_system, 'get_outbox_worker', lambda db_path: worker)
+    enqueue = advanced_automation_system.enqueue
+
+    def failing_enqueue(*args, **kwargs):
+        enqueue(*args, **kwargs)
+        raise RuntimeError("outbox unavailable")
+
+    monkeypatch.setattr(advanced_automation_system, 'enqueue', failing_enqueue)
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'campaigns.db')
+        try:
+            system = _system(db_path)
+            campaign = {'id': 'campaign-1', 'template_id': 'template-1',
+                        'recipient_list': json.dumps(['a@example.com', 'b@example.com'])}
+
+            assert system._execute_email_campaign(campaign) is None
+
+            assert _campaign_status(db_path) == 'scheduled'
+            assert latest_job_id('automation_email_campaign', 'campaign-1', db_path) is None
+            assert worker.wakes == 0
+        finally:
+            close_connections(db_path)
@@ -0,0 +1,39 @@
+"""
+Exit Strategy Regression Test for NXTRIX CRM
+Fails when an exit strategy's IRR is solved from flows that don't match its profit:
+- Runs exit_strategy_analysis on profitable, cash-out and marginal sample deals
+- Checks each strategy's cash_flows add up to its profit and IRR is a plain float
+"""
+
+import math
+
+import pytest
+
+from financial_modeling import AdvancedFinancialModeling
+
+SAMPLE_DEALS = [
+    {'purchase_price': 200000, 'arv': 280000, 'repair_costs': 40000, 'monthly_rent': 2600,
+     'annual_taxes': 3600, 'insurance': 1500, 'hoa_fees': 0},
+    # The refinance returns all the cash invested, so the BRRRR IRR is undefined
+    {'purchase_price': 200000, 'arv': 320000, 'repair_costs': 40000, 'monthly_rent': 2600,
+     'annual_taxes': 3600, 'insurance': 1500, 'hoa_fees': 0},
+    {'purchase_price': 150000, 'arv': 180000, 'repair_costs': 25000, 'monthly_rent': 1400,
+     'annual_taxes': 2400, 'insurance': 1100, 'hoa_fees': 600},
+]
+
+
+@pytest.mark.parametrize('deal_data', SAMPLE_DEALS)
+def test_strategy_cash_flows_add_up_to_profit(deal_data):
+    strategies = AdvancedFinancialModeling().exit_strategy_analysis(deal_data)
+
+    for name in ('Flip', 'Hold', 'BRRRR'):
+        strategy = strategies[name]
+        assert math.isclose(sum(strategy['cash_flows']), strategy['profit'], rel_tol=1e-9, abs_tol=1e-6), name
+        assert type(strategy['irr']) is float, name
+
+
+def test_profitable_brrrr_has_positive_irr():
+    brrrr = AdvancedFinancialModeling().exit_strategy_analysis(SAMPLE_DEALS[0])['BRRRR']
+
+    assert brrrr['profit'] > 0
+    assert brrrr['irr'] > 0
@@ -0,0 +1,115 @@
+"""
+Investor Matching Regression Test for NXTRIX CRM
+Fails when the resident InvestorMatcher drifts from the per-pair scorer:
+- Stores randomized investor criteria in a scratch database
+- Compares InvestorMatcher.score_leads with _calculate_match_score for every pair
+- Checks resident criteria reload after writes made outside the matcher
+"""
+
+import os
+import random
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+from automated_deal_sourcing import (
+    AlertFrequency, AutomatedDealSourcing, DealSourceType, InvestorCriteria, InvestorMatcher,
+    PropertyCondition, PropertyLead, PropertyType
+)
+from db_connection import close_connections, transaction
+
+CITIES = ['Austin', 'Dallas', 'Houston', 'San Antonio', 'El Paso']
+ZIP_CODES = ['78701', '75201', '77002', '78205', '79901']
+
+
+def _criteria(rng: random.Random, index: int) -> InvestorCriteria:
+    min_price = rng.randrange(50_000, 300_000, 5_000)
+    return InvestorCriteria(
+        investor_id=f"investor-{index}",
+        investor_name=f"Investor {index}",
+        min_price=min_price,
+        max_price=min_price + rng.randrange(50_000, 400_000, 5_000),
+        preferred_property_types=rng.sample(list(PropertyType), rng.randint(0, 3)),
+        target_locations=rng.sample(CITIES + ZIP_CODES + ['787'], rng.randint(0, 3)),
+        min_roi=rng.uniform(-5, 15),
+        min_cash_flow=0,
+        max_rehab_budget=rng.randrange(10_000, 120_000, 5_000),
+        preferred_conditions=rng.sample(list(PropertyCondition), rng.randint(0, 3)),
+        investment_strategy="Fix and Flip",
+        deal_sources=[DealSourceType.WHOLESALER],
+        alert_frequency=AlertFrequency.DAILY
+    )
+
+
+def _lead(rng: random.Random, index: int) -> PropertyLead:
+    asking_price = rng.randrange(40_000, 700_000, 5_000)
+    location = rng.randrange(len(CITIES))
+    return PropertyLead(
+        lead_id=f"lead-{index}", property_address=f"{index} Main St", city=CITIES[location], state="TX",
+        zip_code=ZIP_CODES[location], property_type=rng.choice(list(PropertyType)), bedrooms=3,
+        bathrooms=2.0, square_feet=1500, lot_size=0.2, year_built=1990, asking_price=asking_price,
+        estimated_arv=asking_price * rng.uniform(0.8, 1.8), estimated_rehab=rng.randrange(0, 150_000, 5_000),
+        property_condition=rng.choice(list(PropertyCondition)), days_on_market=10, listing_agent="",
+        listing_agent_phone="", deal_source=DealSourceType.WHOLESALER, lead_source_contact="",
+        description="", photos=[], discovered_date=datetime.now(), last_updated=datetime.now()
+    )
+
+
+def _scalar_investor(criteria: InvestorCriteria) -> dict:
+    return {
+        'min_price': criteria.min_price,
+        'max_price': criteria.max_price,
+        'preferred_property_types': [pt.value for pt in criteria.preferred_property_types],
+        'target_locations': criteria.target_locations,
+        'preferred_conditions': [pc.value for pc in criteria.preferred_conditions],
+        'max_rehab_budget': criteria.max_rehab_budget,
+        'min_roi': criteria.min_roi
+    }
+
+
+def test_score_leads_matches_per_pair_scorer():
+    rng = random.Random(13)
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'investor_matching.db')
+        try:
+            sourcing = AutomatedDealSourcing(db_path)
+            investors = [_criteria(rng, index) for index in range(40)]
+            for criteria in investors:
+                assert sourcing.add_investor_criteria(criteria)
+            leads = [_lead(rng, index) for index in range(200)]
+
+            roi = np.array([sourcing._estimate_roi(lead) for lead in leads], dtype=float)
+            scores = sourcing.matcher.score_leads(leads, roi)
+            columns = {investor_id: column
+                       for column, investor_id in enumerate(sourcing.matcher.criteria()['investor_ids'])}
+            expected = np.zeros_like(scores, dtype=float)
+            for row, lead in enumerate(leads):
+                for criteria in investors:
+                    expected[row, columns[criteria.investor_id]] = sourcing._calculate_match_score(
+                        lead, _scalar_investor(criteria))
+            np.testing.assert_array_equal(scores, expected)
+        finally:
+            close_connections(db_path)
+
+
+def test_resident_criteria_follow_writes_from_other_processes():
+    rng = random.Random(8)
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'investor_matching.db')
+        try:
+            sourcing = AutomatedDealSourcing(db_path)
+            assert sourcing.add_investor_criteria(_criteria(rng, 0))
+            # Stands in for the matcher of another process: nothing invalidates it locally
+            matcher = InvestorMatcher(db_path)
+            assert matcher.criteria()['investor_ids'] == ['investor-0']
+            matcher.criteria()
+            assert matcher.loads == 1
+
+            with transaction(db_path) as conn:
+                conn.execute("UPDATE investor_criteria SET active = 0 WHERE investor_id = 'investor-0'")
+            assert sourcing.add_investor_criteria(_criteria(rng, 1))
+            assert matcher.criteria()['investor_ids'] == ['investor-1']
+            assert matcher.loads == 2
+        finally:
+            close_connections(db_path)
@@ -0,0 +1,177 @@
+"""
+Bulk Dispatch Regression Test for NXTRIX CRM
+Drives BulkDispatcher against a local stub of the EmailJS API:
+- Starts an http.server stub on localhost and points EMAILJS_API_URL at it
+- Checks the concurrency limit, token-bucket throughput and retry backoff
+- Checks send_bulk_emails records every outcome in one batched write
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import communication_services
+import message_dispatch
+from communication_services import EmailJSService
+from db_connection import close_connections, get_connection
+from email_automation import EmailAutomationManager, EmailTemplate
+from message_dispatch import BulkDispatcher, TokenBucket
+
+
+class StubEmailAPI(ThreadingHTTPServer):
+    """Records every request; answers each recipient from its scripted status codes"""
+
+    daemon_threads = True
+
+    def __init__(self, responses=None, delay: float = 0.0):
+        super().__init__(('127.0.0.1', 0), StubEmailHandler)
+        self.responses = responses or {}
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/api/v1.0/email/send"
+
+    def status_for(self, recipient: str) -> int:
+        with self.lock:
+            attempt = sum(1 for _, sent_to in self.requests if sent_to == recipient)
+            self.requests.append((time.monotonic(), recipient))
+        scripted = self.responses.get(recipient, [])
+        return scripted[attempt] if attempt < len(scripted) else 200
+
+
+class StubEmailHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            status = server.status_for(body['template_params']['to_email'])
+            time.sleep(server.delay)
+            self.send_response(status)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'OK')
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_api(monkeypatch):
+    servers = []
+
+    def start(responses=None, delay: float = 0.0) -> StubEmailAPI:
+        server = StubEmailAPI(responses, delay)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setenv('EMAILJS_API_URL', server.url)
+        monkeypatch.setenv('EMAILJS_SERVICE_ID', 'service_stub')
+        monkeypatch.setenv('EMAILJS_PUBLIC_KEY', 'public_stub')
+        monkeypatch.setenv('ENABLE_EMAIL_NOTIFICATIONS', 'true')
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _dispatcher(service: EmailJSService, concurrency: int, rate_limiter: TokenBucket) -> BulkDispatcher:
+    return BulkDispatcher('emailjs', lambda email: service.send_email(email, 'Subject', 'Body'),
+                          concurrency=concurrency, rate_limiter=rate_limiter)
+
+
+def test_concurrency_stays_within_the_limit(stub_api):
+    server = stub_api(delay=0.05)
+    recipients = [f"investor{index}@example.com" for index in range(24)]
+
+    results = _dispatcher(EmailJSService(), 4, TokenBucket(1000, 1000)).dispatch(recipients)
+
+    assert all(result.success for result in results)
+    assert len(server.requests) == len(recipients)
+    assert 1 < server.max_in_flight <= 4
+
+
+def test_token_bucket_holds_throughput_at_the_configured_rate(stub_api):
+    server = stub_api()
+    rate, burst = 20.0, 2
+    recipients = [f"investor{index}@example.com" for index in range(12)]
+
+    results = _dispatcher(EmailJSService(), 8, TokenBucket(rate, burst)).dispatch(recipients)
+
+    assert all(result.success for result in results)
+    times = sorted(sent_at for sent_at, _ in server.requests)
+    # After the burst, requests can go no faster than the refill rate
+    assert times[-1] - times[0] >= (len(recipients) - burst) / rate * 0.9
+
+
+def test_rate_limited_and_server_errors_are_retried_with_backoff(stub_api, monkeypatch):
+    server = stub_api({'limited@example.com': [429, 429], 'flaky@example.com': [503],
+                       'rejected@example.com': [400]})
+    delays = []
+
+    def recorded_backoff(attempt):
+        delays.append(attempt)
+        return 0.05 * attempt
+
+    monkeypatch.setattr(message_dispatch, 'backoff_delay', recorded_backoff)
+    recipients = ['limited@example.com', 'flaky@example.com', 'rejected@example.com', 'ok@example.com']
+
+    results = _dispatcher(EmailJSService(), 4, TokenBucket(1000, 1000)).dispatch(recipients)
+
+    assert [(result.success, result.attempts) for result in results] == [
+        (True, 3), (True, 2), (False, 1), (True, 1)
+    ]
+    assert sorted(delays) == [1, 1, 2]
+    limited = [sent_at for sent_at, recipient in server.requests if recipient == 'limited@example.com']
+    assert limited[1] - limited[0] >= 0.05 and limited[2] - limited[1] >= 0.1
+
+
+def test_send_bulk_emails_records_results_in_one_batch(stub_api, monkeypatch):
+    stub_api({'flaky@example.com': [500]})
+    monkeypatch.setattr(communication_services.communication_manager, 'email_service', EmailJSService())
+    monkeypatch.setitem(message_dispatch._rate_limiters, 'emailjs', TokenBucket(1000, 1000))
+    monkeypatch.setattr(message_dispatch, 'backoff_delay', lambda attempt: 0.01)
+    recipients = [f"investor{index}@example.com" for index in range(9)] + ['flaky@example.com']
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'email_dispatch.db')
+        try:
+            manager = EmailAutomationManager(db_path)
+            batches = []
+            record_sends = manager.record_sends
+            monkeypatch.setattr(manager, 'record_sends', lambda sends: (batches.append(len(sends)),
+                                                                        record_sends(sends)))
+            progress = []
+            template = EmailTemplate(name="Stub", subject="Hi {first_name}", body_text="Body")
+
+            results = manager.send_bulk_emails(
+                recipients, template, [{'first_name': r.split('@')[0]} for r in recipients], concurrency=4,
+                on_progress=lambda completed, total, recipient: progress.append((completed, total, recipient))
+            )
+
+            assert [result['recipient'] for result in results] == recipients
+            assert all(result['success'] for result in results)
+            assert results[-1]['attempts'] == 2
+            assert batches == [len(recipients)]
+            assert [completed for completed, _, _ in progress] == list(range(1, len(recipients) + 1))
+            assert sorted(recipient for _, _, recipient in progress) == sorted(recipients)
+            stored = get_connection(db_path).execute("SELECT COUNT(*) FROM email_sends").fetchone()[0]
+            assert stored == len(recipients)
+        finally:
+            close_connections(db_path)
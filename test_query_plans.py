@@ -0,0 +1,23 @@
+"""
+Query Plan Regression Test for NXTRIX CRM
+Fails when a hot query stops using the index schema_migrations expects:
+- Migrates a fresh scratch database to the latest schema version
+- Runs EXPLAIN QUERY PLAN for every entry in HOT_QUERIES
+"""
+
+import os
+import tempfile
+
+from db_connection import close_connections
+from schema_migrations import SCHEMA_MIGRATIONS, check_query_plans, schema_version
+
+
+def test_hot_queries_use_their_indexes():
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'query_plans.db')
+        try:
+            problems = {name: problem for name, problem in check_query_plans(db_path).items() if problem}
+            assert schema_version(db_path) == SCHEMA_MIGRATIONS[-1].version
+            assert not problems, "\n".join(f"{name}: {problem}" for name, problem in problems.items())
+        finally:
+            close_connections(db_path)
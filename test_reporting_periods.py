@@ -0,0 +1,39 @@
+"""
+Reporting Period Regression Test for NXTRIX CRM
+Fails when the current or previous reporting period is not exactly N whole days:
+- Stores one lead per day in a scratch database (counted by the leads_daily rollup)
+- Compares period_aggregates with counts over the intended calendar days
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+from advanced_reporting import ReportingQueryEngine, TimeFrame
+from db_connection import close_connections, transaction
+from schema_migrations import ensure_schema
+
+
+@pytest.mark.parametrize('timeframe, days', [(TimeFrame.LAST_7_DAYS, 7), (TimeFrame.LAST_30_DAYS, 30)])
+def test_periods_are_whole_days(timeframe, days):
+    end_date = datetime(2026, 10, 16, 9, 30)
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'reporting.db')
+        try:
+            ensure_schema(db_path)
+            with transaction(db_path) as conn:
+                # One lead at noon on each of the 80 days up to end_date's day, two on the oldest current day
+                rows = [(f"lead-{offset}", (end_date - timedelta(days=offset)).replace(hour=12).isoformat())
+                        for offset in range(80)]
+                rows.append(('extra', (end_date - timedelta(days=days - 1)).replace(hour=1).isoformat()))
+                conn.executemany("INSERT INTO leads (id, name, created_at) VALUES (?, 'Lead', ?)", rows)
+
+            periods = ReportingQueryEngine(db_path).period_aggregates(
+                'leads', timeframe, end_date - timedelta(days=days), end_date)
+
+            assert periods['current']['total_leads'] == days + 1
+            assert periods['previous']['total_leads'] == days
+        finally:
+            close_connections(db_path)
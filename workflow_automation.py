@@ -9,7 +9,7 @@ from typing import List, Dict, Optional, Any
 from dataclasses import dataclass, field
 from enum import Enum
 import json
-import sqlite3
+from db_connection import get_connection
 import uuid
 from communication_services import CommunicationManager
 
@@ -69,7 +69,7 @@ class WorkflowAutomationSystem:
     def init_database(self):
         """Initialize automation database tables"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -198,7 +198,7 @@ class WorkflowAutomationSystem:
     def get_rule_by_name(self, name: str) -> Optional[AutomationRule]:
         """Get automation rule by name"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM automation_rules WHERE name = ?", (name,))
@@ -236,7 +236,7 @@ class WorkflowAutomationSystem:
     def save_rule(self, rule: AutomationRule):
         """Save automation rule to database"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -266,7 +266,7 @@ class WorkflowAutomationSystem:
     def get_all_rules(self) -> List[AutomationRule]:
         """Get all automation rules"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM automation_rules ORDER BY created_at DESC")
@@ -375,7 +375,7 @@ class WorkflowAutomationSystem:
     def _create_automated_task(self, action: Dict[str, Any], trigger_data: Dict[str, Any]):
         """Create automated task"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             task_id = str(uuid.uuid4())
@@ -435,7 +435,7 @@ class WorkflowAutomationSystem:
     def _save_execution(self, execution: AutomationExecution):
         """Save execution record to database"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -462,7 +462,7 @@ class WorkflowAutomationSystem:
     def get_automation_stats(self) -> Dict[str, Any]:
         """Get automation statistics"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_connection(self.db_path)
             cursor = conn.cursor()
             
             # Get rule stats